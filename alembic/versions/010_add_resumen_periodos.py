@@ -0,0 +1,65 @@
+"""Add resumen_semanal / resumen_mensual (rollups de progreso_calorias)
+
+Revision ID: 010_resumen_periodos
+Revises: 008_workout_session_ej, 009_hash_reset_code
+Create Date: 2026-10-17
+
+Une las dos cabezas (008 y 009) del historial de migraciones.
+Tras aplicarla: ``python cli.py rollups`` rellena los resúmenes existentes.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+revision: str = "010_resumen_periodos"
+down_revision: Union[str, Sequence[str], None] = ("008_workout_session_ej", "009_hash_reset_code")
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _columnas_comunes() -> list:
+    return [
+        sa.Column("fecha_inicio", sa.Date(), nullable=False),
+        sa.Column("fecha_fin", sa.Date(), nullable=False),
+        sa.Column("kcal_consumidas", sa.Float(), nullable=False, server_default="0"),
+        sa.Column("kcal_quemadas", sa.Float(), nullable=False, server_default="0"),
+        sa.Column("proteinas_g", sa.Float(), nullable=False, server_default="0"),
+        sa.Column("carbohidratos_g", sa.Float(), nullable=False, server_default="0"),
+        sa.Column("grasas_g", sa.Float(), nullable=False, server_default="0"),
+        sa.Column("kcal_objetivo_promedio", sa.Float(), nullable=False, server_default="0"),
+        sa.Column("dias_registrados", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("dias_con_ejercicio", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("adherencia_pct", sa.Float(), nullable=False, server_default="0"),
+        sa.Column("actualizado_en", sa.TIMESTAMP(), nullable=False, server_default=sa.func.now()),
+    ]
+
+
+def upgrade() -> None:
+    op.create_table(
+        "resumen_semanal",
+        sa.Column("id", sa.Integer(), primary_key=True, autoincrement=True),
+        sa.Column("client_id", sa.Integer(), sa.ForeignKey("clients.id", ondelete="CASCADE"), nullable=False),
+        sa.Column("anio", sa.Integer(), nullable=False),
+        sa.Column("semana", sa.Integer(), nullable=False),
+        *_columnas_comunes(),
+        sa.UniqueConstraint("client_id", "anio", "semana", name="uq_resumen_semanal_cliente_semana"),
+    )
+    op.create_index("ix_resumen_semanal_client_id", "resumen_semanal", ["client_id"])
+    op.create_table(
+        "resumen_mensual",
+        sa.Column("id", sa.Integer(), primary_key=True, autoincrement=True),
+        sa.Column("client_id", sa.Integer(), sa.ForeignKey("clients.id", ondelete="CASCADE"), nullable=False),
+        sa.Column("anio", sa.Integer(), nullable=False),
+        sa.Column("mes", sa.Integer(), nullable=False),
+        *_columnas_comunes(),
+        sa.UniqueConstraint("client_id", "anio", "mes", name="uq_resumen_mensual_cliente_mes"),
+    )
+    op.create_index("ix_resumen_mensual_client_id", "resumen_mensual", ["client_id"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_resumen_mensual_client_id", table_name="resumen_mensual")
+    op.drop_table("resumen_mensual")
+    op.drop_index("ix_resumen_semanal_client_id", table_name="resumen_semanal")
+    op.drop_table("resumen_semanal")
@@ -0,0 +1,35 @@
+"""Índices GIN de trigramas para la resolución de nombres de alimentos
+
+Revision ID: 011_trgm_alimentos
+Revises: 010_resumen_periodos
+Create Date: 2026-10-17
+
+Los ``LIKE '%x%'`` de app/services/alimentos_resolucion.py (y los ``ilike`` del
+buscador) dejan de hacer seq scan de ``alimentos`` / ``alimento_alias``.
+pg_trgm ya está instalado en BD_Calofit; el CREATE EXTENSION es idempotente.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+revision: str = "011_trgm_alimentos"
+down_revision: Union[str, Sequence[str], None] = "010_resumen_periodos"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    op.create_index(
+        "ix_alimentos_nombre_normalizado_trgm", "alimentos", ["nombre_normalizado"],
+        postgresql_using="gin", postgresql_ops={"nombre_normalizado": "gin_trgm_ops"},
+    )
+    op.create_index(
+        "ix_alimento_alias_normalizado_trgm", "alimento_alias", ["alias_normalizado"],
+        postgresql_using="gin", postgresql_ops={"alias_normalizado": "gin_trgm_ops"},
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_alimento_alias_normalizado_trgm", table_name="alimento_alias")
+    op.drop_index("ix_alimentos_nombre_normalizado_trgm", table_name="alimentos")
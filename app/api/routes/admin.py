@@ -365,3 +365,63 @@ async def listar_logs_admin(
         }
         for log in logs
     ]
+
+@router.get("/cache/metrics")
+async def metricas_cache(
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Métricas de caché por caché y prefijo de key (hits, misses, expiraciones,
+    expulsiones, bytes retenidos y latencia de lookup).
+
+    ``worker`` es el proceso que atiende la request; ``host`` agrega lo publicado
+    por todos los workers en CALOFIT_METRICS_DIR. ``single_flight`` cuenta las
+    llamadas colapsadas (waiters que reutilizaron una búsqueda/LLM en vuelo).
+    """
+    check_is_admin(current_user)
+
+    from app.core.cache_metrics import registry, read_published, merge_snapshots
+    from app.core.single_flight import single_flight_stats
+
+    worker = registry.snapshot()
+    if registry.publish_dir:
+        registry.publish()
+        host = merge_snapshots(read_published(registry.publish_dir))
+    else:
+        host = merge_snapshots([worker])
+    return {"worker": worker, "host": host, "single_flight": single_flight_stats()}
+
+
+@router.get("/runtime/metrics")
+async def metricas_runtime(
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Estado interno del worker que atiende: cachés, pool HTTP y gobernador del
+    LLM, circuit breakers, event loop, SQL por ruta, catálogo de alimentos...
+    Fuera de /health, que es público y solo dice si el proceso está vivo.
+    """
+    check_is_admin(current_user)
+
+    from app.core.cache import get_cache_stats
+    from app.core.loop_monitor import loop_monitor_stats
+    from app.core.query_counter import sql_stats
+    from app.core.identity_cache import identity_cache_stats
+    from app.services.catalogo_alimentos import catalogo_stats
+    from app.services.ai.http_pool import http_stats
+    from app.services.ai.circuit_breaker import breaker_stats
+    from app.services.ai.rate_governor import governor_stats
+    from app.services.asistente.clasificador_intencion import clasificador_stats
+    from app.services.asistente.tiempos_consulta import tiempos_consulta_stats
+    return {
+        "cache": get_cache_stats(),
+        "llm_http": http_stats(),
+        "llm_governor": governor_stats(),
+        "llm_breakers": breaker_stats(),
+        "intent_classifier": clasificador_stats(),
+        "assistant_stages": tiempos_consulta_stats(),
+        "event_loop": loop_monitor_stats(),
+        "sql": sql_stats(),
+        "auth_cache": identity_cache_stats(),
+        "food_catalog": catalogo_stats(),
+    }
@@ -1,7 +1,8 @@
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
 from app.core.database import get_db
-from app.api.routes.auth import get_current_user
+from app.api.routes.auth import get_current_client, get_current_user
+from app.models.client import Client
 from app.services.ia_service import ia_engine
 from pydantic import BaseModel
 from typing import List, Dict
@@ -127,22 +128,17 @@ async def actualizar_porcion_balance(
     alimento: str,
     nueva_porcion_gramos: int,
     db: Session = Depends(get_db),
-    current_user = Depends(get_current_user)
+    current_user = Depends(get_current_user),
+    cliente: Client = Depends(get_current_client)
 ):
     """
     🔄 ACTUALIZAR PORCIÓN: Ajusta la cantidad de un alimento ya registrado
     
     Se usa cuando el usuario cambia la porción desde la pantalla de detalle.
     """
-    from app.models.client import Client
     from app.models.historial import ProgresoCalorias
     from datetime import date
     
-    # Obtener cliente
-    cliente = db.query(Client).filter(Client.email == current_user.email).first()
-    if not cliente:
-        raise HTTPException(status_code=404, detail="Cliente no encontrado")
-    
     # Calcular nuevas calorías según la porción ajustada
     # Usar Groq para obtener calorías exactas de la nueva porción
     detalle_request = DetalleAlimentoRequest(
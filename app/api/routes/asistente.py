@@ -3,6 +3,7 @@ Rutas del Asistente del Cliente — "CaloFit Coach Personal"
 
 Endpoints:
   POST /consultar          → Consulta de chat (nutrición, recetas, rutinas, progreso)
+  POST /consultar/stream   → Igual que /consultar, en SSE: tokens + tarjeta final
   POST /log-inteligente    → Registro de comida/ejercicio por texto o voz
   POST /confirmar-registro → Confirmar registro desde tarjeta interactiva (consulta_id)
 
@@ -10,13 +11,20 @@ Toda la lógica de negocio está delegada a:
   app.services.asistente.asistente_service.AsistenteService
 """
 
+import asyncio
+import time
 import traceback
+from typing import Optional
 from fastapi import APIRouter, Depends, HTTPException
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from pydantic import BaseModel
-from app.core.database import get_db
-from app.api.routes.auth import get_current_user
+from app.core.database import SessionLocal, get_async_db, get_db
+from app.api.routes.auth import get_current_client_optional, get_current_user
 from app.services.asistente.asistente_service import asistente_service
+from app.services.ai.streaming import TokenSink, emitir_a, evento_sse
 from app.models.historial import SugerenciaGuardada
 from app.models.client import Client
 
@@ -70,7 +78,7 @@ class GuardarSugerenciaRequest(BaseModel):
 
 # ── helpers de memoria conversacional ──────────────────────────────────────
 
-def _cargar_historial_bd(client_id: int, db: Session, limite: int = 8) -> list:
+async def _cargar_historial_bd(client_id: int, db: AsyncSession, limite: int = 8) -> list:
     """
     Devuelve los últimos `limite` mensajes de chat_historial como lista [{role, content}],
     SOLO si el último mensaje es de las últimas 2 horas (misma sesión activa).
@@ -81,10 +89,10 @@ def _cargar_historial_bd(client_id: int, db: Session, limite: int = 8) -> list:
     from datetime import datetime, timezone, timedelta
 
     # Verificar cuándo fue el último mensaje
-    last_row = db.execute(_t(
+    last_row = (await db.execute(_t(
         "SELECT created_at FROM chat_historial "
         "WHERE client_id = :cid ORDER BY created_at DESC LIMIT 1"
-    ), {"cid": client_id}).fetchone()
+    ), {"cid": client_id})).fetchone()
 
     if not last_row:
         return []
@@ -97,10 +105,10 @@ def _cargar_historial_bd(client_id: int, db: Session, limite: int = 8) -> list:
     if (now_utc - last_ts) > timedelta(hours=2):
         return []  # Sesión expirada — no contaminar con contexto viejo
 
-    rows = db.execute(_t(
+    rows = (await db.execute(_t(
         "SELECT rol, contenido FROM chat_historial "
         "WHERE client_id = :cid ORDER BY created_at DESC LIMIT :n"
-    ), {"cid": client_id, "n": limite}).fetchall()
+    ), {"cid": client_id, "n": limite})).fetchall()
     return [{"role": r.rol, "content": r.contenido} for r in reversed(rows)]
 
 
@@ -125,16 +133,27 @@ def _guardar_turno_bd(client_id: int, mensaje_user: str, texto_asistente: str, d
         db.rollback()
 
 
+def _persistir_turno(client_id: int, mensaje_user: str, resultado: dict, db: Session):
+    """Persiste el turno de /consultar (no guarda turnos bloqueados por guardia)."""
+    if resultado.get("_blocked"):
+        return
+    texto_resp = (
+        resultado.get("respuesta_estructurada", {}).get("texto_conversacional", "")
+        or resultado.get("respuesta", "")
+    )
+    if texto_resp:
+        _guardar_turno_bd(client_id, mensaje_user, texto_resp, db)
+
+
 @router.post("/consultar")
 async def consultar_asistente(
     request: ChatRequest,
     db: Session = Depends(get_db),
     current_user=Depends(get_current_user),
+    cliente: Optional[Client] = Depends(get_current_client_optional),
 ):
     """Chat principal con memoria conversacional persistida en BD."""
     try:
-        cliente = db.query(Client).filter(Client.email == current_user.email).first()
-
         # Solo historial de la sesión actual (últimos 6 mensajes enviados por Flutter).
         # El historial BD está desactivado — causaba que el LLM dijera "como recordarás..." y similares.
         historial_sesion = request.historial or []
@@ -150,14 +169,8 @@ async def consultar_asistente(
             consulta_id=request.consulta_id,
         )
 
-        # Persistir el nuevo turno en BD (no guardar turnos bloqueados por guardia)
-        if cliente and not resultado.get("_blocked"):
-            texto_resp = (
-                resultado.get("respuesta_estructurada", {}).get("texto_conversacional", "")
-                or resultado.get("respuesta", "")
-            )
-            if texto_resp:
-                _guardar_turno_bd(cliente.id, request.mensaje, texto_resp, db)
+        if cliente:
+            _persistir_turno(cliente.id, request.mensaje, resultado, db)
 
         return resultado
     except ValueError as e:
@@ -168,21 +181,81 @@ async def consultar_asistente(
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.post("/consultar/stream")
+async def consultar_asistente_stream(
+    request: ChatRequest,
+    current_user=Depends(get_current_user),
+    cliente: Optional[Client] = Depends(get_current_client_optional),
+):
+    """
+    Variante en streaming (SSE) de /consultar.
+
+    Eventos:
+      token → {"t": "..."}  borrador del texto visible, a medida que llega del LLM
+      reset → {}            el borrador se descarta (fallback de modelo)
+      final → mismo JSON que devuelve /consultar (texto ya post-procesado, macros, secciones)
+      error → {"detail": "..."}
+    """
+    async def eventos():
+        # Sesión propia: la de Depends(get_db) se cierra antes de que empiece el stream.
+        db = SessionLocal()
+        try:
+            with emitir_a(TokenSink()) as sink:
+                task = asyncio.create_task(asistente_service.consultar(
+                    mensaje=request.mensaje,
+                    db=db,
+                    current_user=current_user,
+                    historial=request.historial or [],
+                    contexto_manual=request.contexto_manual,
+                    override_ia=request.override_ia,
+                    consulta_id=request.consulta_id,
+                ))
+            try:
+                async for nombre, data in sink.eventos(task):
+                    yield evento_sse(nombre, data)
+                resultado = task.result()
+            except asyncio.CancelledError:
+                # El cliente cerró la conexión: no seguir gastando tokens.
+                task.cancel()
+                raise
+            except Exception as e:
+                print(f"❌ ERROR EN /consultar/stream: {str(e)}")
+                traceback.print_exc()
+                yield evento_sse("error", {"detail": str(e)})
+                return
+
+            if cliente:
+                _persistir_turno(cliente.id, request.mensaje, resultado, db)
+            total_ms = (time.perf_counter() - sink.t0) * 1000.0
+            print(
+                f"[consultar/stream] ttft={sink.ttft_ms or 0:.0f}ms total={total_ms:.0f}ms "
+                f"tokens={sink.tokens}"
+            )
+            yield evento_sse("final", jsonable_encoder(resultado))
+        finally:
+            db.close()
+
+    return StreamingResponse(
+        eventos(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
 @router.get("/historial")
 async def obtener_historial_chat(
     limite: int = 30,
-    db: Session = Depends(get_db),
-    current_user=Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db),
+    cliente: Optional[Client] = Depends(get_current_client_optional),
 ):
     """Devuelve los últimos mensajes del chat para restaurar conversación entre sesiones."""
     from sqlalchemy import text as _t
-    cliente = db.query(Client).filter(Client.email == current_user.email).first()
-    if not cliente:
+    if cliente is None:
         return []
-    rows = db.execute(_t(
+    rows = (await db.execute(_t(
         "SELECT rol, contenido, created_at FROM chat_historial "
         "WHERE client_id = :cid ORDER BY created_at DESC LIMIT :n"
-    ), {"cid": cliente.id, "n": min(limite, 60)}).fetchall()
+    ), {"cid": cliente.id, "n": min(limite, 60)})).fetchall()
     return [
         {
             "role": r.rol,
@@ -243,20 +316,18 @@ class RegistroDirectoRequest(BaseModel):
 async def registrar_macros_directos(
     body: RegistroDirectoRequest,
     db: Session = Depends(get_db),
-    current_user=Depends(get_current_user),
+    perfil: Optional[Client] = Depends(get_current_client_optional),
 ):
     """
     Registro directo con macros pre-calculados desde el Registro Inteligente.
     NO re-estima — usa exactamente los valores calculados en el preview.
     Garantiza consistencia entre lo que el usuario vio y lo que se guarda.
     """
-    from app.models.client import Client
     from app.models.historial import ProgresoCalorias
     from app.models.comida_registro import ComidaRegistro
     from app.core.utils import get_peru_date
     from sqlalchemy import func
 
-    perfil = db.query(Client).filter(Client.email.ilike(current_user.email)).first()
     if not perfil:
         raise HTTPException(status_code=404, detail="Perfil no encontrado")
 
@@ -399,14 +470,13 @@ async def confirmar_registro_con_consulta_id(
 async def guardar_sugerencia(
     body: GuardarSugerenciaRequest,
     db: Session = Depends(get_db),
-    current_user=Depends(get_current_user),
+    perfil: Optional[Client] = Depends(get_current_client_optional),
 ):
     """Guarda una receta/rutina sugerida por la IA para prepararla después."""
     import re as _re
     from app.models.preferencias import PreferenciaAlimento
 
     try:
-        perfil = db.query(Client).filter(Client.email == current_user.email).first()
         if not perfil:
             raise HTTPException(status_code=404, detail="Perfil no encontrado")
 
@@ -474,11 +544,10 @@ async def guardar_sugerencia(
 @router.get("/mis-sugerencias")
 async def listar_sugerencias(
     db: Session = Depends(get_db),
-    current_user=Depends(get_current_user),
+    perfil: Optional[Client] = Depends(get_current_client_optional),
 ):
     """Lista las sugerencias guardadas del usuario."""
     try:
-        perfil = db.query(Client).filter(Client.email == current_user.email).first()
         if not perfil:
             raise HTTPException(status_code=404, detail="Perfil no encontrado")
 
@@ -506,11 +575,10 @@ async def listar_sugerencias(
 async def completar_sugerencia(
     sugerencia_id: int,
     db: Session = Depends(get_db),
-    current_user=Depends(get_current_user),
+    perfil: Optional[Client] = Depends(get_current_client_optional),
 ):
     """Marca una sugerencia como completada (ya la preparó/hizo)."""
     try:
-        perfil = db.query(Client).filter(Client.email == current_user.email).first()
         item = db.query(SugerenciaGuardada).filter(
             SugerenciaGuardada.id == sugerencia_id,
             SugerenciaGuardada.client_id == perfil.id,
@@ -531,11 +599,10 @@ async def completar_sugerencia(
 async def eliminar_sugerencia(
     sugerencia_id: int,
     db: Session = Depends(get_db),
-    current_user=Depends(get_current_user),
+    perfil: Optional[Client] = Depends(get_current_client_optional),
 ):
     """Elimina una sugerencia guardada."""
     try:
-        perfil = db.query(Client).filter(Client.email == current_user.email).first()
         item = db.query(SugerenciaGuardada).filter(
             SugerenciaGuardada.id == sugerencia_id,
             SugerenciaGuardada.client_id == perfil.id,
@@ -1,7 +1,7 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.orm import Session
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
-from app.core.database import get_db
+from app.core.database import AsyncSessionLocal, get_db
 from app.models.user import User
 from app.core.security import security
 from datetime import timedelta, datetime
@@ -9,6 +9,10 @@ from app.schemas.user import UserLogin, SyncPasswordRequest, ForgotPasswordReque
 from app.core.config import settings
 from jose import JWTError, jwt
 from app.models.client import Client
+from app.core.identity_cache import guardar_identidad, obtener_identidad
+from dataclasses import dataclass
+from typing import Optional
+from sqlalchemy import select
 import hmac
 import hashlib
 
@@ -147,26 +151,39 @@ async def login(credentials: UserLogin, db: Session = Depends(get_db)):
 
     
 
-async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
-    print(f"🔍 Verificando token...")
-    
-    credentials_exception = HTTPException(
+def _credenciales_invalidas() -> HTTPException:
+    return HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Token inválido o expirado",
         headers={"WWW-Authenticate": "Bearer"},
     )
+
+
+@dataclass(frozen=True)
+class Identidad:
+    """Quién hace el request según los claims del JWT (sin tocar la BD)."""
+    user_id: int
+    user_type: str  # "client" | "staff"
+    email: str
+    role: str
+
+    @property
+    def es_staff(self) -> bool:
+        return self.user_type == "staff"
+
+
+def _identidad_del_token(token: str) -> Identidad:
+    """Identidad del JWT; 401 si es inválido o incompleto."""
+    credentials_exception = _credenciales_invalidas()
     
     try:
         # Decodificar el JWT
         payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
-        print(f"🔍 Payload del token: {payload}")
         
         email: str = payload.get("sub")
         user_id: int = payload.get("user_id")  # ✅ Obtener user_id del token
         user_type: str = payload.get("type")
         
-        print(f"🔍 Email: {email}, User ID: {user_id}, Tipo: {user_type}")
-        
         if email is None or user_type is None or user_id is None:
             print(f"❌ Token incompleto")
             raise credentials_exception
@@ -174,18 +191,79 @@ async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = De
     except JWTError as e:
         print(f"❌ Error decodificando token: {e}")
         raise credentials_exception
-        
-    # Buscar usuario según el tipo
-    if user_type == "staff":
-        user = db.query(User).filter(User.id == user_id).first()
+    return Identidad(
+        user_id=int(user_id),
+        user_type=user_type,
+        email=email,
+        role=payload.get("role") or "",
+    )
+
+
+def get_identidad(token: str = Depends(oauth2_scheme)) -> Identidad:
+    """Identidad del request (FastAPI la resuelve una vez por request)."""
+    return _identidad_del_token(token)
+
+
+async def get_current_user(identidad: Identidad = Depends(get_identidad)):
+    """
+    Usuario del token (Client o User staff), por id.
+
+    Sale de la caché de identidad (app.core.identity_cache) si está; si no, se
+    lee por el engine async en una sesión propia que se cierra enseguida (no
+    retiene una conexión del pool durante todo el request) y se cachea. El
+    objeto queda desligado: sirve para leer sus columnas. Las rutas que
+    modifican al propio usuario usan ``get_current_user_sync``.
+    """
+    modelo = User if identidad.es_staff else Client
+    user = obtener_identidad(modelo, identidad.user_id)
+    if user is not None:
+        return user
+
+    async with AsyncSessionLocal() as db:
+        user = await db.get(modelo, identidad.user_id)
+    if user is None:
+        print(f"❌ Usuario no encontrado en BD")
+        raise _credenciales_invalidas()
+    guardar_identidad(user)
+    return user
+
+
+async def get_current_client_optional(
+    identidad: Identidad = Depends(get_identidad),
+    current_user=Depends(get_current_user),
+) -> Optional[Client]:
+    """
+    Perfil de cliente del request, o None. Con token de cliente es el propio
+    ``get_current_user`` (sin otra query); con token staff, el Client con su
+    email, en una sesión async corta como la de ``get_current_user``.
+    """
+    if not identidad.es_staff:
+        return current_user
+    async with AsyncSessionLocal() as db:
+        return (await db.execute(
+            select(Client).where(Client.email == identidad.email).limit(1)
+        )).scalars().first()
+
+
+async def get_current_client(cliente: Optional[Client] = Depends(get_current_client_optional)) -> Client:
+    """Como ``get_current_client_optional``, con 404 si no hay perfil de cliente."""
+    if cliente is None:
+        raise HTTPException(status_code=404, detail="Cliente no encontrado")
+    return cliente
+
+
+async def get_current_user_sync(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
+    """Igual que ``get_current_user``, pero ligado a la sesión ``get_db`` de la ruta (para modificarlo y hacer commit)."""
+    identidad = _identidad_del_token(token)
+
+    if identidad.es_staff:
+        user = db.query(User).filter(User.id == identidad.user_id).first()
     else:
-        user = db.query(Client).filter(Client.id == user_id).first()
-        
+        user = db.query(Client).filter(Client.id == identidad.user_id).first()
+
     if user is None:
         print(f"❌ Usuario no encontrado en BD")
-        raise credentials_exception
-    
-    print(f"✅ Usuario autenticado: {user.email} (ID: {user.id})")
+        raise _credenciales_invalidas()
     return user
 
 
@@ -369,7 +447,7 @@ from app.schemas.client import ChangePassword
 @router.post("/change-password")
 async def change_password(
     data: ChangePassword,
-    current_user = Depends(get_current_user),
+    current_user = Depends(get_current_user_sync),
     db: Session = Depends(get_db)
 ):
     """
@@ -1,10 +1,12 @@
 from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from app.core.database import get_db
-from app.api.routes.auth import get_current_user
+from app.core.database import get_async_db, get_db
+from app.api.routes.auth import get_current_client
 from app.models.client import Client
 from app.models.historial import ProgresoCalorias
 from app.models.nutricion import PlanNutricional, PlanDiario
+from app.services.resumen_periodos import adherencia_dia, marcar_resumen, objetivos_plan
 from datetime import datetime, date, timezone as _tz
 from typing import Optional
 from zoneinfo import ZoneInfo
@@ -23,8 +25,8 @@ router = APIRouter()
 @router.get("/hoy")
 async def obtener_balance_hoy(
     fecha: Optional[str] = Query(None, description="Fecha opcional YYYY-MM-DD para historial"),
-    db: Session = Depends(get_db),
-    current_user = Depends(get_current_user)
+    db: AsyncSession = Depends(get_async_db),
+    cliente: Client = Depends(get_current_client)
 ):
     """
     📊 MI BALANCE DIARIO: Ver todos los registros de una fecha
@@ -35,11 +37,10 @@ async def obtener_balance_hoy(
     - Lista de alimentos registrados
     - Lista de ejercicios registrados
     """
-    # Obtener cliente
-    cliente = db.query(Client).filter(Client.email == current_user.email).first()
-    if not cliente:
-        raise HTTPException(status_code=404, detail="Cliente no encontrado")
-    
+    return await db.run_sync(_balance_hoy, cliente, fecha)
+
+
+def _balance_hoy(db: Session, cliente: Client, fecha: Optional[str]) -> dict:
     # Obtener plan activo
     # Obtener plan activo (Lógica alineada con Dashboard)
     plan_activo = db.query(PlanNutricional).filter(
@@ -236,8 +237,8 @@ async def obtener_balance_hoy(
 @router.get("/semanal")
 async def obtener_seguimiento_semanal(
     semana_offset: int = Query(0, ge=-12, le=0, description="0=semana actual, -1=semana anterior, etc."),
-    db: Session = Depends(get_db),
-    current_user = Depends(get_current_user)
+    db: AsyncSession = Depends(get_async_db),
+    cliente: Client = Depends(get_current_client)
 ):
     """
     📅 SEGUIMIENTO SEMANAL: Plan vs ejecución real (últimos 7 días)
@@ -251,25 +252,54 @@ async def obtener_seguimiento_semanal(
 
     Más un resumen semanal agregado.
     """
-    from app.core.utils import get_peru_date
+    return await db.run_sync(_seguimiento_semanal, cliente, semana_offset)
+
+
+def _datos_semana(db: Session, client_id: int, lunes: date) -> tuple[dict, dict]:
+    """
+    Datos de Lun-Dom en dos queries (antes 2 por día):
+    ProgresoCalorias por fecha y nº de workout_logs por fecha local de Lima.
+    """
     from datetime import timedelta
     from sqlalchemy import text as _sql
 
-    cliente = db.query(Client).filter(Client.email == current_user.email).first()
-    if not cliente:
-        raise HTTPException(status_code=404, detail="Cliente no encontrado")
+    domingo = lunes + timedelta(days=6)
+    progreso_por_fecha: dict = {}
+    for p in db.query(ProgresoCalorias).filter(
+        ProgresoCalorias.client_id == client_id,
+        ProgresoCalorias.fecha >= lunes,
+        ProgresoCalorias.fecha <= domingo,
+    ).order_by(ProgresoCalorias.id).all():
+        progreso_por_fecha.setdefault(p.fecha, p)
+
+    # created_at es UTC naive: el rango se filtra en UTC (usa el índice de
+    # created_at) y se agrupa por la fecha de Lima (UTC-5).
+    desde = datetime.combine(lunes, datetime.min.time())
+    hasta = desde + timedelta(days=7)
+    if db.bind.dialect.name == "postgresql":
+        filas = db.execute(_sql(
+            "SELECT (created_at AT TIME ZONE 'UTC' AT TIME ZONE 'America/Lima')::date AS dia, COUNT(*) "
+            "FROM workout_logs "
+            "WHERE client_id = :cid AND created_at >= :desde AND created_at < :hasta "
+            "GROUP BY 1"
+        ), {"cid": client_id, "desde": desde + timedelta(hours=5), "hasta": hasta + timedelta(hours=5)})
+    else:
+        filas = db.execute(_sql(
+            "SELECT date(created_at) AS dia, COUNT(*) FROM workout_logs "
+            "WHERE client_id = :cid AND created_at >= :desde AND created_at < :hasta "
+            "GROUP BY 1"
+        ), {"cid": client_id, "desde": desde, "hasta": hasta})
+    ejercicios_por_fecha = {
+        d if isinstance(d, date) else date.fromisoformat(str(d)[:10]): int(n) for d, n in filas
+    }
+    return progreso_por_fecha, ejercicios_por_fecha
+
 
-    plan_activo = db.query(PlanNutricional).filter(
-        PlanNutricional.client_id == cliente.id
-    ).order_by(PlanNutricional.fecha_creacion.desc()).first()
+def _seguimiento_semanal(db: Session, cliente: Client, semana_offset: int) -> dict:
+    from app.core.utils import get_peru_date
+    from datetime import timedelta
 
-    objetivo_base = 2000.0
-    plan_por_dia: dict[int, float] = {}
-    if plan_activo:
-        if plan_activo.calorias_ia_base:
-            objetivo_base = float(plan_activo.calorias_ia_base)
-        for pd in db.query(PlanDiario).filter(PlanDiario.plan_id == plan_activo.id).all():
-            plan_por_dia[pd.dia_numero] = float(pd.calorias_dia)
+    objetivo_base, plan_por_dia = objetivos_plan(db, cliente.id)
 
     # Metas de macros: usar metas_usuario si existen, derivar de kcal si no
     from app.models.meta_usuario import MetaUsuario
@@ -295,6 +325,7 @@ async def obtener_seguimiento_semanal(
     hoy = get_peru_date()
     lunes_actual = hoy - timedelta(days=hoy.isoweekday() - 1)
     lunes_semana = lunes_actual + timedelta(weeks=semana_offset)
+    progreso_por_fecha, ejercicios_por_fecha = _datos_semana(db, cliente.id, lunes_semana)
     dias_labels = ["Lun", "Mar", "Mié", "Jue", "Vie", "Sáb", "Dom"]
 
     resultado_dias = []
@@ -311,33 +342,16 @@ async def obtener_seguimiento_semanal(
 
         kcal_objetivo = plan_por_dia.get(dia_iso, objetivo_base)
 
-        progreso = db.query(ProgresoCalorias).filter(
-            ProgresoCalorias.client_id == cliente.id,
-            ProgresoCalorias.fecha == fecha_dia
-        ).first()
+        progreso = progreso_por_fecha.get(fecha_dia)
 
         kcal_consumidas = float(progreso.calorias_consumidas or 0) if progreso else 0.0
         kcal_quemadas = float(progreso.calorias_quemadas or 0) if progreso else 0.0
         hay_registro = progreso is not None and kcal_consumidas > 0
 
-        # Contar ejercicios del día desde workout_logs
-        wl_count = db.execute(_sql(
-            "SELECT COUNT(*) FROM workout_logs "
-            "WHERE client_id = :cid "
-            "AND (created_at AT TIME ZONE 'UTC' AT TIME ZONE 'America/Lima')::date = :fecha"
-        ), {"cid": cliente.id, "fecha": fecha_dia}).scalar() or 0
-        hay_ejercicio = int(wl_count) > 0
+        hay_ejercicio = ejercicios_por_fecha.get(fecha_dia, 0) > 0
 
         # Adherencia: 100% si consumidas está entre 90-110% del objetivo
-        adherencia_pct = 0.0
-        if hay_registro and kcal_objetivo > 0:
-            ratio = kcal_consumidas / kcal_objetivo
-            if ratio <= 1.1:
-                adherencia_pct = min(ratio, 1.0) * 100.0
-            else:
-                # Penalizar superávit excesivo
-                adherencia_pct = max(0.0, (2.2 - ratio) / 1.1) * 100.0
-            adherencia_pct = round(max(0.0, min(100.0, adherencia_pct)), 1)
+        adherencia_pct = adherencia_dia(kcal_consumidas, kcal_objetivo) if hay_registro else 0.0
 
         if hay_registro:
             dias_con_registro += 1
@@ -401,8 +415,8 @@ async def obtener_seguimiento_semanal(
 @router.get("/historico")
 async def obtener_historico(
     dias: int = Query(30, ge=7, le=90, description="Días de historial (7, 30 o 90)"),
-    db: Session = Depends(get_db),
-    current_user = Depends(get_current_user)
+    db: AsyncSession = Depends(get_async_db),
+    cliente: Client = Depends(get_current_client)
 ):
     """
     📈 HISTORIAL: Calorías y peso en un rango de fechas
@@ -411,14 +425,14 @@ async def obtener_historico(
     - calorias: lista diaria (consumidas, quemadas, objetivo)
     - peso: registros de historial_peso en el rango
     """
+    return await db.run_sync(_historico, cliente, dias)
+
+
+def _historico(db: Session, cliente: Client, dias: int) -> dict:
     from app.core.utils import get_peru_date
     from datetime import timedelta
     from app.models.historial import HistorialPeso
 
-    cliente = db.query(Client).filter(Client.email == current_user.email).first()
-    if not cliente:
-        raise HTTPException(status_code=404, detail="Cliente no encontrado")
-
     hoy = get_peru_date()
     desde = hoy - timedelta(days=dias - 1)
 
@@ -493,19 +507,72 @@ async def obtener_historico(
     }
 
 
+@router.get("/resumen")
+async def obtener_resumen_periodos(
+    periodo: str = Query("semana", pattern="^(semana|mes)$", description="semana (ISO) o mes"),
+    cantidad: int = Query(12, ge=1, le=104, description="Periodos hacia atrás, incluido el actual"),
+    db: AsyncSession = Depends(get_async_db),
+    cliente: Client = Depends(get_current_client)
+):
+    """
+    🗓️ RESUMEN POR PERIODOS: Historial largo por semana o mes
+
+    Lee las tablas resumen_semanal / resumen_mensual (sin re-agregar los días).
+    Por periodo: año y número (semana ISO o mes), kcal consumidas / quemadas,
+    macros, promedio diario, días registrados, días con ejercicio y adherencia media.
+    """
+    from datetime import timedelta
+    from sqlalchemy import select
+    from app.core.utils import get_peru_date
+    from app.models.resumen_periodo import ResumenMensual, ResumenSemanal
+
+    hoy = get_peru_date()
+    if periodo == "semana":
+        modelo = ResumenSemanal
+        desde = hoy - timedelta(days=hoy.isoweekday() - 1) - timedelta(weeks=cantidad - 1)
+    else:
+        modelo = ResumenMensual
+        meses = hoy.year * 12 + hoy.month - 1 - (cantidad - 1)
+        desde = date(meses // 12, meses % 12 + 1, 1)
+
+    filas = (await db.execute(
+        select(modelo).where(
+            modelo.client_id == cliente.id,
+            modelo.fecha_inicio >= desde,
+        ).order_by(modelo.fecha_inicio)
+    )).scalars().all()
+
+    periodos = [
+        {
+            "fecha_inicio": r.fecha_inicio.isoformat(),
+            "fecha_fin": r.fecha_fin.isoformat(),
+            "anio": r.anio,
+            "numero": r.semana if periodo == "semana" else r.mes,
+            "kcal_consumidas": r.kcal_consumidas,
+            "kcal_quemadas": r.kcal_quemadas,
+            "proteinas_g": r.proteinas_g,
+            "carbohidratos_g": r.carbohidratos_g,
+            "grasas_g": r.grasas_g,
+            "kcal_promedio_consumidas": round(r.kcal_consumidas / r.dias_registrados, 1) if r.dias_registrados else 0.0,
+            "kcal_objetivo_promedio": r.kcal_objetivo_promedio,
+            "dias_registrados": r.dias_registrados,
+            "dias_con_ejercicio": r.dias_con_ejercicio,
+            "adherencia_pct": r.adherencia_pct,
+        }
+        for r in filas
+    ]
+    return {"periodo": periodo, "desde": desde.isoformat(), "hasta": hoy.isoformat(), "periodos": periodos}
+
+
 @router.post("/favorito/{registro_id}")
 async def toggle_favorito(
     registro_id: int,
     db: Session = Depends(get_db),
-    current_user = Depends(get_current_user),
+    cliente: Client = Depends(get_current_client),
 ):
     """Marca o desmarca un alimento como favorito (toggle)."""
     from app.models.preferencias import PreferenciaAlimento
 
-    cliente = db.query(Client).filter(Client.email == current_user.email).first()
-    if not cliente:
-        raise HTTPException(status_code=404, detail="Cliente no encontrado")
-
     registro = db.query(PreferenciaAlimento).filter(
         PreferenciaAlimento.id == registro_id,
         PreferenciaAlimento.client_id == cliente.id,
@@ -520,15 +587,15 @@ async def toggle_favorito(
 
 @router.get("/favoritos")
 async def listar_favoritos(
-    db: Session = Depends(get_db),
-    current_user = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db),
+    cliente: Client = Depends(get_current_client),
 ):
     """Devuelve todos los alimentos marcados como favoritos del usuario."""
-    from app.models.preferencias import PreferenciaAlimento
+    return await db.run_sync(_favoritos, cliente)
+
 
-    cliente = db.query(Client).filter(Client.email == current_user.email).first()
-    if not cliente:
-        raise HTTPException(status_code=404, detail="Cliente no encontrado")
+def _favoritos(db: Session, cliente: Client) -> list:
+    from app.models.preferencias import PreferenciaAlimento
 
     favs = db.query(PreferenciaAlimento).filter(
         PreferenciaAlimento.client_id == cliente.id,
@@ -557,7 +624,7 @@ async def eliminar_registro(
     tipo: str,              # "alimento" o "ejercicio"
     n: int = 0,             # cuántos eliminar (0 = todos del grupo)
     db: Session = Depends(get_db),
-    current_user = Depends(get_current_user)
+    cliente: Client = Depends(get_current_client)
 ):
     """
     🗑️ ELIMINAR REGISTRO: Elimina un alimento o ejercicio registrado
@@ -569,10 +636,6 @@ async def eliminar_registro(
 
     Recalcula automáticamente el balance después de eliminar.
     """
-    # Obtener cliente
-    cliente = db.query(Client).filter(Client.email == current_user.email).first()
-    if not cliente:
-        raise HTTPException(status_code=404, detail="Cliente no encontrado")
     
     from app.models.comida_registro import ComidaRegistro
     from app.services.trazabilidad import recalcular_progreso_diario
@@ -620,6 +683,7 @@ async def eliminar_registro(
             "UPDATE progreso_calorias SET calorias_quemadas = GREATEST(0, calorias_quemadas - :cal) "
             "WHERE client_id = :cid AND fecha = :hoy"
         ), {"cal": cal_a_restar, "cid": cliente.id, "hoy": _gpd()})
+        marcar_resumen(db, cliente.id, _gpd())
         db.commit()
     else:
         raise HTTPException(status_code=400, detail="Tipo debe ser 'alimento' o 'ejercicio'")
@@ -9,7 +9,7 @@ from app.models.user import User
 from app.schemas.client import ClientCreate, ClientUpdate, ClientResponse, ChangePassword, AdminCreateClient
 from app.schemas.dieta import ClientResponseConDieta, RecomendacionDietaCompleta
 from app.core.security import security
-from app.api.routes.auth import get_current_user, get_current_staff
+from app.api.routes.auth import get_current_staff, get_current_user, get_current_user_sync
 from app.services.calculador_dieta import CalculadorDietaAutomatica
 from datetime import date
 from app.services.email_service import EmailService
@@ -238,7 +238,7 @@ def obtener_perfil_cliente(
 @router.post("/perfil/foto")
 async def subir_foto_perfil_cliente(
     file: UploadFile = File(...),
-    current_user: Client = Depends(get_current_user),
+    current_user: Client = Depends(get_current_user_sync),
     db: Session = Depends(get_db)
 ):
     """Sube una foto de perfil localmente para el cliente y actualiza la URL en la base de datos"""
@@ -479,7 +479,7 @@ def actualizar_perfil_cliente(
 @router.put("/vincular-uid")
 def vincular_uid_flutter(
     flutter_uid: str,
-    current_user = Depends(get_current_user),
+    current_user = Depends(get_current_user_sync),
     db: Session = Depends(get_db)
 ):
     """
@@ -1,10 +1,11 @@
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from datetime import datetime, timedelta, date
 from typing import List, Dict
 import math
 
-from app.core.database import get_db
+from app.core.database import get_async_db
 from app.models.client import Client
 from app.models.nutricion import PlanDiario, PlanNutricional
 from app.api.routes.auth import get_current_user
@@ -16,19 +17,19 @@ router = APIRouter()
 @router.get("/clientes/{cliente_id}/resumen-diario")
 async def get_daily_summary(
     cliente_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: dict = Depends(get_current_user)
 ):
-    cliente = db.query(Client).filter(Client.id == cliente_id).first()
+    cliente = await db.get(Client, cliente_id)
     if not cliente:
         raise HTTPException(status_code=404, detail="Cliente no encontrado")
     
     # 1. Obtener datos de consumo real del historial
     hoy = get_peru_date()
-    progreso_hoy = db.query(ProgresoCalorias).filter(
+    progreso_hoy = (await db.execute(select(ProgresoCalorias).filter(
         ProgresoCalorias.client_id == cliente_id,
         ProgresoCalorias.fecha == hoy
-    ).first()
+    ).limit(1))).scalars().first()
 
     consumo_actual = {
         "calorias": progreso_hoy.calorias_consumidas if progreso_hoy else 0,
@@ -38,17 +39,19 @@ async def get_daily_summary(
     }
     
     # 2. Obtener el plan nutricional activo
-    plan_maestro = db.query(PlanNutricional).filter(
+    plan_maestro = (await db.execute(select(PlanNutricional).filter(
         PlanNutricional.client_id == cliente_id
-    ).order_by(PlanNutricional.fecha_creacion.desc()).first()
+    ).order_by(PlanNutricional.fecha_creacion.desc()).limit(1))).scalars().first()
     
     plan_objetivo = None
     if plan_maestro:
         dia_semana = get_peru_now().isoweekday()
-        plan_hoy = db.query(PlanDiario).filter(
+        plan_hoy = (await db.execute(select(PlanDiario).filter(
             PlanDiario.plan_id == plan_maestro.id,
             PlanDiario.dia_numero == dia_semana
-        ).first() or db.query(PlanDiario).filter(PlanDiario.plan_id == plan_maestro.id).first()
+        ).limit(1))).scalars().first() or (await db.execute(
+            select(PlanDiario).filter(PlanDiario.plan_id == plan_maestro.id).limit(1)
+        )).scalars().first()
         
         if plan_hoy:
             total_macros_kcal = (plan_hoy.proteinas_g * 4) + (plan_hoy.carbohidratos_g * 4) + (plan_hoy.grasas_g * 9)
@@ -179,13 +182,22 @@ async def get_daily_summary(
     }
 
 @router.get("/clientes/{cliente_id}/calorias-tendencia")
-async def get_calories_trend(cliente_id: int, db: Session = Depends(get_db)):
+async def get_calories_trend(cliente_id: int, db: AsyncSession = Depends(get_async_db)):
     dias_semana = ['Lun', 'Mar', 'Mié', 'Jue', 'Vie', 'Sáb', 'Dom']
     resultado = []
     hoy = get_peru_date()
+    # Los 7 días en una sola query
+    filas = (await db.execute(select(ProgresoCalorias).filter(
+        ProgresoCalorias.client_id == cliente_id,
+        ProgresoCalorias.fecha >= hoy - timedelta(days=6),
+        ProgresoCalorias.fecha <= hoy,
+    ))).scalars().all()
+    por_fecha = {}
+    for p in filas:
+        por_fecha.setdefault(p.fecha, p)
     for i in range(7):
         fecha = hoy - timedelta(days=6-i)
-        p = db.query(ProgresoCalorias).filter(ProgresoCalorias.client_id == cliente_id, ProgresoCalorias.fecha == fecha).first()
+        p = por_fecha.get(fecha)
         resultado.append({
             "dia": dias_semana[fecha.weekday()],
             "consumidas": p.calorias_consumidas if p else 0,
@@ -194,11 +206,11 @@ async def get_calories_trend(cliente_id: int, db: Session = Depends(get_db)):
     return resultado
 
 @router.get("/clientes/{cliente_id}/peso-historial")
-async def get_weight_history(cliente_id: int, db: Session = Depends(get_db)):
-    registros = db.query(HistorialPeso).filter(HistorialPeso.client_id == cliente_id).order_by(HistorialPeso.fecha_registro.desc()).limit(10).all()
+async def get_weight_history(cliente_id: int, db: AsyncSession = Depends(get_async_db)):
+    registros = (await db.execute(select(HistorialPeso).filter(HistorialPeso.client_id == cliente_id).order_by(HistorialPeso.fecha_registro.desc()).limit(10))).scalars().all()
     return [{"fecha": r.fecha_registro.isoformat(), "peso": r.peso_kg} for r in registros]
 
 @router.get("/clientes/{cliente_id}/imc-historial")
-async def get_imc_history(cliente_id: int, db: Session = Depends(get_db)):
-    registros = db.query(HistorialIMC).filter(HistorialIMC.client_id == cliente_id).order_by(HistorialIMC.fecha_registro.desc()).limit(10).all()
+async def get_imc_history(cliente_id: int, db: AsyncSession = Depends(get_async_db)):
+    registros = (await db.execute(select(HistorialIMC).filter(HistorialIMC.client_id == cliente_id).order_by(HistorialIMC.fecha_registro.desc()).limit(10))).scalars().all()
     return [{"fecha": r.fecha_registro.isoformat(), "imc": r.imc, "categoria": r.categoria} for r in registros]
\ No newline at end of file
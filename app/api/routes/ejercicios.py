@@ -13,7 +13,8 @@ from pydantic import BaseModel, Field
 from sqlalchemy import text as _sql
 from sqlalchemy.orm import Session
 
-from app.api.routes.auth import get_current_user
+from app.api.routes.auth import get_current_client_optional
+from app.models.client import Client
 from app.core.database import get_db
 from app.services.asistente.asistente_registro_ejercicio import registro_ejercicio_handler
 from app.services.rutina_service import generar_rutina_inteligente
@@ -107,14 +108,12 @@ async def listar_grupos(db: Session = Depends(get_db)):
 async def generar_rutina(
     body: RutinaRequest,
     db: Session = Depends(get_db),
-    current_user=Depends(get_current_user),
+    perfil: Optional[Client] = Depends(get_current_client_optional),
 ):
     """
     Genera una rutina personalizada basada en perfil ML (A/B/C),
     lesiones del usuario y zonas objetivo.
     """
-    from app.models.client import Client
-    perfil = db.query(Client).filter(Client.email.ilike(current_user.email)).first()
     if not perfil:
         raise HTTPException(status_code=404, detail="Perfil de cliente no encontrado")
 
@@ -133,14 +132,12 @@ async def generar_rutina(
 async def registrar_series(
     body: LogSeriesRequest,
     db: Session = Depends(get_db),
-    current_user=Depends(get_current_user),
+    perfil: Optional[Client] = Depends(get_current_client_optional),
 ):
     """
     Registra una sesión detallada (series × reps × peso) en workout_logs
     y sincroniza con progreso_calorias y Random Forest features.
     """
-    from app.models.client import Client
-    perfil = db.query(Client).filter(Client.email.ilike(current_user.email)).first()
     if not perfil:
         raise HTTPException(status_code=404, detail="Perfil de cliente no encontrado")
 
@@ -162,11 +159,9 @@ async def registrar_series(
 async def historial_logs(
     limit: int = Query(default=20, ge=1, le=100),
     db: Session = Depends(get_db),
-    current_user=Depends(get_current_user),
+    perfil: Optional[Client] = Depends(get_current_client_optional),
 ):
     """Historial de workout_logs del usuario autenticado."""
-    from app.models.client import Client
-    perfil = db.query(Client).filter(Client.email.ilike(current_user.email)).first()
     if not perfil:
         raise HTTPException(status_code=404, detail="Perfil no encontrado")
 
@@ -6,7 +6,8 @@ from app.models.nutricion import PlanNutricional, PlanDiario
 from app.schemas.nutricion import PlanNutricionalCreate, PlanNutricionalResponse, TestIARequest
 from typing import List, Optional, Any, Dict
 
-from app.api.routes.auth import get_current_staff, get_current_user
+from app.api.routes.auth import get_current_client, get_current_staff
+from app.models.client import Client
 from app.services.ia_service import ia_engine 
 
 router = APIRouter()
@@ -260,7 +261,7 @@ async def validar_plan_nutricional(
 @router.get("/recomendaciones")
 async def obtener_recomendaciones_personalizadas(
     db: Session = Depends(get_db),
-    current_user = Depends(get_current_user)
+    cliente: Client = Depends(get_current_client)
 ):
     """
     🧠 SISTEMA DE APRENDIZAJE: Recomendaciones personalizadas de alimentos
@@ -268,15 +269,9 @@ async def obtener_recomendaciones_personalizadas(
     - Usuario NUEVO → Top alimentos según objetivo y condiciones dietéticas
     - Usuario CON historial → Sus favoritos filtrados por restricciones dietéticas
     """
-    from app.models.client import Client
     from app.models.preferencias import PreferenciaAlimento
     from app.services.recomendador_platos import _tokens_prohibidos
 
-    # Obtener cliente
-    cliente = db.query(Client).filter(Client.email == current_user.email).first()
-    if not cliente:
-        raise HTTPException(status_code=404, detail="Cliente no encontrado")
-
     # Tokens prohibidos según condiciones dietéticas del perfil
     _conds = list(cliente.medical_conditions or [])
     tokens_prohib = _tokens_prohibidos(_conds)
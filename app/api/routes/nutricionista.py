@@ -1,5 +1,6 @@
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from sqlalchemy import func
+from sqlalchemy.orm import Session, raiseload
 from typing import List
 from app.core.database import get_db
 from app.models.client import Client
@@ -7,13 +8,15 @@ from app.models.user import User
 from app.api.routes.auth import get_current_user
 from app.services.ia_service import ia_service
 from app.models.nutricion import PlanNutricional, PlanDiario
-from app.models.historial import AlertaSalud
+from app.models.historial import AlertaSalud, HistorialPeso, ProgresoCalorias
 from app.schemas.nutricion import PlanNutricionalResponse, PlanNutricionalUpdate
 from app.schemas.client import StrategicGuideUpdate
 from datetime import datetime, timedelta
 from app.core.utils import calcular_metabolismo_basal, obtener_macros_desglosados, get_peru_now
 from app.schemas.client import StrategicGuideUpdate, ClientExpressCreate
 from app.core.security import security
+from app.core.cache import get_cached, set_cached
+from app.core.config import settings
 
 router = APIRouter()
 
@@ -41,9 +44,14 @@ def calcular_progreso_paciente(client: Client) -> float:
 
     # Encontramos el peso más antiguo para comparar
     historial_ordenado = sorted(client.historial_peso, key=lambda x: x.fecha_registro)
-    peso_inicial = historial_ordenado[0].peso_kg
-    peso_actual = client.weight or peso_inicial
-    objetivo = (client.goal or "Mantener peso").lower()
+    return _progreso_por_peso(historial_ordenado[0].peso_kg, client.weight, client.goal)
+
+def _progreso_por_peso(peso_inicial: float, peso_actual: float, goal: str) -> float:
+    """Progreso (%) a partir del primer pesaje; sin pesajes (peso_inicial None) → 50."""
+    if peso_inicial is None:
+        return 50.0
+    peso_actual = peso_actual or peso_inicial
+    objetivo = (goal or "Mantener peso").lower()
 
     if "perder" in objetivo:
         # Si bajó de peso respecto al inicio, progreso > 50
@@ -57,6 +65,56 @@ def calcular_progreso_paciente(client: Client) -> float:
         variacion = abs(peso_actual - peso_inicial)
         return max(0.0, 100.0 - (variacion * 5))
 
+def _agregados_pacientes(db: Session, client_ids: List[int], desde, con_plan: bool = True) -> dict:
+    """
+    Datos del listado de pacientes en tres queries agrupadas (sin cargar historiales):
+    registros de progreso desde ``desde``, primer/último pesaje y estado del último plan
+    (este último se omite con ``con_plan=False``).
+    Devuelve {client_id: {"registros_7d", "peso_inicial", "ultimo_pesaje", "plan_status"}}.
+    """
+    datos = {
+        cid: {"registros_7d": 0, "peso_inicial": None, "ultimo_pesaje": None, "plan_status": None}
+        for cid in client_ids
+    }
+    if not client_ids:
+        return datos
+
+    for cid, n in db.query(ProgresoCalorias.client_id, func.count(ProgresoCalorias.id)).filter(
+        ProgresoCalorias.client_id.in_(client_ids),
+        ProgresoCalorias.fecha >= desde,
+    ).group_by(ProgresoCalorias.client_id).all():
+        datos[cid]["registros_7d"] = n
+
+    pesajes = db.query(
+        HistorialPeso.client_id,
+        HistorialPeso.peso_kg,
+        func.max(HistorialPeso.fecha_registro).over(partition_by=HistorialPeso.client_id).label("ultimo"),
+        func.row_number().over(
+            partition_by=HistorialPeso.client_id,
+            order_by=(HistorialPeso.fecha_registro, HistorialPeso.id),
+        ).label("orden"),
+    ).filter(HistorialPeso.client_id.in_(client_ids)).subquery()
+    for cid, peso, ultimo in db.query(pesajes.c.client_id, pesajes.c.peso_kg, pesajes.c.ultimo).filter(
+        pesajes.c.orden == 1
+    ).all():
+        datos[cid]["peso_inicial"] = peso
+        datos[cid]["ultimo_pesaje"] = ultimo
+
+    if not con_plan:
+        return datos
+    planes = db.query(
+        PlanNutricional.client_id,
+        PlanNutricional.status,
+        func.row_number().over(
+            partition_by=PlanNutricional.client_id,
+            order_by=(PlanNutricional.fecha_creacion.desc(), PlanNutricional.id.desc()),
+        ).label("orden"),
+    ).filter(PlanNutricional.client_id.in_(client_ids)).subquery()
+    for cid, plan_status in db.query(planes.c.client_id, planes.c.status).filter(planes.c.orden == 1).all():
+        datos[cid]["plan_status"] = plan_status
+
+    return datos
+
 @router.post("/clientes/express")
 def create_express_patient(
     client_data: ClientExpressCreate,
@@ -173,19 +231,25 @@ def get_assigned_patients(
         )
     # Admin: sin filtro — ve todos
 
-    clients = query.all()
+    # Los historiales no se recorren aquí: se agregan en SQL (_agregados_pacientes).
+    clients = query.options(
+        raiseload(Client.progreso_calorias),
+        raiseload(Client.historial_peso),
+        raiseload(Client.planes_nutricionales),
+    ).all()
     
     now = get_peru_now()
     seven_days_ago = now - timedelta(days=7)
+    agregados = _agregados_pacientes(db, [c.id for c in clients], seven_days_ago.date())
     
     result = []
     for c in clients:
+        datos = agregados[c.id]
         # Lógica de adherencia real: Contar días con registros en los últimos 7 días
-        registros_recientes = [r for r in c.progreso_calorias if r.fecha >= seven_days_ago.date()]
-        num_registros = len(registros_recientes)
+        num_registros = datos["registros_7d"]
 
         adherencia = round((num_registros / 7) * 100, 1)
-        progreso = calcular_progreso_paciente(c)
+        progreso = _progreso_por_peso(datos["peso_inicial"], c.weight, c.goal)
 
         alerta_data = ia_service.generar_alerta_fuzzy(adherencia, progreso)
 
@@ -201,9 +265,7 @@ def get_assigned_patients(
         if is_new_user:
             hizo_checkin_peso = True
         else:
-            last_record = max(
-                (r.fecha_registro for r in c.historial_peso), default=None
-            )
+            last_record = datos["ultimo_pesaje"]
             days_since = (
                 (now.date() - last_record).days if last_record else days_since_creation
             )
@@ -225,7 +287,7 @@ def get_assigned_patients(
             "is_profile_complete": c.is_profile_complete,
             "dni": c.dni,
             "hizo_checkin_peso": hizo_checkin_peso,
-            "semana_status": _calcular_mes_status(c, db)
+            "semana_status": "validado" if datos["plan_status"] == "validado" else "pendiente"
         })
     
     return result
@@ -678,12 +740,32 @@ def get_nutri_stats(
 ):
     check_is_nutri(current_user)
 
+    # Caché corto por usuario staff: el dashboard se refresca a menudo y las
+    # cifras toleran unos segundos de retraso (CALOFIT_NUTRI_STATS_TTL_SEC).
+    ttl = settings.CALOFIT_NUTRI_STATS_TTL_SEC
+    cache_key = f"nutri_stats:{current_user.id}"
+    if ttl > 0:
+        cached = get_cached(cache_key)
+        if cached is not None:
+            return cached
+
+    stats = _calcular_stats(db, current_user)
+    if ttl > 0:
+        set_cached(cache_key, stats, ttl_seconds=ttl)
+    return stats
+
+
+def _calcular_stats(db: Session, current_user: User) -> dict:
+    """
+    Estadísticas del dashboard en un número fijo de queries agrupadas
+    (no crece con los pacientes ni con sus historiales).
+    """
     _ROLES_NUTRI  = {"nutricionista", "nutritionist", "nutri"}
     _ROLES_COACH  = {"coach", "entrenador", "trainer"}
 
     # ── Bug 1 & 2: filtro correcto por rol ───────────────────────────────
     role  = str(getattr(current_user, "role_name", "")).lower()
-    query = db.query(Client)
+    query = db.query(Client.id, Client.first_name, Client.last_name_paternal, Client.weight, Client.goal)
     if role in _ROLES_NUTRI:
         query = query.filter(Client.assigned_nutri_id == current_user.id)
     elif role in _ROLES_COACH:
@@ -695,7 +777,7 @@ def get_nutri_stats(
 
     pacientes       = query.all()
     total_pacientes = len(pacientes)
-    paciente_ids    = {c.id for c in pacientes}
+    paciente_ids    = [c.id for c in pacientes]
 
     if total_pacientes == 0:
         return {
@@ -708,33 +790,39 @@ def get_nutri_stats(
         }
 
     # ── Validaciones pendientes ───────────────────────────────────────────
-    validaciones_pendientes = db.query(PlanNutricional).join(Client).filter(
-        Client.id.in_(paciente_ids),
+    validaciones_pendientes = db.query(func.count(PlanNutricional.id)).filter(
+        PlanNutricional.client_id.in_(paciente_ids),
         PlanNutricional.status == "provisional_ia",
-    ).count()
+    ).scalar() or 0
 
     # ── Bug 3: alertas de BD solo de los últimos 30 días ─────────────────
-    thirty_days_ago = datetime.now() - timedelta(days=30)
-    seven_days_ago  = datetime.now() - timedelta(days=7)
-
-    alertas_db_query = (
-        db.query(AlertaSalud)
-        .filter(
-            AlertaSalud.estado == "pendiente",
-            AlertaSalud.fecha_deteccion >= thirty_days_ago,
-        )
-        .join(Client)
-        .filter(Client.id.in_(paciente_ids))
+    ahora           = datetime.now()
+    thirty_days_ago = ahora - timedelta(days=30)
+    seven_days_ago  = ahora - timedelta(days=7)
+
+    filtro_alertas = (
+        AlertaSalud.estado == "pendiente",
+        AlertaSalud.fecha_deteccion >= thirty_days_ago,
+        AlertaSalud.client_id.in_(paciente_ids),
     )
-    alertas_db_count = alertas_db_query.count()
-
-    # IDs de pacientes que ya tienen alerta en BD (para no duplicar con IA)
-    pacientes_con_alerta_db = {
-        a.cliente.id for a in alertas_db_query.all() if a.cliente
-    }
+    # Conteo por paciente: total de alertas y pacientes que ya tienen alerta en BD
+    # (para no duplicar con IA) en una sola query agrupada.
+    alertas_por_paciente = dict(
+        db.query(AlertaSalud.client_id, func.count(AlertaSalud.id))
+        .filter(*filtro_alertas)
+        .group_by(AlertaSalud.client_id)
+        .all()
+    )
+    alertas_db_count        = sum(alertas_por_paciente.values())
+    pacientes_con_alerta_db = set(alertas_por_paciente)
 
-    alertas_recientes_objs = (
-        alertas_db_query
+    alertas_recientes_filas = (
+        db.query(
+            AlertaSalud.id, AlertaSalud.descripcion, AlertaSalud.severidad, AlertaSalud.tipo,
+            Client.first_name, Client.last_name_paternal,
+        )
+        .join(Client, Client.id == AlertaSalud.client_id)
+        .filter(*filtro_alertas)
         .order_by(AlertaSalud.fecha_deteccion.desc())
         .limit(5)
         .all()
@@ -742,24 +830,23 @@ def get_nutri_stats(
     alertas_formateadas = [
         {
             "id": a.id,
-            "paciente": f"{a.cliente.first_name} {a.cliente.last_name_paternal}",
+            "paciente": f"{a.first_name} {a.last_name_paternal}",
             "problema": a.descripcion,
             "urgencia": a.severidad.capitalize(),
             "tipo": a.tipo,
         }
-        for a in alertas_recientes_objs
+        for a in alertas_recientes_filas
     ]
 
     # ── Alertas IA: solo pacientes SIN alerta en BD (evita doble conteo) ─
+    agregados = _agregados_pacientes(db, paciente_ids, seven_days_ago.date(), con_plan=False)
     alertas_ia = 0
     for c in pacientes:
         if c.id in pacientes_con_alerta_db:
             continue
-        registros_recientes = [
-            r for r in c.progreso_calorias if r.fecha >= seven_days_ago.date()
-        ]
-        adh  = round((len(registros_recientes) / 7) * 100, 1)
-        prog = calcular_progreso_paciente(c)
+        datos = agregados[c.id]
+        adh  = round((datos["registros_7d"] / 7) * 100, 1)
+        prog = _progreso_por_peso(datos["peso_inicial"], c.weight, c.goal)
         alerta_data = ia_service.generar_alerta_fuzzy(adh, prog)
         if alerta_data.get("nivel") == "Alto":
             alertas_ia += 1
@@ -775,15 +862,25 @@ def get_nutri_stats(
     total_alertas = alertas_db_count + alertas_ia
 
     # ── Adherencia media y tendencia (últimos 7 días) ─────────────────────
+    # Pacientes distintos con registro por día, agrupado en SQL.
+    hoy    = ahora.date()
+    inicio = hoy - timedelta(days=6)
+    activos_por_dia = dict(
+        db.query(ProgresoCalorias.fecha, func.count(func.distinct(ProgresoCalorias.client_id)))
+        .filter(
+            ProgresoCalorias.client_id.in_(paciente_ids),
+            ProgresoCalorias.fecha >= inicio,
+            ProgresoCalorias.fecha <= hoy,
+        )
+        .group_by(ProgresoCalorias.fecha)
+        .all()
+    )
+
     tendencia     = []
     total_adh_sum = 0.0
     for i in range(6, -1, -1):
-        target_date = (datetime.now() - timedelta(days=i)).date()
-        conteo_dia  = sum(
-            1 for c in pacientes
-            if any(r.fecha == target_date for r in c.progreso_calorias)
-        )
-        adh_dia = round((conteo_dia / total_pacientes) * 100, 1)
+        target_date = hoy - timedelta(days=i)
+        adh_dia = round((activos_por_dia.get(target_date, 0) / total_pacientes) * 100, 1)
         tendencia.append(adh_dia)
         total_adh_sum += adh_dia
 
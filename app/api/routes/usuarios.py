@@ -4,7 +4,7 @@ from app.core.database import get_db
 from app.models.user import User
 from app.core.security import security
 from app.schemas.user import UserCreate, StaffSelfUpdate
-from app.api.routes.auth import get_current_user
+from app.api.routes.auth import get_current_user, get_current_user_sync
 from app.core.local_storage import local_storage
 from datetime import datetime 
 
@@ -13,7 +13,7 @@ router = APIRouter()
 @router.post("/perfil/foto")
 async def subir_foto_perfil(
     file: UploadFile = File(...),
-    current_user: User = Depends(get_current_user),
+    current_user: User = Depends(get_current_user_sync),
     db: Session = Depends(get_db)
 ):
     """Sube una foto de perfil localmente y actualiza la URL en la base de datos"""
@@ -104,7 +104,7 @@ async def leer_mi_perfil(current_user: User = Depends(get_current_user)):
 @router.put("/me")
 async def actualizar_mi_perfil(
     datos: StaffSelfUpdate,
-    current_user: User = Depends(get_current_user),
+    current_user: User = Depends(get_current_user_sync),
     db: Session = Depends(get_db),
 ):
     """Permite a un miembro del staff (nutri/entrenador/admin) actualizar sus propios datos personales."""
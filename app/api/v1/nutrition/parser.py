@@ -6,6 +6,7 @@ from typing import List, Optional
 from app.core.database import get_db
 from app.api.routes.auth import get_current_user
 from app.services.ia_service import ia_engine
+from app.services.ai.completion_cache import cache_llm
 
 router = APIRouter(tags=["Nutrition Parser"])
 
@@ -52,7 +53,8 @@ async def parse_ingredients(
 
     try:
         prompt = _PROMPT_COMIDA.format(mensaje=request.texto)
-        raw = await ia_engine._llamar_groq(prompt, max_tokens=500, temp=0.0)
+        with cache_llm("parse_ingredients"):
+            raw = await ia_engine._llamar_groq(prompt, max_tokens=500, temp=0.0)
         datos = _parse_json(raw)
 
         if not datos or not datos.get("alimentos"):
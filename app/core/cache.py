@@ -1,19 +1,60 @@
 """
-Caché en proceso (sin Redis).
+Caché de la app (sin Redis).
 
 Misma API que antes: consultas del asistente, comidas recientes, alimentos en nutrición_unificado.
-En multi-worker cada proceso tiene su propia caché; para un solo uvicorn es suficiente.
+Dos tiers:
+
+- Tier caliente (siempre): ``StripedTTLCache`` en proceso con snapshots inmutables
+  (``app.core.frozen``). Un hit devuelve el mismo objeto sin ``json.loads``; un set
+  solo copia/congela el valor. Acotado por ``CALOFIT_CACHE_MAX_ENTRIES``/``_MAX_BYTES``.
+- Tier compartido (opcional, ``app.core.cache_backends``): ``sqlite`` (archivo compartido
+  por los workers del host) o ``postgres`` (tabla UNLOGGED). Solo aquí se serializa a
+  JSON. Con ``memory`` (default) no hay tier compartido: cada worker tiene su caché.
+
+Con tier compartido, el tier caliente guarda como máximo ``CALOFIT_CACHE_HOT_TTL_SEC``
+para que una key reescrita por otro worker (p. ej. ``recent_meals``) no quede vieja.
+
+Los valores devueltos son de solo lectura (``FrozenDict`` / tuple); para editarlos,
+copiar con ``dict(x)`` / ``list(x)``.
+
+``get_cache_stats()`` expone hits/misses, hits del tier caliente y cuántos hits
+vinieron de otro worker. El detalle por prefijo (hits, misses, expiraciones,
+expulsiones, bytes, latencia) va al registro de ``app.core.cache_metrics``
+con el nombre ``app_cache``.
 """
 import json
+import os
 import threading
 import time
-from typing import Any, Optional
+from typing import Any, Optional, Sequence
 
+from app.core.cache_backends import CacheBackend, MemoryBackend, build_backend
+from app.core.cache_engine import StripedTTLCache
+from app.core.cache_metrics import key_prefix, registry as metrics
 from app.core.config import settings
+from app.core.frozen import freeze_with_size
+
+_backend: Optional[CacheBackend] = None
+_backend_lock = threading.Lock()
+
+_METRICS_NAME = "app_cache"
+
+
+def _on_hot_remove(key: str, motivo: str) -> None:
+    metrics.incr(_METRICS_NAME, key_prefix(key), "expirations" if motivo == "expired" else "evictions")
+
+
+_hot = StripedTTLCache(
+    max_entries=settings.CALOFIT_CACHE_MAX_ENTRIES,
+    max_bytes=settings.CALOFIT_CACHE_MAX_BYTES,
+    stripes=settings.CALOFIT_CACHE_STRIPES,
+    on_remove=_on_hot_remove,
+)
+_MISS = object()
+metrics.register_gauge(_METRICS_NAME, lambda: _hot.usage_by(key_prefix))
 
-_lock = threading.Lock()
-# key -> (expiry_epoch_seconds, json_str)
-_store: dict[str, tuple[float, str]] = {}
+_stats_lock = threading.Lock()
+_stats = {"hits": 0, "hits_hot": 0, "misses": 0, "sets": 0, "errors": 0, "hits_cross_worker": 0}
 
 _CACHE_PREFIX = "calofit"
 _CONSULTA_TTL = 600
@@ -31,47 +72,160 @@ def _full_key(key: str) -> str:
     return f"{_CACHE_PREFIX}:{key}"
 
 
-def _purge_expired_unlocked(now: float) -> None:
-    dead = [k for k, (exp, _) in _store.items() if exp <= now]
-    for k in dead:
-        del _store[k]
+def _count(campo: str) -> None:
+    with _stats_lock:
+        _stats[campo] += 1
+
+
+def get_backend() -> CacheBackend:
+    """Backend activo; se construye en el primer uso según ``CALOFIT_CACHE_BACKEND``."""
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                try:
+                    _backend = build_backend(
+                        settings.CALOFIT_CACHE_BACKEND,
+                        sqlite_path=settings.CALOFIT_CACHE_SQLITE_PATH,
+                    )
+                except Exception as e:
+                    print(f"CACHE BACKEND [{settings.CALOFIT_CACHE_BACKEND}] no disponible, usando memoria: {e}")
+                    _backend = MemoryBackend()
+    return _backend
+
+
+def _shared_backend() -> Optional[CacheBackend]:
+    backend = get_backend()
+    return backend if backend.shared else None
+
+
+def set_backend(backend: CacheBackend) -> None:
+    """Reemplaza el backend activo (tests / scripts), vacía el tier caliente y reinicia estadísticas."""
+    global _backend
+    with _backend_lock:
+        _backend = backend
+    _hot.clear()
+    reset_cache_stats()
 
 
 def get_cached(key: str) -> Optional[Any]:
+    t0 = time.perf_counter()
+    val = _get_cached(key)
+    metrics.lookup(_METRICS_NAME, key_prefix(key), val is not None, time.perf_counter() - t0)
+    return val
+
+
+def _get_cached(key: str) -> Optional[Any]:
     rkey = _full_key(key)
-    now = time.time()
-    with _lock:
-        _purge_expired_unlocked(now)
-        tup = _store.get(rkey)
-        if not tup:
-            _cache_debug(f"CACHE MISS [{rkey}]")
-            return None
-        exp, raw = tup
-        if exp <= now:
-            del _store[rkey]
-            return None
+    val = _hot.get(rkey, _MISS)
+    if val is not _MISS:
+        with _stats_lock:
+            _stats["hits"] += 1
+            _stats["hits_hot"] += 1
+        _cache_debug(f"CACHE HIT [{rkey}]")
+        return val
+
+    shared = _shared_backend()
+    if shared is None:
+        _count("misses")
+        _cache_debug(f"CACHE MISS [{rkey}]")
+        return None
+    try:
+        entry = shared.get(rkey)
+    except Exception as e:
+        print(f"CACHE GET [{rkey}]: {e}")
+        _count("errors")
+        return None
+    if entry is None:
+        _count("misses")
+        _cache_debug(f"CACHE MISS [{rkey}]")
+        return None
+    raw, writer_pid = entry
+    try:
+        frozen, size = freeze_with_size(json.loads(raw))
+    except Exception as e:
+        print(f"CACHE GET JSON [{rkey}]: {e}")
+        _count("errors")
+        return None
+    # Promover al tier caliente: los próximos hits de este worker no re-parsean.
+    _hot.set(rkey, frozen, settings.CALOFIT_CACHE_HOT_TTL_SEC, size=size)
+    with _stats_lock:
+        _stats["hits"] += 1
+        if writer_pid != os.getpid():
+            _stats["hits_cross_worker"] += 1
+    _cache_debug(f"CACHE HIT [{rkey}]")
+    return frozen
+
+
+def set_cached(key: str, value: Any, ttl_seconds: int = _ALIMENTO_TTL) -> bool:
+    rkey = _full_key(key)
+    shared = _shared_backend()
+    raw = None
+    if shared is not None:
+        # Solo el tier compartido necesita JSON.
         try:
-            val = json.loads(raw)
-            _cache_debug(f"CACHE HIT [{rkey}]")
-            return val
+            raw = json.dumps(value, ensure_ascii=False)
         except Exception as e:
-            print(f"CACHE GET JSON [{rkey}]: {e}")
-            return None
+            print(f"CACHE SET JSON [{rkey}]: {e}")
+            return False
+    frozen, size = freeze_with_size(value)
+    hot_ttl = float(ttl_seconds) if shared is None else min(float(ttl_seconds), settings.CALOFIT_CACHE_HOT_TTL_SEC)
+    _hot.set(rkey, frozen, hot_ttl, size=size)
+    if shared is not None:
+        try:
+            shared.set(rkey, raw, float(ttl_seconds))
+        except Exception as e:
+            print(f"CACHE SET [{rkey}]: {e}")
+            _count("errors")
+            return False
+    _count("sets")
+    metrics.incr(_METRICS_NAME, key_prefix(key), "sets")
+    _cache_debug(f"CACHE SAVE [{rkey}] TTL={ttl_seconds}s")
+    return True
 
 
-def set_cached(key: str, value: Any, ttl_seconds: int = _ALIMENTO_TTL) -> bool:
+def delete_cached(key: str) -> None:
     rkey = _full_key(key)
-    now = time.time()
+    _hot.delete(rkey)
+    shared = _shared_backend()
+    if shared is None:
+        return
     try:
-        raw = json.dumps(value, ensure_ascii=False)
+        shared.delete(rkey)
     except Exception as e:
-        print(f"CACHE SET JSON [{rkey}]: {e}")
-        return False
-    with _lock:
-        _purge_expired_unlocked(now)
-        _store[rkey] = (now + float(ttl_seconds), raw)
-        _cache_debug(f"CACHE SAVE [{rkey}] TTL={ttl_seconds}s")
-    return True
+        print(f"CACHE DELETE [{rkey}]: {e}")
+
+
+def get_cache_stats() -> dict:
+    """
+    Contadores de este worker desde el arranque.
+
+    ``hits_hot``: hits servidos por el tier caliente (sin deserializar).
+    ``cross_worker_hit_rate``: fracción de hits servidos con datos escritos por OTRO
+    proceso — con backend ``memory`` siempre es 0; con ``sqlite``/``postgres`` mide
+    cuánto aporta compartir la caché entre workers.
+    """
+    with _stats_lock:
+        s = dict(_stats)
+    lookups = s["hits"] + s["misses"]
+    backend = get_backend()
+    s["backend"] = backend.name
+    s["pid"] = os.getpid()
+    s["hit_rate"] = round(s["hits"] / lookups, 4) if lookups else 0.0
+    s["cross_worker_hit_rate"] = round(s["hits_cross_worker"] / s["hits"], 4) if s["hits"] else 0.0
+    s["hot"] = _hot.stats()
+    if backend.shared:
+        try:
+            s["shared"] = backend.stats()
+        except Exception as e:
+            s["shared"] = {"error": str(e)}
+    return s
+
+
+def reset_cache_stats() -> None:
+    with _stats_lock:
+        for k in _stats:
+            _stats[k] = 0
 
 
 def get_consulta_cached(consulta_id: str) -> Optional[dict]:
@@ -90,7 +244,8 @@ def cache_key_ejercicio(nombre_normalizado: str) -> str:
     return f"ejercicio:{nombre_normalizado.lower().strip()}"
 
 
-def get_user_recent_meals(user_id: int) -> list:
+def get_user_recent_meals(user_id: int) -> Sequence[dict]:
+    """Comidas recientes (tupla de solo lectura si hay caché)."""
     val = get_cached(f"recent_meals:{user_id}")
     _cache_debug(f"CACHE DEBUG: get_user_recent_meals({user_id}) -> {val}")
     return val if val else []
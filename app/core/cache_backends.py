@@ -0,0 +1,281 @@
+"""
+Backends de almacenamiento para ``app.core.cache``.
+
+Todos guardan el valor ya serializado (str JSON) junto con su expiración y el
+PID del worker que lo escribió; ``app.core.cache`` se encarga de serializar y
+de contar hits entre workers distintos.
+
+Los backends con ``shared = True`` forman el tier compartido de ``app.core.cache``
+(delante siempre está su tier caliente en proceso, sin serialización):
+
+- ``MemoryBackend``: en proceso (un caché por worker), TTL + LRU acotado. No es
+  compartido: con él ``app.core.cache`` usa solo su tier caliente.
+- ``SQLiteBackend``: archivo SQLite en modo WAL, compartido por todos los workers
+  del mismo host. No requiere Redis ni servicios extra.
+- ``PostgresUnloggedBackend``: tabla UNLOGGED en la BD de la app. Compartida entre
+  hosts; sin WAL de Postgres, así que se pierde en un crash (es solo caché).
+
+Selección por env: ``CALOFIT_CACHE_BACKEND=memory|sqlite|postgres``.
+"""
+from __future__ import annotations
+
+import os
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from typing import Optional
+
+from app.core.cache_engine import StripedTTLCache
+
+# (valor serializado, pid del worker que lo escribió)
+CacheEntry = tuple[str, int]
+
+
+class CacheBackend(ABC):
+    """Interfaz mínima que usa ``app.core.cache``."""
+
+    name: str = "base"
+    # True si varios procesos ven las mismas entradas (tier compartido).
+    shared: bool = True
+
+    @abstractmethod
+    def get(self, key: str) -> Optional[CacheEntry]:
+        """Retorna ``(raw, writer_pid)`` o None si no existe o expiró."""
+
+    @abstractmethod
+    def set(self, key: str, raw: str, ttl_seconds: float) -> None:
+        """Guarda ``raw`` bajo ``key`` durante ``ttl_seconds``."""
+
+    @abstractmethod
+    def delete(self, key: str) -> None:
+        """Elimina la entrada (no falla si no existe)."""
+
+    @abstractmethod
+    def clear(self) -> None:
+        """Vacía el backend completo."""
+
+    def size(self) -> int:
+        """Número aproximado de entradas (incluye expiradas aún no purgadas)."""
+        return 0
+
+    def stats(self) -> dict:
+        """Métricas propias del backend (entradas, bytes, expulsiones…)."""
+        return {"entries": self.size()}
+
+
+class MemoryBackend(CacheBackend):
+    """
+    Caché en memoria de proceso; cada worker de uvicorn tiene el suyo.
+
+    Usa ``StripedTTLCache``: expiración por heap (sin barrer todo el dict en cada
+    acceso), LRU acotado por entradas/bytes y un lock por shard.
+    """
+
+    name = "memory"
+    shared = False
+
+    def __init__(
+        self,
+        max_entries: int = 10_000,
+        max_bytes: int = 64 * 1024 * 1024,
+        stripes: int = 16,
+    ) -> None:
+        self._cache = StripedTTLCache(max_entries=max_entries, max_bytes=max_bytes, stripes=stripes)
+
+    def get(self, key: str) -> Optional[CacheEntry]:
+        return self._cache.get(key)
+
+    def set(self, key: str, raw: str, ttl_seconds: float) -> None:
+        # Tamaño aproximado: caracteres del JSON + la key.
+        self._cache.set(key, (raw, os.getpid()), ttl_seconds, size=len(raw) + len(key))
+
+    def delete(self, key: str) -> None:
+        self._cache.delete(key)
+
+    def clear(self) -> None:
+        self._cache.clear()
+
+    def size(self) -> int:
+        return len(self._cache)
+
+    def stats(self) -> dict:
+        return self._cache.stats()
+
+
+class SQLiteBackend(CacheBackend):
+    """
+    Caché compartido entre workers del mismo host vía archivo SQLite (WAL).
+
+    Una conexión por hilo (sqlite3 no comparte conexiones entre hilos). WAL permite
+    lecturas concurrentes mientras un worker escribe; ``busy_timeout`` absorbe
+    las escrituras simultáneas. Las expiradas se purgan cada ``purge_every`` sets
+    usando el índice por ``expires_at`` (no en cada lectura).
+    """
+
+    name = "sqlite"
+
+    def __init__(self, path: str, purge_every: int = 256) -> None:
+        self.path = path
+        self._purge_every = max(1, int(purge_every))
+        self._sets = 0
+        self._local = threading.local()
+        self._init_lock = threading.Lock()
+        dirname = os.path.dirname(os.path.abspath(path))
+        os.makedirs(dirname, exist_ok=True)
+        with self._init_lock:
+            conn = self._conn()
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS cache_kv ("
+                " key TEXT PRIMARY KEY,"
+                " value TEXT NOT NULL,"
+                " expires_at REAL NOT NULL,"
+                " writer_pid INTEGER NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_cache_kv_expires ON cache_kv(expires_at)")
+            conn.commit()
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5.0, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA busy_timeout=5000")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key: str) -> Optional[CacheEntry]:
+        row = self._conn().execute(
+            "SELECT value, writer_pid FROM cache_kv WHERE key = ? AND expires_at > ?",
+            (key, time.time()),
+        ).fetchone()
+        if not row:
+            return None
+        return row[0], int(row[1])
+
+    def set(self, key: str, raw: str, ttl_seconds: float) -> None:
+        now = time.time()
+        conn = self._conn()
+        conn.execute(
+            "INSERT INTO cache_kv (key, value, expires_at, writer_pid) VALUES (?, ?, ?, ?) "
+            "ON CONFLICT(key) DO UPDATE SET value = excluded.value, "
+            "expires_at = excluded.expires_at, writer_pid = excluded.writer_pid",
+            (key, raw, now + float(ttl_seconds), os.getpid()),
+        )
+        self._sets += 1
+        if self._sets % self._purge_every == 0:
+            conn.execute("DELETE FROM cache_kv WHERE expires_at <= ?", (now,))
+
+    def delete(self, key: str) -> None:
+        self._conn().execute("DELETE FROM cache_kv WHERE key = ?", (key,))
+
+    def clear(self) -> None:
+        self._conn().execute("DELETE FROM cache_kv")
+
+    def size(self) -> int:
+        row = self._conn().execute("SELECT COUNT(*) FROM cache_kv").fetchone()
+        return int(row[0]) if row else 0
+
+
+class PostgresUnloggedBackend(CacheBackend):
+    """
+    Caché compartido en una tabla UNLOGGED de Postgres (``calofit_cache_kv``).
+
+    UNLOGGED evita escribir al WAL: las escrituras son mucho más baratas y la tabla
+    se trunca tras un crash, lo cual es aceptable para datos de caché.
+    La tabla se crea sola en el primer uso; ``table`` permite que otro caché
+    (p. ej. el de completions del LLM) use su propia tabla con el mismo esquema.
+    """
+
+    name = "postgres"
+    TABLE = "calofit_cache_kv"
+
+    def __init__(self, engine=None, purge_every: int = 256, table: Optional[str] = None) -> None:
+        if table:
+            self.TABLE = table
+        if engine is None:
+            from app.core.database import engine as _app_engine
+            engine = _app_engine
+        self._engine = engine
+        self._purge_every = max(1, int(purge_every))
+        self._sets = 0
+        self._crear_tabla()
+
+    def _crear_tabla(self) -> None:
+        from sqlalchemy import text
+
+        with self._engine.begin() as conn:
+            conn.execute(text(
+                f"CREATE UNLOGGED TABLE IF NOT EXISTS {self.TABLE} ("
+                " key TEXT PRIMARY KEY,"
+                " value TEXT NOT NULL,"
+                " expires_at DOUBLE PRECISION NOT NULL,"
+                " writer_pid INTEGER NOT NULL)"
+            ))
+            conn.execute(text(
+                f"CREATE INDEX IF NOT EXISTS idx_{self.TABLE}_expires ON {self.TABLE}(expires_at)"
+            ))
+
+    def get(self, key: str) -> Optional[CacheEntry]:
+        from sqlalchemy import text
+
+        with self._engine.connect() as conn:
+            row = conn.execute(
+                text(f"SELECT value, writer_pid FROM {self.TABLE} WHERE key = :k AND expires_at > :now"),
+                {"k": key, "now": time.time()},
+            ).fetchone()
+        if not row:
+            return None
+        return row[0], int(row[1])
+
+    def set(self, key: str, raw: str, ttl_seconds: float) -> None:
+        from sqlalchemy import text
+
+        now = time.time()
+        with self._engine.begin() as conn:
+            conn.execute(
+                text(
+                    f"INSERT INTO {self.TABLE} (key, value, expires_at, writer_pid) "
+                    "VALUES (:k, :v, :exp, :pid) "
+                    "ON CONFLICT (key) DO UPDATE SET value = EXCLUDED.value, "
+                    "expires_at = EXCLUDED.expires_at, writer_pid = EXCLUDED.writer_pid"
+                ),
+                {"k": key, "v": raw, "exp": now + float(ttl_seconds), "pid": os.getpid()},
+            )
+            self._sets += 1
+            if self._sets % self._purge_every == 0:
+                conn.execute(text(f"DELETE FROM {self.TABLE} WHERE expires_at <= :now"), {"now": now})
+
+    def delete(self, key: str) -> None:
+        from sqlalchemy import text
+
+        with self._engine.begin() as conn:
+            conn.execute(text(f"DELETE FROM {self.TABLE} WHERE key = :k"), {"k": key})
+
+    def clear(self) -> None:
+        from sqlalchemy import text
+
+        with self._engine.begin() as conn:
+            conn.execute(text(f"TRUNCATE {self.TABLE}"))
+
+    def size(self) -> int:
+        from sqlalchemy import text
+
+        with self._engine.connect() as conn:
+            return int(conn.execute(text(f"SELECT COUNT(*) FROM {self.TABLE}")).scalar() or 0)
+
+
+def build_backend(kind: str, sqlite_path: str = "", **memory_opts) -> CacheBackend:
+    """Construye el backend pedido por ``CALOFIT_CACHE_BACKEND``.
+
+    ``memory_opts`` (max_entries, max_bytes, stripes) solo aplican a ``memory``.
+    """
+    kind = (kind or "memory").strip().lower()
+    if kind == "sqlite":
+        return SQLiteBackend(sqlite_path)
+    if kind in ("postgres", "postgresql", "pg"):
+        return PostgresUnloggedBackend()
+    if kind != "memory":
+        raise ValueError(f"CALOFIT_CACHE_BACKEND desconocido: {kind!r}")
+    return MemoryBackend(**memory_opts)
@@ -0,0 +1,170 @@
+"""
+Motor de caché en proceso: TTL con heap de expiración + LRU acotado + lock striping.
+
+- Expiración: cada shard mantiene un min-heap ``(expires_at, seq, key)``. Purgar solo
+  saca del tope lo ya vencido → O(log n) amortizado por entrada, en vez de
+  recorrer todo el dict en cada get/set. Las entradas del heap que quedaron
+  obsoletas (key reescrita con otro TTL) se descartan al salir (borrado perezoso)
+  y el heap se reconstruye si crece más del doble que el shard.
+- Límite: ``max_entries`` y ``max_bytes`` totales, repartidos entre shards; al
+  excederse se expulsa lo menos usado recientemente (OrderedDict como LRU).
+- Striping: la key se asigna a uno de ``stripes`` shards, cada uno con su lock;
+  requests sobre keys distintas casi nunca compiten por el mismo lock.
+
+El valor guardado es opaco (str JSON en ``MemoryBackend``); el llamador indica su
+tamaño en bytes.
+"""
+from __future__ import annotations
+
+import heapq
+import itertools
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Optional
+
+_MISSING = object()
+
+
+class _Shard:
+    __slots__ = ("lock", "data", "heap", "bytes", "evictions", "expirations")
+
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        # key -> (expires_at, value, size)
+        self.data: OrderedDict[Hashable, tuple[float, Any, int]] = OrderedDict()
+        # (expires_at, seq, key): seq desempata sin comparar keys.
+        self.heap: list[tuple[float, int, Hashable]] = []
+        self.bytes = 0
+        self.evictions = 0
+        self.expirations = 0
+
+
+class StripedTTLCache:
+    """Caché TTL + LRU thread-safe con locks por shard."""
+
+    def __init__(
+        self,
+        max_entries: int = 10_000,
+        max_bytes: int = 64 * 1024 * 1024,
+        stripes: int = 16,
+        on_remove: Optional[Callable[[Hashable, str], None]] = None,
+    ) -> None:
+        # on_remove(key, "expired" | "evicted"): se invoca con el lock del shard tomado,
+        # así que debe ser barato y no volver a entrar en este caché.
+        self._on_remove = on_remove
+        self.stripes = max(1, int(stripes))
+        self.max_entries = max(self.stripes, int(max_entries))
+        self.max_bytes = max(self.stripes, int(max_bytes))
+        self._shard_entries = max(1, self.max_entries // self.stripes)
+        self._shard_bytes = max(1, self.max_bytes // self.stripes)
+        self._shards = [_Shard() for _ in range(self.stripes)]
+        self._seq = itertools.count()
+
+    def _shard(self, key: Hashable) -> _Shard:
+        return self._shards[hash(key) % self.stripes]
+
+    # ── mantenimiento (se llama con el lock del shard tomado) ──────────────
+
+    def _purge_expired_unlocked(self, sh: _Shard, now: float) -> None:
+        heap = sh.heap
+        while heap and heap[0][0] <= now:
+            exp, _, key = heapq.heappop(heap)
+            cur = sh.data.get(key)
+            # Solo borra si el heap apunta a la versión vigente de la key.
+            if cur is not None and cur[0] == exp:
+                del sh.data[key]
+                sh.bytes -= cur[2]
+                sh.expirations += 1
+                if self._on_remove is not None:
+                    self._on_remove(key, "expired")
+
+    def _remove_unlocked(self, sh: _Shard, key: Hashable) -> None:
+        cur = sh.data.pop(key, None)
+        if cur is not None:
+            sh.bytes -= cur[2]
+
+    def _evict_unlocked(self, sh: _Shard) -> None:
+        while sh.data and (len(sh.data) > self._shard_entries or sh.bytes > self._shard_bytes):
+            key, (_, _, size) = sh.data.popitem(last=False)
+            sh.bytes -= size
+            sh.evictions += 1
+            if self._on_remove is not None:
+                self._on_remove(key, "evicted")
+
+    def _compact_heap_unlocked(self, sh: _Shard) -> None:
+        if len(sh.heap) > 2 * len(sh.data) + 64:
+            sh.heap = [(exp, next(self._seq), k) for k, (exp, _, _) in sh.data.items()]
+            heapq.heapify(sh.heap)
+
+    # ── API ────────────────────────────────────────────────────────────────
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        sh = self._shard(key)
+        now = time.time()
+        with sh.lock:
+            self._purge_expired_unlocked(sh, now)
+            cur = sh.data.get(key, _MISSING)
+            if cur is _MISSING:
+                return default
+            sh.data.move_to_end(key)
+            return cur[1]
+
+    def set(self, key: Hashable, value: Any, ttl_seconds: float, size: int = 1) -> bool:
+        """Guarda ``value``; retorna False si por sí solo excede el presupuesto del shard."""
+        size = max(1, int(size))
+        sh = self._shard(key)
+        now = time.time()
+        with sh.lock:
+            self._purge_expired_unlocked(sh, now)
+            self._remove_unlocked(sh, key)
+            if size > self._shard_bytes:
+                return False
+            exp = now + float(ttl_seconds)
+            sh.data[key] = (exp, value, size)
+            sh.bytes += size
+            heapq.heappush(sh.heap, (exp, next(self._seq), key))
+            self._evict_unlocked(sh)
+            self._compact_heap_unlocked(sh)
+        return True
+
+    def delete(self, key: Hashable) -> None:
+        sh = self._shard(key)
+        with sh.lock:
+            # La entrada del heap queda huérfana y se descarta al vencer.
+            self._remove_unlocked(sh, key)
+
+    def clear(self) -> None:
+        for sh in self._shards:
+            with sh.lock:
+                sh.data.clear()
+                sh.heap.clear()
+                sh.bytes = 0
+
+    def __len__(self) -> int:
+        return sum(len(sh.data) for sh in self._shards)
+
+    def usage_by(self, group: Callable[[Hashable], str]) -> dict[str, dict[str, int]]:
+        """Entradas y bytes retenidos agrupados por ``group(key)`` (recorre todo: solo para métricas)."""
+        out: dict[str, dict[str, int]] = {}
+        for sh in self._shards:
+            with sh.lock:
+                for key, (_, _, size) in sh.data.items():
+                    g = out.setdefault(group(key), {"entries": 0, "bytes": 0})
+                    g["entries"] += 1
+                    g["bytes"] += size
+        return out
+
+    def stats(self) -> dict:
+        out = {"entries": 0, "bytes": 0, "evictions": 0, "expirations": 0}
+        for sh in self._shards:
+            with sh.lock:
+                out["entries"] += len(sh.data)
+                out["bytes"] += sh.bytes
+                out["evictions"] += sh.evictions
+                out["expirations"] += sh.expirations
+        out["max_entries"] = self.max_entries
+        out["max_bytes"] = self.max_bytes
+        out["stripes"] = self.stripes
+        return out
+
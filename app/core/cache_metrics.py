@@ -0,0 +1,248 @@
+"""
+Registro unificado de métricas de caché (por caché y por prefijo de key).
+
+Cachés instrumentados:
+  - ``app_cache``           → app.core.cache (prefijos: consulta, recent_meals, alimento, reco_macros…)
+  - ``macro_cache``         → ``_macro_cache`` de llm_registro.py (prefijos: exact, fuzzy)
+  - ``app_cache_alimentos`` → CacheManager (tabla app_cache_alimentos)
+
+Por cada (caché, prefijo): hits, misses, sets, expirations, evictions y latencia
+de lookup (conteo, suma, máximo e histograma en ms). Entradas/bytes retenidos se
+obtienen al pedir el snapshot mediante "gauges" registrados por cada caché.
+
+Cada worker publica su snapshot cada ``_PUBLISH_EVERY_SEC`` en
+``CALOFIT_METRICS_DIR/<pid>.json`` desde un hilo propio (el lookup solo toca
+contadores); ``python cli.py stats`` y ``/admin/cache/metrics`` agregan esos
+archivos para ver todos los workers del host.
+"""
+from __future__ import annotations
+
+import glob
+import json
+import os
+import tempfile
+import threading
+import time
+from typing import Callable, Dict, Iterable, Optional
+
+# Límites superiores (ms) de los buckets del histograma de latencia; el último es +inf.
+LATENCY_BUCKETS_MS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 1000)
+_PUBLISH_EVERY_SEC = 15.0
+# Snapshots más viejos que esto se consideran de workers muertos.
+_STALE_AFTER_SEC = 3600.0
+
+_CONTADORES = ("hits", "misses", "sets", "expirations", "evictions")
+
+GaugeFn = Callable[[], Dict[str, Dict[str, int]]]
+
+
+def key_prefix(key: str) -> str:
+    """``calofit:consulta:abc`` → ``consulta``; ``recent_meals:7`` → ``recent_meals``."""
+    k = key[8:] if key.startswith("calofit:") else key
+    return k.split(":", 1)[0] or "-"
+
+
+class _Serie:
+    __slots__ = ("hits", "misses", "sets", "expirations", "evictions",
+                 "lat_count", "lat_sum_ms", "lat_max_ms", "buckets")
+
+    def __init__(self) -> None:
+        self.hits = self.misses = self.sets = self.expirations = self.evictions = 0
+        self.lat_count = 0
+        self.lat_sum_ms = 0.0
+        self.lat_max_ms = 0.0
+        self.buckets = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+
+    def observar_latencia(self, ms: float) -> None:
+        self.lat_count += 1
+        self.lat_sum_ms += ms
+        if ms > self.lat_max_ms:
+            self.lat_max_ms = ms
+        for i, limite in enumerate(LATENCY_BUCKETS_MS):
+            if ms <= limite:
+                self.buckets[i] += 1
+                return
+        self.buckets[-1] += 1
+
+    def to_dict(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "sets": self.sets,
+            "expirations": self.expirations,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "lookup_ms": {
+                "count": self.lat_count,
+                "avg": round(self.lat_sum_ms / self.lat_count, 4) if self.lat_count else 0.0,
+                "max": round(self.lat_max_ms, 4),
+                "buckets": dict(zip([*map(str, LATENCY_BUCKETS_MS), "inf"], self.buckets)),
+            },
+        }
+
+
+class CacheMetricsRegistry:
+    """Contadores thread-safe por (caché, prefijo)."""
+
+    def __init__(self, publish_dir: Optional[str] = None) -> None:
+        self._lock = threading.Lock()
+        self._series: dict[tuple[str, str], _Serie] = {}
+        self._gauges: dict[str, GaugeFn] = {}
+        self.publish_dir = publish_dir
+        # pid del proceso que tiene el hilo publicador (tras un fork hay que lanzar otro).
+        self._publicador_pid: Optional[int] = None
+        self._parar = threading.Event()
+
+    def _serie(self, cache: str, prefix: str) -> _Serie:
+        s = self._series.get((cache, prefix))
+        if s is None:
+            s = self._series[(cache, prefix)] = _Serie()
+        return s
+
+    # ── registro ──────────────────────────────────────────────────────────
+
+    def lookup(self, cache: str, prefix: str, hit: bool, seconds: float) -> None:
+        with self._lock:
+            s = self._serie(cache, prefix)
+            if hit:
+                s.hits += 1
+            else:
+                s.misses += 1
+            s.observar_latencia(seconds * 1000.0)
+        if self.publish_dir and self._publicador_pid != os.getpid():
+            self._iniciar_publicador()
+
+    def incr(self, cache: str, prefix: str, campo: str, n: int = 1) -> None:
+        """Incrementa ``sets``/``expirations``/``evictions`` (o hits/misses sin latencia)."""
+        if campo not in _CONTADORES:
+            raise ValueError(f"contador desconocido: {campo}")
+        with self._lock:
+            s = self._serie(cache, prefix)
+            setattr(s, campo, getattr(s, campo) + n)
+
+    def register_gauge(self, cache: str, fn: GaugeFn) -> None:
+        """``fn()`` → ``{prefijo: {"entries": n, "bytes": b}}``; se evalúa solo en ``snapshot()``."""
+        self._gauges[cache] = fn
+
+    def reset(self) -> None:
+        with self._lock:
+            self._series.clear()
+
+    # ── lectura ───────────────────────────────────────────────────────────
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            series = {k: v.to_dict() for k, v in self._series.items()}
+        caches: dict[str, dict] = {}
+        for (cache, prefix), d in series.items():
+            caches.setdefault(cache, {"prefixes": {}})["prefixes"][prefix] = d
+        for cache, fn in list(self._gauges.items()):
+            try:
+                uso = fn() or {}
+            except Exception as e:
+                caches.setdefault(cache, {"prefixes": {}})["gauge_error"] = str(e)
+                continue
+            for prefix, g in uso.items():
+                d = caches.setdefault(cache, {"prefixes": {}})["prefixes"].setdefault(prefix, {})
+                d["entries"] = int(g.get("entries", 0))
+                d["bytes"] = int(g.get("bytes", 0))
+        for c in caches.values():
+            c["total"] = _sumar(c["prefixes"].values())
+        return {"pid": os.getpid(), "ts": time.time(), "caches": caches}
+
+    # ── publicación para CLI / otros workers ──────────────────────────────
+
+    def _iniciar_publicador(self) -> None:
+        with self._lock:
+            if self._publicador_pid == os.getpid():
+                return
+            self._publicador_pid = os.getpid()
+            self._parar = parar = threading.Event()
+        threading.Thread(target=self._publicar_periodicamente, args=(parar,),
+                         name="cache-metrics", daemon=True).start()
+
+    def _publicar_periodicamente(self, parar: threading.Event) -> None:
+        while not parar.wait(_PUBLISH_EVERY_SEC):
+            try:
+                self.publish()
+            except Exception:
+                pass
+
+    def detener_publicador(self) -> None:
+        self._parar.set()
+        self._publicador_pid = None
+
+    def publish(self) -> Optional[str]:
+        """Escribe el snapshot de este worker en ``publish_dir/<pid>.json`` (rename atómico)."""
+        if not self.publish_dir:
+            return None
+        os.makedirs(self.publish_dir, exist_ok=True)
+        path = os.path.join(self.publish_dir, f"{os.getpid()}.json")
+        fd, tmp = tempfile.mkstemp(dir=self.publish_dir, suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(self.snapshot(), f)
+        os.replace(tmp, path)
+        return path
+
+
+def _sumar(series: Iterable[dict]) -> dict:
+    total = {c: 0 for c in _CONTADORES}
+    total.update({"entries": 0, "bytes": 0, "lookup_count": 0, "lookup_ms_sum": 0.0, "lookup_ms_max": 0.0})
+    for d in series:
+        for c in _CONTADORES:
+            total[c] += d.get(c, 0)
+        total["entries"] += d.get("entries", 0)
+        total["bytes"] += d.get("bytes", 0)
+        lat = d.get("lookup_ms") or {}
+        total["lookup_count"] += lat.get("count", 0)
+        total["lookup_ms_sum"] += lat.get("avg", 0.0) * lat.get("count", 0)
+        total["lookup_ms_max"] = max(total["lookup_ms_max"], lat.get("max", 0.0))
+    lookups = total["hits"] + total["misses"]
+    total["hit_rate"] = round(total["hits"] / lookups, 4) if lookups else 0.0
+    total["lookup_ms_avg"] = round(total["lookup_ms_sum"] / total["lookup_count"], 4) if total["lookup_count"] else 0.0
+    del total["lookup_ms_sum"]
+    return total
+
+
+def read_published(publish_dir: str) -> list[dict]:
+    """Snapshots publicados por los workers del host (ignora los de workers muertos hace rato)."""
+    out: list[dict] = []
+    if not publish_dir:
+        return out
+    limite = time.time() - _STALE_AFTER_SEC
+    for path in glob.glob(os.path.join(publish_dir, "*.json")):
+        try:
+            with open(path, encoding="utf-8") as f:
+                snap = json.load(f)
+        except (OSError, ValueError):
+            continue
+        if snap.get("ts", 0) >= limite:
+            out.append(snap)
+    return out
+
+
+def merge_snapshots(snapshots: Iterable[dict]) -> dict:
+    """Suma los snapshots de varios workers por (caché, prefijo)."""
+    por_prefijo: dict[str, dict[str, list[dict]]] = {}
+    pids = []
+    for snap in snapshots:
+        pids.append(snap.get("pid"))
+        for cache, c in (snap.get("caches") or {}).items():
+            for prefix, d in (c.get("prefixes") or {}).items():
+                por_prefijo.setdefault(cache, {}).setdefault(prefix, []).append(d)
+    caches = {}
+    for cache, prefijos in por_prefijo.items():
+        caches[cache] = {
+            "prefixes": {p: _sumar(ds) for p, ds in prefijos.items()},
+            "total": _sumar(d for ds in prefijos.values() for d in ds),
+        }
+    return {"workers": pids, "caches": caches}
+
+
+def _default_dir() -> str:
+    from app.core.config import settings
+    return settings.CALOFIT_METRICS_DIR
+
+
+registry = CacheMetricsRegistry(publish_dir=_default_dir())
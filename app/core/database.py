@@ -1,12 +1,20 @@
 from __future__ import annotations
 
 import os
+import tempfile
+import threading
+from typing import TYPE_CHECKING, AsyncIterator
+
 from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 
 from .config import settings
 
+if TYPE_CHECKING:
+    from sqlalchemy.ext.asyncio import AsyncSession
+
 Base = declarative_base()
 
 
@@ -16,6 +24,9 @@ def _build_engine():
 
     - En producción: usa DATABASE_URL (Postgres) normalmente.
     - En tests/local sin driver: permite fallback a SQLite si CALOFIT_DB_FALLBACK_SQLITE=1.
+      Es un archivo (CALOFIT_DB_FALLBACK_SQLITE_PATH, por defecto en el directorio
+      temporal) y no ``:memory:``: el engine async (aiosqlite) abre el mismo
+      archivo y ve los mismos datos (usuarios de get_current_user, balance...).
     """
     url = str(getattr(settings, "DATABASE_URL", "") or "")
     fallback_sqlite = os.getenv("CALOFIT_DB_FALLBACK_SQLITE", "").strip() in ("1", "true", "True", "yes", "YES")
@@ -25,7 +36,14 @@ def _build_engine():
             import psycopg2  # noqa: F401
         except Exception:
             if fallback_sqlite:
-                return create_engine("sqlite+pysqlite:///:memory:", pool_pre_ping=True)
+                ruta = os.getenv("CALOFIT_DB_FALLBACK_SQLITE_PATH", "").strip() or os.path.join(
+                    tempfile.gettempdir(), "calofit_fallback.db"
+                )
+                return create_engine(
+                    f"sqlite+pysqlite:///{ruta}",
+                    pool_pre_ping=True,
+                    connect_args={"check_same_thread": False},
+                )
             raise
 
     return create_engine(url, pool_pre_ping=True)
@@ -39,4 +57,74 @@ def get_db():
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+
+# ── Engine async (asyncpg) ────────────────────────────────────────────────────
+# Rutas de solo lectura muy llamadas (/balance, /dashboard, historial del chat,
+# get_current_user) usan ``get_async_db``: sus queries no bloquean el event loop
+# mientras otras requests (chat, streaming) esperan al LLM. El resto de la app
+# sigue con ``SessionLocal`` / ``get_db``.
+#
+# Se crea en el primer uso: importar este módulo no exige asyncpg. Con el
+# fallback SQLite usa aiosqlite sobre el mismo archivo que el engine síncrono.
+
+_async_lock = threading.Lock()
+_async_engine = None
+_async_sessionmaker = None
+
+
+def _async_url(url: str):
+    """postgresql:// → postgresql+asyncpg:// (sslmode pasa a connect_args); sqlite → aiosqlite."""
+    u = make_url(url)
+    connect_args: dict = {}
+    if u.get_backend_name() == "postgresql":
+        query = dict(u.query)
+        sslmode = query.pop("sslmode", None)
+        if sslmode and sslmode != "disable":
+            connect_args["ssl"] = sslmode if sslmode in ("require", "verify-ca", "verify-full") else "prefer"
+        u = u.set(drivername="postgresql+asyncpg", query=query)
+    elif u.get_backend_name() == "sqlite":
+        u = u.set(drivername="sqlite+aiosqlite")
+    return u, connect_args
+
+
+def get_async_engine():
+    global _async_engine, _async_sessionmaker
+    if _async_engine is None:
+        from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+        with _async_lock:
+            if _async_engine is None:
+                url, connect_args = _async_url(str(engine.url.render_as_string(hide_password=False)))
+                kwargs = {"pool_pre_ping": True, "connect_args": connect_args}
+                if url.get_backend_name() == "postgresql":
+                    kwargs.update(
+                        pool_size=settings.DB_ASYNC_POOL_SIZE,
+                        max_overflow=settings.DB_ASYNC_MAX_OVERFLOW,
+                    )
+                _async_engine = create_async_engine(url, **kwargs)
+                # expire_on_commit=False: los objetos siguen legibles después de
+                # cerrar la sesión (p. ej. el usuario de get_current_user).
+                _async_sessionmaker = async_sessionmaker(_async_engine, expire_on_commit=False)
+    return _async_engine
+
+
+def AsyncSessionLocal():
+    get_async_engine()
+    return _async_sessionmaker()
+
+
+async def get_async_db() -> AsyncIterator[AsyncSession]:
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
+async def dispose_async_engine() -> None:
+    """Cierra el pool async (evento shutdown de la app)."""
+    global _async_engine, _async_sessionmaker
+    with _async_lock:
+        eng, _async_engine, _async_sessionmaker = _async_engine, None, None
+    if eng is not None:
+        await eng.dispose()
+
@@ -0,0 +1,78 @@
+"""
+Snapshots inmutables para el tier caliente de ``app.core.cache``.
+
+``freeze`` convierte un valor JSON-like en una copia profunda inmutable:
+dict → ``FrozenDict``, list/tuple → tuple, set → frozenset. El resultado se puede
+compartir entre requests sin copiarlo ni re-parsearlo en cada hit.
+
+``FrozenDict`` hereda de ``dict`` (en vez de usar ``MappingProxyType``) para que
+``json.dumps``, ``jsonable_encoder`` de FastAPI e ``isinstance(x, dict)`` sigan
+funcionando igual que con el dict que devolvía ``json.loads``; solo bloquea las
+mutaciones.
+"""
+from __future__ import annotations
+
+import sys
+from typing import Any
+
+_ESCALARES = (str, int, float, bool, type(None), bytes)
+
+
+class FrozenDict(dict):
+    """dict de solo lectura. Mutarlo lanza ``TypeError``."""
+
+    __slots__ = ()
+
+    def _solo_lectura(self, *args, **kwargs):
+        raise TypeError("FrozenDict es inmutable (snapshot de caché); usa dict(x) para obtener una copia editable")
+
+    __setitem__ = _solo_lectura
+    __delitem__ = _solo_lectura
+    __ior__ = _solo_lectura
+    clear = _solo_lectura
+    pop = _solo_lectura
+    popitem = _solo_lectura
+    setdefault = _solo_lectura
+    update = _solo_lectura
+
+    def __reduce__(self):
+        # pickle/deepcopy reconstruyen desde un dict normal (no vía __setitem__).
+        return (FrozenDict, (dict(self),))
+
+    def __repr__(self) -> str:
+        return f"FrozenDict({dict.__repr__(self)})"
+
+
+def _freeze(value: Any) -> tuple[Any, int]:
+    if isinstance(value, _ESCALARES) or isinstance(value, FrozenDict):
+        return value, sys.getsizeof(value)
+    if isinstance(value, dict):
+        size = sys.getsizeof(value)
+        out = {}
+        for k, v in value.items():
+            fv, sv = _freeze(v)
+            out[k] = fv
+            size += sv + sys.getsizeof(k)
+        return FrozenDict(out), size
+    if isinstance(value, (list, tuple)):
+        size = sys.getsizeof(value)
+        items = []
+        for v in value:
+            fv, sv = _freeze(v)
+            items.append(fv)
+            size += sv
+        return tuple(items), size
+    if isinstance(value, (set, frozenset)):
+        return frozenset(value), sys.getsizeof(value)
+    # Otros objetos (dataclasses frozen, Decimal, datetime…) se asumen inmutables.
+    return value, sys.getsizeof(value)
+
+
+def freeze(value: Any) -> Any:
+    """Copia profunda inmutable de ``value``."""
+    return _freeze(value)[0]
+
+
+def freeze_with_size(value: Any) -> tuple[Any, int]:
+    """Como ``freeze`` pero también retorna el tamaño aproximado en bytes (una sola pasada)."""
+    return _freeze(value)
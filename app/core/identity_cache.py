@@ -0,0 +1,142 @@
+"""
+Caché de identidad de la autenticación (``get_current_user``).
+
+Cada request autenticado leía su fila de ``clients`` / ``users`` por id. Aquí
+se guarda un snapshot de las columnas de esa fila por (tabla, id) durante
+``CALOFIT_AUTH_CACHE_TTL_SEC`` segundos (0 = sin caché):
+
+  - Un hit no toca la BD: reconstruye un objeto propio del request, desligado
+    de cualquier sesión (``make_transient_to_detached``), con las mismas
+    columnas. Los requests no comparten instancias: lo que una ruta cambie en
+    memoria no lo ve otra.
+  - Invalidación: hooks de ``Session`` (``instalar_invalidacion_identidad``)
+    descartan la entrada al hacer flush y al hacer commit de cualquier cambio
+    ORM sobre un Client / User (perfil, contraseña, UID de Firebase...). Las
+    escrituras en SQL crudo sobre esas tablas llaman a ``invalidar_identidad``.
+  - La caché es por worker: otro worker ve el cambio como máximo tras el TTL.
+
+``identity_cache_stats()`` (en /admin/runtime/metrics como ``auth_cache``) expone hits/misses.
+"""
+from __future__ import annotations
+
+import threading
+from typing import Any
+
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session, make_transient_to_detached
+
+from app.core.cache_engine import StripedTTLCache
+from app.core.config import settings
+
+_TABLAS = frozenset({"clients", "users"})
+_MODIFICADAS = "identidades_modificadas"
+_FALTA = object()
+
+_cache = StripedTTLCache(
+    max_entries=settings.CALOFIT_AUTH_CACHE_MAX_ENTRIES,
+    max_bytes=settings.CALOFIT_AUTH_CACHE_MAX_ENTRIES,  # tamaño 1 por entrada: acota por nº de filas
+    stripes=8,
+)
+_stats = {"hits": 0, "misses": 0, "invalidaciones": 0}
+_stats_lock = threading.Lock()
+_hooks_instalados = False
+
+
+def _contar(campo: str) -> None:
+    with _stats_lock:
+        _stats[campo] += 1
+
+
+def _clave(tabla: str, user_id: Any) -> tuple:
+    return (tabla, int(user_id))
+
+
+def _copia(valor: Any) -> Any:
+    # ARRAY (medical_conditions, recommended_foods...) llega como list mutable.
+    return list(valor) if isinstance(valor, list) else valor
+
+
+def obtener_identidad(modelo, user_id: Any):
+    """Instancia desligada de ``modelo`` con id ``user_id`` desde la caché, o None."""
+    if settings.CALOFIT_AUTH_CACHE_TTL_SEC <= 0:
+        return None
+    columnas = _cache.get(_clave(modelo.__tablename__, user_id))
+    if columnas is None:
+        _contar("misses")
+        return None
+    _contar("hits")
+    obj = inspect(modelo).class_manager.new_instance()
+    for k, v in columnas.items():
+        setattr(obj, k, _copia(v))
+    make_transient_to_detached(obj)
+    return obj
+
+
+def guardar_identidad(obj) -> None:
+    """Guarda el snapshot de columnas de una fila recién leída (sin disparar cargas)."""
+    ttl = settings.CALOFIT_AUTH_CACHE_TTL_SEC
+    if ttl <= 0:
+        return
+    estado = inspect(obj)
+    columnas = {}
+    for attr in estado.mapper.column_attrs:
+        valor = estado.dict.get(attr.key, _FALTA)
+        if valor is _FALTA:
+            return  # columna sin cargar (expirada / diferida): no cachear una fila parcial
+        columnas[attr.key] = _copia(valor)
+    _cache.set(_clave(estado.mapper.local_table.name, columnas["id"]), columnas, ttl)
+
+
+def invalidar_identidad(tabla: str, user_id: Any) -> None:
+    """Descarta la fila cacheada (``tabla`` = "clients" | "users")."""
+    _cache.delete(_clave(tabla, user_id))
+    _contar("invalidaciones")
+
+
+def limpiar_identidades() -> None:
+    _cache.clear()
+
+
+def identity_cache_stats() -> dict:
+    with _stats_lock:
+        stats = dict(_stats)
+    total = stats["hits"] + stats["misses"]
+    stats["hit_rate"] = round(stats["hits"] / total, 3) if total else 0.0
+    stats["entradas"] = len(_cache)
+    stats["ttl_sec"] = settings.CALOFIT_AUTH_CACHE_TTL_SEC
+    return stats
+
+
+# ── Hooks de sesión ──────────────────────────────────────────────────────────
+
+def _tras_flush(session: Session, flush_context) -> None:
+    modificadas = session.info.setdefault(_MODIFICADAS, set())
+    for obj in (*session.dirty, *session.deleted):
+        tabla = getattr(type(obj), "__tablename__", None)
+        identidad = inspect(obj).identity if tabla in _TABLAS else None
+        if identidad:
+            modificadas.add((tabla, identidad[0]))
+            invalidar_identidad(tabla, identidad[0])
+
+
+def _tras_commit(session: Session) -> None:
+    # Segunda invalidación: un request concurrente pudo cachear la fila vieja
+    # entre el flush y el commit.
+    for tabla, user_id in session.info.pop(_MODIFICADAS, ()):
+        invalidar_identidad(tabla, user_id)
+
+
+def _tras_rollback(session: Session, transaccion) -> None:
+    if not getattr(transaccion, "nested", False):
+        session.info.pop(_MODIFICADAS, None)
+
+
+def instalar_invalidacion_identidad() -> None:
+    """Engancha la invalidación a todas las sesiones ORM (idempotente)."""
+    global _hooks_instalados
+    if _hooks_instalados:
+        return
+    event.listen(Session, "after_flush", _tras_flush)
+    event.listen(Session, "after_commit", _tras_commit)
+    event.listen(Session, "after_soft_rollback", _tras_rollback)
+    _hooks_instalados = True
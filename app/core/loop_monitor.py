@@ -0,0 +1,242 @@
+"""
+Monitor del event loop: lag continuo y detección de callbacks que lo bloquean.
+
+Un hilo vigía envía cada ``intervalo`` un ping al loop con
+``call_soon_threadsafe`` y mide cuánto tarda en ejecutarse (lag de
+planificación). Si el ping no se atiende en ``umbral`` ms, el vigía toma una
+muestra del stack del hilo del loop (``sys._current_frames``): como el loop
+sigue ocupado, esa muestra apunta a la llamada que lo retiene (``urlopen``,
+``time.sleep``, una query síncrona, ``smtplib``...). Cuando el ping por fin
+corre se registra el bloqueo con su duración y la muestra.
+
+Uso:
+  - Servidor: ``CALOFIT_LOOP_MONITOR_ENABLED=true`` lo arranca en el startup
+    (main.py); ``loop_monitor_stats()`` sale en /admin/runtime/metrics como ``event_loop``
+    (histograma de lag y últimos bloqueos con su sitio).
+  - Tests: ``async with vigilar_bloqueos(umbral_ms=...)`` lanza
+    ``LoopBloqueado`` si algo dentro del bloque retuvo el loop (también el
+    fixture ``sin_bloqueos_loop`` de tests/conftest.py).
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Límites superiores (ms) de los buckets del histograma de lag; el último es +inf.
+LAG_BUCKETS_MS = (1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500)
+_FRAMES_MUESTRA = 15
+# Raíz del proyecto: el "sitio" de un bloqueo es el frame más profundo de aquí
+# (app/, scripts/, tests/) y no de asyncio o de una librería.
+_RAIZ = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+_EXCLUIR = (os.sep + "site-packages" + os.sep, os.sep + "dist-packages" + os.sep, __file__)
+
+
+class LoopBloqueado(AssertionError):
+    """Algún callback retuvo el event loop más que el umbral (modo test)."""
+
+
+class _Ping:
+    __slots__ = ("enviado", "hecho", "muestra", "lock")
+
+    def __init__(self) -> None:
+        self.enviado = time.perf_counter()
+        self.hecho = threading.Event()
+        self.muestra: Optional[List[traceback.FrameSummary]] = None
+        self.lock = threading.Lock()
+
+
+def _sitio(frames: List[traceback.FrameSummary]) -> str:
+    for f in reversed(frames):
+        if f.filename.startswith(_RAIZ) and not any(x in f.filename for x in _EXCLUIR):
+            return f"{os.path.relpath(f.filename, _RAIZ)}:{f.lineno} in {f.name}"
+    if frames:
+        f = frames[-1]
+        return f"{f.filename}:{f.lineno} in {f.name}"
+    return "desconocido"
+
+
+class LoopMonitor:
+    """Vigía de un event loop; ``iniciar()`` se llama desde el propio loop."""
+
+    def __init__(self, umbral_ms: float = 100.0, intervalo_ms: float = 250.0, max_bloqueos: int = 20) -> None:
+        self.umbral = umbral_ms / 1000.0
+        self.intervalo = intervalo_ms / 1000.0
+        self.bloqueos: deque = deque(maxlen=max_bloqueos)
+        self._lock = threading.Lock()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._hilo_loop: Optional[int] = None
+        self._vigia: Optional[threading.Thread] = None
+        self._parar = threading.Event()
+        self._reset_contadores()
+
+    def _reset_contadores(self) -> None:
+        self.lag_count = 0
+        self.lag_sum_ms = 0.0
+        self.lag_max_ms = 0.0
+        self.buckets = [0] * (len(LAG_BUCKETS_MS) + 1)
+        self.total_bloqueos = 0
+
+    @property
+    def activo(self) -> bool:
+        return self._vigia is not None and self._vigia.is_alive()
+
+    def iniciar(self, loop: Optional[asyncio.AbstractEventLoop] = None) -> None:
+        if self.activo:
+            return
+        self._loop = loop or asyncio.get_running_loop()
+        self._hilo_loop = threading.get_ident()
+        self._parar.clear()
+        self._vigia = threading.Thread(target=self._vigilar, name="loop-monitor", daemon=True)
+        self._vigia.start()
+
+    def detener(self) -> None:
+        self._parar.set()
+        if self._vigia is not None and self._vigia is not threading.current_thread():
+            self._vigia.join(timeout=max(1.0, self.intervalo * 2))
+        self._vigia = None
+
+    # ── hilo vigía ───────────────────────────────────────────────────────────
+
+    def _vigilar(self) -> None:
+        loop = self._loop
+        while not self._parar.wait(self.intervalo):
+            ping = _Ping()
+            try:
+                loop.call_soon_threadsafe(self._pong, ping)
+            except RuntimeError:  # loop cerrado
+                return
+            if ping.hecho.wait(self.umbral):
+                continue
+            frame = sys._current_frames().get(self._hilo_loop)
+            muestra = traceback.extract_stack(frame)[-_FRAMES_MUESTRA:] if frame is not None else []
+            del frame
+            with ping.lock:
+                if not ping.hecho.is_set():
+                    ping.muestra = muestra
+            # No mandar otro ping hasta que el loop atienda este.
+            while not ping.hecho.wait(self.intervalo):
+                if self._parar.is_set() or loop.is_closed():
+                    return
+
+    # ── hilo del loop ────────────────────────────────────────────────────────
+
+    def _pong(self, ping: _Ping) -> None:
+        lag_ms = (time.perf_counter() - ping.enviado) * 1000.0
+        with ping.lock:
+            ping.hecho.set()
+            muestra = ping.muestra
+        self._observar(lag_ms)
+        if lag_ms >= self.umbral * 1000.0:
+            self._registrar_bloqueo(lag_ms, muestra or [])
+
+    def _observar(self, ms: float) -> None:
+        with self._lock:
+            self.lag_count += 1
+            self.lag_sum_ms += ms
+            if ms > self.lag_max_ms:
+                self.lag_max_ms = ms
+            for i, limite in enumerate(LAG_BUCKETS_MS):
+                if ms <= limite:
+                    self.buckets[i] += 1
+                    return
+            self.buckets[-1] += 1
+
+    def _registrar_bloqueo(self, ms: float, muestra: List[traceback.FrameSummary]) -> None:
+        bloqueo = {
+            "ms": round(ms, 1),
+            "sitio": _sitio(muestra),
+            "stack": [f"{f.filename}:{f.lineno} in {f.name}" for f in muestra],
+            "ts": time.time(),
+        }
+        with self._lock:
+            self.total_bloqueos += 1
+            self.bloqueos.append(bloqueo)
+        logger.warning("event loop bloqueado %.0f ms en %s", ms, bloqueo["sitio"])
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            n = self.lag_count
+            return {
+                "enabled": self.activo,
+                "threshold_ms": self.umbral * 1000.0,
+                "lag_ms": {
+                    "count": n,
+                    "avg": round(self.lag_sum_ms / n, 3) if n else 0.0,
+                    "max": round(self.lag_max_ms, 3),
+                    "buckets": dict(zip([*map(str, LAG_BUCKETS_MS), "inf"], self.buckets)),
+                },
+                "blocks": self.total_bloqueos,
+                "recent_blocks": [{k: v for k, v in b.items() if k != "stack"} for b in self.bloqueos],
+            }
+
+    def reset(self) -> None:
+        with self._lock:
+            self._reset_contadores()
+            self.bloqueos.clear()
+
+
+# ── Monitor del worker (main.py / /admin/runtime/metrics) ────────────────────
+
+_monitor: Optional[LoopMonitor] = None
+
+
+def iniciar_monitor_loop() -> None:
+    """Arranca el monitor del worker si ``CALOFIT_LOOP_MONITOR_ENABLED`` (llamar desde el loop)."""
+    global _monitor
+    if not settings.CALOFIT_LOOP_MONITOR_ENABLED:
+        return
+    if _monitor is None:
+        _monitor = LoopMonitor(
+            umbral_ms=settings.CALOFIT_LOOP_BLOCK_MS,
+            intervalo_ms=settings.CALOFIT_LOOP_LAG_INTERVAL_MS,
+        )
+    _monitor.iniciar()
+
+
+def detener_monitor_loop() -> None:
+    if _monitor is not None:
+        _monitor.detener()
+
+
+def loop_monitor_stats() -> Dict[str, Any]:
+    if _monitor is None:
+        return {"enabled": False}
+    return _monitor.stats()
+
+
+# ── Modo test ────────────────────────────────────────────────────────────────
+
+@asynccontextmanager
+async def vigilar_bloqueos(umbral_ms: float = 100.0, fallar: bool = True) -> AsyncIterator[LoopMonitor]:
+    """
+    Vigila el loop actual durante el bloque; con ``fallar`` lanza ``LoopBloqueado``
+    con el sitio y el stack de cada bloqueo detectado.
+    """
+    monitor = LoopMonitor(umbral_ms=umbral_ms, intervalo_ms=max(umbral_ms / 4, 5.0), max_bloqueos=50)
+    monitor.iniciar()
+    try:
+        yield monitor
+    finally:
+        # Dejar correr el ping pendiente: un bloqueo justo al final del bloque
+        # solo se registra cuando el loop vuelve a atender callbacks.
+        await asyncio.sleep(0)
+        await asyncio.sleep(0)
+        monitor.detener()
+    if fallar and monitor.bloqueos:
+        detalle = "\n".join(
+            f"  {b['ms']:.0f} ms en {b['sitio']}\n    " + "\n    ".join(b["stack"][-6:])
+            for b in monitor.bloqueos
+        )
+        raise LoopBloqueado(f"event loop bloqueado (umbral {umbral_ms:.0f} ms):\n{detalle}")
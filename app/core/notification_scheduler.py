@@ -11,6 +11,7 @@ from app.core.utils import get_peru_date
 from app.core.logging_config import get_logger
 from app.models.client import Client
 from app.models.comida_registro import ComidaRegistro
+from app.services.resumen_periodos import instalar_hooks_resumen
 
 logger = get_logger("notification_scheduler")
 
@@ -152,6 +153,8 @@ def enviar_motivacion_diaria():
 
 
 def iniciar_scheduler() -> BackgroundScheduler:
+    # Los jobs abren sus propias sesiones: que también actualicen los resúmenes.
+    instalar_hooks_resumen()
     scheduler = BackgroundScheduler(timezone=PERU_TZ)
     scheduler.add_job(
         enviar_motivacion_diaria,
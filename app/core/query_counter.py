@@ -0,0 +1,236 @@
+"""
+Conteo de queries SQL por request y detección de N+1.
+
+Hooks ``before/after_cursor_execute`` sobre ``Engine`` (todos los engines,
+también el ``sync_engine`` del engine async) cuentan sentencias, tiempo de BD y
+"formas" repetidas (la sentencia con literales y parámetros normalizados) del
+``ContadorQueries`` activo en el contexto:
+
+  - ``QueryCountMiddleware`` abre un contador por request. Al terminar acumula
+    por ruta (``sql_stats()``, en /admin/runtime/metrics como ``sql``; los requests que no
+    matchean ninguna ruta van juntos en ``<unmatched>``) y avisa en el log si
+    una misma forma se repitió ``CALOFIT_SQL_N1_THRESHOLD`` veces o más (lazy
+    loads, queries dentro de un for por día...). Con ``CALOFIT_SQL_HEADERS``
+    (por defecto = DEBUG) añade ``X-DB-Queries``, ``X-DB-Time-Ms`` y
+    ``X-DB-Max-Repeat`` a la respuesta.
+  - ``contar_queries()`` sirve en scripts y tests; con ``todo_el_proceso=True``
+    cuenta también lo que corre en otros hilos/loops (el de ``TestClient``).
+    El fixture ``presupuesto_queries`` de tests/conftest.py lo usa para fijar
+    un máximo de queries por endpoint.
+
+El contador viaja en un ContextVar: ``asyncio.to_thread`` y el threadpool de
+Starlette copian el contexto, así que las rutas ``def`` también se cuentan.
+"""
+from __future__ import annotations
+
+import logging
+import re
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+_PARAMS = re.compile(r"%\(\w+\)s|%s|\$\d+")
+_LITERALES = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+_ESPACIOS = re.compile(r"\s+")
+_LISTAS = re.compile(r"\((?:\s*\?\s*,)+\s*\?\s*\)")
+
+
+def forma_sql(statement: str) -> str:
+    """Sentencia sin literales ni espacios extra: dos queries con la misma forma solo difieren en valores."""
+    s = _PARAMS.sub("?", statement)
+    s = _LITERALES.sub("?", s)
+    s = _LISTAS.sub("(?...)", s)
+    return _ESPACIOS.sub(" ", s).strip()
+
+
+class ContadorQueries:
+    """Sentencias, tiempo de BD y formas repetidas de un request (o de un bloque)."""
+
+    __slots__ = ("total", "db_ms", "formas", "_lock")
+
+    def __init__(self) -> None:
+        self.total = 0
+        self.db_ms = 0.0
+        self.formas: Counter = Counter()
+        self._lock = threading.Lock()
+
+    def registrar(self, statement: str, ms: float) -> None:
+        forma = forma_sql(statement)
+        with self._lock:
+            self.total += 1
+            self.db_ms += ms
+            self.formas[forma] += 1
+
+    def repetidas(self, minimo: int = 2) -> List[Tuple[str, int]]:
+        """Formas ejecutadas ``minimo`` veces o más, de la más repetida a la menos."""
+        with self._lock:
+            return [(f, n) for f, n in self.formas.most_common() if n >= minimo]
+
+    @property
+    def max_repeticion(self) -> int:
+        with self._lock:
+            return max(self.formas.values(), default=0)
+
+    def resumen(self) -> str:
+        lineas = [f"{self.total} queries, {self.db_ms:.1f} ms de BD"]
+        lineas += [f"  {n}x {f[:200]}" for f, n in self.formas.most_common(10)]
+        return "\n".join(lineas)
+
+
+_actual: ContextVar[Optional[ContadorQueries]] = ContextVar("calofit_queries", default=None)
+_globales: List[ContadorQueries] = []
+_globales_lock = threading.Lock()
+_instalado = False
+
+
+def _antes(conn, cursor, statement, parameters, context, executemany) -> None:
+    conn.info.setdefault("calofit_t0", []).append(time.perf_counter())
+
+
+def _despues(conn, cursor, statement, parameters, context, executemany) -> None:
+    pila = conn.info.get("calofit_t0")
+    if not pila:
+        return
+    ms = (time.perf_counter() - pila.pop()) * 1000.0
+    contador = _actual.get()
+    if contador is not None:
+        contador.registrar(statement, ms)
+    if _globales:
+        with _globales_lock:
+            globales = [c for c in _globales if c is not contador]
+        for c in globales:
+            c.registrar(statement, ms)
+
+
+def _error(contexto) -> None:
+    # La sentencia falló: no habrá after_cursor_execute que saque su t0.
+    conn = contexto.connection
+    pila = conn.info.get("calofit_t0") if conn is not None else None
+    if pila:
+        pila.pop()
+
+
+def instalar_contador_queries() -> None:
+    """Engancha los hooks a todos los engines (idempotente)."""
+    global _instalado
+    if _instalado:
+        return
+    event.listen(Engine, "before_cursor_execute", _antes)
+    event.listen(Engine, "after_cursor_execute", _despues)
+    event.listen(Engine, "handle_error", _error)
+    _instalado = True
+
+
+@contextmanager
+def contar_queries(todo_el_proceso: bool = False) -> Iterator[ContadorQueries]:
+    instalar_contador_queries()
+    contador = ContadorQueries()
+    token = _actual.set(contador)
+    if todo_el_proceso:
+        with _globales_lock:
+            _globales.append(contador)
+    try:
+        yield contador
+    finally:
+        _actual.reset(token)
+        if todo_el_proceso:
+            with _globales_lock:
+                _globales.remove(contador)
+
+
+# ── Métricas por ruta ────────────────────────────────────────────────────────
+
+_stats_lock = threading.Lock()
+# ruta → {"requests", "queries_sum", "queries_max", "db_ms_sum", "db_ms_max", "n1", "n1_forma"}
+_stats: Dict[str, Dict[str, Any]] = {}
+# Una sola entrada para 404s y escaneos: con el path crudo ``_stats`` crecería sin límite.
+SIN_RUTA = "<unmatched>"
+
+
+def _acumular(ruta: str, contador: ContadorQueries, forma_n1: Optional[str]) -> None:
+    with _stats_lock:
+        s = _stats.setdefault(ruta, {
+            "requests": 0, "queries_sum": 0, "queries_max": 0,
+            "db_ms_sum": 0.0, "db_ms_max": 0.0, "n1": 0, "n1_forma": None,
+        })
+        s["requests"] += 1
+        s["queries_sum"] += contador.total
+        s["queries_max"] = max(s["queries_max"], contador.total)
+        s["db_ms_sum"] += contador.db_ms
+        s["db_ms_max"] = max(s["db_ms_max"], contador.db_ms)
+        if forma_n1 is not None:
+            s["n1"] += 1
+            s["n1_forma"] = forma_n1[:200]
+
+
+def sql_stats() -> Dict[str, Any]:
+    """Por ruta: requests, queries y ms de BD (promedio / máximo) y requests con posible N+1."""
+    with _stats_lock:
+        return {
+            ruta: {
+                "requests": s["requests"],
+                "queries_avg": round(s["queries_sum"] / s["requests"], 2),
+                "queries_max": s["queries_max"],
+                "db_ms_avg": round(s["db_ms_sum"] / s["requests"], 2),
+                "db_ms_max": round(s["db_ms_max"], 2),
+                "n1": s["n1"],
+                "n1_forma": s["n1_forma"],
+            }
+            for ruta, s in sorted(_stats.items())
+        }
+
+
+def reset_sql_stats() -> None:
+    with _stats_lock:
+        _stats.clear()
+
+
+class QueryCountMiddleware:
+    """Middleware ASGI: un ``ContadorQueries`` por request HTTP."""
+
+    def __init__(self, app) -> None:
+        self.app = app
+        instalar_contador_queries()
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http" or not settings.CALOFIT_SQL_METRICS_ENABLED:
+            await self.app(scope, receive, send)
+            return
+
+        contador = ContadorQueries()
+        token = _actual.set(contador)
+        headers = settings.CALOFIT_SQL_HEADERS
+
+        async def send_con_headers(message) -> None:
+            # Los headers salen antes que el cuerpo: cuentan lo ejecutado hasta
+            # entonces (en rutas normales, todo; en streaming, lo del arranque).
+            if message["type"] == "http.response.start":
+                message["headers"] = [
+                    *message.get("headers", []),
+                    (b"x-db-queries", str(contador.total).encode()),
+                    (b"x-db-time-ms", f"{contador.db_ms:.1f}".encode()),
+                    (b"x-db-max-repeat", str(contador.max_repeticion).encode()),
+                ]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_con_headers if headers else send)
+        finally:
+            _actual.reset(token)
+            plantilla = getattr(scope.get("route"), "path", None)
+            ruta = f"{scope.get('method', '')} {plantilla}" if plantilla else SIN_RUTA
+            repetidas = contador.repetidas(settings.CALOFIT_SQL_N1_THRESHOLD)
+            if repetidas:
+                forma, n = repetidas[0]
+                logger.warning("posible N+1 en %s: %dx %s (%d queries en total)", ruta, n, forma[:200], contador.total)
+            _acumular(ruta, contador, repetidas[0][0] if repetidas else None)
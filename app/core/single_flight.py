@@ -0,0 +1,233 @@
+"""
+Single-flight: colapsa llamadas concurrentes con la misma key en una sola ejecución.
+
+Cuando varios requests piden a la vez el mismo alimento sin caché (o un cliente
+reintenta), cada uno dispararía su propia llamada al LLM y luego competiría por
+insertar en ``alimentos`` / ``app_cache_alimentos``. Con ``SingleFlight`` el
+primero (líder) ejecuta la función y los demás (waiters) esperan y reciben el
+mismo resultado — o la misma excepción.
+
+Sync y async comparten el mismo espacio de keys: cada vuelo es un
+``concurrent.futures.Future``, así una llamada síncrona y una async por la misma
+key hacen una sola ejecución, sin importar quién llegó primero.
+
+- ``do(key, fn)``: ruta síncrona (hilos del threadpool de FastAPI, sesiones DB
+  síncronas). El líder ejecuta ``fn`` en su hilo; los waiters bloquean en el
+  Future.
+- ``await do_async(key, coro_fn)``: ruta async. El líder crea una task y todos
+  esperan el Future con ``asyncio.shield``: cancelar a un waiter (o al líder) no
+  cancela la llamada de los demás. Un waiter async puede esperar un vuelo de
+  otro hilo o de otro event loop.
+- ``do_many(keys, fn)`` / ``await do_many_async(keys, coro_fn)``: lo mismo para
+  un lote. Las keys que nadie tiene en vuelo se registran y se resuelven con
+  una sola llamada ``fn(keys_propias) → {key: valor}``; las demás esperan al
+  vuelo existente (de otro lote o de ``do``/``do_async``).
+
+Una llamada síncrona hecha desde el hilo de un event loop no espera a un vuelo
+async de ese mismo loop (lo bloquearía para siempre): ejecuta por su cuenta.
+
+El resultado se comparte tal cual entre todos los llamadores: devolver valores
+que nadie mute (o copiar antes de mutar).
+
+Cada grupo cuenta ``calls``, ``executions`` (líderes), ``coalesced`` (waiters
+que no ejecutaron), ``errors`` e ``inflight``; ``single_flight_stats()`` los
+expone para /admin/cache/metrics.
+"""
+from __future__ import annotations
+
+import asyncio
+import threading
+from concurrent.futures import Future
+from typing import Any, Awaitable, Callable, Dict, Hashable, Iterable, List, Optional, Tuple, TypeVar
+
+T = TypeVar("T")
+
+_grupos: Dict[str, "SingleFlight"] = {}
+_grupos_lock = threading.Lock()
+
+
+def _loop_actual() -> Optional[asyncio.AbstractEventLoop]:
+    try:
+        return asyncio.get_running_loop()
+    except RuntimeError:
+        return None
+
+
+def _fallar(fut: Future, exc: BaseException) -> None:
+    """Lleva la excepción del líder a los waiters (una cancelación cancela el vuelo)."""
+    if isinstance(exc, asyncio.CancelledError):
+        fut.cancel()
+    else:
+        fut.set_exception(exc)
+
+
+class SingleFlight:
+    """Grupo de llamadas colapsables, identificado por ``name`` en las métricas."""
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self._lock = threading.Lock()
+        # key → (Future del vuelo, loop del líder async o None si el líder es síncrono)
+        self._vuelos: dict[Hashable, Tuple[Future, Optional[asyncio.AbstractEventLoop]]] = {}
+        # Referencias fuertes a las tasks líderes: el loop solo guarda referencias débiles.
+        self._tareas: set[asyncio.Task] = set()
+        self._stats = {"calls": 0, "executions": 0, "coalesced": 0, "errors": 0}
+        with _grupos_lock:
+            _grupos[name] = self
+
+    def _count(self, campo: str) -> None:
+        with self._lock:
+            self._stats[campo] += 1
+
+    def _tomar(self, key: Hashable, loop: Optional[asyncio.AbstractEventLoop], sync: bool) -> Tuple[Optional[Future], bool]:
+        """(Future, es_lider) con ``self._lock`` tomado; Future None = ejecutar sin registrar."""
+        self._stats["calls"] += 1
+        vuelo = self._vuelos.get(key)
+        if vuelo is not None and sync and loop is not None and vuelo[1] is loop:
+            self._stats["executions"] += 1
+            return None, True
+        if vuelo is None:
+            fut: Future = Future()
+            self._vuelos[key] = (fut, loop if not sync else None)
+            self._stats["executions"] += 1
+            return fut, True
+        self._stats["coalesced"] += 1
+        return vuelo[0], False
+
+    def _soltar(self, keys: Iterable[Hashable], futs: Dict[Hashable, Future]) -> None:
+        with self._lock:
+            for key in keys:
+                vuelo = self._vuelos.get(key)
+                if vuelo is not None and vuelo[0] is futs.get(key):
+                    del self._vuelos[key]
+
+    # ── ruta síncrona ─────────────────────────────────────────────────────
+
+    def do(self, key: Hashable, fn: Callable[[], T]) -> T:
+        with self._lock:
+            fut, lider = self._tomar(key, _loop_actual(), sync=True)
+        if not lider:
+            return fut.result()
+        try:
+            res = fn()
+        except BaseException as exc:
+            self._count("errors")
+            if fut is not None:
+                _fallar(fut, exc)
+            raise
+        else:
+            if fut is not None:
+                fut.set_result(res)
+            return res
+        finally:
+            if fut is not None:
+                self._soltar([key], {key: fut})
+
+    def do_many(self, keys: Iterable[Hashable], fn: Callable[[List[Hashable]], Dict[Hashable, T]]) -> Dict[Hashable, T]:
+        loop = _loop_actual()
+        propios: dict[Hashable, Optional[Future]] = {}
+        ajenos: dict[Hashable, Future] = {}
+        with self._lock:
+            for key in dict.fromkeys(keys):
+                fut, lider = self._tomar(key, loop, sync=True)
+                if lider:
+                    propios[key] = fut
+                else:
+                    ajenos[key] = fut
+        registrados = {k: f for k, f in propios.items() if f is not None}
+        res: Dict[Hashable, T] = {}
+        if propios:
+            # Primero lo propio y después esperar lo ajeno: dos lotes cruzados no se bloquean.
+            try:
+                res = fn(list(propios))
+            except BaseException as exc:
+                self._count("errors")
+                for fut in registrados.values():
+                    _fallar(fut, exc)
+                raise
+            else:
+                for key, fut in registrados.items():
+                    fut.set_result(res.get(key))
+            finally:
+                self._soltar(registrados, registrados)
+        out = {key: res.get(key) for key in propios}
+        for key, fut in ajenos.items():
+            out[key] = fut.result()
+        return out
+
+    # ── ruta async ────────────────────────────────────────────────────────
+
+    async def do_async(self, key: Hashable, fn: Callable[[], Awaitable[T]]) -> T:
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            fut, lider = self._tomar(key, loop, sync=False)
+            if lider:
+                async def _uno(keys: List[Hashable]) -> Dict[Hashable, T]:
+                    return {key: await fn()}
+
+                self._lanzar(loop, self._ejecutar([key], {key: fut}, _uno))
+        return await asyncio.shield(asyncio.wrap_future(fut))
+
+    async def do_many_async(
+        self,
+        keys: Iterable[Hashable],
+        fn: Callable[[List[Hashable]], Awaitable[Dict[Hashable, T]]],
+    ) -> Dict[Hashable, T]:
+        loop = asyncio.get_running_loop()
+        futs: dict[Hashable, Future] = {}
+        with self._lock:
+            propios = {}
+            for key in dict.fromkeys(keys):
+                fut, lider = self._tomar(key, loop, sync=False)
+                futs[key] = fut
+                if lider:
+                    propios[key] = fut
+            if propios:
+                self._lanzar(loop, self._ejecutar(list(propios), propios, fn))
+        return {key: await asyncio.shield(asyncio.wrap_future(fut)) for key, fut in futs.items()}
+
+    def _lanzar(self, loop: asyncio.AbstractEventLoop, coro: Awaitable[Any]) -> None:
+        task = loop.create_task(coro)
+        self._tareas.add(task)
+        task.add_done_callback(self._tareas.discard)
+
+    async def _ejecutar(
+        self,
+        keys: List[Hashable],
+        futs: Dict[Hashable, Future],
+        fn: Callable[[List[Hashable]], Awaitable[Dict[Hashable, Any]]],
+    ) -> None:
+        """Task líder: el resultado (o la excepción) llega a los waiters por los Futures."""
+        try:
+            res = await fn(keys)
+        except BaseException as exc:
+            self._count("errors")
+            for fut in futs.values():
+                _fallar(fut, exc)
+            if not isinstance(exc, (Exception, asyncio.CancelledError)):
+                raise
+        else:
+            for key, fut in futs.items():
+                fut.set_result(res.get(key))
+        finally:
+            self._soltar(keys, futs)
+
+    # ── métricas ──────────────────────────────────────────────────────────
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            out = dict(self._stats)
+            out["inflight"] = len(self._vuelos)
+        return out
+
+    def reset_stats(self) -> None:
+        with self._lock:
+            for k in self._stats:
+                self._stats[k] = 0
+
+
+def single_flight_stats() -> dict[str, dict[str, Any]]:
+    """Contadores de todos los grupos registrados, por nombre."""
+    with _grupos_lock:
+        grupos = list(_grupos.values())
+    return {g.name: g.stats() for g in grupos}
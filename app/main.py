@@ -54,6 +54,22 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Caché de identidad de get_current_user: se invalida al modificar un Client / User.
+from app.core.identity_cache import instalar_invalidacion_identidad
+instalar_invalidacion_identidad()
+
+# Resúmenes semanales / mensuales: se recalculan al commit cuando cambia progreso_calorias.
+from app.services.resumen_periodos import instalar_hooks_resumen
+instalar_hooks_resumen()
+
+# Catálogo de alimentos en memoria: se recarga tras cada commit que toque alimentos / alias / unidades.
+from app.services.catalogo_alimentos import instalar_recarga_catalogo
+instalar_recarga_catalogo()
+
+# Queries SQL por request: métricas por ruta, aviso de N+1 y headers X-DB-* en debug.
+from app.core.query_counter import QueryCountMiddleware
+app.add_middleware(QueryCountMiddleware)
+
 app.include_router(api_router)
 app.include_router(websocket_router, tags=["WebSockets"])
 
@@ -78,6 +94,45 @@ def iniciar_notificaciones():
     iniciar_scheduler()
 
 
+@app.on_event("startup")
+def cargar_catalogo_alimentos():
+    # Los resolvers de alimentos consultan este snapshot antes que Postgres.
+    from app.services.catalogo_alimentos import iniciar_catalogo
+    iniciar_catalogo()
+
+
+@app.on_event("startup")
+async def abrir_pool_llm():
+    # Conexiones keep-alive hacia el LLM reutilizadas entre turnos de chat.
+    from app.services.ai import http_pool
+    await http_pool.startup()
+
+
+@app.on_event("startup")
+async def arrancar_monitor_loop():
+    # Solo con CALOFIT_LOOP_MONITOR_ENABLED: lag del loop y callbacks que lo bloquean.
+    from app.core.loop_monitor import iniciar_monitor_loop
+    iniciar_monitor_loop()
+
+
+@app.on_event("shutdown")
+async def cerrar_pool_llm():
+    from app.services.ai import http_pool
+    await http_pool.shutdown()
+
+
+@app.on_event("shutdown")
+async def cerrar_pool_bd_async():
+    from app.core.database import dispose_async_engine
+    await dispose_async_engine()
+
+
+@app.on_event("shutdown")
+def parar_monitor_loop():
+    from app.core.loop_monitor import detener_monitor_loop
+    detener_monitor_loop()
+
+
 @app.get("/")
 def read_root():
     return {"message": "Asistente CaloFit Operativo en Gimnasio World Light"}
@@ -85,6 +140,7 @@ def read_root():
 
 @app.api_route("/health", methods=["GET", "HEAD"])
 def health_check_root():
+    # Solo liveness: las métricas internas del worker están en /api/v1/admin/runtime/metrics.
     return {"status": "OK", "version": "1.0.0"}
 
 
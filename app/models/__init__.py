@@ -3,6 +3,7 @@ from .client import Client
 from .role import Role
 from .nutricion import PlanNutricional, PlanDiario
 from .historial import HistorialPeso, HistorialIMC, ProgresoCalorias, AlertaSalud
+from .resumen_periodo import ResumenSemanal, ResumenMensual
 from .preferencias import PreferenciaAlimento, PreferenciaEjercicio
 from .auditoria import AuditoriaAdmin
 from .alimento import Alimento
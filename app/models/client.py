@@ -20,6 +20,7 @@ class Client(Base):
         "PlanNutricional",
         back_populates="cliente",
         cascade="all, delete-orphan",
+        lazy="select",
     )
     
     flutter_uid = Column(String, unique=True, nullable=True, index=True)  # ✅ UID de Firebase/Flutter para vincular usuario con perfil de salud
@@ -56,9 +57,12 @@ class Client(Base):
     nutritionist = relationship("User", foreign_keys="[Client.assigned_nutri_id]", back_populates="clients_as_nutri")
 
     # Nuevas relaciones para historial
-    historial_peso = relationship("HistorialPeso", back_populates="cliente", cascade="all, delete-orphan")
-    historial_imc = relationship("HistorialIMC", back_populates="cliente", cascade="all, delete-orphan")
-    progreso_calorias = relationship("ProgresoCalorias", back_populates="cliente", cascade="all, delete-orphan")
+    # lazy="select" explícito: crecen sin límite con el tiempo, solo se cargan al
+    # acceder a ellas en la vista de un paciente. Los listados agregan en SQL y
+    # las bloquean con raiseload() (ver nutricionista._agregados_pacientes).
+    historial_peso = relationship("HistorialPeso", back_populates="cliente", cascade="all, delete-orphan", lazy="select")
+    historial_imc = relationship("HistorialIMC", back_populates="cliente", cascade="all, delete-orphan", lazy="select")
+    progreso_calorias = relationship("ProgresoCalorias", back_populates="cliente", cascade="all, delete-orphan", lazy="select")
     alertas_salud = relationship("AlertaSalud", back_populates="cliente", cascade="all, delete-orphan")
     sugerencias_guardadas = relationship("SugerenciaGuardada", back_populates="cliente", cascade="all, delete-orphan")
     
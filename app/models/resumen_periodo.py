@@ -0,0 +1,58 @@
+"""
+Resúmenes nutricionales por cliente y periodo (rollups de progreso_calorias).
+
+resumen_semanal → una fila por cliente y semana ISO (Lun-Dom)
+resumen_mensual → una fila por cliente y mes
+
+Derivados: app.services.resumen_periodos los recalcula al cambiar
+progreso_calorias (y ``python cli.py rollups`` los rellena desde cero).
+"""
+from sqlalchemy import Column, Date, Float, ForeignKey, Integer, TIMESTAMP, UniqueConstraint
+from sqlalchemy.sql import func
+
+from app.core.database import Base
+
+
+class _ResumenPeriodo:
+    """Columnas comunes: totales del periodo y días con registro / ejercicio."""
+
+    id = Column(Integer, primary_key=True, index=True)
+    fecha_inicio = Column(Date, nullable=False)
+    fecha_fin = Column(Date, nullable=False)
+
+    kcal_consumidas = Column(Float, nullable=False, default=0.0)
+    kcal_quemadas = Column(Float, nullable=False, default=0.0)
+    proteinas_g = Column(Float, nullable=False, default=0.0)
+    carbohidratos_g = Column(Float, nullable=False, default=0.0)
+    grasas_g = Column(Float, nullable=False, default=0.0)
+    kcal_objetivo_promedio = Column(Float, nullable=False, default=0.0)
+
+    dias_registrados = Column(Integer, nullable=False, default=0)    # días con kcal consumidas > 0
+    dias_con_ejercicio = Column(Integer, nullable=False, default=0)  # días con kcal quemadas > 0
+    adherencia_pct = Column(Float, nullable=False, default=0.0)      # promedio de los días registrados
+
+    actualizado_en = Column(TIMESTAMP, nullable=False, server_default=func.now(), onupdate=func.now())
+
+
+class ResumenSemanal(_ResumenPeriodo, Base):
+    __tablename__ = "resumen_semanal"
+
+    client_id = Column(Integer, ForeignKey("clients.id", ondelete="CASCADE"), nullable=False, index=True)
+    anio = Column(Integer, nullable=False)    # año ISO
+    semana = Column(Integer, nullable=False)  # semana ISO 1-53
+
+    __table_args__ = (
+        UniqueConstraint("client_id", "anio", "semana", name="uq_resumen_semanal_cliente_semana"),
+    )
+
+
+class ResumenMensual(_ResumenPeriodo, Base):
+    __tablename__ = "resumen_mensual"
+
+    client_id = Column(Integer, ForeignKey("clients.id", ondelete="CASCADE"), nullable=False, index=True)
+    anio = Column(Integer, nullable=False)
+    mes = Column(Integer, nullable=False)
+
+    __table_args__ = (
+        UniqueConstraint("client_id", "anio", "mes", name="uq_resumen_mensual_cliente_mes"),
+    )
@@ -0,0 +1,313 @@
+"""
+Circuit breaker por modelo y requests con cobertura (hedging) para el LLM.
+
+``_llamar_groq`` recorre en serie una cadena de modelos de fallback, pero solo
+después de que el intento anterior falle: un upstream lento podía costar los
+180 s de ``GROQ_TIMEOUT_SEC`` antes de probar el siguiente modelo.
+
+- Circuit breaker: cada modelo cuenta fallos consecutivos (timeouts, 5xx, 429,
+  errores de conexión) y llamadas lentas (> ``LLM_BREAKER_SLOW_SEC``). Con
+  ``LLM_BREAKER_FAILURES`` seguidos el circuito se abre y las llamadas a ese
+  modelo fallan al instante con ``CircuitoAbierto`` durante
+  ``LLM_BREAKER_OPEN_SEC``; luego pasa una sola llamada de prueba (half-open)
+  que lo cierra o lo vuelve a abrir. Con el circuito abierto la llamada va
+  directo al secundario del modelo (``SECUNDARIOS``) si ese está sano; si no,
+  ``CircuitoAbierto`` lleva ``timeout`` en el mensaje para que los llamadores
+  salten a su fallback como ya hacían.
+  Un 413 (prompt grande) o ``PresupuestoAgotado`` (cupo local) no cuentan: no
+  dicen nada de la salud del modelo.
+- Hedging (``LLM_HEDGE_ENABLED``): si el primario no respondió tras su p95 de
+  latencia (acotado a ``LLM_HEDGE_MIN_DELAY_SEC``..``LLM_HEDGE_MAX_DELAY_SEC``,
+  contado desde que el rate governor le dio cupo: un primario en cola local no
+  dispara la cobertura, que gastaría más cupo justo cuando se está frenando),
+  se lanza el mismo prompt al modelo secundario (``SECUNDARIOS``) y gana el
+  primero que responda bien; el otro se cancela. No se usa cuando la llamada
+  está en streaming (los tokens se duplicarían).
+
+``llamar(modelo, fn)`` es el punto de entrada: ``fn(modelo)`` hace la llamada
+real a un modelo dado. Con ``reservar`` (cupo del rate governor, que puede
+esperar segundos) la reserva se toma antes de medir y se pasa a
+``fn(modelo, reserva)``: la latencia y las llamadas lentas son solo del
+proveedor. ``breaker_stats()`` expone estado, fallos y p95 por modelo (/admin/runtime/metrics).
+"""
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import threading
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Dict, Optional, TypeVar
+
+from app.core.config import settings
+from app.services.ai.rate_governor import PresupuestoAgotado
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# Modelo al que se cubre cada primario (distinto proveedor/tamaño para no compartir la falla).
+SECUNDARIOS: Dict[str, str] = {
+    "groq/compound-mini": "llama-3.1-8b-instant",
+    "openai/gpt-oss-20b": "llama-3.3-70b-versatile",
+    "openai/gpt-oss-120b": "llama-3.3-70b-versatile",
+    "llama-3.3-70b-versatile": "llama-3.1-8b-instant",
+    "llama-3.1-8b-instant": "groq/compound-mini",
+}
+
+CERRADO, ABIERTO, SEMI_ABIERTO = "closed", "open", "half_open"
+
+
+class CircuitoAbierto(RuntimeError):
+    """El modelo está marcado como no saludable: se rechaza sin llamar."""
+
+
+def es_fallo_de_salud(exc: BaseException) -> bool:
+    """True si el error indica un upstream caído/lento (y no un problema del prompt o del cupo local)."""
+    if isinstance(exc, (PresupuestoAgotado, CircuitoAbierto, asyncio.CancelledError)):
+        return False
+    if isinstance(exc, asyncio.TimeoutError):
+        return True
+    err = str(exc).lower()
+    if "413" in err or "too_large" in err or "too large" in err:
+        return False
+    return True
+
+
+class CircuitBreaker:
+    """Estado closed → open → half_open de un modelo, con ventana de latencias para el p95."""
+
+    def __init__(
+        self,
+        nombre: str,
+        fallos_para_abrir: int = 3,
+        abierto_seg: float = 30.0,
+        lento_seg: float = 20.0,
+        ventana_latencias: int = 100,
+    ) -> None:
+        self.nombre = nombre
+        self.fallos_para_abrir = max(1, int(fallos_para_abrir))
+        self.abierto_seg = float(abierto_seg)
+        self.lento_seg = float(lento_seg)
+        self._lock = threading.Lock()
+        self._estado = CERRADO
+        self._fallos_seguidos = 0
+        self._abierto_desde = 0.0
+        self._prueba_en_curso = False
+        self._latencias: deque[float] = deque(maxlen=ventana_latencias)
+        self._stats = {"calls": 0, "failures": 0, "slow": 0, "rejected": 0, "opened": 0}
+
+    @property
+    def estado(self) -> str:
+        with self._lock:
+            return self._estado_actual(time.monotonic())
+
+    def _estado_actual(self, now: float) -> str:
+        if self._estado == ABIERTO and now - self._abierto_desde >= self.abierto_seg:
+            self._estado = SEMI_ABIERTO
+            self._prueba_en_curso = False
+        return self._estado
+
+    def disponible(self) -> bool:
+        """Sin efectos: ¿aceptaría una llamada ahora?"""
+        with self._lock:
+            estado = self._estado_actual(time.monotonic())
+            return estado == CERRADO or (estado == SEMI_ABIERTO and not self._prueba_en_curso)
+
+    def antes_de_llamar(self) -> None:
+        """Reserva el paso o levanta ``CircuitoAbierto``."""
+        with self._lock:
+            estado = self._estado_actual(time.monotonic())
+            if estado == ABIERTO or (estado == SEMI_ABIERTO and self._prueba_en_curso):
+                self._stats["rejected"] += 1
+                raise CircuitoAbierto(f"timeout: circuito abierto para {self.nombre}")
+            if estado == SEMI_ABIERTO:
+                self._prueba_en_curso = True
+            self._stats["calls"] += 1
+
+    def registrar_exito(self, latencia_seg: float) -> None:
+        with self._lock:
+            self._latencias.append(latencia_seg)
+            if latencia_seg > self.lento_seg:
+                self._stats["slow"] += 1
+                self._fallo()
+                return
+            self._fallos_seguidos = 0
+            self._estado = CERRADO
+            self._prueba_en_curso = False
+
+    def registrar_fallo(self) -> None:
+        with self._lock:
+            self._stats["failures"] += 1
+            self._fallo()
+
+    def liberar(self) -> None:
+        """La llamada terminó sin veredicto (cancelada, 413, cupo local)."""
+        with self._lock:
+            self._prueba_en_curso = False
+
+    def _fallo(self) -> None:
+        self._fallos_seguidos += 1
+        if self._estado == SEMI_ABIERTO or self._fallos_seguidos >= self.fallos_para_abrir:
+            if self._estado != ABIERTO:
+                self._stats["opened"] += 1
+                logger.warning("LLM breaker: circuito abierto para %s", self.nombre)
+            self._estado = ABIERTO
+            self._abierto_desde = time.monotonic()
+        self._prueba_en_curso = False
+
+    def p95(self) -> Optional[float]:
+        with self._lock:
+            muestras = sorted(self._latencias)
+        if len(muestras) < 5:
+            return None
+        return muestras[min(len(muestras) - 1, int(len(muestras) * 0.95))]
+
+    def stats(self) -> Dict[str, Any]:
+        p95 = self.p95()
+        with self._lock:
+            out = dict(self._stats)
+            out["state"] = self._estado_actual(time.monotonic())
+            out["consecutive_failures"] = self._fallos_seguidos
+        out["p95_ms"] = round(p95 * 1000.0, 1) if p95 is not None else None
+        return out
+
+
+_breakers: Dict[str, CircuitBreaker] = {}
+_breakers_lock = threading.Lock()
+_hedge_stats = {"rerouted": 0, "hedged": 0, "secondary_won": 0}
+
+
+def breaker(modelo: str) -> CircuitBreaker:
+    with _breakers_lock:
+        b = _breakers.get(modelo)
+        if b is None:
+            b = _breakers[modelo] = CircuitBreaker(
+                modelo,
+                fallos_para_abrir=settings.LLM_BREAKER_FAILURES,
+                abierto_seg=settings.LLM_BREAKER_OPEN_SEC,
+                lento_seg=settings.LLM_BREAKER_SLOW_SEC,
+            )
+        return b
+
+
+def reset_breakers() -> None:
+    """Olvida estado y latencias de todos los modelos (tests / scripts)."""
+    with _breakers_lock:
+        _breakers.clear()
+        _hedge_stats.update(rerouted=0, hedged=0, secondary_won=0)
+
+
+def _secundarios() -> Dict[str, str]:
+    out = dict(SECUNDARIOS)
+    if settings.LLM_HEDGE_SECONDARY:
+        try:
+            out.update(json.loads(settings.LLM_HEDGE_SECONDARY))
+        except ValueError as e:
+            logger.warning("LLM_HEDGE_SECONDARY inválido (%s): se usan los secundarios por defecto", e)
+    return out
+
+
+Reservar = Optional[Callable[[str], Awaitable[Any]]]
+
+
+async def _con_breaker(
+    modelo: str,
+    fn: Callable[..., Awaitable[T]],
+    reservar: Reservar = None,
+    en_vuelo: Optional[asyncio.Event] = None,
+) -> T:
+    """``en_vuelo`` se marca cuando la llamada sale al proveedor (ya con cupo)."""
+    b = breaker(modelo)
+    b.antes_de_llamar()
+    try:
+        if reservar is None:
+            if en_vuelo is not None:
+                en_vuelo.set()
+            t0 = time.perf_counter()
+            res = await fn(modelo)
+        else:
+            reserva = await reservar(modelo)
+            if en_vuelo is not None:
+                en_vuelo.set()
+            t0 = time.perf_counter()
+            res = await fn(modelo, reserva)
+    except BaseException as exc:
+        if es_fallo_de_salud(exc):
+            b.registrar_fallo()
+        else:
+            b.liberar()
+        raise
+    b.registrar_exito(time.perf_counter() - t0)
+    return res
+
+
+def _delay_hedge(modelo: str) -> float:
+    p95 = breaker(modelo).p95()
+    if p95 is None:
+        p95 = settings.LLM_HEDGE_MAX_DELAY_SEC
+    return min(max(p95, settings.LLM_HEDGE_MIN_DELAY_SEC), settings.LLM_HEDGE_MAX_DELAY_SEC)
+
+
+async def llamar(
+    modelo: str,
+    fn: Callable[..., Awaitable[T]],
+    hedge: bool = True,
+    reservar: Reservar = None,
+) -> T:
+    """Llama a ``fn(modelo)`` (o ``fn(modelo, await reservar(modelo))``) pasando por
+    el breaker y, si está habilitado, con hedging."""
+    secundario = _secundarios().get(modelo)
+    if secundario == modelo:
+        secundario = None
+    if secundario and not breaker(modelo).disponible() and breaker(secundario).disponible():
+        _hedge_stats["rerouted"] += 1
+        return await _con_breaker(secundario, fn, reservar)
+    if not (secundario and hedge and settings.LLM_HEDGE_ENABLED):
+        return await _con_breaker(modelo, fn, reservar)
+
+    en_vuelo = asyncio.Event()
+    primario = asyncio.ensure_future(_con_breaker(modelo, fn, reservar, en_vuelo))
+    pendientes = {primario}
+    try:
+        # El reloj del hedge corre desde que el primario tiene cupo, no mientras espera en el governor.
+        con_cupo = asyncio.ensure_future(en_vuelo.wait())
+        try:
+            await asyncio.wait({primario, con_cupo}, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            con_cupo.cancel()
+        done, _ = await asyncio.wait(pendientes, timeout=_delay_hedge(modelo))
+        if done or not breaker(secundario).disponible():
+            return await primario
+
+        _hedge_stats["hedged"] += 1
+        logger.info("LLM hedge: %s lento, lanzando %s en paralelo", modelo, secundario)
+        cubierta = asyncio.ensure_future(_con_breaker(secundario, fn, reservar))
+        pendientes = {primario, cubierta}
+        error: Optional[BaseException] = None
+        while pendientes:
+            done, pendientes = await asyncio.wait(pendientes, return_when=asyncio.FIRST_COMPLETED)
+            for t in done:
+                if t.exception() is None:
+                    if t is cubierta:
+                        _hedge_stats["secondary_won"] += 1
+                    return t.result()
+                error = error or t.exception()
+        raise error
+    finally:
+        # El perdedor (o todo, si cancelan al llamador) no debe seguir gastando cupo.
+        for t in pendientes:
+            if not t.done():
+                t.cancel()
+
+
+def breaker_stats() -> Dict[str, Any]:
+    with _breakers_lock:
+        breakers = dict(_breakers)
+        hedge = dict(_hedge_stats)
+    return {
+        "hedge_enabled": settings.LLM_HEDGE_ENABLED,
+        "routing": hedge,
+        "models": {m: b.stats() for m, b in breakers.items()},
+    }
@@ -0,0 +1,178 @@
+"""
+Caché direccionado por contenido para completions deterministas del LLM.
+
+Varias llamadas son en la práctica deterministas (temperatura 0 o salida que
+igual se persiste): estimación de macros del resolvedor, ``analizar_intencion``,
+``clasificar_modo_asistente``, MET desconocido y ``/parse_ingredients``. Con este
+caché, la misma petición no vuelve a gastar cuota de Groq.
+
+- Key: ``(modelo, sha256 del prompt normalizado, temperatura, max_tokens)``. El
+  prompt se normaliza colapsando espacios; el system prompt entra en el hash.
+  El modelo es el pedido por el llamador (si respondió un fallback, se guarda
+  igual bajo el modelo pedido).
+- Tiers: memoria del worker (``StripedTTLCache``) y, con
+  ``LLM_CACHE_BACKEND=postgres``, una tabla UNLOGGED compartida
+  (``llm_completion_cache``) que sobrevive a reinicios del worker. Un hit del
+  tier compartido se promueve a memoria.
+- Opt-in por call site: solo se cachea dentro de ``with cache_llm("<call site>"):``.
+  Así no cambia la firma de ``completar`` / ``_llamar_groq`` (los tests los
+  reemplazan con mocks de firma fija). El nombre del call site es el prefijo
+  de las métricas (``llm_completion`` en ``app.core.cache_metrics``).
+- Nunca se guardan respuestas vacías ni mensajes de error/fallback.
+- Misses concurrentes con la misma key comparten una sola llamada (single-flight).
+"""
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Awaitable, Callable, Iterator, Optional
+
+from app.core.cache_backends import CacheBackend, PostgresUnloggedBackend
+from app.core.cache_engine import StripedTTLCache
+from app.core.cache_metrics import registry as metrics
+from app.core.config import settings
+from app.core.single_flight import SingleFlight
+
+logger = logging.getLogger(__name__)
+
+_METRICS_NAME = "llm_completion"
+_TABLE = "llm_completion_cache"
+
+_call_site: ContextVar[Optional[str]] = ContextVar("calofit_llm_cache_call_site", default=None)
+
+
+@contextmanager
+def cache_llm(call_site: str) -> Iterator[None]:
+    """Habilita el caché para las llamadas al LLM hechas dentro del bloque."""
+    token = _call_site.set(call_site)
+    try:
+        yield
+    finally:
+        _call_site.reset(token)
+
+
+def call_site_actual() -> Optional[str]:
+    """Call site con caché habilitado en el contexto actual, o None."""
+    if not settings.LLM_CACHE_ENABLED:
+        return None
+    return _call_site.get()
+
+
+def clave(model: str, prompt: str, temperature: Optional[float], max_tokens: Optional[int], system: str = "") -> str:
+    normalizado = " ".join(f"{system}\n{prompt}".split())
+    h = hashlib.sha256(normalizado.encode("utf-8")).hexdigest()
+    temp = "-" if temperature is None else f"{float(temperature):.3f}"
+    return f"{model}|{temp}|{max_tokens}|{h}"
+
+
+class CompletionCache:
+    """Tier en memoria + tier compartido opcional (Postgres UNLOGGED)."""
+
+    def __init__(
+        self,
+        ttl_seconds: float,
+        max_entries: int,
+        max_bytes: int,
+        backend: str = "memory",
+    ) -> None:
+        self.ttl_seconds = float(ttl_seconds)
+        self._mem = StripedTTLCache(max_entries=max_entries, max_bytes=max_bytes, stripes=8)
+        self._backend_kind = (backend or "memory").strip().lower()
+        self._shared: Optional[CacheBackend] = None
+        self._shared_lock = threading.Lock()
+        self._shared_disabled = self._backend_kind not in ("postgres", "postgresql", "pg")
+        self._vuelos = SingleFlight(_METRICS_NAME)
+        metrics.register_gauge(_METRICS_NAME, self._uso)
+
+    def _uso(self) -> dict:
+        st = self._mem.stats()
+        return {"memoria": {"entries": st["entries"], "bytes": st["bytes"]}}
+
+    def _shared_backend(self) -> Optional[CacheBackend]:
+        if self._shared_disabled:
+            return None
+        with self._shared_lock:
+            if self._shared is None and not self._shared_disabled:
+                try:
+                    self._shared = PostgresUnloggedBackend(table=_TABLE)
+                except Exception as e:
+                    # Sin BD no se cae nada: queda solo el tier en memoria.
+                    logger.warning("Caché LLM: tier Postgres deshabilitado (%s)", e)
+                    self._shared_disabled = True
+            return self._shared
+
+    def set_shared_backend(self, backend: Optional[CacheBackend]) -> None:
+        """Reemplaza el tier compartido (tests / scripts)."""
+        with self._shared_lock:
+            self._shared = backend
+            self._shared_disabled = backend is None
+
+    # ── lectura / escritura ──────────────────────────────────────────────
+
+    async def get(self, key: str) -> Optional[str]:
+        val = self._mem.get(key)
+        if val is not None:
+            return val
+        shared = self._shared_backend()
+        if shared is None:
+            return None
+        try:
+            entry = await asyncio.to_thread(shared.get, key)
+        except Exception as e:
+            logger.warning("Caché LLM GET: %s", e)
+            return None
+        if entry is None:
+            return None
+        raw = entry[0]
+        self._mem.set(key, raw, self.ttl_seconds, size=len(raw) + len(key))
+        return raw
+
+    async def set(self, key: str, texto: str) -> None:
+        self._mem.set(key, texto, self.ttl_seconds, size=len(texto) + len(key))
+        shared = self._shared_backend()
+        if shared is None:
+            return
+        try:
+            await asyncio.to_thread(shared.set, key, texto, self.ttl_seconds)
+        except Exception as e:
+            logger.warning("Caché LLM SET: %s", e)
+
+    def clear(self) -> None:
+        """Vacía el tier en memoria (el compartido expira por TTL)."""
+        self._mem.clear()
+
+    async def obtener_o_llamar(
+        self,
+        call_site: str,
+        key: str,
+        llamar: Callable[[], Awaitable[str]],
+        es_cacheable: Callable[[str], bool],
+    ) -> str:
+        """Retorna la completion cacheada o llama al LLM y guarda la respuesta si es válida."""
+        t0 = time.perf_counter()
+        cached = await self.get(key)
+        metrics.lookup(_METRICS_NAME, call_site, cached is not None, time.perf_counter() - t0)
+        if cached is not None:
+            return cached
+
+        async def _llamar_y_guardar() -> str:
+            texto = await llamar()
+            if es_cacheable(texto):
+                await self.set(key, texto)
+                metrics.incr(_METRICS_NAME, call_site, "sets")
+            return texto
+
+        return await self._vuelos.do_async(key, _llamar_y_guardar)
+
+
+completion_cache = CompletionCache(
+    ttl_seconds=settings.LLM_CACHE_TTL_SEC,
+    max_entries=settings.LLM_CACHE_MAX_ENTRIES,
+    max_bytes=settings.LLM_CACHE_MAX_BYTES,
+    backend=settings.LLM_CACHE_BACKEND,
+)
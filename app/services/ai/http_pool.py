@@ -0,0 +1,247 @@
+"""
+Pool HTTP compartido (keep-alive, HTTP/2) para las llamadas al LLM.
+
+Antes cada completion de OpenRouter abría su propio ``httpx.AsyncClient``: cada
+turno de chat pagaba TCP + TLS, y 2-3 veces cuando saltaban los fallbacks. Aquí
+vive un único ``AsyncClient`` por worker con conexiones reutilizables y límites
+acotados (``LLM_HTTP_*`` en settings):
+
+- ``startup()`` / ``shutdown()`` se enganchan a los eventos de la app (main.py).
+- ``post_json()`` hace el POST midiendo connect / TTFB / total con la extensión
+  ``trace`` de httpcore y acumula estadísticas (``http_stats()``, en /admin/runtime/metrics).
+  ``stream_sse()`` es la variante en streaming (``stream=True`` del proveedor).
+
+Un ``AsyncClient`` solo sirve en el event loop donde abrió sus conexiones, así
+que hay un pool por loop (``WeakKeyDictionary`` loop → cliente): el de uvicorn y
+el de cada ``asyncio.run`` que llame al LLM desde otro hilo (p. ej. el
+resolvedor de alimentos síncrono). Cada pool se cierra al terminar su loop: una
+task guardiana lo cierra cuando ``asyncio.run`` cancela las tasks pendientes.
+
+HTTP/2 requiere el paquete ``h2`` (``httpx[http2]``); sin él se usa HTTP/1.1
+con keep-alive.
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import threading
+import time
+import weakref
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Optional
+
+import httpx
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+try:
+    import h2  # noqa: F401
+    _h2_disponible = True
+except ImportError:
+    _h2_disponible = False
+
+# loop → (cliente, task guardiana que lo cierra al terminar el loop)
+_pools: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, tuple[httpx.AsyncClient, asyncio.Task]]" = (
+    weakref.WeakKeyDictionary()
+)
+_lock = threading.Lock()
+
+_stats_lock = threading.Lock()
+_stats: dict[str, Any] = {}
+
+
+def _reset_stats() -> None:
+    with _stats_lock:
+        _stats.clear()
+        _stats.update({
+            "requests": 0, "errors": 0,
+            "new_connections": 0, "reused_connections": 0,
+            "connect_ms_sum": 0.0, "ttfb_ms_sum": 0.0, "total_ms_sum": 0.0,
+            "connect_ms_max": 0.0, "ttfb_ms_max": 0.0, "total_ms_max": 0.0,
+            "http_versions": {},
+        })
+
+
+_reset_stats()
+
+
+def _nuevo_cliente() -> httpx.AsyncClient:
+    return httpx.AsyncClient(
+        http2=settings.LLM_HTTP2 and _h2_disponible,
+        limits=httpx.Limits(
+            max_connections=settings.LLM_HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=settings.LLM_HTTP_MAX_KEEPALIVE,
+            keepalive_expiry=settings.LLM_HTTP_KEEPALIVE_EXPIRY_SEC,
+        ),
+        timeout=httpx.Timeout(settings.GROQ_TIMEOUT_SEC, connect=settings.LLM_HTTP_CONNECT_TIMEOUT_SEC),
+    )
+
+
+async def startup() -> None:
+    """Crea el pool en el event loop de la app."""
+    _pool_para_este_loop()
+    logger.info("LLM HTTP pool listo (http2=%s)", settings.LLM_HTTP2 and _h2_disponible)
+
+
+async def shutdown() -> None:
+    """Cierra las conexiones del pool de este loop (evento shutdown de la app)."""
+    with _lock:
+        entrada = _pools.pop(asyncio.get_running_loop(), None)
+    if entrada is not None:
+        client, guardiana = entrada
+        guardiana.cancel()
+        await client.aclose()
+
+
+async def _cerrar_al_terminar(loop: asyncio.AbstractEventLoop, client: httpx.AsyncClient) -> None:
+    """Espera hasta que cancelen la task (fin de ``asyncio.run`` / shutdown) y cierra el pool."""
+    try:
+        await loop.create_future()
+    finally:
+        with _lock:
+            if _pools.get(loop, (None,))[0] is client:
+                del _pools[loop]
+        await client.aclose()
+
+
+def _pool_para_este_loop() -> httpx.AsyncClient:
+    loop = asyncio.get_running_loop()
+    with _lock:
+        for otro in [lp for lp in _pools if lp.is_closed()]:
+            # Loop cerrado sin cancelar sus tasks: sus conexiones ya no sirven.
+            del _pools[otro]
+        entrada = _pools.get(loop)
+        if entrada is not None and not entrada[0].is_closed:
+            return entrada[0]
+        client = _nuevo_cliente()
+        _pools[loop] = (client, loop.create_task(_cerrar_al_terminar(loop, client), name="llm-http-pool"))
+    return client
+
+
+@asynccontextmanager
+async def cliente() -> AsyncIterator[httpx.AsyncClient]:
+    """El pool de este event loop (se crea en el primer uso)."""
+    yield _pool_para_este_loop()
+
+
+class _Medicion:
+    """Callback ``trace`` de httpcore: marca inicio/fin de connect y headers de respuesta."""
+
+    __slots__ = ("t0", "connect_inicio", "connect_fin", "ttfb")
+
+    def __init__(self) -> None:
+        self.t0 = time.perf_counter()
+        self.connect_inicio: Optional[float] = None
+        self.connect_fin: Optional[float] = None
+        self.ttfb: Optional[float] = None
+
+    async def __call__(self, evento: str, info: dict) -> None:
+        now = time.perf_counter()
+        if evento == "connection.connect_tcp.started":
+            self.connect_inicio = now
+        elif evento in ("connection.connect_tcp.complete", "connection.start_tls.complete"):
+            self.connect_fin = now
+        elif evento.endswith("receive_response_headers.complete") and self.ttfb is None:
+            self.ttfb = now
+
+    def connect_ms(self) -> float:
+        if self.connect_inicio is None or self.connect_fin is None:
+            return 0.0
+        return (self.connect_fin - self.connect_inicio) * 1000.0
+
+    def ttfb_ms(self) -> float:
+        return ((self.ttfb or time.perf_counter()) - self.t0) * 1000.0
+
+
+def _registrar(m: _Medicion, total_ms: float, version: str, ok: bool) -> None:
+    connect_ms, ttfb_ms = m.connect_ms(), m.ttfb_ms()
+    with _stats_lock:
+        _stats["requests"] += 1
+        if not ok:
+            _stats["errors"] += 1
+        _stats["new_connections" if m.connect_inicio is not None else "reused_connections"] += 1
+        for campo, v in (("connect_ms", connect_ms), ("ttfb_ms", ttfb_ms), ("total_ms", total_ms)):
+            _stats[f"{campo}_sum"] += v
+            _stats[f"{campo}_max"] = max(_stats[f"{campo}_max"], v)
+        if version:
+            _stats["http_versions"][version] = _stats["http_versions"].get(version, 0) + 1
+    logger.info(
+        "LLM HTTP %s connect=%.1fms ttfb=%.1fms total=%.1fms (%s)",
+        version or "-", connect_ms, ttfb_ms, total_ms,
+        "conexión nueva" if m.connect_inicio is not None else "keep-alive",
+    )
+
+
+async def post_json(url: str, *, headers: dict, payload: dict, timeout: Optional[float] = None) -> httpx.Response:
+    """POST JSON por el pool, con el cuerpo de la respuesta ya leído."""
+    m = _Medicion()
+    resp: Optional[httpx.Response] = None
+    try:
+        async with cliente() as client:
+            resp = await client.post(
+                url,
+                headers=headers,
+                json=payload,
+                timeout=timeout if timeout is not None else httpx.USE_CLIENT_DEFAULT,
+                extensions={"trace": m},
+            )
+        return resp
+    finally:
+        _registrar(
+            m,
+            (time.perf_counter() - m.t0) * 1000.0,
+            resp.http_version if resp is not None else "",
+            resp is not None and resp.status_code < 400,
+        )
+
+
+async def stream_sse(
+    url: str, *, headers: dict, payload: dict, timeout: Optional[float] = None
+) -> AsyncIterator[str]:
+    """POST por el pool que produce el campo ``data:`` de cada evento SSE de la respuesta.
+
+    Un status >= 400 levanta ``RuntimeError`` con el cuerpo antes de producir nada.
+    """
+    m = _Medicion()
+    version = ""
+    ok = False
+    try:
+        async with cliente() as client:
+            async with client.stream(
+                "POST",
+                url,
+                headers=headers,
+                json=payload,
+                timeout=timeout if timeout is not None else httpx.USE_CLIENT_DEFAULT,
+                extensions={"trace": m},
+            ) as resp:
+                version = resp.http_version
+                if resp.status_code >= 400:
+                    cuerpo = (await resp.aread()).decode("utf-8", "replace")
+                    raise RuntimeError(f"HTTP {resp.status_code}: {cuerpo}")
+                async for linea in resp.aiter_lines():
+                    if linea.startswith("data:"):
+                        yield linea[5:].strip()
+                ok = True
+    finally:
+        _registrar(m, (time.perf_counter() - m.t0) * 1000.0, version, ok)
+
+
+def http_stats() -> dict[str, Any]:
+    """Totales y promedios de connect / TTFB / total (ms) de este worker."""
+    with _stats_lock:
+        s = dict(_stats, http_versions=dict(_stats["http_versions"]))
+    n = s["requests"]
+    for campo in ("connect_ms", "ttfb_ms", "total_ms"):
+        s[f"{campo}_avg"] = round(s.pop(f"{campo}_sum") / n, 2) if n else 0.0
+        s[f"{campo}_max"] = round(s[f"{campo}_max"], 2)
+    s["http2"] = settings.LLM_HTTP2 and _h2_disponible
+    with _lock:
+        s["pools"] = len(_pools)
+    return s
+
+
+def reset_http_stats() -> None:
+    _reset_stats()
@@ -8,6 +8,9 @@ import logging
 from typing import Any, Dict, List, Optional
 
 from app.core.config import settings
+from app.services.ai import circuit_breaker
+from app.services.ai.completion_cache import cache_llm, call_site_actual, clave, completion_cache
+from app.services.ai.rate_governor import estimar_tokens, reservar_llamada, tokens_usados
 
 logger = logging.getLogger(__name__)
 
@@ -57,20 +60,57 @@ class LLMService:
         temperature: float = _DEFAULT_TEMP,
         max_tokens: int = _DEFAULT_TOKENS,
     ) -> str:
-        """Genera texto libre."""
+        """Genera texto libre.
+
+        Dentro de ``with cache_llm("<call site>")`` la respuesta se sirve/guarda en
+        el caché de completions (ver ``completion_cache``).
+        """
+        call_site = call_site_actual()
+        if call_site:
+            return await completion_cache.obtener_o_llamar(
+                call_site,
+                clave(model, prompt, temperature, max_tokens, system),
+                lambda: self._completar(prompt, system, model, temperature, max_tokens),
+                es_cacheable=lambda texto: bool(texto and texto.strip()),
+            )
+        return await self._completar(prompt, system, model, temperature, max_tokens)
+
+    async def _completar(
+        self,
+        prompt: str,
+        system: str,
+        model: str,
+        temperature: float,
+        max_tokens: int,
+    ) -> str:
         messages: List[Dict[str, str]] = []
         if system:
             messages.append({"role": "system", "content": system})
         messages.append({"role": "user", "content": prompt})
 
         async def _call(m: str, mt: int) -> str:
-            resp = await self._client.chat.completions.create(
-                model=m,
-                messages=messages,
-                temperature=temperature,
-                max_tokens=mt,
+            return await circuit_breaker.llamar(
+                m,
+                lambda modelo, reserva: _call_modelo(modelo, mt, reserva),
+                reservar=lambda modelo: reservar_llamada(modelo, f"{system}\n{prompt}", mt),
             )
-            return resp.choices[0].message.content or ""
+
+        async def _call_modelo(m: str, mt: int, reserva) -> str:
+            resp = None
+            try:
+                resp = await self._client.chat.completions.create(
+                    model=m,
+                    messages=messages,
+                    temperature=temperature,
+                    max_tokens=mt,
+                )
+                return resp.choices[0].message.content or ""
+            finally:
+                # Con error o cancelación (el perdedor de un hedge) solo se cuenta el prompt.
+                if reserva is not None:
+                    reserva.ajustar(
+                        tokens_usados(resp) if resp is not None else estimar_tokens(f"{system}\n{prompt}")
+                    )
 
         try:
             return await _call(model, max_tokens)
@@ -135,12 +175,13 @@ class LLMService:
             f"Clasifica el mensaje del usuario en UNA de estas categorías: {opciones_str}. "
             "Responde SOLO con el nombre exacto de la categoría, sin explicación."
         )
-        resultado = await self.completar(
-            prompt=mensaje,
-            system=system,
-            temperature=0.0,
-            max_tokens=32,
-        )
+        with cache_llm("analizar_intencion"):
+            resultado = await self.completar(
+                prompt=mensaje,
+                system=system,
+                temperature=0.0,
+                max_tokens=32,
+            )
         resultado = resultado.strip().lower()
         for op in opciones:
             if op.lower() in resultado:
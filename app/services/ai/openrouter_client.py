@@ -1,7 +1,12 @@
+import json
 import logging
+from contextlib import aclosing
 import httpx
 from types import SimpleNamespace
 
+from app.core.config import settings
+from app.services.ai import http_pool
+
 logger = logging.getLogger(__name__)
 
 # Mapeo de modelos desde nombres de Groq/OpenAI a nombres de OpenRouter
@@ -17,8 +22,10 @@ class OpenRouterClient:
     """
     Clase cliente compatible con la interfaz mínima de AsyncGroq para OpenRouter.
     """
-    def __init__(self, api_key: str, timeout: float = 180.0, **kwargs):
+    def __init__(self, api_key: str, timeout: float = 180.0, base_url: str = None, **kwargs):
         self.api_key = api_key
+        # OPENROUTER_BASE_URL permite apuntar a un servidor LLM falso local (tests / carga).
+        self.base_url = (base_url or settings.OPENROUTER_BASE_URL).rstrip("/")
         # En caso de que se pase un objeto httpx.Timeout
         if isinstance(timeout, httpx.Timeout):
             self.timeout = timeout.read or 180.0
@@ -41,6 +48,7 @@ class OpenRouterCompletions:
         messages: list,
         max_tokens: int = None,
         temperature: float = None,
+        stream: bool = False,
         **kwargs
     ):
         # Mapear modelo
@@ -66,28 +74,64 @@ class OpenRouterCompletions:
             "X-Title": "CaloFit App",
         }
 
-        async with httpx.AsyncClient() as client:
-            try:
-                resp = await client.post(
-                    "https://openrouter.ai/api/v1/chat/completions",
-                    headers=headers,
-                    json=payload,
-                    timeout=self.client.timeout
-                )
-                if resp.status_code != 200:
-                    error_msg = f"Error en OpenRouter API ({resp.status_code}): {resp.text}"
-                    logger.error(error_msg)
-                    raise RuntimeError(error_msg)
-                
-                data = resp.json()
-                content = data["choices"][0]["message"]["content"]
-                
-                # Reconstruir el objeto de respuesta esperado por el llamador
-                message_obj = SimpleNamespace(content=content)
-                choice_obj = SimpleNamespace(message=message_obj)
-                response_obj = SimpleNamespace(choices=[choice_obj])
-                return response_obj
-                
-            except Exception as e:
-                logger.error(f"Excepción llamando a OpenRouter: {e}")
-                raise e
+        if stream:
+            # Igual que AsyncGroq(stream=True): iterador async de chunks con choices[0].delta.content
+            payload["stream"] = True
+            return self._chunks(headers, payload)
+
+        try:
+            # Pool compartido con keep-alive (ver http_pool): sin TCP/TLS nuevo por turno.
+            resp = await http_pool.post_json(
+                f"{self.client.base_url}/chat/completions",
+                headers=headers,
+                payload=payload,
+                timeout=self.client.timeout,
+            )
+            if resp.status_code != 200:
+                error_msg = f"Error en OpenRouter API ({resp.status_code}): {resp.text}"
+                logger.error(error_msg)
+                raise RuntimeError(error_msg)
+
+            data = resp.json()
+            content = data["choices"][0]["message"]["content"]
+
+            # Reconstruir el objeto de respuesta esperado por el llamador
+            message_obj = SimpleNamespace(content=content)
+            choice_obj = SimpleNamespace(message=message_obj)
+            response_obj = SimpleNamespace(choices=[choice_obj])
+            return response_obj
+
+        except Exception as e:
+            logger.error(f"Excepción llamando a OpenRouter: {e}")
+            raise e
+
+    async def _chunks(self, headers: dict, payload: dict):
+        # aclosing: si el consumidor corta o hay error, el stream del pool se cierra
+        # ya (conexión devuelta) y no cuando el GC recoja el generador.
+        try:
+            async with aclosing(http_pool.stream_sse(
+                f"{self.client.base_url}/chat/completions",
+                headers=headers,
+                payload=payload,
+                timeout=self.client.timeout,
+            )) as eventos:
+                fin = False
+                async for data in eventos:
+                    # Tras [DONE] se deja terminar la respuesta: stream_sse la cuenta como ok.
+                    if fin or data == "[DONE]":
+                        fin = True
+                        continue
+                    try:
+                        evento = json.loads(data)
+                    except ValueError:
+                        continue
+                    if "error" in evento:
+                        raise RuntimeError(f"Error en OpenRouter API (stream): {evento['error']}")
+                    choices = [
+                        SimpleNamespace(delta=SimpleNamespace(content=(c.get("delta") or {}).get("content")))
+                        for c in evento.get("choices") or []
+                    ]
+                    yield SimpleNamespace(choices=choices)
+        except Exception as e:
+            logger.error(f"Excepción en streaming de OpenRouter: {e}")
+            raise e
@@ -0,0 +1,331 @@
+"""
+Gobernador de cuota del LLM: token buckets RPM/TPM por modelo y cola por prioridad.
+
+``IAService._llamar_groq`` y ``LLMService.completar`` solo se enteraban del
+límite de Groq al recibir un 429, y entonces caían en cascada a modelos de
+fallback: en hora punta del gimnasio eso era una tormenta de requests fallidos y
+respuestas degradadas. Ahora cada llamada reserva cupo antes de salir:
+
+- Por modelo hay dos buckets que se rellenan continuamente: requests/min y
+  tokens/min (``LIMITES_GROQ``, sobreescribibles con ``LLM_GOVERNOR_LIMITS``).
+  Se reservan ``tokens estimados del prompt + max_tokens``; cuando la respuesta
+  trae ``usage`` se devuelve la diferencia con lo realmente consumido.
+- Si no hay cupo, la llamada espera en una cola por modelo ordenada por
+  prioridad (``INTERACTIVO`` < ``NORMAL`` < ``BACKGROUND`` < ``BATCH``) y FIFO
+  dentro de la misma prioridad. La prioridad se fija con
+  ``with prioridad_llm(Prioridad.BACKGROUND):`` (por defecto, interactivo).
+- Si la espera estimada supera el máximo de la prioridad se levanta
+  ``PresupuestoAgotado``, cuyo mensaje contiene ``rate_limit``: los llamadores
+  lo tratan igual que un 429 y pasan a su modelo de fallback (otro bucket) sin
+  haber gastado un request.
+- Multi-worker: con ``LLM_GOVERNOR_WORKERS=N`` cada worker se queda con 1/N del
+  presupuesto, así la suma de todos respeta el límite de la cuenta.
+
+Es thread-safe y sirve a varios event loops (el resolvedor de alimentos corre
+``asyncio.run`` en hilos del threadpool). ``governor_stats()`` expone
+profundidad de cola, esperas y rechazos por modelo (/admin/runtime/metrics).
+"""
+from __future__ import annotations
+
+import asyncio
+import heapq
+import itertools
+import json
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from enum import IntEnum
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# (requests/min, tokens/min) del plan de Groq usado en producción.
+LIMITES_GROQ: Dict[str, Tuple[int, int]] = {
+    "groq/compound-mini": (30, 70_000),
+    "openai/gpt-oss-20b": (30, 8_000),
+    "openai/gpt-oss-120b": (30, 8_000),
+    "llama-3.3-70b-versatile": (30, 12_000),
+    "llama-3.1-8b-instant": (30, 6_000),
+}
+_LIMITE_DEFAULT: Tuple[int, int] = (30, 6_000)
+
+
+class Prioridad(IntEnum):
+    INTERACTIVO = 0  # chat del usuario esperando respuesta
+    NORMAL = 1
+    BACKGROUND = 2   # tasks en segundo plano (p. ej. _analizar_salud_background)
+    BATCH = 3        # scripts / backfills
+
+
+class PresupuestoAgotado(RuntimeError):
+    """La espera por cupo superaría el máximo permitido para la prioridad."""
+
+
+_prioridad: ContextVar[Prioridad] = ContextVar("calofit_llm_prioridad", default=Prioridad.INTERACTIVO)
+
+
+@contextmanager
+def prioridad_llm(prioridad: Prioridad) -> Iterator[None]:
+    """Las llamadas al LLM hechas dentro del bloque se encolan con ``prioridad``."""
+    token = _prioridad.set(prioridad)
+    try:
+        yield
+    finally:
+        _prioridad.reset(token)
+
+
+def fijar_prioridad(prioridad: Prioridad) -> None:
+    """Fija la prioridad para el resto de la task actual (cada task tiene su copia del contexto)."""
+    _prioridad.set(prioridad)
+
+
+def prioridad_actual() -> Prioridad:
+    return _prioridad.get()
+
+
+def estimar_tokens(texto: str) -> int:
+    """Tokens aproximados de un prompt (misma heurística que ``_llamar_groq``: 1.3 por palabra)."""
+    return int(len(texto.split()) * 1.3) + 1
+
+
+def _max_espera(prioridad: Prioridad) -> float:
+    if prioridad <= Prioridad.NORMAL:
+        return settings.LLM_GOVERNOR_MAX_WAIT_SEC
+    return settings.LLM_GOVERNOR_MAX_WAIT_BACKGROUND_SEC
+
+
+class _Espera:
+    __slots__ = ("prioridad", "seq", "tokens", "loop", "evento")
+
+    def __init__(self, prioridad: Prioridad, seq: int, tokens: int) -> None:
+        self.prioridad = prioridad
+        self.seq = seq
+        self.tokens = tokens
+        self.loop = asyncio.get_running_loop()
+        self.evento = asyncio.Event()
+
+    def __lt__(self, other: "_Espera") -> bool:
+        return (self.prioridad, self.seq) < (other.prioridad, other.seq)
+
+    def despertar(self) -> None:
+        try:
+            self.loop.call_soon_threadsafe(self.evento.set)
+        except RuntimeError:
+            pass  # loop cerrado: el waiter ya no existe
+
+
+class _Bucket:
+    """Buckets RPM + TPM de un modelo y su cola de espera."""
+
+    def __init__(self, rpm: float, tpm: float) -> None:
+        self.rpm = rpm
+        self.tpm = tpm
+        self.req = rpm
+        self.tok = tpm
+        self.ts = time.monotonic()
+        self.cola: list[_Espera] = []
+        self.stats = {
+            "requests": 0, "waited": 0, "rejected": 0,
+            "wait_ms_sum": 0.0, "wait_ms_max": 0.0, "queue_max": 0,
+            "tokens_reserved": 0, "tokens_refunded": 0,
+        }
+
+    def _rellenar(self, now: float) -> None:
+        dt = now - self.ts
+        if dt > 0:
+            self.req = min(self.rpm, self.req + dt * self.rpm / 60.0)
+            self.tok = min(self.tpm, self.tok + dt * self.tpm / 60.0)
+            self.ts = now
+
+    def espera_para(self, tokens: int, now: float) -> float:
+        """Segundos hasta que haya cupo para 1 request de ``tokens`` (0 si ya hay)."""
+        self._rellenar(now)
+        tokens = min(tokens, self.tpm)  # un prompt mayor que el bucket entero pasa con el bucket lleno
+        falta_req = max(0.0, 1.0 - self.req)
+        falta_tok = max(0.0, tokens - self.tok)
+        return max(falta_req * 60.0 / self.rpm, falta_tok * 60.0 / self.tpm)
+
+    def consumir(self, tokens: int) -> None:
+        self.req -= 1.0
+        self.tok -= min(tokens, self.tpm)
+        self.stats["requests"] += 1
+        self.stats["tokens_reserved"] += tokens
+
+
+class Reserva:
+    """Cupo tomado para una llamada; ``ajustar(real)`` devuelve los tokens no usados."""
+
+    __slots__ = ("_governor", "modelo", "tokens", "espera_ms")
+
+    def __init__(self, governor: "RateGovernor", modelo: str, tokens: int, espera_ms: float) -> None:
+        self._governor = governor
+        self.modelo = modelo
+        self.tokens = tokens
+        self.espera_ms = espera_ms
+
+    def ajustar(self, tokens_reales: Optional[int]) -> None:
+        if tokens_reales is None or tokens_reales >= self.tokens:
+            return
+        self._governor._devolver(self.modelo, self.tokens - tokens_reales)
+        self.tokens = tokens_reales
+
+
+class RateGovernor:
+    """Token buckets por modelo, compartidos por todos los hilos y loops del proceso."""
+
+    def __init__(self, limites: Optional[Dict[str, Tuple[int, int]]] = None, workers: int = 1) -> None:
+        self._limites = dict(limites if limites is not None else LIMITES_GROQ)
+        self._workers = max(1, int(workers))
+        self._lock = threading.Lock()
+        self._buckets: Dict[str, _Bucket] = {}
+        self._seq = itertools.count()
+
+    def _bucket(self, modelo: str) -> _Bucket:
+        b = self._buckets.get(modelo)
+        if b is None:
+            rpm, tpm = self._limites.get(modelo, _LIMITE_DEFAULT)
+            b = self._buckets[modelo] = _Bucket(rpm / self._workers, tpm / self._workers)
+        return b
+
+    async def reservar(
+        self,
+        modelo: str,
+        tokens: int,
+        prioridad: Optional[Prioridad] = None,
+        max_espera: Optional[float] = None,
+    ) -> Reserva:
+        """Espera (por prioridad) hasta tener cupo para una llamada de ``tokens`` a ``modelo``."""
+        prioridad = prioridad_actual() if prioridad is None else prioridad
+        max_espera = _max_espera(prioridad) if max_espera is None else max_espera
+        t0 = time.monotonic()
+        with self._lock:
+            b = self._bucket(modelo)
+            if not b.cola and b.espera_para(tokens, t0) <= 0:
+                b.consumir(tokens)
+                return Reserva(self, modelo, tokens, 0.0)
+            espera = self._estimar_espera(b, tokens, prioridad, t0)
+            if espera > max_espera:
+                b.stats["rejected"] += 1
+                raise PresupuestoAgotado(
+                    f"rate_limit local: sin cupo para {modelo} "
+                    f"(espera estimada {espera:.1f}s > {max_espera:.1f}s)"
+                )
+            w = _Espera(prioridad, next(self._seq), tokens)
+            heapq.heappush(b.cola, w)
+            b.stats["queue_max"] = max(b.stats["queue_max"], len(b.cola))
+
+        obtenida = False
+        try:
+            while True:
+                with self._lock:
+                    now = time.monotonic()
+                    timeout: Optional[float] = None
+                    if b.cola[0] is w:
+                        timeout = b.espera_para(tokens, now)
+                        if timeout <= 0:
+                            heapq.heappop(b.cola)
+                            b.consumir(tokens)
+                            obtenida = True
+                            espera_ms = (now - t0) * 1000.0
+                            b.stats["waited"] += 1
+                            b.stats["wait_ms_sum"] += espera_ms
+                            b.stats["wait_ms_max"] = max(b.stats["wait_ms_max"], espera_ms)
+                            siguiente = b.cola[0] if b.cola else None
+                            break
+                w.evento.clear()
+                try:
+                    await asyncio.wait_for(w.evento.wait(), timeout)
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            if not obtenida:
+                with self._lock:
+                    if w in b.cola:
+                        b.cola.remove(w)
+                        heapq.heapify(b.cola)
+                    siguiente = b.cola[0] if b.cola else None
+                if siguiente is not None:
+                    siguiente.despertar()
+        if siguiente is not None:
+            siguiente.despertar()
+        if espera_ms > 1000:
+            logger.info("LLM governor: %s esperó %.0fms (prioridad %s)", modelo, espera_ms, prioridad.name)
+        return Reserva(self, modelo, tokens, espera_ms)
+
+    def _estimar_espera(self, b: _Bucket, tokens: int, prioridad: Prioridad, now: float) -> float:
+        """Espera aproximada: cupo para los que ya están delante más el propio."""
+        delante = [w for w in b.cola if w.prioridad <= prioridad]
+        req = len(delante) + 1
+        tok = sum(min(w.tokens, b.tpm) for w in delante) + min(tokens, b.tpm)
+        b._rellenar(now)
+        falta_req = max(0.0, req - b.req)
+        falta_tok = max(0.0, tok - b.tok)
+        return max(falta_req * 60.0 / b.rpm, falta_tok * 60.0 / b.tpm)
+
+    def _devolver(self, modelo: str, tokens: int) -> None:
+        with self._lock:
+            b = self._bucket(modelo)
+            b._rellenar(time.monotonic())
+            b.tok = min(b.tpm, b.tok + tokens)
+            b.stats["tokens_refunded"] += tokens
+            siguiente = b.cola[0] if b.cola else None
+        if siguiente is not None:
+            siguiente.despertar()
+
+    def stats(self) -> Dict[str, Any]:
+        """Por modelo: cupo disponible, profundidad de cola y esperas (ms)."""
+        out: Dict[str, Any] = {}
+        with self._lock:
+            now = time.monotonic()
+            for modelo, b in self._buckets.items():
+                b._rellenar(now)
+                s = dict(b.stats)
+                n = s["waited"]
+                s["wait_ms_avg"] = round(s.pop("wait_ms_sum") / n, 2) if n else 0.0
+                s["wait_ms_max"] = round(s["wait_ms_max"], 2)
+                s["queue_depth"] = len(b.cola)
+                s["queue_by_priority"] = {
+                    p.name.lower(): sum(1 for w in b.cola if w.prioridad == p)
+                    for p in Prioridad if any(w.prioridad == p for w in b.cola)
+                }
+                s["available"] = {"requests": round(b.req, 2), "tokens": int(b.tok)}
+                s["limits"] = {"rpm": b.rpm, "tpm": b.tpm}
+                out[modelo] = s
+        return out
+
+
+def _limites_configurados() -> Dict[str, Tuple[int, int]]:
+    limites = dict(LIMITES_GROQ)
+    raw = settings.LLM_GOVERNOR_LIMITS
+    if raw:
+        try:
+            for modelo, (rpm, tpm) in json.loads(raw).items():
+                limites[modelo] = (int(rpm), int(tpm))
+        except (ValueError, TypeError) as e:
+            logger.warning("LLM_GOVERNOR_LIMITS inválido (%s): se usan los límites por defecto", e)
+    return limites
+
+
+governor = RateGovernor(_limites_configurados(), workers=settings.LLM_GOVERNOR_WORKERS)
+
+
+async def reservar_llamada(modelo: str, prompt: str, max_tokens: Optional[int]) -> Optional[Reserva]:
+    """Reserva cupo para una completion; None si el gobernador está deshabilitado."""
+    if not settings.LLM_GOVERNOR_ENABLED:
+        return None
+    return await governor.reservar(modelo, estimar_tokens(prompt) + int(max_tokens or 0))
+
+
+def tokens_usados(respuesta: Any) -> Optional[int]:
+    """``usage.total_tokens`` de una respuesta del SDK, si viene."""
+    usage = getattr(respuesta, "usage", None)
+    total = getattr(usage, "total_tokens", None)
+    return int(total) if isinstance(total, (int, float)) else None
+
+
+def governor_stats() -> Dict[str, Any]:
+    return {"enabled": settings.LLM_GOVERNOR_ENABLED, "models": governor.stats()}
@@ -0,0 +1,108 @@
+"""
+Streaming de tokens del LLM hacia el cliente (Server-Sent Events).
+
+``POST /asistente/consultar`` espera a que ``AsistenteService.consultar`` tenga
+la respuesta completa y post-procesada. La variante ``/consultar/stream`` corre
+la misma consulta, pero reenvía los tokens de la llamada que produce el texto
+visible a medida que llegan; la tarjeta final (macros, secciones, texto ya
+post-procesado) sale como evento terminal.
+
+Sin cambiar firmas (los tests reemplazan ``_llamar_groq`` con mocks de firma
+fija) el canal se pasa por contextvars:
+
+- El endpoint abre ``with emitir_a(sink):`` antes de crear la task de la
+  consulta (la task copia el contexto).
+- Cada call site cuyo texto ve el usuario marca su llamada con
+  ``with respuesta_visible():``. Las demás llamadas (clasificación, extracción,
+  validaciones) no emiten nada aunque haya un sink activo.
+- ``IAService._llamar_groq_sin_cache`` pide ``stream=True`` al proveedor solo
+  si ``sink_actual()`` no es None.
+
+Los tokens son un borrador: el post-proceso (limpieza de markdown, reintentos,
+recortes) puede cambiar el texto, y el evento ``final`` trae el definitivo. Si
+un fallback de modelo vuelve a generar, se emite ``reset`` para que el cliente
+descarte lo ya mostrado.
+"""
+from __future__ import annotations
+
+import asyncio
+import json
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, AsyncIterator, Iterator, Optional
+
+_sink: ContextVar[Optional["TokenSink"]] = ContextVar("calofit_llm_token_sink", default=None)
+_visible: ContextVar[bool] = ContextVar("calofit_llm_respuesta_visible", default=False)
+
+
+class TokenSink:
+    """Cola de eventos ``(nombre, data)`` de una consulta en streaming."""
+
+    def __init__(self) -> None:
+        self._cola: asyncio.Queue[tuple[str, Any]] = asyncio.Queue()
+        self.t0 = time.perf_counter()
+        self.ttft_ms: Optional[float] = None
+        self.tokens = 0
+        self._emitidos = False
+
+    def token(self, texto: str) -> None:
+        if not texto:
+            return
+        if self.ttft_ms is None:
+            self.ttft_ms = (time.perf_counter() - self.t0) * 1000.0
+        self.tokens += 1
+        self._emitidos = True
+        self._cola.put_nowait(("token", {"t": texto}))
+
+    def reiniciar(self) -> None:
+        """Nueva generación visible: el borrador anterior deja de valer."""
+        if self._emitidos:
+            self._emitidos = False
+            self._cola.put_nowait(("reset", {}))
+
+    async def eventos(self, task: asyncio.Future) -> AsyncIterator[tuple[str, Any]]:
+        """Eventos pendientes hasta que ``task`` termine y la cola quede vacía."""
+        while True:
+            getter = asyncio.ensure_future(self._cola.get())
+            done, _ = await asyncio.wait({getter, task}, return_when=asyncio.FIRST_COMPLETED)
+            if getter in done:
+                yield getter.result()
+                continue
+            getter.cancel()
+            while not self._cola.empty():
+                yield self._cola.get_nowait()
+            return
+
+
+@contextmanager
+def emitir_a(sink: TokenSink) -> Iterator[TokenSink]:
+    """Las llamadas visibles hechas dentro del bloque (o de tasks creadas en él) emiten a ``sink``."""
+    token = _sink.set(sink)
+    try:
+        yield sink
+    finally:
+        _sink.reset(token)
+
+
+@contextmanager
+def respuesta_visible() -> Iterator[None]:
+    """Marca la llamada al LLM cuyo texto llega al usuario."""
+    token = _visible.set(True)
+    try:
+        yield
+    finally:
+        _visible.reset(token)
+
+
+def sink_actual() -> Optional[TokenSink]:
+    """Sink de la consulta actual si la llamada en curso es visible, o None."""
+    if not _visible.get():
+        return None
+    return _sink.get()
+
+
+def evento_sse(nombre: str, data: Any) -> str:
+    """Serializa un evento en formato ``text/event-stream``."""
+    payload = json.dumps(data, ensure_ascii=False, default=str)
+    return f"event: {nombre}\ndata: {payload}\n\n"
@@ -7,8 +7,9 @@ from typing import List, Optional, Sequence, Tuple
 from sqlalchemy.orm import Session
 
 from app.models.alimento import Alimento
-from app.models.alimento_alias import AlimentoAlias
 from app.models.alimento_unidad import AlimentoUnidad
+from app.services.alimentos_resolucion import resolver_alimento_id as _resolver_alimento_id
+from app.services.catalogo_alimentos import consultar_catalogo
 from app.utils.alimento_nombre import norm_alimento_key
 
 
@@ -60,6 +61,21 @@ _RX_CLEAN_PREFIX = re.compile(
 _DEFAULT_LATA_G_ATUN = 155.0
 
 
+def _unidad_por_nombre(unidades, u2: str):
+    """
+    Reglas exactas de ``_unidad_bd`` (nombre, singular) sobre las unidades del
+    catálogo. La de subcadena queda en la BD: una unidad exacta agregada después
+    de la última recarga le ganaría.
+    """
+    def _igual(nombre_unit: str):
+        return next((x for x in unidades if (x.nombre or "").lower() == nombre_unit), None)
+
+    row = _igual(u2)
+    if not row and u2.endswith("s") and len(u2) > 3:
+        row = _igual(u2[:-1])
+    return row
+
+
 @dataclass(frozen=True)
 class MacroPorcion:
     kcal: float
@@ -80,32 +96,21 @@ class AlimentosDBService:
         self.db = db
 
     def resolver_alimento_id(self, nombre: str) -> Optional[int]:
-        n = _norm(nombre)
-        if not n:
-            return None
-        a = (
-            self.db.query(Alimento)
-            .filter(Alimento.nombre_normalizado == n)
-            .first()
-        )
-        if a:
-            return int(a.id)
-        al = (
-            self.db.query(AlimentoAlias)
-            .filter(AlimentoAlias.alias_normalizado == n)
-            .first()
-        )
-        if al:
-            return int(al.alimento_id)
-        # Fallback simple por LIKE (prefijo) para UX; mantener determinista.
-        like = f"{n}%"
-        a2 = (
-            self.db.query(Alimento)
-            .filter(Alimento.nombre_normalizado.like(like))
-            .order_by(Alimento.id.asc())
-            .first()
-        )
-        return int(a2.id) if a2 else None
+        # Nombre exacto → alias exacto → primer prefijo por id, en una sola query.
+        return _resolver_alimento_id(self.db, _norm(nombre))
+
+    def _id_por_nombre(self, nombre_normalizado: str) -> Optional[int]:
+        alimento_id = consultar_catalogo(lambda cat: cat.id_por_nombre(nombre_normalizado))
+        if alimento_id is not None:
+            return alimento_id
+        row = self.db.query(Alimento.id).filter(Alimento.nombre_normalizado == nombre_normalizado).first()
+        return int(row.id) if row else None
+
+    def _alimento(self, alimento_id: int) -> Optional[Alimento]:
+        a = consultar_catalogo(lambda cat: cat.alimento(alimento_id))
+        if a is not None:
+            return a
+        return self.db.query(Alimento).filter(Alimento.id == alimento_id).first()
 
     def _resolver_alimento_id_lata(self, nombre: str) -> Optional[int]:
         """
@@ -116,27 +121,15 @@ class AlimentosDBService:
         if not n:
             return None
         if "aceite" in n or "aceit" in n:
-            row = (
-                self.db.query(Alimento)
-                .filter(Alimento.nombre_normalizado == _norm("pescado atún, enlatado en aceite"))
-                .first()
-            )
-            return int(row.id) if row else self.resolver_alimento_id(nombre)
+            aid = self._id_por_nombre(_norm("pescado atún, enlatado en aceite"))
+            return aid if aid else self.resolver_alimento_id(nombre)
         if "agua" in n and "aceite" not in n:
-            row = (
-                self.db.query(Alimento)
-                .filter(Alimento.nombre_normalizado == _norm("pescado atún, enlatado en agua"))
-                .first()
-            )
-            return int(row.id) if row else self.resolver_alimento_id(nombre)
+            aid = self._id_por_nombre(_norm("pescado atún, enlatado en agua"))
+            return aid if aid else self.resolver_alimento_id(nombre)
         if n in ("atun", "tuna") or re.search(r"\batun\b|\btuna\b", n):
-            row = (
-                self.db.query(Alimento)
-                .filter(Alimento.nombre_normalizado == _norm("pescado atún, enlatado en agua"))
-                .first()
-            )
-            if row:
-                return int(row.id)
+            aid = self._id_por_nombre(_norm("pescado atún, enlatado en agua"))
+            if aid:
+                return aid
         return self.resolver_alimento_id(nombre)
 
     def _gramos_unidad_o_default_lata(self, alimento_id: int, unit: str) -> Optional[float]:
@@ -146,7 +139,7 @@ class AlimentosDBService:
         u = _norm(unit)
         if u not in ("lata", "latas"):
             return None
-        a = self.db.query(Alimento).filter(Alimento.id == alimento_id).first()
+        a = self._alimento(alimento_id)
         if not a:
             return None
         an = (a.nombre or "").lower()
@@ -171,6 +164,17 @@ class AlimentosDBService:
         }
         u2 = alias_unit.get(u, u)
 
+        # Alimento en el catálogo en memoria: sus unidades también (sin round trips).
+        # Un miss va a la BD (subcadenas, o una unidad agregada después de la recarga).
+        unidades = consultar_catalogo(lambda cat: cat.unidades(alimento_id) if alimento_id in cat else None)
+        row = _unidad_por_nombre(unidades, u2) if unidades else None
+        if row is None:
+            row = self._unidad_bd(alimento_id, u2)
+        if row and row.gramos and row.gramos > 0:
+            return float(row.gramos)
+        return None
+
+    def _unidad_bd(self, alimento_id: int, u2: str):
         def _buscar(nombre_unit: str):
             return (
                 self.db.query(AlimentoUnidad)
@@ -192,14 +196,12 @@ class AlimentosDBService:
                 .order_by(AlimentoUnidad.id.asc())
                 .first()
             )
-        if row and row.gramos and row.gramos > 0:
-            return float(row.gramos)
-        return None
+        return row
 
     def macros_por_gramos(self, alimento_id: int, gramos: float) -> Optional[MacroPorcion]:
         if gramos <= 0:
             return None
-        a = self.db.query(Alimento).filter(Alimento.id == alimento_id).first()
+        a = self._alimento(alimento_id)
         if not a:
             return None
         factor = float(gramos) / 100.0
@@ -0,0 +1,135 @@
+"""
+Resolución nombre → alimento en una sola query rankeada.
+
+Las cascadas de ``NLPFoodExtractor._buscar_alimento_bd`` (hasta 5 queries
+secuenciales) y ``AlimentosDBService.resolver_alimento_id`` (hasta 3) se
+expresan aquí como un ``UNION ALL`` de ramas: cada regla de la cascada es una
+rama con su propio ``ORDER BY ... LIMIT 1`` y un rango fijo; la query externa
+se queda con la fila de menor rango. Misma precedencia, un solo round trip.
+
+Los ``LIKE '%x%'`` usan los índices GIN de trigramas de
+``alimentos.nombre_normalizado`` y ``alimento_alias.alias_normalizado``
+(migración ``011_trgm_alimentos``) en lugar de un seq scan de ``alimentos``.
+
+Empates dentro de una regla: se desempata por ``id`` ascendente (la cascada
+anterior dejaba el orden al plan de Postgres).
+
+Antes de la query se consulta el catálogo en memoria
+(app/services/catalogo_alimentos.py) con las reglas de nombre y alias exactos;
+el resto de casos llega a Postgres.
+
+``tests/unit/test_alimentos_resolucion.py`` contrasta las tres versiones
+(cascada anterior, query rankeada y catálogo) sobre un corpus de nombres reales.
+"""
+from __future__ import annotations
+
+from typing import Optional
+
+from sqlalchemy import and_, func, literal_column, select, union_all
+from sqlalchemy.orm import Session
+
+from app.models.alimento import Alimento
+from app.models.alimento_alias import AlimentoAlias
+from app.services.catalogo_alimentos import CatalogoAlimentos, consultar_catalogo
+
+# Palabras que no cuentan como "clave" en la regla multi-palabra del extractor.
+_CONECTORES = frozenset({"de", "con", "del", "las", "los"})
+
+
+def _claves(n: str) -> list[str]:
+    return [w for w in n.split() if len(w) >= 4 and w not in _CONECTORES]
+
+
+def _rama(rango: int, columna_id, filtro, *orden):
+    """Mejor candidato de una regla: (alimento_id, rango), como máximo una fila."""
+    return (
+        select(columna_id.label("alimento_id"), literal_column(str(rango)).label("rango"))
+        .where(filtro)
+        .order_by(*orden, columna_id)
+        .limit(1)
+        .subquery()
+    )
+
+
+def _candidatos(ramas: list):
+    return union_all(*(select(r) for r in ramas)).subquery()
+
+
+def _alias_exacto(rango: int, n: str):
+    return _rama(rango, AlimentoAlias.alimento_id, AlimentoAlias.alias_normalizado == n, AlimentoAlias.id)
+
+
+def consulta_alimento_nlp(n: str):
+    """
+    Reglas de ``_buscar_alimento_bd`` (``n`` ya normalizado), por precedencia:
+      1. nombre exacto
+      2. alias exacto
+      3. nombre que empieza por la palabra completa (``"n %"``), el más corto
+      4. con ≥2 palabras clave: nombre que las contiene todas, el más corto
+      5. nombre que contiene ``n``; primero los que empiezan por ``n``, luego el más corto
+    """
+    nombre = Alimento.nombre_normalizado
+    largo = func.length(nombre)
+    ramas = [
+        _rama(1, Alimento.id, nombre == n),
+        _alias_exacto(2, n),
+        _rama(3, Alimento.id, nombre.like(f"{n} %"), largo.asc()),
+    ]
+    claves = _claves(n)
+    if len(claves) >= 2:
+        ramas.append(_rama(4, Alimento.id, and_(*(nombre.like(f"%{w}%") for w in claves)), largo.asc()))
+    ramas.append(_rama(5, Alimento.id, nombre.like(f"%{n}%"), nombre.like(f"{n}%").desc(), largo.asc()))
+    candidatos = _candidatos(ramas)
+    return (
+        select(Alimento)
+        .join(candidatos, candidatos.c.alimento_id == Alimento.id)
+        .order_by(candidatos.c.rango)
+        .limit(1)
+    )
+
+
+def consulta_alimento_id(n: str):
+    """
+    Reglas de ``AlimentosDBService.resolver_alimento_id``: nombre exacto, alias
+    exacto y, por último, el primer nombre (por id) que empieza por ``n``.
+    """
+    nombre = Alimento.nombre_normalizado
+    candidatos = _candidatos([
+        _rama(1, Alimento.id, nombre == n),
+        _alias_exacto(2, n),
+        _rama(3, Alimento.id, nombre.like(f"{n}%")),
+    ])
+    return select(candidatos.c.alimento_id).order_by(candidatos.c.rango).limit(1)
+
+
+# ── Catálogo en memoria: solo las reglas de máxima precedencia ───────────────
+
+def id_exacto_o_alias(cat: CatalogoAlimentos, n: str) -> Optional[int]:
+    """
+    Reglas 1 y 2 de ambas consultas (nombre exacto, alias exacto) sobre el
+    snapshot. Las de prefijo o subcadena no se contestan desde el catálogo: una
+    fila exacta insertada después de la última recarga les ganaría en la BD.
+    """
+    alimento_id = cat.id_por_nombre(n)
+    return alimento_id if alimento_id is not None else cat.id_por_alias_normalizado(n)
+
+
+def buscar_alimento(db: Session, n: str) -> Optional[Alimento]:
+    """Alimento para la clave normalizada ``n`` con la precedencia del extractor NLP."""
+    if not n:
+        return None
+    alimento = consultar_catalogo(lambda cat: cat.alimento(id_exacto_o_alias(cat, n)))
+    if alimento is not None:
+        return alimento
+    return db.execute(consulta_alimento_nlp(n)).scalars().first()
+
+
+def resolver_alimento_id(db: Session, n: str) -> Optional[int]:
+    """Id del alimento para la clave normalizada ``n`` (precedencia de AlimentosDBService)."""
+    if not n:
+        return None
+    alimento_id = consultar_catalogo(lambda cat: id_exacto_o_alias(cat, n))
+    if alimento_id is not None:
+        return alimento_id
+    alimento_id = db.execute(consulta_alimento_id(n)).scalar()
+    return int(alimento_id) if alimento_id is not None else None
@@ -9,6 +9,7 @@ from typing import Any, Optional
 
 import re
 from app.services.parsing.contexto_respuesta import inferir_forzar_por_mensaje_usuario
+from app.services.parsing.keyword_matcher import PALABRA, PREFIJO, SUBCADENA, KeywordMatcher
 
 RECOMENDAR_NUTRICION = "recomendar_nutricion"
 REGISTRAR_NUTRICION = "registrar_nutricion"
@@ -49,6 +50,265 @@ MODOS_ASISTENTE = frozenset(
 )
 
 
+# ── Tablas de palabras clave de las guardas de routing ───────────────────────
+# Se compilan una vez en ``_GUARDAS_MODO`` / ``_GUARDAS_MODO_NORM`` (una pasada
+# por mensaje en vez de un ``any(k in m ...)`` por tabla).
+_CTX_COMIDA: tuple[str, ...] = (
+    "comí",
+    "comi ",
+    "desayun",
+    "almorz",
+    "almuerz",
+    " cen",
+    "cena",
+    "pollo",
+    "arroz",
+    "ensalada",
+    "sopa",
+    "pasta",
+    "snack",
+    "comida",
+    "tomé",
+    "tome ",
+    "bebí",
+    "bebi ",
+    "me tomé",
+    "me tome",
+    "me bebí",
+    "gaseosa",
+    "limonada",
+    "chicha",
+    "jugo",
+    "refresco",
+    "cerveza",
+    "hamburguesa",
+    "lenteja",
+    "piqueo",
+    "manzana",
+    "platano",
+    "plátano",
+    "leche",
+    "avena",
+    "huevo",
+    "pan",
+    "fruta",
+    "carne",
+    "pescado",
+    "ceviche",
+    "queso",
+    "yogur",
+    "metí",
+    "meti",
+    "zampé",
+    "zampe",
+    "chupé",
+    "chupe",
+    "probé",
+    "probe",
+)
+
+_CTX_EJERCICIO: tuple[str, ...] = (
+    "ejercicio",
+    "entren",
+    "gym",
+    "gimnasio",
+    "rutina",
+    "pecho",
+    "pector",
+    "espalda",
+    "bicep",
+    "bícep",
+    "tricep",
+    "trícep",
+    "hombro",
+    "hombros",
+    "gluteo",
+    "glúteo",
+    "abdomen",
+    "abdominal",
+    "sentadill",
+    "press ",
+    "pesas",
+    "pierna",
+    "piernas",
+    "cardio",
+    "series",
+    "repes",
+    "flexion",
+    "flexión",
+    "cuádriceps",
+    "cuadriceps",
+    "isquio",
+    "isquios",
+    "femoral",
+    "gemelo",
+    "gemelos",
+    "pantorrilla",
+    "vasto",
+    "dorsal",
+    "trapecio",
+    "deltoides",
+    "core",
+)
+
+# Verbos de consumo pasado (con límite de palabra: "darme comidas" no es "me comi").
+_VERBOS_LOG: tuple[str, ...] = (
+    "desayuné", "desayune", "almorcé", "almorce", "cené", "cene",
+    "comí", "comi ", "tomé ", "tome ", "bebí ", "bebi ",
+    "he desayunado", "he almorzado", "he cenado", "he comido", "he tomado",
+    # Frases más naturales
+    "acabo de comer", "acabo de tomar", "acabo de beber",
+    "me comi", "me tomé", "me bebí", "me comí",
+    "termine de comer", "terminé de comer",
+    "ya comi", "ya comí", "ya almorcé", "ya desayuné",
+    # "me hice un desayuno/almuerzo" — construcción coloquial de preparación+consumo
+    "me hice un", "me hice una",
+    # Lenguaje informal / jerga
+    "me metí", "me meti", "metí", "meti",
+    "me zampé", "me zampe", "zampé", "zampe",
+    "me chupé", "me chupe", "chupé", "chupe",
+    "piqueo", "pique", "piqué", "piqueando",
+    "probé", "probe", "me probé", "me probe",
+)
+
+_REGISTRO: tuple[str, ...] = (
+    "registr",
+    "anoté",
+    "anote",
+    "apunta",
+    "ya comí",
+    "ya comi",
+    "acabo de comer",
+    "acabo de entren",
+    "terminé de entren",
+    "termine de entren",
+)
+
+_REC_NUT: tuple[str, ...] = (
+    "qué como", "que como", "qué comer", "que comer",
+    "ideas para comer", "sugerencias de comida",
+    "opciones de almuerzo", "opciones de desayuno", "opciones de cena",
+    "recetas", "receta ", "platos para",
+    # Verbos de alimentación en infinitivo → intención de comer
+    "almorzar", "desayunar", "merendar",
+    # Frases de recomendación de comida
+    "para el almuerzo", "para la cena", "para el desayuno", "para la merienda",
+    "qué recomiendas", "que recomiendas", "dame ideas", "dame opciones",
+    "qué me recomiendas", "que me recomiendas",
+    # Frases naturales de hambre/recomendación
+    "tengo hambre", "tengo antojo", "qué puedo comer", "que puedo comer",
+    "me recomiendas comer", "me da hambre", "quiero comer algo",
+    "qué me como", "que me como", "qué hay para comer", "que hay para comer",
+    "busco algo para comer", "dame algo de comer",
+)
+
+# NOTA: "hice " (genérico) no está — matcheaba "me hice un desayuno".
+_EJERCICIO_REGISTRADO: tuple[str, ...] = (
+    # Formas genéricas verificadas
+    "hice cardio", "hice pesas", "hice gym", "hice ejercicio",
+    "hice sentadillas", "hice flexiones", "hice abdominales",
+    # Ejercicios específicos de gym (evita "hice " solo que matchea "me hice un desayuno")
+    "hice press", "hice curl", "hice remo", "hice jalon", "hice jalón",
+    "hice dominadas", "hice fondos", "hice burpees", "hice plancha",
+    "hice peso muerto", "hice sentadilla", "hice extensiones",
+    "tiré press", "tire press", "tiré sentadillas",
+    "fui al gym", "fui al gimnasio", "entrené", "entrenei", "entrenei ",
+    "realicé", "realize", "corrí", "corri ", "caminé", "camine ",
+    "nadé", "nade ", "pedalié", "pedalee",
+    "terminé de entrenar", "termine de entrenar",
+    "acabo de entrenar", "acabo de hacer ejercicio",
+    "sali a correr", "salí a correr", "sali a trotar", "salí a trotar",
+    "sali a caminar", "salí a caminar", "sali a entrenar", "salí a entrenar",
+    "correr durante", "trotar durante", "caminar durante",
+)
+
+# Preguntas de permiso/capacidad sobre actividad física ("puedo realizar un trote").
+_PERMISO_EJ_SYNC: tuple[str, ...] = (
+    "puedo realizar", "puedo trotar", "puedo correr", "puedo nadar",
+    "puedo caminar", "puedo jugar", "puedo bailar", "puedo practicar",
+    "puedo ir a ", "se puede trotar", "se puede correr", "se puede nadar",
+    "es bueno trotar", "es bueno correr", "es bueno nadar", "es bueno caminar",
+    "es malo trotar", "es malo correr",
+)
+
+_REC_EX: tuple[str, ...] = (
+    "qué ejercicio",
+    "que ejercicio",
+    "ejercicios puedo hacer",
+    "ejercicios para",
+    "ejercicio para",
+    "para pecho",
+    "pecho ",
+    "rutina para",
+    "rutina de",
+    "cómo entren",
+    "como entren",
+    "qué hacer en el gym",
+    "que hacer en el gym",
+    "entreno de",
+    "cuádriceps",
+    "cuadriceps",
+    "isquios",
+    "isquio",
+    "femoral",
+    "gemelos",
+    "gemelo",
+    "pantorrilla",
+    "vasto",
+    "recto femoral",
+)
+
+# Saludo marcado que en realidad trae una petición de comida/ejercicio.
+_NO_SALUDO_PURO: tuple[str, ...] = (
+    "comer", "cenar", "almorzar", "desayunar", "merendar", "comida", "cena", "almuerzo", "desayuno", "plato", "receta",
+    "ejercicio", "entren", "rutina", "pecho", "espalda", "pierna", "hombro", "cardio", "gym", "gimnasio",
+    "dime", "puedo", "quiero", "sugier", "recomiend", "dame", "verdura", "hacer",
+    "correr", "corrí", "corri", "trotar", "troté", "trote", "caminar", "caminé", "camine",
+    "nadar", "nadé", "nade", "bicicleta", "salí", "sali", "pesa", "pesas", "pesos", "comi", "comí", "tomar", "tome", "tomé"
+)
+
+# Tablas sobre el texto sin tildes (_mn).
+_MODALES: tuple[str, ...] = (
+    "puedo ", "se puede ", "podria ", "podria ",
+    "es bueno ", "es malo ", "es buena ", "es mala ",
+    "seria bueno ", "es recomendable ", "es posible ", "conviene ",
+)
+_RECETA_O_TECNICA: tuple[str, ...] = (
+    "como se hace", "como se prepara", "como hacer", "receta de", "como cocinar",
+    "ingredientes de", "preparacion de", "tecnica de", "como realizar",
+    "como ejecutar", "pasos para", "forma correcta", "preparar "
+)
+_CONSUMO_CLARO_NORM: tuple[str, ...] = (
+    "comi", "desayune", "almorce", "cene", "bebi", "me jale",
+    "me comi", "me tome", "acabo de comer", "acabo de tomar", "acabo de beber",
+    "termine de comer", "he desayunado", "he almorzado", "he cenado",
+    "he comido", "he bebido",
+    "me meti", "meti", "me zampe", "zampe", "chupe", "me chupe", "piqueo", "probe", "tome"
+)
+
+# Mensaje en minúsculas (con tildes).
+_GUARDAS_MODO = KeywordMatcher({
+    "imperativo_registro": (PREFIJO, _VERBOS_IMPERATIVOS_REGISTRO),
+    "no_saludo_puro": (SUBCADENA, _NO_SALUDO_PURO),
+    "comida": (SUBCADENA, _CTX_COMIDA),
+    "ejercicio": (SUBCADENA, _CTX_EJERCICIO),
+    "verbo_log": (PALABRA, _VERBOS_LOG),
+    "registro": (SUBCADENA, _REGISTRO),
+    "rec_nut": (SUBCADENA, _REC_NUT),
+    "ejercicio_registrado": (SUBCADENA, _EJERCICIO_REGISTRADO),
+    "permiso_ejercicio": (SUBCADENA, _PERMISO_EJ_SYNC),
+    "rec_ex": (SUBCADENA, _REC_EX),
+})
+# Mensaje en minúsculas y sin tildes.
+_GUARDAS_MODO_NORM = KeywordMatcher({
+    # "puedo ..." al inicio o " puedo ..." en medio del mensaje.
+    "modal_inicio": (PREFIJO, _MODALES),
+    "modal": (SUBCADENA, tuple(f" {p}" for p in _MODALES)),
+    "receta_tecnica": (SUBCADENA, _RECETA_O_TECNICA),
+    "consumo_claro": (PALABRA, _CONSUMO_CLARO_NORM),
+})
+
+
 def intent_prioritario_para_parser(intent_ia: Optional[str], modo_funcion: Optional[str]) -> str:
     """
     Si el servidor ya clasificó el mensaje en uno de los 4 modos, el parseo usa un intent
@@ -76,136 +336,21 @@ def detectar_modo_funcion(mensaje: str, es_saludo: bool) -> str:
     if len(m) < 2:
         return OTRO
 
+    c = _GUARDAS_MODO.buscar(m)
+
     # ── Prioridad máxima: verbo imperativo de registro ────────────────────────
     # "Regístrame el ceviche de caballa" → REGISTRAR_NUTRICION inmediato (sin LLM)
-    if any(m.startswith(v) for v in _VERBOS_IMPERATIVOS_REGISTRO):
+    if c.tiene("imperativo_registro"):
         return REGISTRAR_NUTRICION
 
-    comida_ctx = (
-        "comí",
-        "comi ",
-        "desayun",
-        "almorz",
-        "almuerz",
-        " cen",
-        "cena",
-        "pollo",
-        "arroz",
-        "ensalada",
-        "sopa",
-        "pasta",
-        "snack",
-        "comida",
-        "tomé",
-        "tome ",
-        "bebí",
-        "bebi ",
-        "me tomé",
-        "me tome",
-        "me bebí",
-        "gaseosa",
-        "limonada",
-        "chicha",
-        "jugo",
-        "refresco",
-        "cerveza",
-        "hamburguesa",
-        "lenteja",
-        "piqueo",
-        "manzana",
-        "platano",
-        "plátano",
-        "leche",
-        "avena",
-        "huevo",
-        "pan",
-        "fruta",
-        "carne",
-        "pescado",
-        "ceviche",
-        "queso",
-        "yogur",
-        "metí",
-        "meti",
-        "zampé",
-        "zampe",
-        "chupé",
-        "chupe",
-        "probé",
-        "probe",
-    )
-    ej_ctx = (
-        "ejercicio",
-        "entren",
-        "gym",
-        "gimnasio",
-        "rutina",
-        "pecho",
-        "pector",
-        "espalda",
-        "bicep",
-        "bícep",
-        "tricep",
-        "trícep",
-        "hombro",
-        "hombros",
-        "gluteo",
-        "glúteo",
-        "abdomen",
-        "abdominal",
-        "sentadill",
-        "press ",
-        "pesas",
-        "pierna",
-        "piernas",
-        "cardio",
-        "series",
-        "repes",
-        "flexion",
-        "flexión",
-        "cuádriceps",
-        "cuadriceps",
-        "isquio",
-        "isquios",
-        "femoral",
-        "gemelo",
-        "gemelos",
-        "pantorrilla",
-        "vasto",
-        "dorsal",
-        "trapecio",
-        "deltoides",
-        "core",
-    )
-    fc = sum(1 for x in comida_ctx if x in m)
-    fe = sum(1 for x in ej_ctx if x in m)
+    fc = c.cuenta("comida")
+    fe = c.cuenta("ejercicio")
 
     # Narración diaria de comidas: "Hoy desayuné X, almorcé Y, cené Z"
     # El LLM clasifica estos mensajes como recomendar_nutricion por error.
     # Señales: adverbio temporal + verbo pasado + alimento → siempre registro.
-    _VERBOS_LOG = (
-        "desayuné", "desayune", "almorcé", "almorce", "cené", "cene",
-        "comí", "comi ", "tomé ", "tome ", "bebí ", "bebi ",
-        "he desayunado", "he almorzado", "he cenado", "he comido", "he tomado",
-        # Frases más naturales
-        "acabo de comer", "acabo de tomar", "acabo de beber",
-        "me comi", "me tomé", "me bebí", "me comí",
-        "termine de comer", "terminé de comer",
-        "ya comi", "ya comí", "ya almorcé", "ya desayuné",
-        # "me hice un desayuno/almuerzo" — construcción coloquial de preparación+consumo
-        "me hice un", "me hice una",
-        # Lenguaje informal / jerga
-        "me metí", "me meti", "metí", "meti",
-        "me zampé", "me zampe", "zampé", "zampe",
-        "me chupé", "me chupe", "chupé", "chupe",
-        "piqueo", "pique", "piqué", "piqueando",
-        "probé", "probe", "me probé", "me probe",
-    )
     # Usamos límites de palabra (\b) para evitar coincidencias parciales (ej. darme comidas -> me comi)
-    _verbos_log_count = sum(
-        1 for v in _VERBOS_LOG
-        if m.startswith(v) or re.search(rf"\b{re.escape(v.strip())}\b", m)
-    )
+    _verbos_log_count = c.cuenta("verbo_log")
     # Una de estas condiciones basta:
     # a) ≥2 verbos de consumo pasado en el mismo mensaje (resumen del día)
     # b) adverbio temporal + ≥1 verbo de consumo pasado + alimento
@@ -213,21 +358,8 @@ def detectar_modo_funcion(mensaje: str, es_saludo: bool) -> str:
     if _verbos_log_count >= 1 and fc > 0 and "?" not in m:
         return REGISTRAR_NUTRICION
 
-    registro = any(
-        x in m
-        for x in (
-            "registr",
-            "anoté",
-            "anote",
-            "apunta",
-            "ya comí",
-            "ya comi",
-            "acabo de comer",
-            "acabo de entren",
-            "terminé de entren",
-            "termine de entren",
-        )
-    )
+    registro = c.tiene("registro")
+    rec_nut = c.tiene("rec_nut")
     if registro:
         if fc > fe:
             return REGISTRAR_NUTRICION
@@ -235,92 +367,17 @@ def detectar_modo_funcion(mensaje: str, es_saludo: bool) -> str:
             return REGISTRAR_EJERCICIO
         return OTRO
 
-    rec_nut = any(
-        x in m
-        for x in (
-            "qué como", "que como", "qué comer", "que comer",
-            "ideas para comer", "sugerencias de comida",
-            "opciones de almuerzo", "opciones de desayuno", "opciones de cena",
-            "recetas", "receta ", "platos para",
-            # Verbos de alimentación en infinitivo → intención de comer
-            "almorzar", "desayunar", "merendar",
-            # Frases de recomendación de comida
-            "para el almuerzo", "para la cena", "para el desayuno", "para la merienda",
-            "qué recomiendas", "que recomiendas", "dame ideas", "dame opciones",
-            "qué me recomiendas", "que me recomiendas",
-            # Frases naturales de hambre/recomendación
-            "tengo hambre", "tengo antojo", "qué puedo comer", "que puedo comer",
-            "me recomiendas comer", "me da hambre", "quiero comer algo",
-            "qué me como", "que me como", "qué hay para comer", "que hay para comer",
-            "busco algo para comer", "dame algo de comer",
-        )
-    )
-    # Ejercicio registrado: "entrené X", "realicé X", etc.
-    # NOTA: "hice " (genérico) fue eliminado — matcheaba "me hice un desayuno".
-    # Usar solo formas específicas de ejercicio.
-    # NOTA 2: si el mensaje tiene intención clara de comida (rec_nut), no registrar ejercicio
+    # Ejercicio registrado: "entrené X", "realicé X", etc. (solo formas específicas).
+    # NOTA: si el mensaje tiene intención clara de comida (rec_nut), no registrar ejercicio
     # aunque mencione "entrené" de forma incidental ("ya entrené, qué almuerzo?").
-    _EJERCICIO_REGISTRADO = (
-        # Formas genéricas verificadas
-        "hice cardio", "hice pesas", "hice gym", "hice ejercicio",
-        "hice sentadillas", "hice flexiones", "hice abdominales",
-        # Ejercicios específicos de gym (evita "hice " solo que matchea "me hice un desayuno")
-        "hice press", "hice curl", "hice remo", "hice jalon", "hice jalón",
-        "hice dominadas", "hice fondos", "hice burpees", "hice plancha",
-        "hice peso muerto", "hice sentadilla", "hice extensiones",
-        "tiré press", "tire press", "tiré sentadillas",
-        "fui al gym", "fui al gimnasio", "entrené", "entrenei", "entrenei ",
-        "realicé", "realize", "corrí", "corri ", "caminé", "camine ",
-        "nadé", "nade ", "pedalié", "pedalee",
-        "terminé de entrenar", "termine de entrenar",
-        "acabo de entrenar", "acabo de hacer ejercicio",
-        "sali a correr", "salí a correr", "sali a trotar", "salí a trotar",
-        "sali a caminar", "salí a caminar", "sali a entrenar", "salí a entrenar",
-        "correr durante", "trotar durante", "caminar durante",
-    )
-    if any(x in m for x in _EJERCICIO_REGISTRADO) and "?" not in m and fe >= fc and not rec_nut:
+    if c.tiene("ejercicio_registrado") and "?" not in m and fe >= fc and not rec_nut:
         return REGISTRAR_EJERCICIO
     # Preguntas de permiso/capacidad sobre actividad física → OTRO informativo
     # "puedo realizar un trote", "se puede trotar", "es bueno correr" — NO son registros
-    _PERMISO_EJ_SYNC = (
-        "puedo realizar", "puedo trotar", "puedo correr", "puedo nadar",
-        "puedo caminar", "puedo jugar", "puedo bailar", "puedo practicar",
-        "puedo ir a ", "se puede trotar", "se puede correr", "se puede nadar",
-        "es bueno trotar", "es bueno correr", "es bueno nadar", "es bueno caminar",
-        "es malo trotar", "es malo correr",
-    )
-    if any(p in m for p in _PERMISO_EJ_SYNC):
+    if c.tiene("permiso_ejercicio"):
         return OTRO
 
-    rec_ex = any(
-        x in m
-        for x in (
-            "qué ejercicio",
-            "que ejercicio",
-            "ejercicios puedo hacer",
-            "ejercicios para",
-            "ejercicio para",
-            "para pecho",
-            "pecho ",
-            "rutina para",
-            "rutina de",
-            "cómo entren",
-            "como entren",
-            "qué hacer en el gym",
-            "que hacer en el gym",
-            "entreno de",
-            "cuádriceps",
-            "cuadriceps",
-            "isquios",
-            "isquio",
-            "femoral",
-            "gemelos",
-            "gemelo",
-            "pantorrilla",
-            "vasto",
-            "recto femoral",
-        )
-    )
+    rec_ex = c.tiene("rec_ex")
     if rec_ex and not rec_nut:
         return RECOMENDAR_EJERCICIO
     if rec_nut and not rec_ex:
@@ -329,14 +386,9 @@ def detectar_modo_funcion(mensaje: str, es_saludo: bool) -> str:
         return OTRO
 
     # Si contiene intenciones claras de recetas o técnicas, forzar a OTRO
-    _RECETA_O_TECNICA = (
-        "como se hace", "como se prepara", "como hacer", "receta de", "como cocinar",
-        "ingredientes de", "preparacion de", "tecnica de", "como realizar",
-        "como ejecutar", "pasos para", "forma correcta", "preparar "
-    )
     import unicodedata as _ud_rec
-    _mn_rec = "".join(c for c in _ud_rec.normalize("NFD", m) if _ud_rec.category(c) != "Mn")
-    if any(k in _mn_rec for k in _RECETA_O_TECNICA):
+    _mn_rec = "".join(ch for ch in _ud_rec.normalize("NFD", m) if _ud_rec.category(ch) != "Mn")
+    if _GUARDAS_MODO_NORM.buscar(_mn_rec).tiene("receta_tecnica"):
         return OTRO
 
     inf = inferir_forzar_por_mensaje_usuario(mensaje)
@@ -349,30 +401,25 @@ def detectar_modo_funcion(mensaje: str, es_saludo: bool) -> str:
 
 async def resolver_modo_funcion(ia: Any, mensaje: str, es_saludo: bool, historial: list = None) -> str:
     """
-    Clasificación de intención: 4 pre-checks infalibles + LLM 70B para todo lo demás.
+    Clasificación de intención: 4 pre-checks infalibles, clasificador local si está
+    seguro (``clasificador_intencion``) y LLM 70B para todo lo demás.
     Reemplaza los ~200 pre-checks anteriores por reglas mínimas y máxima confianza en el LLM.
     """
     _m = (mensaje or "").lower().strip()
     if len(_m) < 2:
         return OTRO
 
+    c = _GUARDAS_MODO.buscar(_m)
+
     # Si viene marcado como saludo, validar que sea un saludo puro (sin peticiones de comida/ejercicio)
-    if es_saludo:
-        _NO_SALUDO_PURO = (
-            "comer", "cenar", "almorzar", "desayunar", "merendar", "comida", "cena", "almuerzo", "desayuno", "plato", "receta",
-            "ejercicio", "entren", "rutina", "pecho", "espalda", "pierna", "hombro", "cardio", "gym", "gimnasio",
-            "dime", "puedo", "quiero", "sugier", "recomiend", "dame", "verdura", "hacer",
-            "correr", "corrí", "corri", "trotar", "troté", "trote", "caminar", "caminé", "camine",
-            "nadar", "nadé", "nade", "bicicleta", "salí", "sali", "pesa", "pesas", "pesos", "comi", "comí", "tomar", "tome", "tomé"
-        )
-        if any(k in _m for k in _NO_SALUDO_PURO):
-            es_saludo = False
+    if es_saludo and c.tiene("no_saludo_puro"):
+        es_saludo = False
 
     if es_saludo:
         return OTRO
 
     # ── Pre-check 1: verbos imperativos de registro ──────────────────────────────
-    if any(_m.startswith(v) for v in _VERBOS_IMPERATIVOS_REGISTRO):
+    if c.tiene("imperativo_registro"):
         return REGISTRAR_NUTRICION
 
     # ── Pre-check 1b: cálculo nutricional puntual ────────────────────────────────
@@ -381,7 +428,8 @@ async def resolver_modo_funcion(ia: Any, mensaje: str, es_saludo: bool, historia
     # RECOMENDAR_NUTRICION. Se mantiene como pre-check porque SIEMPRE devuelve
     # el camino seguro (OTRO sigue razonando con el LLM, no fuerza una tarjeta).
     import unicodedata as _ud
-    _mn = "".join(c for c in _ud.normalize("NFD", _m) if _ud.category(c) != "Mn")
+    _mn = "".join(ch for ch in _ud.normalize("NFD", _m) if _ud.category(ch) != "Mn")
+    cn = _GUARDAS_MODO_NORM.buscar(_mn)
     _RX_CALCULO_NUTRICIONAL = re.compile(
         r"\bcuant[oa]s?\b.{0,15}\b(proteina|proteína|calorias|calorías|"
         r"carbohidratos|grasas|macros)\b"
@@ -407,11 +455,6 @@ async def resolver_modo_funcion(ia: Any, mensaje: str, es_saludo: bool, historia
     # real; el LLM solo clasifica bien ambos casos (el simple y el compuesto).
 
     # ── Pre-check 2: modal de permiso = SIEMPRE pregunta, nunca registro ─────────
-    _MODALES = (
-        "puedo ", "se puede ", "podria ", "podria ",
-        "es bueno ", "es malo ", "es buena ", "es mala ",
-        "seria bueno ", "es recomendable ", "es posible ", "conviene ",
-    )
     # Excepción: "qué (ejercicios/comida) puedo hacer/comer/almorzar/..." es
     # una pregunta ABIERTA pidiendo una recomendación (ejercicio o comida) —
     # no es una pregunta de permiso sobre un alimento/acción específica ya
@@ -423,34 +466,16 @@ async def resolver_modo_funcion(ia: Any, mensaje: str, es_saludo: bool, historia
     _es_pregunta_abierta_que_hacer = bool(re.search(
         r"\bque\s+(?:\w+\s+){0,2}puedo\s+(hacer|comer|almorzar|cenar|desayunar|merendar)\b", _mn
     ))
-    if not _es_pregunta_abierta_que_hacer and any(
-        _mn.startswith(p) or f" {p}" in _mn for p in _MODALES
-    ):
+    if not _es_pregunta_abierta_que_hacer and (cn.tiene("modal_inicio") or cn.tiene("modal")):
         return OTRO
 
     # ── Pre-check 2b: recetas y técnicas = SIEMPRE conversacional (OTRO) ─────────
-    _RECETA_O_TECNICA = (
-        "como se hace", "como se prepara", "como hacer", "receta de", "como cocinar",
-        "ingredientes de", "preparacion de", "tecnica de", "como realizar",
-        "como ejecutar", "pasos para", "forma correcta", "preparar "
-    )
-    if any(k in _mn for k in _RECETA_O_TECNICA):
+    if cn.tiene("receta_tecnica"):
         return OTRO
 
     # ── Pre-check 3: verbos de consumo pasado inequívocos ────────────────────────
     # Usamos límites de palabra (\b) y el texto normalizado _mn para evitar coincidencias parciales
-    _CONSUMO_CLARO_NORM = (
-        "comi", "desayune", "almorce", "cene", "bebi", "me jale",
-        "me comi", "me tome", "acabo de comer", "acabo de tomar", "acabo de beber",
-        "termine de comer", "he desayunado", "he almorzado", "he cenado",
-        "he comido", "he bebido",
-        "me meti", "meti", "me zampe", "zampe", "chupe", "me chupe", "piqueo", "probe", "tome"
-    )
-    _tiene_consumo = any(
-        _mn.startswith(v) or re.search(rf"\b{re.escape(v.strip())}\b", _mn)
-        for v in _CONSUMO_CLARO_NORM
-    )
-    if _tiene_consumo and "?" not in _m:
+    if cn.tiene("consumo_claro") and "?" not in _m:
         return REGISTRAR_NUTRICION
 
     # NOTA: "hice press/sentadilla/...", "terminé de entrenar", y el patrón
@@ -470,6 +495,13 @@ async def resolver_modo_funcion(ia: Any, mensaje: str, es_saludo: bool, historia
     # El LLM solo clasifica bien tanto los casos simples ("hice sentadillas
     # 3x10", "sentadillas 4x12 con 80kg") como los compuestos/adversariales.
 
+    # ── Clasificador local (TF-IDF): si está seguro, se ahorra el round-trip ─────
+    from app.services.asistente.clasificador_intencion import clasificar_local
+
+    modo_local = clasificar_local(mensaje, historial)
+    if modo_local:
+        return modo_local
+
     # ── LLM 70B: clasificación definitiva para todo lo demás ─────────────────────
     try:
         modo_ia = await ia.clasificar_modo_asistente(mensaje, historial=historial)
@@ -225,11 +225,52 @@ def _parse_ing_gramos(texto: str) -> Optional[Tuple[str, float]]:
     return None
 
 
+def _mas_parecido(nombre_norm: str, candidatos, texto):
+    """
+    Candidato con mayor similitud a ``nombre_norm`` si supera el umbral (0.75;
+    0.85 si empieza por una palabra de categoría que el usuario no dijo).
+    """
+    if not candidatos:
+        return None
+    best = max(
+        candidatos,
+        key=lambda c: difflib.SequenceMatcher(None, nombre_norm, texto(c) or "").ratio(),
+    )
+    _ratio_best = difflib.SequenceMatcher(None, nombre_norm, texto(best) or "").ratio()
+    _first_cand = (texto(best) or "").split()[0] if texto(best) else ""
+    _umbral_best = (
+        0.85
+        if _first_cand in _PRIMERAS_PALABRAS_CATEGORIA
+        and _first_cand not in nombre_norm.split()
+        else 0.75
+    )
+    return best if _ratio_best >= _umbral_best else None
+
+
+def _palabras_contiene(nombre_norm: str) -> list[str]:
+    return [w for w in nombre_norm.split() if len(w) >= 5 and w not in _ING_STOPWORDS]
+
+
+def _resolver_en_catalogo(cat, nombre_norm: str):
+    """
+    Reglas exactas de ``_resolver_alimento_en_bd`` (nombre, alias) sobre el
+    catálogo en memoria (id o None). Las de "contiene" van a la BD: una fila
+    nueva que el snapshot aún no tiene podría ser más parecida.
+    """
+    alimento_id = cat.id_por_nombre(nombre_norm)
+    return alimento_id if alimento_id is not None else cat.id_por_alias(nombre_norm)
+
+
 def _resolver_alimento_en_bd(db: Session, nombre_norm: str):
     """Busca un alimento por nombre o alias en la BD. Devuelve objeto Alimento o None."""
     from app.models.alimento import Alimento
     from app.models.alimento_alias import AlimentoAlias
+    from app.services.catalogo_alimentos import consultar_catalogo
 
+    # Catálogo en memoria primero: un hit no consulta la BD.
+    a = consultar_catalogo(lambda cat: cat.alimento(_resolver_en_catalogo(cat, nombre_norm)))
+    if a is not None:
+        return a
     # Exact match
     a = db.query(Alimento).filter(Alimento.nombre_normalizado == nombre_norm).first()
     if a:
@@ -239,58 +280,25 @@ def _resolver_alimento_en_bd(db: Session, nombre_norm: str):
     if alias:
         return db.query(Alimento).filter(Alimento.id == alias.alimento_id).first()
     # Contains — prefiere el candidato con mayor similitud al nombre buscado
-    words = [w for w in nombre_norm.split() if len(w) >= 5 and w not in _ING_STOPWORDS]
-    for w in words:
+    for w in _palabras_contiene(nombre_norm):
         candidates = (
             db.query(Alimento)
             .filter(Alimento.nombre_normalizado.like(f"%{w}%"))
             .limit(15)
             .all()
         )
-        if candidates:
-            best = max(
-                candidates,
-                key=lambda c: difflib.SequenceMatcher(
-                    None, nombre_norm, c.nombre_normalizado or ""
-                ).ratio(),
-            )
-            _ratio_best = difflib.SequenceMatcher(
-                None, nombre_norm, best.nombre_normalizado or ""
-            ).ratio()
-            _first_cand = (best.nombre_normalizado or "").split()[0] if best.nombre_normalizado else ""
-            _umbral_best = (
-                0.85
-                if _first_cand in _PRIMERAS_PALABRAS_CATEGORIA
-                and _first_cand not in nombre_norm.split()
-                else 0.75
-            )
-            if _ratio_best >= _umbral_best:
-                return best
+        best = _mas_parecido(nombre_norm, candidates, lambda c: c.nombre_normalizado)
+        if best is not None:
+            return best
         alias_candidates = (
             db.query(AlimentoAlias)
             .filter(AlimentoAlias.alias_normalizado.like(f"%{w}%"))
             .limit(10)
             .all()
         )
-        if alias_candidates:
-            best_alias = max(
-                alias_candidates,
-                key=lambda al: difflib.SequenceMatcher(
-                    None, nombre_norm, al.alias_normalizado or ""
-                ).ratio(),
-            )
-            _ratio_alias = difflib.SequenceMatcher(
-                None, nombre_norm, best_alias.alias_normalizado or ""
-            ).ratio()
-            _first_alias = (best_alias.alias_normalizado or "").split()[0] if best_alias.alias_normalizado else ""
-            _umbral_alias = (
-                0.85
-                if _first_alias in _PRIMERAS_PALABRAS_CATEGORIA
-                and _first_alias not in nombre_norm.split()
-                else 0.75
-            )
-            if _ratio_alias >= _umbral_alias:
-                return db.query(Alimento).filter(Alimento.id == best_alias.alimento_id).first()
+        best_alias = _mas_parecido(nombre_norm, alias_candidates, lambda al: al.alias_normalizado)
+        if best_alias is not None:
+            return db.query(Alimento).filter(Alimento.id == best_alias.alimento_id).first()
     return None
 
 
@@ -303,15 +303,17 @@ def _get_porcion_estandar(alimento_nombre: str, db: Session) -> tuple[float, str
     Busca primero en alimento_unidades, luego usa fallback por categoría.
     """
     from app.models.alimento import Alimento
+    # Regla de "contiene": va siempre a la BD (el catálogo en memoria solo contesta
+    # nombres y alias exactos). Primer alimento y primera unidad por id.
     alim = db.query(Alimento).filter(
         Alimento.nombre_normalizado.ilike(f"%{alimento_nombre[:30].lower()}%")
-    ).first()
+    ).order_by(Alimento.id).first()
 
     if alim:
         from app.models.alimento_unidad import AlimentoUnidad
         unidad = db.query(AlimentoUnidad).filter(
             AlimentoUnidad.alimento_id == alim.id
-        ).first()
+        ).order_by(AlimentoUnidad.id).first()
         if unidad and unidad.gramos:
             return float(unidad.gramos), f"1 {unidad.nombre} (~{int(unidad.gramos)}g)"
 
@@ -15,6 +15,9 @@ import logging
 import re
 import unicodedata
 from datetime import datetime
+from typing import Optional
+
+from app.services.parsing.keyword_matcher import SUBCADENA, TOKEN, Coincidencias, KeywordMatcher
 
 logger = logging.getLogger(__name__)
 
@@ -51,6 +54,29 @@ def _deaccent(s: str) -> str:
     )
 
 
+# ── Guardia de saludo ─────────────────────────────────────────────────────────
+_KW_SALUDO = ("hola", "hey", "saludos", "buenas", "que tal", "qué tal",
+              "cómo estás", "como estas", "cómo te va", "como te va")
+_KW_ACCION = ("comí", "comi", "hice", "fui al", "corrí", "corri",
+              "almorcé", "almorce", "desayuné", "desayune", "cené", "cene",
+              "registra", "anota", "tomé", "tome ", "bebí", "bebi",
+              "entrené", "entrenei",
+              "correr", "trotar", "caminar", "nadar", "salí", "sali", "ejercicio", "entrenar")
+# Patrones de respuesta conversacional — NO son saludos aunque contengan "gracias"
+_KW_RESPUESTA = (
+    "bien gracias", "sí gracias", "si gracias", "ok gracias",
+    "muchas gracias", "gracias igual", "gracias por", "de nada",
+    "entendido", "ya entendí", "perfecto gracias", "claro gracias",
+    "bueno gracias", "ok", "sí", "no gracias", "ya",
+)
+# Las tres tablas en una sola pasada sobre el mensaje en minúsculas.
+_GUARDA_SALUDO = KeywordMatcher({
+    "saludo": (SUBCADENA, _KW_SALUDO),
+    "accion": (SUBCADENA, _KW_ACCION),
+    "respuesta": (SUBCADENA, _KW_RESPUESTA),
+})
+
+
 # ── Guardia off-topic ─────────────────────────────────────────────────────────
 # Señales de que el mensaje SÍ es sobre nutrición/ejercicio/salud.
 # Si el mensaje contiene alguna de estas palabras → pasa al pipeline normal.
@@ -98,10 +124,18 @@ _RESPUESTA_OFFTOPIC = (
     "¿Tienes alguna consulta sobre tu dieta o entrenamiento?"
 )
 
-def _es_offtopic(msg_norm: str) -> bool:
+# Tokens del mensaje sin tildes: bloqueo absoluto y señales de nutrición en una pasada.
+_GUARDA_TOKENS = KeywordMatcher({
+    "bloqueo_absoluto": (TOKEN, _BLOQUEO_ABSOLUTO),
+    "senal_nutricion": (TOKEN, _SEÑALES_NUTRICION),
+})
+
+
+def _es_offtopic(msg_norm: str, coincidencias: Optional[Coincidencias] = None) -> bool:
     """Devuelve True si el mensaje es claramente off-topic (sin señales nutricionales)."""
-    tokens = set(msg_norm.split())
-    if tokens & _SEÑALES_NUTRICION:
+    if coincidencias is None:
+        coincidencias = _GUARDA_TOKENS.buscar(msg_norm)
+    if coincidencias.tiene("senal_nutricion"):
         return False  # tiene señal de nutrición → on-topic
     return bool(_RE_OFFTOPIC.search(msg_norm))
 
@@ -194,9 +228,11 @@ def _resumir_para_historial(content: str, role: str) -> str:
 from sqlalchemy.orm import Session
 
 from app.core.cache import get_consulta_cached
+from app.core.config import settings
 from app.core.utils import get_peru_date
 from app.models.client import Client
 from app.models.historial import AlertaSalud, ProgresoCalorias
+from app.services.ai.rate_governor import Prioridad, fijar_prioridad
 from app.services.asistente.asistente_ejercicio import (
     es_payload_ejercicio,
     procesar_secciones_ejercicio,
@@ -224,6 +260,7 @@ from app.services.asistente.asistente_registro_comida import (
 )
 from app.services.asistente.asistente_registro_ejercicio import registro_ejercicio_handler
 from app.services.asistente.asistente_respuesta_normalize import enriquecer_respuesta_estructurada
+from app.services.asistente.tiempos_consulta import TiemposConsulta
 from app.services.ia_service import ia_engine
 from app.services.response_parser import parsear_respuesta_para_frontend
 
@@ -335,6 +372,123 @@ def _build_response(perfil, intencion, tipo_pregunta, meta, consumido, quemado,
     }
 
 
+def _perfil_cliente(db: Session, current_user) -> Optional[Client]:
+    """
+    Client del usuario autenticado, ligado a ``db``. Con token de cliente,
+    ``current_user`` ya es ese Client (get_current_user): se busca por id en el
+    identity map / PK; si no (staff u objetos de test), por email.
+    """
+    if isinstance(current_user, Client):
+        return db.get(Client, current_user.id)
+    return db.query(Client).filter(Client.email == current_user.email).first()
+
+
+def _quemadas_hoy(db: Session, client_id: int, hoy) -> float:
+    """Calorías quemadas hoy según workout_logs (fuente autoritativa, cubre todos los paths de registro)."""
+    from sqlalchemy import text as _sql_wl
+    _dialect = getattr(getattr(db, "bind", None), "dialect", None)
+    _dname = getattr(_dialect, "name", "") or ""
+    if _dname == "postgresql":
+        return float(db.execute(_sql_wl(
+            "SELECT COALESCE(SUM(calorias_quemadas), 0) FROM workout_logs "
+            "WHERE client_id = :cid "
+            "  AND (created_at AT TIME ZONE 'UTC' AT TIME ZONE 'America/Lima')::date = :hoy"
+        ), {"cid": client_id, "hoy": hoy}).scalar() or 0)
+    return float(db.execute(_sql_wl(
+        "SELECT COALESCE(SUM(calorias_quemadas), 0) FROM workout_logs "
+        "WHERE client_id = :cid AND date(created_at) = :hoy"
+    ), {"cid": client_id, "hoy": hoy}).scalar() or 0)
+
+
+def _cargar_contexto_dia(perfil, edad: int, db: Session):
+    """(plan_hoy_data, ProgresoCalorias de hoy o None, quemadas hoy). Solo lecturas."""
+    _, plan_hoy_data, _ = obtener_plan_hoy(perfil, edad, db)
+    hoy = get_peru_date()
+    prog = db.query(ProgresoCalorias).filter(
+        ProgresoCalorias.client_id == perfil.id, ProgresoCalorias.fecha == hoy
+    ).first()
+    return plan_hoy_data, prog, _quemadas_hoy(db, perfil.id, hoy)
+
+
+def _contexto_en_hilo(db: Session) -> bool:
+    """SQLite (fallback en memoria de tests/local) ata la conexión al hilo: ahí se lee en el loop."""
+    if not settings.CALOFIT_CONSULTA_CONTEXTO_EN_HILO:
+        return False
+    _dialect = getattr(getattr(db, "bind", None), "dialect", None)
+    return (getattr(_dialect, "name", "") or "") != "sqlite"
+
+
+def _respuesta_guarda(perfil, mensaje: str, msg_limpio: str, es_saludo: bool, historial: list):
+    """
+    Guardas que responden sin LLM ni modo: ``(intencion, tipo_pregunta, texto, bloqueado)``
+    o None si el mensaje sigue al pipeline normal. No tocan la BD.
+    """
+    # ── Saludo puro ("hola", sin nada más) → saludo correcto según la hora
+    # real de Perú, sin pasar por el LLM. Antes el LLM generaba saludos como
+    # "estás a punto de empezar tu día" sin saber la hora real — a las 11pm
+    # eso no tiene sentido. Solo se intercepta si NO queda contenido aparte
+    # del saludo (si dice "Hola, ¿cuánta proteína necesito?" debe seguir el
+    # flujo normal, no cortarse en un saludo).
+    if es_saludo:
+        _resto_saludo = msg_limpio
+        for _s in _KW_SALUDO:
+            _resto_saludo = _resto_saludo.replace(_s, "")
+        _resto_saludo = re.sub(r'[^\wáéíóúñ]+', '', _resto_saludo)
+        if len(_resto_saludo) <= 2:
+            from app.core.utils import get_peru_now
+            _hora_actual = get_peru_now().hour
+            if 5 <= _hora_actual < 12:
+                _saludo_hora = "Buenos días"
+            elif 12 <= _hora_actual < 19:
+                _saludo_hora = "Buenas tardes"
+            else:
+                _saludo_hora = "Buenas noches"
+            _nombre_saludo = f", {perfil.first_name}" if perfil.first_name else ""
+            return "CHAT", "OTRO", f"{_saludo_hora}{_nombre_saludo}. ¿En qué te ayudo hoy?", False
+
+    # ── Guardia anti-no-alimento (2 capas) ───────────────────────────────
+    _msg_norm = _deaccent(msg_limpio)
+    _kw_norm = _GUARDA_TOKENS.buscar(_msg_norm)
+
+    # Capa 1: bloqueo absoluto — palabras que nunca son comida (caca, veneno, etc.)
+    _item_abs = _kw_norm.primera("bloqueo_absoluto")
+
+    # Capa 2: no-alimentos + verbo explícito de ingesta (papel, madera, hierro...)
+    _item_verb = None
+    if not _item_abs and _RE_INTENTO_COMER.search(msg_limpio):
+        from app.services.nlp_food_extractor import NO_ALIMENTOS
+        _item_verb = next((t for t in _msg_norm.split() if t in NO_ALIMENTOS), None)
+
+    _item_no_comida = _item_abs or _item_verb
+    if _item_no_comida:
+        return (
+            "CHAT", "OTRO",
+            f"'{_item_no_comida.capitalize()}' no es un alimento. "
+            f"Solo puedo ayudarte con comidas y bebidas reales. "
+            f"¿Qué comida o ejercicio puedo registrar por ti?",
+            True,
+        )
+
+    # ── Guardia off-topic (Python puro, sin llamar al LLM) ───────────────
+    if not es_saludo and _es_offtopic(_msg_norm, _kw_norm):
+        return "INFO", "OTRO", _RESPUESTA_OFFTOPIC, True  # no guardar en historial BD
+
+    # ── Pre-check de seguridad COMÚN, antes de decidir el modo ───────────────
+    # Si se menciona una lesión sin especificar zona (rodilla/espalda/hombro/
+    # codo), no hay info suficiente para recomendar nada seguro — sin importar
+    # a qué modo iba a ir el mensaje (antes esto solo protegía dentro de
+    # respuesta_chat_llm, así que RECOMENDAR_EJERCICIO podía saltárselo).
+    from app.services.llm_registro import _lesion_mencionada_sin_tipo
+    if _lesion_mencionada_sin_tipo(mensaje, historial):
+        return (
+            "INFO", "OTRO",
+            "¿Qué lesión tienes exactamente? ¿Es en la rodilla, espalda, "
+            "hombro, codo u otra zona? Así te doy un consejo seguro y específico.",
+            False,
+        )
+    return None
+
+
 class AsistenteService:
     """Punto de entrada único del asistente del cliente."""
 
@@ -353,7 +507,9 @@ class AsistenteService:
         override_ia: str = None,
         consulta_id: str = None,  # confirmar card directamente desde el chat
     ):
-        perfil = db.query(Client).filter(Client.email.ilike(current_user.email)).first()
+        tiempos = TiemposConsulta()
+        with tiempos.etapa("perfil"):
+            perfil = _perfil_cliente(db, current_user)
         if not perfil:
             raise ValueError("Perfil de cliente no encontrado")
         edad = (datetime.now().year - perfil.birth_date.year) if perfil.birth_date else 25
@@ -366,146 +522,67 @@ class AsistenteService:
 
         _ctx_extra = f"\n\nCONTEXTO ADICIONAL:\n{contexto_manual}" if contexto_manual else ""
 
-        # Plan del día
-        _, plan_hoy_data, _ = obtener_plan_hoy(perfil, edad, db)
+        msg_limpio    = mensaje.lower().strip()
+        with tiempos.etapa("guardas"):
+            # Detecta saludos puros — inicio de conversación, no respuestas en medio del hilo.
+            # Regla: es saludo SI contiene keyword de apertura Y no hay verbo de acción
+            #        Y no es una respuesta de seguimiento ("bien gracias", "sí claro", "ok").
+            _kw = _GUARDA_SALUDO.buscar(msg_limpio)
+            es_saludo = (
+                not _kw.tiene("respuesta")
+                and _kw.tiene("saludo")
+                and not _kw.tiene("accion")
+            )
+            _resp_guarda = _respuesta_guarda(perfil, mensaje, msg_limpio, es_saludo, historial)
+
+        # El modo no depende del contexto de BD: se clasifica (pre-checks, modelo
+        # local o LLM) mientras el plan, el progreso y workout_logs se leen en un hilo.
+        # Si una guarda ya responde no se clasifica nada.
+        _tarea_modo = None
+        if _resp_guarda is None:
+            _tarea_modo = asyncio.create_task(tiempos.medir(
+                "modo", resolver_modo_funcion(self.ia, mensaje, es_saludo, historial=historial)
+            ))
+        try:
+            with tiempos.etapa("contexto_bd"):
+                if _contexto_en_hilo(db):
+                    plan_hoy_data, prog, quemadas_real = await asyncio.to_thread(
+                        _cargar_contexto_dia, perfil, edad, db
+                    )
+                else:
+                    plan_hoy_data, prog, quemadas_real = _cargar_contexto_dia(perfil, edad, db)
+        except BaseException:
+            if _tarea_modo is not None:
+                _tarea_modo.cancel()
+            raise
 
-        # Progreso y adherencia
-        hoy           = get_peru_date()
-        prog          = db.query(ProgresoCalorias).filter(
-            ProgresoCalorias.client_id == perfil.id, ProgresoCalorias.fecha == hoy
-        ).first()
         consumo_real  = prog.calorias_consumidas if prog else 0
-        
-        # Calorías quemadas: fuente autoritativa = workout_logs (cubre todos los paths de registro)
-        from sqlalchemy import text as _sql_wl
-        _dialect = getattr(getattr(db, "bind", None), "dialect", None)
-        _dname = getattr(_dialect, "name", "") or ""
-        if _dname == "postgresql":
-            quemadas_real = float(db.execute(_sql_wl(
-                "SELECT COALESCE(SUM(calorias_quemadas), 0) FROM workout_logs "
-                "WHERE client_id = :cid "
-                "  AND (created_at AT TIME ZONE 'UTC' AT TIME ZONE 'America/Lima')::date = :hoy"
-            ), {"cid": perfil.id, "hoy": hoy}).scalar() or 0)
-        else:
-            quemadas_real = float(db.execute(_sql_wl(
-                "SELECT COALESCE(SUM(calorias_quemadas), 0) FROM workout_logs "
-                "WHERE client_id = :cid AND date(created_at) = :hoy"
-            ), {"cid": perfil.id, "hoy": hoy}).scalar() or 0)
         calorias_meta = plan_hoy_data["calorias_dia"]
-        progreso_pct  = min(100, (consumo_real / calorias_meta) * 100) if calorias_meta > 0 else 0
-        adherencia_pct = round(progreso_pct * 0.7 + 20, 1)
-        
+
         from app.core.user_context import UserContext
         ctx = UserContext.build(perfil, consumo_real, quemadas_real, plan_hoy_data)
 
-        alerta_fuzzy  = self.ia.generar_alerta_fuzzy(adherencia_pct, progreso_pct)
-        mensaje_fuzzy = alerta_fuzzy.get("mensaje", "")
-        msg_limpio    = mensaje.lower().strip()
-        # Detecta saludos puros — inicio de conversación, no respuestas en medio del hilo.
-        # Regla: es saludo SI contiene keyword de apertura Y no hay verbo de acción
-        #        Y no es una respuesta de seguimiento ("bien gracias", "sí claro", "ok").
-        _KW_SALUDO  = ("hola", "hey", "saludos", "buenas", "que tal", "qué tal",
-                       "cómo estás", "como estas", "cómo te va", "como te va")
-        _KW_ACCION  = ("comí", "comi", "hice", "fui al", "corrí", "corri",
-                       "almorcé", "almorce", "desayuné", "desayune", "cené", "cene",
-                       "registra", "anota", "tomé", "tome ", "bebí", "bebi",
-                       "entrené", "entrenei",
-                       "correr", "trotar", "caminar", "nadar", "salí", "sali", "ejercicio", "entrenar")
-        # Patrones de respuesta conversacional — NO son saludos aunque contengan "gracias"
-        _KW_RESPUESTA = (
-            "bien gracias", "sí gracias", "si gracias", "ok gracias",
-            "muchas gracias", "gracias igual", "gracias por", "de nada",
-            "entendido", "ya entendí", "perfecto gracias", "claro gracias",
-            "bueno gracias", "ok", "sí", "no gracias", "ya",
-        )
-        _es_respuesta = any(r in msg_limpio for r in _KW_RESPUESTA)
-        es_saludo = (
-            not _es_respuesta
-            and any(s in msg_limpio for s in _KW_SALUDO)
-            and not any(kw in msg_limpio for kw in _KW_ACCION)
-        )
+        # Después de leer el contexto: la sesión ya no está en uso por el hilo.
         if not es_saludo:
             asyncio.create_task(self._analizar_salud_background(mensaje, perfil, db))
 
-        # ── Saludo puro ("hola", sin nada más) → saludo correcto según la hora
-        # real de Perú, sin pasar por el LLM. Antes el LLM generaba saludos como
-        # "estás a punto de empezar tu día" sin saber la hora real — a las 11pm
-        # eso no tiene sentido. Solo se intercepta si NO queda contenido aparte
-        # del saludo (si dice "Hola, ¿cuánta proteína necesito?" debe seguir el
-        # flujo normal, no cortarse en un saludo).
-        if es_saludo:
-            _resto_saludo = msg_limpio
-            for _s in _KW_SALUDO:
-                _resto_saludo = _resto_saludo.replace(_s, "")
-            _resto_saludo = re.sub(r'[^\wáéíóúñ]+', '', _resto_saludo)
-            if len(_resto_saludo) <= 2:
-                from app.core.utils import get_peru_now
-                _hora_actual = get_peru_now().hour
-                if 5 <= _hora_actual < 12:
-                    _saludo_hora = "Buenos días"
-                elif 12 <= _hora_actual < 19:
-                    _saludo_hora = "Buenas tardes"
-                else:
-                    _saludo_hora = "Buenas noches"
-                _nombre_saludo = f", {perfil.first_name}" if perfil.first_name else ""
-                return _build_response(
-                    perfil, "CHAT", "OTRO",
-                    calorias_meta, consumo_real, quemadas_real, plan_hoy_data,
-                    f"{_saludo_hora}{_nombre_saludo}. ¿En qué te ayudo hoy?"
-                )
-
-        # ── Guardia anti-no-alimento (2 capas) ───────────────────────────────
-        _tokens_norm = set(_deaccent(msg_limpio).split())
-
-        # Capa 1: bloqueo absoluto — palabras que nunca son comida (caca, veneno, etc.)
-        _item_abs = next((t for t in _tokens_norm if t in _BLOQUEO_ABSOLUTO), None)
-
-        # Capa 2: no-alimentos + verbo explícito de ingesta (papel, madera, hierro...)
-        _item_verb = None
-        if not _item_abs and _RE_INTENTO_COMER.search(msg_limpio):
-            from app.services.nlp_food_extractor import NO_ALIMENTOS
-            _item_verb = next((t for t in _tokens_norm if t in NO_ALIMENTOS), None)
-
-        _item_no_comida = _item_abs or _item_verb
-        if _item_no_comida:
+        if _resp_guarda is not None:
+            tiempos.marcar_arranque()
+            tiempos.cerrar()
+            _intencion_g, _tipo_g, _texto_g, _bloqueado_g = _resp_guarda
             _resp = _build_response(
-                perfil, "CHAT", "OTRO",
-                calorias_meta, consumo_real, quemadas_real, plan_hoy_data,
-                f"'{_item_no_comida.capitalize()}' no es un alimento. "
-                f"Solo puedo ayudarte con comidas y bebidas reales. "
-                f"¿Qué comida o ejercicio puedo registrar por ti?"
+                perfil, _intencion_g, _tipo_g,
+                calorias_meta, consumo_real, quemadas_real, plan_hoy_data, _texto_g,
             )
-            _resp["_blocked"] = True  # señal para no guardar en historial BD
+            if _bloqueado_g:
+                _resp["_blocked"] = True  # señal para no guardar en historial BD
             return _resp
 
-        # ── Guardia off-topic (Python puro, sin llamar al LLM) ───────────────
-        _msg_norm = _deaccent(msg_limpio)
-        if not es_saludo and _es_offtopic(_msg_norm):
-            _resp_ot = _build_response(
-                perfil, "INFO", "OTRO",
-                calorias_meta, consumo_real, quemadas_real, plan_hoy_data,
-                _RESPUESTA_OFFTOPIC,
-            )
-            _resp_ot["_blocked"] = True  # no guardar en historial BD
-            return _resp_ot
-
-        # ── Pre-check de seguridad COMÚN, antes de decidir el modo ───────────────
-        # Si se menciona una lesión sin especificar zona (rodilla/espalda/hombro/
-        # codo), no hay info suficiente para recomendar nada seguro — sin importar
-        # a qué modo iba a ir el mensaje (antes esto solo protegía dentro de
-        # respuesta_chat_llm, así que RECOMENDAR_EJERCICIO podía saltárselo).
-        from app.services.llm_registro import _lesion_mencionada_sin_tipo
-        if _lesion_mencionada_sin_tipo(mensaje, historial):
-            _resp_lesion = _build_response(
-                perfil, "INFO", "OTRO",
-                calorias_meta, consumo_real, quemadas_real, plan_hoy_data,
-                "¿Qué lesión tienes exactamente? ¿Es en la rodilla, espalda, "
-                "hombro, codo u otra zona? Así te doy un consejo seguro y específico.",
-            )
-            return _resp_lesion
-
         # Modo funcional + guard rails
-        modo_funcion = await resolver_modo_funcion(self.ia, mensaje, es_saludo, historial=historial)
+        with tiempos.etapa("espera_modo"):
+            modo_funcion = await _tarea_modo
+        tiempos.marcar_arranque()
+        tiempos.cerrar()
 
         # ══════════════════════════════════════════════════════════════════════════
         # NUEVA ARQUITECTURA: LLM estima macros directo, sin lookup de BD
@@ -592,21 +669,8 @@ class AsistenteService:
             _c_e = float(_p_e.calorias_consumidas if _p_e else consumo_real)
             
             # Calorías quemadas de ejercicio registrado: fuente autoritativa = workout_logs
-            from sqlalchemy import text as _sql_wl
-            _dialect = getattr(getattr(db, "bind", None), "dialect", None)
-            _dname = getattr(_dialect, "name", "") or ""
-            if _dname == "postgresql":
-                _q_e = float(db.execute(_sql_wl(
-                    "SELECT COALESCE(SUM(calorias_quemadas), 0) FROM workout_logs "
-                    "WHERE client_id = :cid "
-                    "  AND (created_at AT TIME ZONE 'UTC' AT TIME ZONE 'America/Lima')::date = :hoy"
-                ), {"cid": perfil.id, "hoy": _hoy_e}).scalar() or 0)
-            else:
-                _q_e = float(db.execute(_sql_wl(
-                    "SELECT COALESCE(SUM(calorias_quemadas), 0) FROM workout_logs "
-                    "WHERE client_id = :cid AND date(created_at) = :hoy"
-                ), {"cid": perfil.id, "hoy": _hoy_e}).scalar() or 0)
-            
+            _q_e = _quemadas_hoy(db, perfil.id, _hoy_e)
+
             return {
                 "asistente":    "CaloFit IA",
                 "usuario":      perfil.first_name,
@@ -873,7 +937,7 @@ class AsistenteService:
     # ── 2b. Registro manual ───────────────────────────────────────────────────
 
     async def registrar_manual_alimento(self, body: dict, db: Session, current_user):
-        perfil = db.query(Client).filter(Client.email == current_user.email).first()
+        perfil = _perfil_cliente(db, current_user)
         if not perfil:
             raise ValueError("Perfil de cliente no encontrado")
         return await registro_comida_handler.registrar_manual(body, perfil, db)
@@ -888,7 +952,7 @@ class AsistenteService:
         - Fuerza (series/reps > 0): duración estimada = series × (reps×4s + 90s descanso) / 60.
         Fórmula de kcal: MET × peso_corporal × 3.5 / 200 × duracion_min
         """
-        perfil = db.query(Client).filter(Client.email == current_user.email).first()
+        perfil = _perfil_cliente(db, current_user)
         if not perfil:
             raise ValueError("Perfil no encontrado")
         peso_corporal = float(getattr(perfil, "weight", None) or 70.0)
@@ -928,7 +992,7 @@ class AsistenteService:
         Registra una lista de ejercicios con series×reps×peso en workout_logs.
         Cada ítem: {name, series, reps, peso_kg, kcal, met, duracion_min}
         """
-        perfil = db.query(Client).filter(Client.email == current_user.email).first()
+        perfil = _perfil_cliente(db, current_user)
         if not perfil:
             raise ValueError("Perfil no encontrado")
 
@@ -961,7 +1025,7 @@ class AsistenteService:
     # ── 3. Confirmar desde card ───────────────────────────────────────────────
 
     async def confirmar_registro(self, consulta_id: str, db: Session, current_user):
-        perfil = db.query(Client).filter(Client.email == current_user.email).first()
+        perfil = _perfil_cliente(db, current_user)
         if not perfil:
             raise ValueError("Perfil de cliente no encontrado")
         payload = get_consulta_cached(consulta_id)
@@ -998,6 +1062,8 @@ class AsistenteService:
     # ── Privados ──────────────────────────────────────────────────────────────
 
     async def _analizar_salud_background(self, mensaje: str, perfil, db: Session):
+        # Corre en su propia task: las llamadas al LLM de aquí ceden el cupo al chat interactivo.
+        fijar_prioridad(Prioridad.BACKGROUND)
         try:
             if self.ia.identificar_intencion_salud(mensaje) == "ALERT":
                 db.add(AlertaSalud(
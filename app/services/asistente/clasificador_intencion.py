@@ -0,0 +1,156 @@
+"""
+Clasificador local de intención para ``resolver_modo_funcion``.
+
+TF-IDF de n-gramas de caracteres + regresión logística sobre los 5 modos del
+asistente, entrenado con ``scripts/entrenar_clasificador_intencion.py`` y
+guardado junto a los demás modelos (``app/models/ai_models/clasificador_intencion.pkl``).
+
+Si la probabilidad del modo más votado llega a ``CALOFIT_INTENT_LOCAL_THRESHOLD``
+el modo se usa tal cual y no se llama a ``IAService.clasificar_modo_asistente``.
+Con historial, los mensajes que remiten a turnos anteriores ("cuál de esas",
+"agrégalo", "también") siempre van al LLM: el modelo solo ve el mensaje.
+``clasificador_stats()`` expone cuántas decisiones se tomaron sin LLM (/admin/runtime/metrics).
+"""
+from __future__ import annotations
+
+import logging
+import os
+import re
+import threading
+import unicodedata
+from typing import Any, Dict, Optional, Tuple
+
+from app.core.config import settings
+from app.services.asistente.asistente_modos import MODOS_ASISTENTE, RX_CORREGIR_REGISTRO
+
+logger = logging.getLogger(__name__)
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+MODELO_PATH = os.path.join(BASE_DIR, "models", "ai_models", "clasificador_intencion.pkl")
+
+# Referencias a lo ya conversado (R6/R7 del prompt del clasificador LLM).
+_RX_REFERENCIA = re.compile(
+    r"\b(es[aeo]s?|aquel\w*|anterior|cual(?:es)?|tambien|lo mismo|otra vez|la primera|la segunda)\b"
+)
+
+
+def normalizar_texto(mensaje: str) -> str:
+    """Minúsculas, sin tildes y con espacios colapsados (igual en entrenamiento e inferencia)."""
+    m = unicodedata.normalize("NFD", (mensaje or "").lower())
+    m = "".join(c for c in m if unicodedata.category(c) != "Mn")
+    return " ".join(m.split())
+
+
+class ClasificadorIntencion:
+    """Carga perezosa del .pkl; sin archivo o sin scikit-learn queda inactivo."""
+
+    def __init__(self, ruta: str = MODELO_PATH):
+        self.ruta = ruta
+        self._pipeline = None
+        self._version: Optional[str] = None
+        self._cargado = False
+        self._lock = threading.Lock()
+
+    def _cargar(self) -> None:
+        with self._lock:
+            if self._cargado:
+                return
+            self._cargado = True
+            if not os.path.exists(self.ruta):
+                logger.info("Clasificador de intención: %s no existe, se usa solo el LLM", self.ruta)
+                return
+            try:
+                import joblib
+
+                paquete = joblib.load(self.ruta)
+                self._pipeline = paquete["pipeline"]
+                self._version = paquete.get("version")
+                logger.info("Clasificador de intención %s cargado", self._version)
+            except Exception as e:
+                logger.warning("Clasificador de intención no disponible: %s", e)
+
+    @property
+    def activo(self) -> bool:
+        self._cargar()
+        return self._pipeline is not None
+
+    @property
+    def version(self) -> Optional[str]:
+        self._cargar()
+        return self._version
+
+    def predecir(self, mensaje: str) -> Optional[Tuple[str, float]]:
+        """(modo, probabilidad) del modo más probable, o None si no hay modelo."""
+        if not self.activo:
+            return None
+        probas = self._pipeline.predict_proba([normalizar_texto(mensaje)])[0]
+        i = int(probas.argmax())
+        modo = str(self._pipeline.classes_[i])
+        if modo not in MODOS_ASISTENTE:
+            return None
+        return modo, float(probas[i])
+
+
+clasificador = ClasificadorIntencion()
+
+_stats_lock = threading.Lock()
+_stats: Dict[str, Any] = {
+    "local": 0,
+    "llm": {"sin_modelo": 0, "baja_confianza": 0, "referencia_historial": 0},
+    "local_por_modo": {},
+}
+
+
+def _contar_llm(motivo: str) -> None:
+    with _stats_lock:
+        _stats["llm"][motivo] += 1
+
+
+def clasificar_local(mensaje: str, historial: Optional[list] = None) -> Optional[str]:
+    """
+    Modo del mensaje si el modelo local está seguro; None = hay que preguntar al LLM.
+    """
+    if not settings.CALOFIT_INTENT_LOCAL_ENABLED:
+        return None
+    if historial:
+        mn = normalizar_texto(mensaje)
+        if _RX_REFERENCIA.search(mn) or RX_CORREGIR_REGISTRO.search(mn):
+            _contar_llm("referencia_historial")
+            return None
+    pred = clasificador.predecir(mensaje)
+    if pred is None:
+        _contar_llm("sin_modelo")
+        return None
+    modo, proba = pred
+    if proba < settings.CALOFIT_INTENT_LOCAL_THRESHOLD:
+        _contar_llm("baja_confianza")
+        return None
+    with _stats_lock:
+        _stats["local"] += 1
+        _stats["local_por_modo"][modo] = _stats["local_por_modo"].get(modo, 0) + 1
+    logger.info("Modo %s resuelto sin LLM (p=%.2f)", modo, proba)
+    return modo
+
+
+def reset_stats() -> None:
+    with _stats_lock:
+        _stats["local"] = 0
+        _stats["llm"] = {k: 0 for k in _stats["llm"]}
+        _stats["local_por_modo"] = {}
+
+
+def clasificador_stats() -> Dict[str, Any]:
+    with _stats_lock:
+        local = _stats["local"]
+        llm = dict(_stats["llm"])
+        por_modo = dict(_stats["local_por_modo"])
+    total = local + sum(llm.values())
+    return {
+        "enabled": settings.CALOFIT_INTENT_LOCAL_ENABLED,
+        "model_version": clasificador.version,
+        "threshold": settings.CALOFIT_INTENT_LOCAL_THRESHOLD,
+        "local": local,
+        "local_by_mode": por_modo,
+        "llm": llm,
+        "llm_skip_rate": round(local / total, 3) if total else None,
+    }
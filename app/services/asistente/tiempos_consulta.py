@@ -0,0 +1,83 @@
+"""
+Tiempos por etapa de ``AsistenteService.consultar``.
+
+Cada turno de chat crea un ``TiemposConsulta`` y mide sus etapas de arranque:
+
+  perfil       lookup del cliente
+  guardas      saludo / no-alimento / off-topic / lesión (Python puro)
+  contexto_bd  plan del día + ProgresoCalorias + SUM de workout_logs
+  modo         ``resolver_modo_funcion`` (pre-checks, modelo local o LLM)
+  espera_modo  lo que aún faltaba del modo cuando el contexto de BD ya estaba
+  arranque     desde el inicio hasta tener contexto y modo (camino crítico)
+
+``contexto_bd`` y ``modo`` corren solapados, así que ``arranque`` ≈ max de
+ambos en vez de la suma. ``tiempos_consulta_stats()`` (en /admin/runtime/metrics) da conteo,
+promedio y máximo por etapa de este worker.
+"""
+from __future__ import annotations
+
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Awaitable, Dict, Iterator, TypeVar
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+_stats_lock = threading.Lock()
+# etapa → [conteo, suma_ms, max_ms]
+_stats: Dict[str, list] = {}
+
+
+class TiemposConsulta:
+    """Cronómetro de un turno; ``cerrar()`` acumula las etapas en las estadísticas del worker."""
+
+    def __init__(self) -> None:
+        self.t0 = time.perf_counter()
+        self.etapas: Dict[str, float] = {}
+
+    def registrar(self, etapa: str, ms: float) -> None:
+        self.etapas[etapa] = ms
+
+    @contextmanager
+    def etapa(self, nombre: str) -> Iterator[None]:
+        t = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.registrar(nombre, (time.perf_counter() - t) * 1000.0)
+
+    async def medir(self, nombre: str, aw: Awaitable[T]) -> T:
+        """Espera ``aw`` registrando su duración (para envolver una corutina en una task)."""
+        with self.etapa(nombre):
+            return await aw
+
+    def marcar_arranque(self) -> None:
+        self.registrar("arranque", (time.perf_counter() - self.t0) * 1000.0)
+
+    def cerrar(self) -> None:
+        with _stats_lock:
+            for etapa, ms in self.etapas.items():
+                s = _stats.setdefault(etapa, [0, 0.0, 0.0])
+                s[0] += 1
+                s[1] += ms
+                s[2] = max(s[2], ms)
+        logger.info(
+            "consultar etapas: %s",
+            " ".join(f"{k}={v:.1f}ms" for k, v in self.etapas.items()),
+        )
+
+
+def tiempos_consulta_stats() -> Dict[str, Any]:
+    with _stats_lock:
+        return {
+            etapa: {"count": n, "avg_ms": round(suma / n, 2) if n else 0.0, "max_ms": round(maximo, 2)}
+            for etapa, (n, suma, maximo) in _stats.items()
+        }
+
+
+def reset_tiempos_consulta() -> None:
+    with _stats_lock:
+        _stats.clear()
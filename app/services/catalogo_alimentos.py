@@ -0,0 +1,357 @@
+"""
+Catálogo de alimentos en memoria: ``alimentos`` + ``alimento_alias`` + ``alimento_unidades``.
+
+El catálogo es pequeño (1–2k filas) y cada resolver lo consultaba en Postgres
+ítem por ítem. Aquí se carga entero en un snapshot inmutable por worker:
+
+  - Índices: nombre exacto, alias (normalizado y tal cual), índice invertido de
+    palabras completas sin tildes y unidades por alimento.
+  - Los resolvers lo consultan primero (``consultar_catalogo``): un hit no hace
+    ningún round trip. Un miss sigue por la query de siempre, que también cubre
+    lo insertado por otro worker desde la última recarga. Solo se confía en las
+    reglas de máxima precedencia (nombre exacto, alias exacto): una fila nueva
+    que el snapshot aún no tiene no puede ganarles; prefijos y subcadenas van
+    siempre a la BD.
+  - Tras una escritura local el snapshot no se usa hasta que llegue uno leído
+    después de ella (``catalogo_vigente`` devuelve None mientras tanto).
+  - Swap atómico: una recarga construye un snapshot nuevo y reemplaza la
+    referencia (``version`` + 1); las lecturas en curso terminan con el anterior.
+  - Recargas, en un hilo aparte: al arrancar (``iniciar_catalogo``), tras el
+    commit de cualquier cambio ORM sobre las tres tablas (``_persistir_en_bd``,
+    validación del nutricionista...; hooks de ``instalar_recarga_catalogo``) y
+    al vencer ``CALOFIT_CATALOGO_TTL_SEC`` (cambios de otros workers). Las
+    escrituras en SQL crudo llaman a ``programar_recarga``.
+    ``CALOFIT_CATALOGO_TTL_SEC=0`` desactiva el catálogo.
+
+Los ``Alimento`` que devuelve son instancias desligadas propias de cada llamada
+(solo lectura, como las de app/core/identity_cache.py).
+
+``catalogo_stats()`` (en /admin/runtime/metrics como ``food_catalog``) expone versión y hit rate.
+"""
+from __future__ import annotations
+
+import threading
+import time
+import unicodedata
+from dataclasses import dataclass
+from types import MappingProxyType
+from typing import Callable, Iterable, Mapping, Optional, TypeVar
+
+from sqlalchemy import event, inspect, select
+from sqlalchemy.orm import Session, make_transient_to_detached
+
+from app.core.config import settings
+from app.core.logging_config import get_logger
+from app.models.alimento import Alimento
+from app.models.alimento_alias import AlimentoAlias
+from app.models.alimento_unidad import AlimentoUnidad
+
+logger = get_logger("catalogo_alimentos")
+
+T = TypeVar("T")
+
+_TABLAS = (Alimento, AlimentoAlias, AlimentoUnidad)
+_MODIFICADO = "catalogo_alimentos_modificado"
+
+
+def sin_tildes(s: str) -> str:
+    """Equivalente a ``unaccent(lower(s))`` de Postgres (la ñ pasa a n)."""
+    s = unicodedata.normalize("NFKD", (s or "").lower())
+    return "".join(c for c in s if not unicodedata.combining(c))
+
+
+@dataclass(frozen=True)
+class AliasCatalogo:
+    id: int
+    alimento_id: int
+    alias: str
+    alias_normalizado: str
+
+
+@dataclass(frozen=True)
+class UnidadCatalogo:
+    id: int
+    nombre: str
+    gramos: Optional[float]
+
+
+class CatalogoAlimentos:
+    """Snapshot inmutable del catálogo: se construye entero y no se modifica después."""
+
+    def __init__(
+        self,
+        version: int,
+        alimentos: Iterable[Mapping],
+        alias: Iterable[AliasCatalogo],
+        unidades: Iterable[tuple[int, UnidadCatalogo]],
+        leido_en: Optional[float] = None,
+    ):
+        self.version = version
+        self.cargado_en = time.monotonic()
+        # Inicio de la lectura de las tablas: lo escrito después no está en el snapshot.
+        self.leido_en = self.cargado_en if leido_en is None else leido_en
+        self._filas: dict[int, Mapping] = {f["id"]: MappingProxyType(dict(f)) for f in alimentos}
+
+        por_nombre: dict[str, int] = {}
+        palabras_sin_tildes: dict[str, list[int]] = {}
+        for i in sorted(self._filas):  # listas de ids en orden ascendente
+            nombre = self.nombre(i)
+            por_nombre.setdefault(nombre, i)
+            for p in set(sin_tildes(nombre).split(" ")):
+                palabras_sin_tildes.setdefault(p, []).append(i)
+        self._por_nombre = por_nombre
+        self._palabras_sin_tildes = {p: frozenset(ids) for p, ids in palabras_sin_tildes.items()}
+
+        self._alias = tuple(sorted(alias, key=lambda a: a.id))
+        self._por_alias_normalizado: dict[str, int] = {}
+        self._por_alias: dict[str, int] = {}
+        for a in self._alias:
+            self._por_alias_normalizado.setdefault(a.alias_normalizado, a.alimento_id)
+            self._por_alias.setdefault(a.alias, a.alimento_id)
+
+        por_alimento: dict[int, list[UnidadCatalogo]] = {}
+        for alimento_id, unidad in sorted(unidades, key=lambda x: x[1].id):
+            por_alimento.setdefault(alimento_id, []).append(unidad)
+        self._unidades = {i: tuple(us) for i, us in por_alimento.items()}
+
+    def __len__(self) -> int:
+        return len(self._filas)
+
+    def __contains__(self, alimento_id) -> bool:
+        return alimento_id in self._filas
+
+    # ── Filas ─────────────────────────────────────────────────────────────────
+
+    def fila(self, alimento_id: int) -> Optional[Mapping]:
+        """Columnas de ``alimentos`` (solo lectura)."""
+        return self._filas.get(alimento_id)
+
+    def nombre(self, alimento_id: int) -> str:
+        return self._filas[alimento_id]["nombre_normalizado"] or ""
+
+    def alimento(self, alimento_id: Optional[int]) -> Optional[Alimento]:
+        """Instancia ``Alimento`` desligada y propia del llamador, o None."""
+        fila = self._filas.get(alimento_id) if alimento_id is not None else None
+        if fila is None:
+            return None
+        obj = inspect(Alimento).class_manager.new_instance()
+        for k, v in fila.items():
+            setattr(obj, k, v)
+        make_transient_to_detached(obj)
+        return obj
+
+    def unidades(self, alimento_id: int) -> tuple[UnidadCatalogo, ...]:
+        """Unidades del alimento por id ascendente (vacío si no tiene)."""
+        return self._unidades.get(alimento_id, ())
+
+    # ── Búsquedas (todas devuelven ids en orden ascendente) ─────────────────
+
+    def id_por_nombre(self, nombre_normalizado: str) -> Optional[int]:
+        return self._por_nombre.get(nombre_normalizado)
+
+    def id_por_alias_normalizado(self, alias_normalizado: str) -> Optional[int]:
+        alimento_id = self._por_alias_normalizado.get(alias_normalizado)
+        return alimento_id if alimento_id in self._filas else None
+
+    def id_por_alias(self, alias: str) -> Optional[int]:
+        alimento_id = self._por_alias.get(alias)
+        return alimento_id if alimento_id in self._filas else None
+
+    def con_palabras(self, tokens: Iterable[str]) -> list[int]:
+        """Nombres que contienen cada token como palabra completa, sin tildes ni mayúsculas."""
+        candidatos: Optional[frozenset] = None
+        for t in tokens:
+            ids = self._palabras_sin_tildes.get(sin_tildes(t), frozenset())
+            candidatos = ids if candidatos is None else candidatos & ids
+            if not candidatos:
+                return []
+        return sorted(candidatos or ())
+
+
+# ── Snapshot vigente ─────────────────────────────────────────────────────────
+
+_actual: Optional[CatalogoAlimentos] = None
+_version = 0
+_lock_carga = threading.Lock()
+_lock_estado = threading.Lock()
+_recarga = {"hilo": None, "otra_vez": False, "intento": 0.0, "escritura": 0.0}
+_fabrica: Optional[Callable[[], Session]] = None
+_stats = {"hits": 0, "misses": 0, "recargas": 0, "errores": 0}
+_hooks_instalados = False
+
+
+def _contar(campo: str) -> None:
+    with _lock_estado:
+        _stats[campo] += 1
+
+
+def catalogo_vigente() -> Optional[CatalogoAlimentos]:
+    """
+    Snapshot actual, o None si el catálogo está desactivado, aún no se cargó o
+    se leyó antes de la última escritura local (hasta que llegue la recarga).
+    """
+    actual = _actual
+    ttl = settings.CALOFIT_CATALOGO_TTL_SEC
+    if actual is None or ttl <= 0:
+        return None
+    if time.monotonic() - max(actual.cargado_en, _recarga["intento"]) > ttl:
+        programar_recarga(tras_escritura=False)
+    if actual.leido_en < _recarga["escritura"]:
+        return None
+    return actual
+
+
+def consultar_catalogo(fn: Callable[[CatalogoAlimentos], Optional[T]]) -> Optional[T]:
+    """``fn(snapshot)`` contando hit / miss; None si no hay catálogo o ``fn`` no encontró nada."""
+    cat = catalogo_vigente()
+    if cat is None:
+        return None
+    valor = fn(cat)
+    _contar("misses" if valor is None else "hits")
+    return valor
+
+
+def cargar_catalogo(db: Session) -> CatalogoAlimentos:
+    """Lee las tres tablas (3 queries) y publica un snapshot nuevo."""
+    global _actual, _version
+    with _lock_carga:
+        leido_en = time.monotonic()
+        columnas = [getattr(Alimento, a.key) for a in inspect(Alimento).column_attrs]
+        alimentos = db.execute(select(*columnas)).mappings().all()
+        alias = [
+            AliasCatalogo(r.id, r.alimento_id, r.alias, r.alias_normalizado)
+            for r in db.execute(select(
+                AlimentoAlias.id, AlimentoAlias.alimento_id, AlimentoAlias.alias, AlimentoAlias.alias_normalizado,
+            ))
+        ]
+        unidades = [
+            (r.alimento_id, UnidadCatalogo(r.id, r.nombre, r.gramos))
+            for r in db.execute(select(
+                AlimentoUnidad.id, AlimentoUnidad.alimento_id, AlimentoUnidad.nombre, AlimentoUnidad.gramos,
+            ))
+        ]
+        nuevo = CatalogoAlimentos(_version + 1, alimentos, alias, unidades, leido_en)
+        _version = nuevo.version
+        _actual = nuevo
+    _contar("recargas")
+    logger.info(
+        f"Catálogo de alimentos v{nuevo.version}: {len(nuevo)} alimentos, "
+        f"{len(alias)} alias, {len(unidades)} unidades"
+    )
+    return nuevo
+
+
+def descartar_catalogo() -> None:
+    """Vuelve a consultar siempre la BD hasta la próxima carga."""
+    global _actual
+    _actual = None
+
+
+def iniciar_catalogo() -> None:
+    """Carga inicial al arrancar el worker (sin catálogo si la BD no responde)."""
+    if settings.CALOFIT_CATALOGO_TTL_SEC <= 0:
+        return
+    try:
+        with _nueva_sesion() as db:
+            cargar_catalogo(db)
+    except Exception as exc:
+        _contar("errores")
+        logger.warning(f"Catálogo de alimentos no cargado: {exc}")
+
+
+def _nueva_sesion() -> Session:
+    if _fabrica is not None:
+        return _fabrica()
+    from app.core.database import SessionLocal
+    return SessionLocal()
+
+
+def programar_recarga(tras_escritura: bool = True) -> None:
+    """
+    Recarga en un hilo aparte; si ya hay una en curso, se repite al terminar.
+
+    ``tras_escritura`` (lo normal: se llama tras escribir en las tablas) deja de
+    usar el snapshot actual hasta que llegue uno leído después de este momento.
+    """
+    with _lock_estado:
+        ahora = time.monotonic()
+        _recarga["intento"] = ahora
+        if tras_escritura:
+            _recarga["escritura"] = ahora
+        if _recarga["hilo"] is not None:
+            _recarga["otra_vez"] = True
+            return
+        hilo = threading.Thread(target=_recargar, name="catalogo-alimentos", daemon=True)
+        _recarga["hilo"] = hilo
+    hilo.start()
+
+
+def _recargar() -> None:
+    while True:
+        with _lock_estado:
+            _recarga["otra_vez"] = False
+        try:
+            with _nueva_sesion() as db:
+                cargar_catalogo(db)
+        except Exception as exc:
+            _contar("errores")
+            logger.warning(f"Recarga del catálogo de alimentos fallida: {exc}")
+        with _lock_estado:
+            if not _recarga["otra_vez"]:
+                _recarga["hilo"] = None
+                return
+
+
+def esperar_recarga(timeout: float = 5.0) -> None:
+    """Espera a que termine la recarga en curso (tests / scripts)."""
+    hilo = _recarga["hilo"]
+    if hilo is not None:
+        hilo.join(timeout)
+
+
+def catalogo_stats() -> dict:
+    actual = _actual
+    with _lock_estado:
+        stats = dict(_stats)
+    total = stats["hits"] + stats["misses"]
+    stats["hit_rate"] = round(stats["hits"] / total, 3) if total else 0.0
+    stats["version"] = actual.version if actual else 0
+    stats["alimentos"] = len(actual) if actual else 0
+    stats["edad_sec"] = round(time.monotonic() - actual.cargado_en, 1) if actual else None
+    stats["ttl_sec"] = settings.CALOFIT_CATALOGO_TTL_SEC
+    return stats
+
+
+# ── Hooks de sesión ──────────────────────────────────────────────────────────
+
+def _tras_flush(session: Session, flush_context) -> None:
+    if _actual is None or session.info.get(_MODIFICADO):
+        return
+    if any(isinstance(obj, _TABLAS) for obj in (*session.new, *session.dirty, *session.deleted)):
+        session.info[_MODIFICADO] = True
+
+
+def _tras_commit(session: Session) -> None:
+    if session.info.pop(_MODIFICADO, False):
+        programar_recarga()
+
+
+def _tras_rollback(session: Session, transaccion) -> None:
+    if not getattr(transaccion, "nested", False):
+        session.info.pop(_MODIFICADO, None)
+
+
+def instalar_recarga_catalogo(fabrica: Optional[Callable[[], Session]] = None) -> None:
+    """Recarga el catálogo tras cada commit que toque sus tablas (idempotente).
+
+    ``fabrica`` crea la sesión de las recargas (por defecto ``SessionLocal``).
+    """
+    global _hooks_instalados, _fabrica
+    if fabrica is not None:
+        _fabrica = fabrica
+    if _hooks_instalados:
+        return
+    event.listen(Session, "after_flush", _tras_flush)
+    event.listen(Session, "after_commit", _tras_commit)
+    event.listen(Session, "after_soft_rollback", _tras_rollback)
+    _hooks_instalados = True
@@ -46,6 +46,10 @@ except ImportError:
 
 from app.core.config import settings
 from app.core.mets_gym import METS_GYM
+from app.services.ai.completion_cache import cache_llm, call_site_actual, clave, completion_cache
+from app.services.ai import circuit_breaker
+from app.services.ai.rate_governor import estimar_tokens, reservar_llamada, tokens_usados
+from app.services.ai.streaming import sink_actual
 from app.services.nutricion_service import nutricion_service
 
 # Mensaje estable si httpx/Groq corta por tiempo (evitar "[Error: Request timed out.]" en el chat).
@@ -383,11 +387,12 @@ class IAService:
             "Respuesta (una sola palabra exacta):"
         )
         # Clasificación con groq/compound-mini — salida ~1 token, muy rápida y robusta (70,000 TPM limit)
-        raw = await self._llamar_groq(prompt, max_tokens=150, temp=0.0,
-                                      model="groq/compound-mini")
-        if self.es_fallo_respuesta_llm(raw):
-            # Fallback
-            raw = await self._llamar_groq(prompt, max_tokens=150, temp=0.0)
+        with cache_llm("clasificar_modo"):
+            raw = await self._llamar_groq(prompt, max_tokens=150, temp=0.0,
+                                          model="groq/compound-mini")
+            if self.es_fallo_respuesta_llm(raw):
+                # Fallback
+                raw = await self._llamar_groq(prompt, max_tokens=150, temp=0.0)
         if self.es_fallo_respuesta_llm(raw):
             return None
         return IAService.normalizar_etiqueta_modo_llm(raw)
@@ -426,7 +431,19 @@ class IAService:
         if not self.groq_client:
             return "[Modo Offline]"
         modelo = model or "groq/compound-mini"
-        
+
+        # Opt-in con ``with cache_llm("<call site>")``: prompts deterministas no vuelven a Groq.
+        call_site = call_site_actual()
+        if call_site:
+            return await completion_cache.obtener_o_llamar(
+                call_site,
+                clave(modelo, prompt, temp, max_tokens),
+                lambda: self._llamar_groq_sin_cache(prompt, max_tokens, temp, modelo),
+                es_cacheable=lambda texto: not self.es_fallo_respuesta_llm(texto),
+            )
+        return await self._llamar_groq_sin_cache(prompt, max_tokens, temp, modelo)
+
+    async def _llamar_groq_sin_cache(self, prompt: str, max_tokens: int, temp: float, modelo: str) -> str:
         # Para los modelos de razonamiento (gpt-oss), ajustamos dinámicamente max_tokens
         # para dar espacio al razonamiento (~1000 tokens) sin exceder el límite de 8000 TPM de Groq.
         if "gpt-oss" in modelo:
@@ -437,14 +454,62 @@ class IAService:
             # Asegurar al menos 1800 para razonamiento + respuesta, sin pasarnos del límite seguro
             max_tokens = min(max_tokens_seguro, max(max_tokens, 1800))
 
+        sink = sink_actual()
+
         async def _ejecutar_llamada(m, mt):
-            r = await self.groq_client.chat.completions.create(
-                model=m,
-                messages=[{"role": "user", "content": prompt}],
-                max_tokens=mt,
-                temperature=temp,
+            # Breaker por modelo (salta modelos caídos) y hedging opcional al secundario.
+            # Sin hedging en streaming: los tokens de dos modelos se mezclarían.
+            # Cupo RPM/TPM antes de salir (fuera de la latencia que mide el breaker):
+            # sin cupo levanta PresupuestoAgotado ("rate_limit") → fallback.
+            return await circuit_breaker.llamar(
+                m,
+                lambda modelo, reserva: _llamar_modelo(modelo, mt, reserva),
+                hedge=sink is None,
+                reservar=lambda modelo: reservar_llamada(modelo, prompt, mt),
             )
-            return r.choices[0].message.content.strip()
+
+        async def _llamar_modelo(m, mt, reserva):
+            if sink is not None:
+                # Consulta en streaming (/asistente/consultar/stream): reenviar tokens al cliente.
+                sink.reiniciar()
+                partes = []
+                usados = None
+                try:
+                    chunks = await self.groq_client.chat.completions.create(
+                        model=m,
+                        messages=[{"role": "user", "content": prompt}],
+                        max_tokens=mt,
+                        temperature=temp,
+                        stream=True,
+                    )
+                    async for chunk in chunks:
+                        # Groq manda el usage en el último chunk (``x_groq.usage``).
+                        usados = tokens_usados(chunk) or tokens_usados(getattr(chunk, "x_groq", None)) or usados
+                        delta = chunk.choices[0].delta.content if chunk.choices else None
+                        if delta:
+                            partes.append(delta)
+                            sink.token(delta)
+                    return "".join(partes).strip()
+                finally:
+                    # También con error o cancelación: el cupo reservado se ajusta a lo
+                    # consumido (usage real, o prompt + tokens recibidos estimados).
+                    if reserva is not None:
+                        if usados is None:
+                            usados = estimar_tokens(prompt) + estimar_tokens("".join(partes))
+                        reserva.ajustar(usados)
+            r = None
+            try:
+                r = await self.groq_client.chat.completions.create(
+                    model=m,
+                    messages=[{"role": "user", "content": prompt}],
+                    max_tokens=mt,
+                    temperature=temp,
+                )
+                return r.choices[0].message.content.strip()
+            finally:
+                # Con error o cancelación (el perdedor de un hedge) solo se cuenta el prompt.
+                if reserva is not None:
+                    reserva.ajustar(tokens_usados(r) if r is not None else estimar_tokens(prompt))
 
         try:
             return await _ejecutar_llamada(modelo, max_tokens)
@@ -34,9 +34,15 @@ logger = logging.getLogger(__name__)
 # Fuente principal: app.core.objetivo_utils — mapa cerrado de los 5 valores
 # controlados por el frontend. No depende de regex ni texto libre.
 from app.core.objetivo_utils import es_superavit as _es_superavit_goal
+from app.core.single_flight import SingleFlight
+from app.services.ai.completion_cache import cache_llm
+from app.services.ai.streaming import respuesta_visible
 from app.core.user_context import UserContext
 from app.core.mets_gym import tabla_prompt_texto as _tabla_met_texto
 
+# Extracción LLM de comidas en vuelo, por mensaje normalizado (ver registrar_comida_llm).
+_vuelos_extraccion = SingleFlight("registro_comida_llm")
+
 _RX_CANTIDAD_AMBIGUA = re.compile(
     r'\b(?:no\s+(?:estoy\s+seguro|se|sé)\s+si|creo\s+que|tal\s+vez|quiz[aá]s|mas\s+o\s+menos|más\s+o\s+menos|aprox|entre\s+\d+\s+y\s+\d+|o\s+(?:media|una|dos)|un\s+poco(?:\s+de)?|algo(?:\s+de)?|bastante)\b',
     re.IGNORECASE
@@ -529,7 +535,8 @@ async def estimar_met_desconocido(nombre: str, ia_engine) -> float:
     Cubre cualquier ejercicio sin necesidad de agregarlo a mano al catálogo."""
     try:
         prompt = _PROMPT_MET_DESCONOCIDO.format(nombre=nombre)
-        raw = await _llamar_groq_con_excepciones(ia_engine, prompt, max_tokens=40, temp=0.0)
+        with cache_llm("met_desconocido"):
+            raw = await _llamar_groq_con_excepciones(ia_engine, prompt, max_tokens=40, temp=0.0)
         datos = _parse_json(raw)
         met = float(datos.get("met")) if datos and datos.get("met") else 0.0
         return met if met > 0 else 5.0
@@ -841,7 +848,13 @@ async def registrar_comida_llm(
             # 700 sigue cubriendo el JSON de la mayoría de registros
             # (~700-800 tokens reales para 5-9 ítems) dejando margen para
             # mensajes de usuario más largos sin pasar el límite.
-            raw = await _llamar_groq_con_excepciones(ia_engine, prompt, max_tokens=700, temp=0.0, model="llama-3.3-70b-versatile")
+            # Mismo prompt en vuelo (otro usuario o un reintento) → se comparte
+            # la misma llamada al LLM; cada request parsea su propia copia. La key
+            # es el prompt exacto: mensajes que solo se parecen no comparten respuesta.
+            raw = await _vuelos_extraccion.do_async(
+                prompt,
+                lambda: _llamar_groq_con_excepciones(ia_engine, prompt, max_tokens=700, temp=0.0, model="llama-3.3-70b-versatile"),
+            )
             datos = _parse_json(raw)
         except asyncio.TimeoutError as e:
             logger.error("[LLM Timeout in registrar_comida_llm]: %s", e)
@@ -1962,7 +1975,8 @@ async def respuesta_recomendacion_llm(
         )
 
         try:
-            respuesta_ej = await _llamar_groq_con_excepciones(ia_engine, prompt, max_tokens=300, temp=0.7)
+            with respuesta_visible():
+                respuesta_ej = await _llamar_groq_con_excepciones(ia_engine, prompt, max_tokens=300, temp=0.7)
 
             if _lesiones_activas:
                 # _normalizar_nombre quita tildes — sin esto, "jalon" (keyword) nunca
@@ -2598,9 +2612,10 @@ async def respuesta_recomendacion_llm(
     )
 
     try:
-        respuesta_llm_reco = await _llamar_groq_con_excepciones(
-            ia_engine, _prompt_reco_comida, max_tokens=180, temp=0.5
-        )
+        with respuesta_visible():
+            respuesta_llm_reco = await _llamar_groq_con_excepciones(
+                ia_engine, _prompt_reco_comida, max_tokens=180, temp=0.5
+            )
 
         # Guard: si el LLM ignoró el formato y devolvió receta, reintentar con prompt mínimo
         _RECIPE_MARKERS = ("ingredientes:", "preparación:", "preparacion:", "pasos:", "instrucciones:")
@@ -3446,7 +3461,8 @@ async def respuesta_chat_llm(
 
     try:
         _max_tok = 500 if (_es_receta or _es_tecnica) else 200
-        raw = await _llamar_groq_con_excepciones(ia_engine, prompt, max_tokens=_max_tok, temp=0.7)
+        with respuesta_visible():
+            raw = await _llamar_groq_con_excepciones(ia_engine, prompt, max_tokens=_max_tok, temp=0.7)
         resultado = _limpiar_markdown(raw)
 
         # Para recetas: añadir saltos de línea antes de secciones clave
@@ -3654,12 +3670,29 @@ def _recortar_respuesta_chat(texto: str, mensaje_usuario: str, max_oraciones: in
 # guarda aquí. Si el usuario registra ese plato en la misma sesión, se usan
 # los mismos valores → consistencia perfecta sin BD hardcodeada.
 
+import threading as _threading
 import time as _time
 import unicodedata as _ud2
 import re as _re2
 
+from app.core.cache_metrics import registry as _cache_metrics
+
 _macro_cache: dict = {}
+_macro_lock = _threading.Lock()  # set / expulsión de vencidas (las lecturas no lo toman)
 _CACHE_TTL = 7200  # 2 horas
+_METRICS_NAME = "macro_cache"
+
+
+def _uso_macro_cache() -> dict:
+    # Bytes aproximados: largo de la key + repr de los macros (solo para métricas).
+    entradas = list(_macro_cache.items())
+    return {"exact": {
+        "entries": len(entradas),
+        "bytes": sum(len(k) + len(repr(v)) for k, v in entradas),
+    }}
+
+
+_cache_metrics.register_gauge(_METRICS_NAME, _uso_macro_cache)
 
 
 _SINONIMOS_ALIMENTOS = {
@@ -4292,20 +4325,40 @@ def _cache_key(nombre: str) -> str:
 def cache_macros(nombre: str, macros: dict) -> None:
     """Guarda macros en caché con TTL de 2 horas."""
     key = _cache_key(nombre)
-    _macro_cache[key] = {**macros, "_ts": _time.time()}
+    with _macro_lock:
+        _macro_cache[key] = {**macros, "_ts": _time.time()}
+    _cache_metrics.incr(_METRICS_NAME, "exact", "sets")
     logger.info("[MacroCache] Guardado: %s → %s kcal", nombre, macros.get("kcal", "?"))
 
 
 def get_cached_macros(nombre: str) -> dict | None:
     """Retorna macros cacheados o None si no existe / expiró."""
+    t0 = _time.perf_counter()
     key = _cache_key(nombre)
     entry = _macro_cache.get(key)
+    out = None
     if entry and (_time.time() - entry.get("_ts", 0)) < _CACHE_TTL:
-        return {k: v for k, v in entry.items() if k != "_ts"}
-    return None
+        out = {k: v for k, v in entry.items() if k != "_ts"}
+    elif entry:
+        # Vencida: se expulsa al verla, así la expiración cuenta una sola vez.
+        with _macro_lock:
+            vencida = _macro_cache.get(key) is entry
+            if vencida:
+                del _macro_cache[key]
+        if vencida:
+            _cache_metrics.incr(_METRICS_NAME, "exact", "expirations")
+    _cache_metrics.lookup(_METRICS_NAME, "exact", out is not None, _time.perf_counter() - t0)
+    return out
 
 
 def _buscar_en_cache(mensaje: str) -> dict | None:
+    t0 = _time.perf_counter()
+    out = _buscar_en_cache_sin_metricas(mensaje)
+    _cache_metrics.lookup(_METRICS_NAME, "fuzzy", out is not None, _time.perf_counter() - t0)
+    return out
+
+
+def _buscar_en_cache_sin_metricas(mensaje: str) -> dict | None:
     """Busca en caché con:
     1. Coincidencia exacta limpia (quitando verbos de acción y artículos)
     2. Fuzzy matching limpio (umbral 0.82) sobre las formas limpias"""
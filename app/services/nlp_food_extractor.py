@@ -49,8 +49,9 @@ from typing import List, Optional
 from sqlalchemy.orm import Session
 
 from app.models.alimento import Alimento
-from app.models.alimento_alias import AlimentoAlias
 from app.models.alimento_unidad import AlimentoUnidad
+from app.services.alimentos_resolucion import buscar_alimento
+from app.services.catalogo_alimentos import consultar_catalogo
 from app.services.asistente.asistente_nutricion import coherencia_proteina_platos
 from app.services.nutricional_result import validar_macros_atwater
 from app.core.logging_config import get_logger
@@ -728,60 +729,10 @@ class NLPFoodExtractor:
 
     # ─── PASO 2: Buscar alimento en BD por nombre o alias ─────────────────────
     def _buscar_alimento_bd(self, nombre: str) -> Optional[Alimento]:
-        n = _norm(nombre)
-        if not n:
-            return None
-        # 1. Búsqueda exacta por nombre normalizado
-        a = self.db.query(Alimento).filter(Alimento.nombre_normalizado == n).first()
-        if a:
-            return a
-        # 2. Búsqueda por alias exacto
-        alias = self.db.query(AlimentoAlias).filter(AlimentoAlias.alias_normalizado == n).first()
-        if alias:
-            return self.db.query(Alimento).filter(Alimento.id == alias.alimento_id).first()
-        # 3. Búsqueda por palabra inicial exacta: "papa" NO debe coincidir con "papaya"
-        #    Usamos LIKE "papa %" para evitar falsos positivos.
-        #    REGLA 6: ORDER BY LENGTH ASC → preferir el nombre más corto/específico.
-        #    Evita que "fruta" matchee "Ensalada de Frutas" (381 kcal) en lugar de
-        #    "Fruta Seca" o el alimento individual correcto.
-        from sqlalchemy import func as _sqlfunc
-        a3 = (
-            self.db.query(Alimento)
-            .filter(Alimento.nombre_normalizado.like(f"{n} %"))
-            .order_by(_sqlfunc.length(Alimento.nombre_normalizado).asc())
-            .first()
-        )
-        if a3:
-            return a3
-        # 4. Bug 3 fix: cuando el nombre tiene ≥2 palabras con "de" (ej: "galleta de avena"),
-        #    priorizar el match que contenga TODAS las palabras clave, no solo la primera.
-        #    Esto evita que "galleta de avena" matchee "Galleta De Soda" por LIKE "%galleta%".
-        palabras_n = [w for w in n.split() if len(w) >= 4 and w not in {"de", "con", "del", "las", "los"}]
-        if len(palabras_n) >= 2:
-            # Requiere que TODAS las palabras clave estén en el nombre normalizado de BD
-            query_multi = self.db.query(Alimento)
-            for pw in palabras_n:
-                query_multi = query_multi.filter(Alimento.nombre_normalizado.like(f"%{pw}%"))
-            a_multi = (
-                query_multi
-                .order_by(_sqlfunc.length(Alimento.nombre_normalizado).asc())
-                .first()
-            )
-            if a_multi:
-                return a_multi
-        # 5. Fallback amplio: el nombre buscado aparece en cualquier posición.
-        #    REGLA 6: ORDER BY LENGTH ASC garantiza que "Fruta" (genérico corto) tenga
-        #    prioridad sobre "Ensalada de Frutas" o "Mezcla de Frutas" (compuestos largos).
-        a5 = (
-            self.db.query(Alimento)
-            .filter(Alimento.nombre_normalizado.like(f"%{n}%"))
-            .order_by(
-                Alimento.nombre_normalizado.like(f"{n}%").desc(),
-                _sqlfunc.length(Alimento.nombre_normalizado).asc(),
-            )
-            .first()
-        )
-        return a5
+        # Precedencia de siempre (exacto → alias → "x %" → todas las palabras
+        # clave → "%x%", más corto primero): catálogo en memoria y, si no está,
+        # una sola query rankeada; ver app/services/alimentos_resolucion.py.
+        return buscar_alimento(self.db, _norm(nombre))
 
     # ─── PASO 3b: Aplicar modificadores sin/con_extra ─────────────────────────
     def _gramos_tipicos_ingrediente(self, nombre_ingrediente: str, nombre_plato: str) -> float:
@@ -866,15 +817,20 @@ class NLPFoodExtractor:
         if u in _PESOS_UNIVERSALES:
             return UNIDADES_GLOBALES.get(u, 1.0) * cantidad
 
-        # 1. Buscar en alimento_unidades de la BD (porciones específicas: rebanada, taza…)
-        row = (
-            self.db.query(AlimentoUnidad)
-            .filter(
-                AlimentoUnidad.alimento_id == alimento.id,
-                AlimentoUnidad.nombre.ilike(f"%{u}%"),
+        # 1. Buscar en alimento_unidades (porciones específicas: rebanada, taza…);
+        #    primero las del catálogo en memoria; un miss va a la BD (la unidad pudo
+        #    agregarse después de la última recarga).
+        unidades = consultar_catalogo(lambda cat: cat.unidades(alimento.id) if alimento.id in cat else None)
+        row = next((x for x in unidades or () if u in (x.nombre or "").lower()), None)
+        if row is None:
+            row = (
+                self.db.query(AlimentoUnidad)
+                .filter(
+                    AlimentoUnidad.alimento_id == alimento.id,
+                    AlimentoUnidad.nombre.ilike(f"%{u}%"),
+                )
+                .first()
             )
-            .first()
-        )
         if row and row.gramos and row.gramos > 0:
             return float(row.gramos) * cantidad
 
@@ -897,10 +853,9 @@ class NLPFoodExtractor:
         """
         # No consultar USDA si el término es claramente no-comestible
         n_lower = _norm(nombre_en)
-        for palabra in NO_ALIMENTOS:
-            if palabra in n_lower.split():
-                print(f"[USDA] Término bloqueado por lista negra: '{nombre_en}'")
-                return None
+        if not NO_ALIMENTOS.isdisjoint(n_lower.split()):
+            print(f"[USDA] Término bloqueado por lista negra: '{nombre_en}'")
+            return None
 
         # No consultar si la query tiene más de 5 palabras (probablemente es una frase completa)
         if len(nombre_en.split()) > 5:
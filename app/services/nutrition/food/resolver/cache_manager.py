@@ -4,16 +4,28 @@ Gestor de caché inteligente para alimentos.
 AppCacheAlimentos tiene: food_normalized, user_id, alimento_id, source,
 raw_response (TEXT), hit_count, expires_at, created_at.
 Los macros se serializan como JSON en raw_response.
+Las métricas van al registro de ``app.core.cache_metrics`` como ``app_cache_alimentos``.
+
+Las variantes ``*_async`` corren la misma consulta en el executor por defecto
+(la sesión es síncrona): el loop no se bloquea, pero la sesión sigue siendo de
+un solo uso a la vez, así que no se deben lanzar en paralelo sobre el mismo
+``CacheManager``.
 """
+import asyncio
 import json
+import time
 from typing import Optional, Dict, Any
 from datetime import datetime, timedelta, timezone
 from sqlalchemy.orm import Session
 from app.models import AppCacheAlimentos
+from app.core.cache_metrics import registry as cache_metrics
 import logging
 
 logger = logging.getLogger(__name__)
 
+_METRICS_NAME = "app_cache_alimentos"
+_METRICS_PREFIX = "food"
+
 
 class CacheManager:
     """
@@ -39,6 +51,12 @@ class CacheManager:
         Returns:
             Dict con claves calorias_100g, proteina_100g, … o None si expiró/no existe.
         """
+        t0 = time.perf_counter()
+        out = self._obtener_del_cache(food_normalized, user_id)
+        cache_metrics.lookup(_METRICS_NAME, _METRICS_PREFIX, out is not None, time.perf_counter() - t0)
+        return out
+
+    def _obtener_del_cache(self, food_normalized: str, user_id: int) -> Optional[Dict[str, Any]]:
         try:
             entry = self.db.query(AppCacheAlimentos).filter(
                 AppCacheAlimentos.food_normalized == food_normalized.lower().strip(),
@@ -52,6 +70,7 @@ class CacheManager:
                 logger.info("Cache expirado para %s", food_normalized)
                 self.db.delete(entry)
                 self.db.commit()
+                cache_metrics.incr(_METRICS_NAME, _METRICS_PREFIX, "expirations")
                 return None
 
             if not entry.raw_response:
@@ -116,6 +135,7 @@ class CacheManager:
                 logger.info("Cache creado: %s", food_normalized)
 
             self.db.commit()
+            cache_metrics.incr(_METRICS_NAME, _METRICS_PREFIX, "sets")
             return True
 
         except Exception as exc:
@@ -123,6 +143,25 @@ class CacheManager:
             self.db.rollback()
             return False
 
+    async def obtener_del_cache_async(
+        self,
+        food_normalized: str,
+        user_id: int,
+    ) -> Optional[Dict[str, Any]]:
+        return await asyncio.to_thread(self.obtener_del_cache, food_normalized, user_id)
+
+    async def guardar_en_cache_async(
+        self,
+        food_normalized: str,
+        user_id: int,
+        macros: Dict[str, float],
+        source: str,
+        alimento_id: Optional[int] = None,
+    ) -> bool:
+        return await asyncio.to_thread(
+            self.guardar_en_cache, food_normalized, user_id, macros, source, alimento_id
+        )
+
     def invalidar_cache(self, food_normalized: str, user_id: int) -> bool:
         """Elimina entrada de caché específica."""
         try:
@@ -146,6 +185,8 @@ class CacheManager:
                 q = q.filter(AppCacheAlimentos.user_id == user_id)
             count = q.delete()
             self.db.commit()
+            if count:
+                cache_metrics.incr(_METRICS_NAME, _METRICS_PREFIX, "expirations", count)
             return count
         except Exception as exc:
             logger.error("CacheManager.limpiar_cache_expirado error: %s", exc)
@@ -1,6 +1,7 @@
 """
 Constructor de platos (PlatoBuilder).
 """
+import asyncio
 from typing import Optional, List, Dict, Any
 from datetime import datetime, timezone, timedelta
 from sqlalchemy.orm import Session
@@ -57,6 +58,9 @@ class PlatoBuilder:
     ) -> PlatoConstructionResultDTO:
         """
         Construye y valida un plato.
+
+        Ruta síncrona para scripts y tests; en requests se usa
+        ``construir_plato_async``.
         
         Args:
             nombre_plato: nombre del plato
@@ -83,7 +87,50 @@ class PlatoBuilder:
             ingredientes=ingredientes,
             user_id=client_id,
         )
-        
+        return self._finalizar_plato(
+            nombre_plato, nombre_norm, ingredientes, ingredientes_resueltos, client_id, tipo_plato
+        )
+
+    async def construir_plato_async(
+        self,
+        nombre_plato: str,
+        ingredientes: List[Dict[str, Any]],
+        client_id: int,
+        tipo_plato: str = "cualquiera",
+    ) -> PlatoConstructionResultDTO:
+        """
+        Versión async de ``construir_plato``: el LLM de los ingredientes se
+        espera en el loop del llamador; caché, validación y guardado (sesión
+        síncrona) van al executor por defecto, uno tras otro.
+        """
+        logger.info(f"Construyendo plato (async): {nombre_plato} para cliente {client_id}")
+
+        nombre_norm = nombre_plato.lower().strip()
+        resultado_cache = await asyncio.to_thread(self._buscar_en_cache, nombre_norm, client_id)
+        if resultado_cache:
+            logger.info(f"✅ Plato en caché: {nombre_plato}")
+            resultado_cache.cached = True
+            return resultado_cache
+
+        ingredientes_resueltos = await self.food_resolver.resolver_ingredientes_lote_async(
+            ingredientes=ingredientes,
+            user_id=client_id,
+        )
+        return await asyncio.to_thread(
+            self._finalizar_plato,
+            nombre_plato, nombre_norm, ingredientes, ingredientes_resueltos, client_id, tipo_plato,
+        )
+
+    def _finalizar_plato(
+        self,
+        nombre_plato: str,
+        nombre_norm: str,
+        ingredientes: List[Dict[str, Any]],
+        ingredientes_resueltos: List[Dict[str, Any]],
+        client_id: int,
+        tipo_plato: str,
+    ) -> PlatoConstructionResultDTO:
+        """Pasos 3-10 de ``construir_plato``, con los ingredientes ya resueltos."""
         # Verificar si todos se resolvieron
         ingredientes_fallidos = [
             ing for ing in ingredientes_resueltos if not ing['exito']
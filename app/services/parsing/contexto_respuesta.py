@@ -6,6 +6,8 @@ from __future__ import annotations
 
 from typing import Literal, Optional
 
+from app.services.parsing.keyword_matcher import SUBCADENA, KeywordMatcher
+
 _CTX_COMIDA = (
     "comí",
     "comi ",
@@ -57,6 +59,11 @@ _CTX_EJERCICIO = (
     "deltoides",
 )
 
+_DOMINIOS = KeywordMatcher({
+    "comida": (SUBCADENA, _CTX_COMIDA),
+    "ejercicio": (SUBCADENA, _CTX_EJERCICIO),
+})
+
 
 def inferir_forzar_por_mensaje_usuario(
     mensaje: str,
@@ -68,8 +75,9 @@ def inferir_forzar_por_mensaje_usuario(
     m = (mensaje or "").lower().strip()
     if len(m) < 2:
         return None
-    fc = sum(1 for x in _CTX_COMIDA if x in m)
-    fe = sum(1 for x in _CTX_EJERCICIO if x in m)
+    c = _DOMINIOS.buscar(m)
+    fc = c.cuenta("comida")
+    fe = c.cuenta("ejercicio")
     if fc > fe:
         return "comida"
     if fe > fc:
@@ -0,0 +1,160 @@
+"""
+Matcher de palabras clave compilado para las guardas de routing del asistente.
+
+Las guardas (saludo, anti-no-alimento, off-topic, ``detectar_modo_funcion``,
+``resolver_modo_funcion``) recorrían tuplas largas con
+``any(k in msg for k in ...)``: un escaneo del mensaje por palabra clave y
+varias veces por mensaje. ``KeywordMatcher`` se arma una vez al importar a
+partir de esas mismas tablas y, en una pasada sobre el mensaje, devuelve
+todas las categorías (y las claves concretas) que coinciden.
+
+Las claves de subcadena van en una sola regex en forma de trie dentro de un
+lookahead, así que en cada posición el motor encuentra la clave más larga que
+empieza ahí; las demás que empiezan en la misma posición son prefijos suyos y
+salen de una tabla precalculada. Por eso el resultado es exacto (no solo
+"alguna coincide"): ``cuenta()`` da lo mismo que ``sum(1 for k in tabla if k in msg)``.
+
+Modos por categoría (misma semántica que el código que reemplazan):
+  SUBCADENA  ``k in texto``
+  PREFIJO    ``texto.startswith(k)``
+  PALABRA    ``texto.startswith(k) or re.search(rf"\\b{re.escape(k.strip())}\\b", texto)``
+  TOKEN      ``k in set(texto.split())``
+
+La normalización (minúsculas, tildes) la decide el llamador: un matcher por
+forma del texto.
+"""
+from __future__ import annotations
+
+import re
+from typing import Dict, Iterable, List, Optional, Tuple
+
+SUBCADENA = "subcadena"
+PREFIJO = "prefijo"
+PALABRA = "palabra"
+TOKEN = "token"
+
+_MODOS = (SUBCADENA, PREFIJO, PALABRA, TOKEN)
+# Modo interno de PALABRA para la forma sin espacios: límite \b a ambos lados.
+_LIMITES = "limites"
+
+
+def _es_palabra(c: str) -> bool:
+    return c.isalnum() or c == "_"
+
+
+def _hay_limite(texto: str, i: int) -> bool:
+    """``\\b`` en la posición ``i`` (entre ``texto[i-1]`` y ``texto[i]``)."""
+    antes = i > 0 and _es_palabra(texto[i - 1])
+    despues = i < len(texto) and _es_palabra(texto[i])
+    return antes != despues
+
+
+def _regex_trie(claves: Iterable[str]) -> str:
+    """Alternancia en forma de trie; en cada nodo se prueba primero la continuación más larga."""
+    trie: dict = {}
+    for clave in claves:
+        nodo = trie
+        for ch in clave:
+            nodo = nodo.setdefault(ch, {})
+        nodo[""] = {}
+
+    def armar(nodo: dict) -> str:
+        ramas = [re.escape(ch) + armar(sub) for ch, sub in sorted(nodo.items()) if ch]
+        if not ramas:
+            return ""
+        cuerpo = ramas[0] if len(ramas) == 1 else "(?:" + "|".join(ramas) + ")"
+        return f"(?:{cuerpo})?" if "" in nodo else cuerpo
+
+    return armar(trie)
+
+
+class Coincidencias:
+    """Resultado de ``KeywordMatcher.buscar``: claves encontradas por categoría, en orden de aparición."""
+
+    __slots__ = ("_por_categoria",)
+
+    def __init__(self, por_categoria: Dict[str, Dict[str, None]]):
+        self._por_categoria = por_categoria
+
+    def tiene(self, categoria: str) -> bool:
+        return categoria in self._por_categoria
+
+    __contains__ = tiene
+
+    def cuenta(self, categoria: str) -> int:
+        """Cuántas entradas distintas de la tabla coinciden."""
+        return len(self._por_categoria.get(categoria, ()))
+
+    def primera(self, categoria: str) -> Optional[str]:
+        """La entrada que aparece primero en el mensaje, o None."""
+        return next(iter(self._por_categoria.get(categoria, ())), None)
+
+    def claves(self, categoria: str) -> List[str]:
+        return list(self._por_categoria.get(categoria, ()))
+
+    @property
+    def categorias(self) -> frozenset:
+        return frozenset(self._por_categoria)
+
+    def __repr__(self) -> str:
+        return f"Coincidencias({ {c: list(k) for c, k in self._por_categoria.items()} })"
+
+
+class KeywordMatcher:
+    """
+    ``KeywordMatcher({"saludo": (SUBCADENA, ("hola", "buenas")), ...})``.
+
+    Cada categoría es ``(modo, claves)``; una misma clave puede estar en
+    varias categorías. Las claves vacías se ignoran.
+    """
+
+    def __init__(self, tablas: Dict[str, Tuple[str, Iterable[str]]]):
+        # clave buscada → [(categoría, modo, entrada original)]
+        self._por_clave: Dict[str, List[Tuple[str, str, str]]] = {}
+        self._tokens: Dict[str, List[Tuple[str, str]]] = {}
+        for categoria, (modo, claves) in tablas.items():
+            if modo not in _MODOS:
+                raise ValueError(f"modo desconocido para {categoria!r}: {modo!r}")
+            for original in claves:
+                if not original:
+                    continue
+                if modo == TOKEN:
+                    self._tokens.setdefault(original, []).append((categoria, original))
+                elif modo == PALABRA:
+                    self._agregar(original, categoria, PREFIJO, original)
+                    if original.strip():
+                        self._agregar(original.strip(), categoria, _LIMITES, original)
+                else:
+                    self._agregar(original, categoria, modo, original)
+
+        # Para cada clave: todas las claves que son prefijo suyo (incluida ella),
+        # que son justamente las que también coinciden en la misma posición.
+        self._cierre: Dict[str, List[Tuple[str, List[Tuple[str, str, str]]]]] = {
+            clave: [(clave[:i], self._por_clave[clave[:i]]) for i in range(1, len(clave) + 1) if clave[:i] in self._por_clave]
+            for clave in self._por_clave
+        }
+        self._rx = re.compile(f"(?=({_regex_trie(self._por_clave)}))") if self._por_clave else None
+
+    def _agregar(self, clave: str, categoria: str, modo: str, original: str) -> None:
+        self._por_clave.setdefault(clave, []).append((categoria, modo, original))
+
+    def buscar(self, texto: str) -> Coincidencias:
+        """Todas las categorías que coinciden con ``texto`` (ya normalizado por el llamador)."""
+        encontradas: Dict[str, Dict[str, None]] = {}
+        if self._rx is not None and texto:
+            for m in self._rx.finditer(texto):
+                inicio = m.start()
+                for clave, entradas in self._cierre[m.group(1)]:
+                    for categoria, modo, original in entradas:
+                        if modo == PREFIJO and inicio != 0:
+                            continue
+                        if modo == _LIMITES and not (
+                            _hay_limite(texto, inicio) and _hay_limite(texto, inicio + len(clave))
+                        ):
+                            continue
+                        encontradas.setdefault(categoria, {})[original] = None
+        if self._tokens:
+            for token in texto.split():
+                for categoria, original in self._tokens.get(token, ()):
+                    encontradas.setdefault(categoria, {})[original] = None
+        return Coincidencias(encontradas)
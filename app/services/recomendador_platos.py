@@ -254,7 +254,7 @@ class RecomendadorPlatosConfiables:
     # API PÚBLICA
     # ─────────────────────────────────────────────────────────────────────────
 
-    def recomendar(
+    async def recomendar(
         self,
         client_id: int,
         deficit_kcal: float,
@@ -270,6 +270,10 @@ class RecomendadorPlatosConfiables:
         """
         Retorna N platos recomendados, confiables y variados.
 
+        El LLM y la construcción de platos nuevos se esperan en el loop del
+        llamador; las lecturas/escrituras de BD (sesión síncrona) van al
+        executor por defecto, una tras otra.
+
         Args:
             client_id: ID del cliente
             deficit_kcal: calorías que aún faltan en el día
@@ -286,7 +290,7 @@ class RecomendadorPlatosConfiables:
         excluir = set(s.lower().strip() for s in (excluir_nombres or []))
 
         # 1. Obtener historial reciente del cliente
-        historial = self._historial_reciente(client_id, dias=_HISTORIAL_DIAS)
+        historial = await asyncio.to_thread(self._historial_reciente, client_id, dias=_HISTORIAL_DIAS)
         excluir.update(historial)
 
         # Tokens prohibidos por condición dietética (Vegano, Vegetariano, etc.)
@@ -296,7 +300,8 @@ class RecomendadorPlatosConfiables:
         _pool_efectivo = _POOL_SIZE * 3 if tokens_prohibidos else _POOL_SIZE
 
         # 2. Candidatos desde BD (platos con macros reales)
-        candidatos_bd = self._candidatos_desde_bd(
+        candidatos_bd = await asyncio.to_thread(
+            self._candidatos_desde_bd,
             deficit_kcal=deficit_kcal,
             deficit_proteina=deficit_proteina,
             deficit_carb=deficit_carb,
@@ -331,7 +336,7 @@ class RecomendadorPlatosConfiables:
         if len(seleccionados) < n and self.plate_builder:
             faltantes = n - len(seleccionados)
             logger.info(f"BD pobre para este déficit. Generando {faltantes} platos nuevos vía IA...")
-            nuevos_platos = self._generar_y_validar_nuevos_platos(
+            nuevos_platos = await self._generar_y_validar_nuevos_platos(
                 client_id=client_id,
                 deficit_kcal=deficit_kcal,
                 deficit_proteina=deficit_proteina,
@@ -346,7 +351,7 @@ class RecomendadorPlatosConfiables:
 
         # 6. Guardar en historial para evitar repetición
         for plato in seleccionados:
-            self._guardar_recomendacion(client_id, plato)
+            await asyncio.to_thread(self._guardar_recomendacion, client_id, plato)
 
         logger.info(
             f"Recomendados {len(seleccionados)} platos para cliente {client_id} "
@@ -656,7 +661,7 @@ class RecomendadorPlatosConfiables:
     # GENERACIÓN EN TIEMPO REAL (ENRIQUECIMIENTO DE BD)
     # ─────────────────────────────────────────────────────────────────────────
 
-    def _generar_y_validar_nuevos_platos(
+    async def _generar_y_validar_nuevos_platos(
         self,
         client_id: int,
         deficit_kcal: float,
@@ -707,16 +712,7 @@ class RecomendadorPlatosConfiables:
                 "]"
             )
 
-            # Ejecutar LLM síncronamente (en un thread si estamos en async loop)
-            import asyncio
-            loop = asyncio.get_event_loop()
-            if loop.is_running():
-                import concurrent.futures
-                with concurrent.futures.ThreadPoolExecutor() as pool:
-                    future = pool.submit(asyncio.run, llm.generar_json(prompt=prompt, max_tokens=1500))
-                    propuestas = future.result(timeout=25)
-            else:
-                propuestas = loop.run_until_complete(llm.generar_json(prompt=prompt, max_tokens=1500))
+            propuestas = await asyncio.wait_for(llm.generar_json(prompt=prompt, max_tokens=1500), timeout=25)
 
             if not propuestas or not isinstance(propuestas, list):
                 return []
@@ -738,7 +734,7 @@ class RecomendadorPlatosConfiables:
                         continue
                 
                 # Construir plato (esto lo valida semánticamente y nutricionalmente, y LO GUARDA EN BD)
-                resultado = self.plate_builder.construir_plato(
+                resultado = await self.plate_builder.construir_plato_async(
                     nombre_plato=nombre,
                     ingredientes=ings,
                     client_id=client_id,
@@ -0,0 +1,268 @@
+"""
+Resúmenes semanales y mensuales por cliente (tablas resumen_semanal / resumen_mensual).
+
+progreso_calorias → fuente diaria (la mantienen los flujos de registro y
+                    recalcular_progreso_diario)
+resumen_*         → derivado: totales de kcal y macros, días registrados, días
+                    con ejercicio y adherencia de cada semana ISO y cada mes
+
+Actualización incremental: al cambiar una fila de progreso_calorias solo se
+recalculan la semana y el mes que contienen esa fecha (≤ 38 filas diarias) en
+la misma transacción. Las filas del periodo se crean o bloquean primero con
+``INSERT ... ON CONFLICT DO UPDATE`` y recién entonces se leen los días: dos
+commits concurrentes sobre la misma semana se serializan y el segundo suma lo
+que el primero ya confirmó. Los flujos ORM quedan cubiertos por los hooks de
+sesión (``instalar_hooks_resumen``, que llaman explícitamente el arranque de la
+app, cli.py, el scheduler y los scripts que escriben); los UPDATE/DELETE en SQL crudo llaman a
+``marcar_resumen``. ``backfill_resumenes`` (``python cli.py rollups``) los
+rellena desde cero.
+
+La adherencia diaria es la de /balance/semanal (``adherencia_dia``) con el
+objetivo del plan vigente al recalcular el periodo.
+"""
+from __future__ import annotations
+
+import calendar
+from datetime import date, timedelta
+from typing import Iterable, Optional
+
+from sqlalchemy import event
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from app.core.logging_config import get_logger
+from app.models.historial import ProgresoCalorias
+from app.models.nutricion import PlanDiario, PlanNutricional
+from app.models.resumen_periodo import ResumenMensual, ResumenSemanal
+
+logger = get_logger("resumen_periodos")
+
+OBJETIVO_DEFECTO = 2000.0
+_PENDIENTES = "resumenes_pendientes"
+_hooks_instalados = False
+
+
+def adherencia_dia(kcal_consumidas: float, kcal_objetivo: float) -> float:
+    """100% si lo consumido está en 90-110% del objetivo; penaliza el superávit excesivo."""
+    if kcal_consumidas <= 0 or kcal_objetivo <= 0:
+        return 0.0
+    ratio = kcal_consumidas / kcal_objetivo
+    if ratio <= 1.1:
+        adherencia = min(ratio, 1.0) * 100.0
+    else:
+        adherencia = max(0.0, (2.2 - ratio) / 1.1) * 100.0
+    return round(max(0.0, min(100.0, adherencia)), 1)
+
+
+def objetivos_plan(db: Session, client_id: int) -> tuple[float, dict[int, float]]:
+    """(objetivo base, {día ISO: kcal}) del plan más reciente, en una query (LEFT JOIN con sus días)."""
+    plan_reciente = db.query(PlanNutricional.id).filter(
+        PlanNutricional.client_id == client_id
+    ).order_by(PlanNutricional.fecha_creacion.desc()).limit(1).scalar_subquery()
+    filas = db.query(
+        PlanNutricional.calorias_ia_base, PlanDiario.dia_numero, PlanDiario.calorias_dia
+    ).outerjoin(PlanDiario, PlanDiario.plan_id == PlanNutricional.id).filter(
+        PlanNutricional.id == plan_reciente
+    ).all()
+
+    objetivo_base = OBJETIVO_DEFECTO
+    if filas and filas[0].calorias_ia_base:
+        objetivo_base = float(filas[0].calorias_ia_base)
+    plan_por_dia = {f.dia_numero: float(f.calorias_dia) for f in filas if f.dia_numero is not None}
+    return objetivo_base, plan_por_dia
+
+
+def rango_semana(fecha: date) -> tuple[date, date]:
+    lunes = fecha - timedelta(days=fecha.isoweekday() - 1)
+    return lunes, lunes + timedelta(days=6)
+
+
+def rango_mes(fecha: date) -> tuple[date, date]:
+    ultimo = calendar.monthrange(fecha.year, fecha.month)[1]
+    return fecha.replace(day=1), fecha.replace(day=ultimo)
+
+
+def _totales(filas: dict, inicio: date, fin: date, objetivo_base: float, plan_por_dia: dict) -> dict:
+    """Agrega los ProgresoCalorias (por fecha) de [inicio, fin]."""
+    t = {
+        "kcal_consumidas": 0.0, "kcal_quemadas": 0.0,
+        "proteinas_g": 0.0, "carbohidratos_g": 0.0, "grasas_g": 0.0,
+        "dias_registrados": 0, "dias_con_ejercicio": 0,
+    }
+    suma_objetivo = suma_adherencia = 0.0
+    dias = (fin - inicio).days + 1
+    for i in range(dias):
+        fecha = inicio + timedelta(days=i)
+        objetivo = plan_por_dia.get(fecha.isoweekday(), objetivo_base)
+        suma_objetivo += objetivo
+        p = filas.get(fecha)
+        if p is None:
+            continue
+        consumidas = float(p.calorias_consumidas or 0)
+        quemadas = float(p.calorias_quemadas or 0)
+        t["kcal_consumidas"] += consumidas
+        t["kcal_quemadas"] += quemadas
+        t["proteinas_g"] += float(p.proteinas_consumidas or 0)
+        t["carbohidratos_g"] += float(p.carbohidratos_consumidos or 0)
+        t["grasas_g"] += float(p.grasas_consumidas or 0)
+        if consumidas > 0:
+            t["dias_registrados"] += 1
+            suma_adherencia += adherencia_dia(consumidas, objetivo)
+        if quemadas > 0:
+            t["dias_con_ejercicio"] += 1
+    for k in ("kcal_consumidas", "kcal_quemadas", "proteinas_g", "carbohidratos_g", "grasas_g"):
+        t[k] = round(t[k], 1)
+    t["kcal_objetivo_promedio"] = round(suma_objetivo / dias, 1)
+    t["adherencia_pct"] = round(suma_adherencia / t["dias_registrados"], 1) if t["dias_registrados"] else 0.0
+    return t
+
+
+def _reservar_fila(db: Session, modelo, client_id: int, clave: dict, inicio: date, fin: date) -> None:
+    """
+    Crea la fila del periodo o, si ya existe, la bloquea hasta el commit
+    (``INSERT ... ON CONFLICT DO UPDATE``): otra transacción que inserte la
+    misma semana espera en vez de fallar con unique violation.
+    """
+    dialecto = {"postgresql": postgresql, "sqlite": sqlite}.get(db.get_bind().dialect.name)
+    if dialecto is None:
+        return  # sin upsert: _guardar crea la fila
+    stmt = dialecto.insert(modelo).values(client_id=client_id, fecha_inicio=inicio, fecha_fin=fin, **clave)
+    db.execute(stmt.on_conflict_do_update(
+        index_elements=["client_id", *clave],
+        set_={"fecha_inicio": stmt.excluded.fecha_inicio, "fecha_fin": stmt.excluded.fecha_fin},
+    ))
+
+
+def _guardar(db: Session, modelo, client_id: int, clave: dict, inicio: date, fin: date, totales: dict) -> None:
+    # populate_existing: una instancia ya cargada en la sesión puede traer valores
+    # anteriores al commit de otra transacción y el UPDATE omitiría columnas.
+    fila = db.query(modelo).populate_existing().filter_by(client_id=client_id, **clave).first()
+    if fila is None:
+        fila = modelo(client_id=client_id, **clave)
+        db.add(fila)
+    fila.fecha_inicio = inicio
+    fila.fecha_fin = fin
+    for k, v in totales.items():
+        setattr(fila, k, v)
+
+
+def recalcular_resumenes(db: Session, client_id: int, fechas: Iterable[date]) -> None:
+    """
+    Recalcula la semana ISO y el mes de cada fecha desde progreso_calorias.
+    No hace commit; una sola lectura de progreso cubre todos los periodos tocados.
+    """
+    semanas = sorted({rango_semana(f) for f in fechas})
+    meses = sorted({rango_mes(f) for f in fechas})
+    if not semanas:
+        return
+    desde = min(r[0] for r in semanas + meses)
+    hasta = max(r[1] for r in semanas + meses)
+
+    # Bloqueo antes de leer (en orden fijo, sin deadlocks entre transacciones): la
+    # lectura de progreso ya ve lo confirmado por quien tenía el periodo.
+    for inicio, fin in semanas:
+        anio, semana, _ = inicio.isocalendar()
+        _reservar_fila(db, ResumenSemanal, client_id, {"anio": anio, "semana": semana}, inicio, fin)
+    for inicio, fin in meses:
+        _reservar_fila(db, ResumenMensual, client_id, {"anio": inicio.year, "mes": inicio.month}, inicio, fin)
+
+    filas: dict = {}
+    for p in db.query(ProgresoCalorias).filter(
+        ProgresoCalorias.client_id == client_id,
+        ProgresoCalorias.fecha >= desde,
+        ProgresoCalorias.fecha <= hasta,
+    ).order_by(ProgresoCalorias.id).all():
+        filas.setdefault(p.fecha, p)
+    objetivo_base, plan_por_dia = objetivos_plan(db, client_id)
+
+    for inicio, fin in semanas:
+        anio, semana, _ = inicio.isocalendar()
+        _guardar(db, ResumenSemanal, client_id, {"anio": anio, "semana": semana}, inicio, fin,
+                 _totales(filas, inicio, fin, objetivo_base, plan_por_dia))
+    for inicio, fin in meses:
+        _guardar(db, ResumenMensual, client_id, {"anio": inicio.year, "mes": inicio.month}, inicio, fin,
+                 _totales(filas, inicio, fin, objetivo_base, plan_por_dia))
+
+
+def marcar_resumen(db: Session, client_id: int, fecha: date) -> None:
+    """Pide recalcular al commit los resúmenes de ``fecha`` (para escrituras en SQL crudo)."""
+    db.info.setdefault(_PENDIENTES, set()).add((client_id, fecha))
+
+
+# ── Hooks de sesión ──────────────────────────────────────────────────────────
+
+def _marcar_progreso_cambiado(session: Session) -> None:
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        if isinstance(obj, ProgresoCalorias) and obj.client_id is not None and obj.fecha is not None:
+            marcar_resumen(session, obj.client_id, obj.fecha)
+
+
+def _tras_flush(session: Session, flush_context) -> None:
+    _marcar_progreso_cambiado(session)
+
+
+def _antes_de_commit(session: Session) -> None:
+    # Cambios aún sin flush (el flush del commit viene después de este hook).
+    _marcar_progreso_cambiado(session)
+    if not session.info.get(_PENDIENTES):
+        return
+    session.flush()
+    pendientes = session.info.pop(_PENDIENTES, set())
+    por_cliente: dict[int, set] = {}
+    for client_id, fecha in pendientes:
+        por_cliente.setdefault(client_id, set()).add(fecha)
+    for client_id, fechas in por_cliente.items():
+        try:
+            # SAVEPOINT: un fallo del resumen no debe tumbar el registro del usuario.
+            with session.begin_nested():
+                recalcular_resumenes(session, client_id, fechas)
+        except Exception as e:
+            logger.warning(f"resumenes cliente={client_id}: no se pudieron recalcular ({e})")
+
+
+def _tras_rollback(session: Session, transaccion) -> None:
+    if not transaccion.nested:
+        session.info.pop(_PENDIENTES, None)
+
+
+def instalar_hooks_resumen() -> None:
+    """Engancha el recálculo a todas las sesiones ORM (idempotente)."""
+    global _hooks_instalados
+    if _hooks_instalados:
+        return
+    event.listen(Session, "after_flush", _tras_flush)
+    event.listen(Session, "before_commit", _antes_de_commit)
+    event.listen(Session, "after_soft_rollback", _tras_rollback)
+    _hooks_instalados = True
+
+
+# ── Backfill ─────────────────────────────────────────────────────────────────
+
+def backfill_resumenes(
+    db: Session,
+    client_id: Optional[int] = None,
+    desde: Optional[date] = None,
+) -> dict:
+    """
+    Recalcula todos los resúmenes desde progreso_calorias (un commit por cliente).
+    Devuelve {"clientes", "semanas", "meses"}.
+    """
+    consulta = db.query(ProgresoCalorias.client_id).distinct()
+    if client_id is not None:
+        consulta = consulta.filter(ProgresoCalorias.client_id == client_id)
+    if desde is not None:
+        consulta = consulta.filter(ProgresoCalorias.fecha >= desde)
+    clientes = sorted(cid for (cid,) in consulta.all())
+
+    resultado = {"clientes": 0, "semanas": 0, "meses": 0}
+    for cid in clientes:
+        fechas_q = db.query(ProgresoCalorias.fecha).filter(ProgresoCalorias.client_id == cid)
+        if desde is not None:
+            fechas_q = fechas_q.filter(ProgresoCalorias.fecha >= desde)
+        fechas = {f for (f,) in fechas_q.distinct().all()}
+        recalcular_resumenes(db, cid, fechas)
+        db.commit()
+        resultado["clientes"] += 1
+        resultado["semanas"] += len({rango_semana(f) for f in fechas})
+        resultado["meses"] += len({rango_mes(f) for f in fechas})
+    return resultado
@@ -3,6 +3,7 @@ Trazabilidad de ingesta.
 
 comida_registros  → fuente de verdad auditada por evento
 progreso_calorias → derivado: recalcular_progreso_diario() lo mantiene sincronizado
+resumen_semanal / resumen_mensual → derivados de progreso_calorias (resumen_periodos.py)
 """
 from __future__ import annotations
 
@@ -15,6 +16,7 @@ from sqlalchemy.orm import Session
 from app.core.logging_config import get_logger
 from app.models.comida_registro import ComidaRegistro
 from app.models.historial import ProgresoCalorias
+from app.services.resumen_periodos import marcar_resumen
 
 logger = get_logger("trazabilidad")
 
@@ -47,7 +49,8 @@ def recalcular_progreso_diario(
 ) -> ProgresoCalorias:
     """
     Suma los ComidaRegistro del día y actualiza (o crea) la fila en progreso_calorias.
-    Retorna el objeto actualizado sin hacer commit.
+    Retorna el objeto actualizado sin hacer commit (al hacerlo se recalculan
+    también los resúmenes de la semana y el mes de ``fecha``).
     """
     totales = db.query(
         sqlfunc.coalesce(sqlfunc.sum(ComidaRegistro.kcal), 0.0),
@@ -72,6 +75,8 @@ def recalcular_progreso_diario(
     progreso.carbohidratos_consumidos = round(float(totales[2]), 1)
     progreso.grasas_consumidas        = round(float(totales[3]), 1)
 
+    # Resumen semanal / mensual de esa fecha: se recalcula al commit.
+    marcar_resumen(db, client_id, fecha)
     return progreso
 
 
@@ -9,6 +9,9 @@ Uso dentro del contenedor Docker:
     python cli.py cleanup --fix   # Limpieza real
     python cli.py health          # Health check
     python cli.py stats           # Estadísticas del sistema
+    python cli.py stats --cache   # Solo métricas de caché (todos los workers)
+    python cli.py rollups         # Recalcular resúmenes semanales/mensuales
+    python cli.py rollups --cliente 12 --desde 2026-01-01
     python cli.py version         # Versión del sistema
 
 Desde Windows (fuera del contenedor):
@@ -32,8 +35,10 @@ console = Console(force_terminal=_IS_TTY, highlight=False)
 
 
 def _get_db():
-    """Obtiene sesión de BD de producción."""
+    """Obtiene sesión de BD de producción (con los hooks de resúmenes instalados)."""
     from app.core.database import SessionLocal
+    from app.services.resumen_periodos import instalar_hooks_resumen
+    instalar_hooks_resumen()
     return SessionLocal()
 
 
@@ -177,27 +182,107 @@ def cmd_health(use_json: bool):
 # stats
 # ─────────────────────────────────────────────────────────────────────────────
 
+def _metricas_cache() -> dict:
+    """Agrega las métricas de caché publicadas por los workers de este host."""
+    from app.core.config import settings
+    from app.core.cache_metrics import read_published, merge_snapshots
+    return merge_snapshots(read_published(settings.CALOFIT_METRICS_DIR))
+
+
+def _imprimir_metricas_cache(data: dict) -> None:
+    from rich.table import Table
+
+    console.print(f"Métricas de caché — workers: {len(data['workers'])}")
+    if not data["caches"]:
+        console.print("  (sin métricas publicadas todavía)")
+        return
+    table = Table(show_lines=False)
+    for col in ("caché", "prefijo", "hits", "misses", "hit %", "sets",
+                "expir.", "expuls.", "entradas", "bytes", "ms prom", "ms máx"):
+        table.add_column(col, justify="left" if col in ("caché", "prefijo") else "right")
+    for cache, c in sorted(data["caches"].items()):
+        filas = sorted(c["prefixes"].items()) + [("TOTAL", c["total"])]
+        for prefijo, d in filas:
+            table.add_row(
+                cache, prefijo, str(d["hits"]), str(d["misses"]), f"{d['hit_rate'] * 100:.1f}",
+                str(d["sets"]), str(d["expirations"]), str(d["evictions"]),
+                str(d["entries"]), str(d["bytes"]),
+                f"{d['lookup_ms_avg']:.3f}", f"{d['lookup_ms_max']:.3f}",
+            )
+    console.print(table)
+
+
 @cli.command("stats")
 @click.option("--json", "use_json", is_flag=True, default=False, help="Exportar en JSON")
-def cmd_stats(use_json: bool):
+@click.option("--cache", "solo_cache", is_flag=True, default=False, help="Solo métricas de caché")
+def cmd_stats(use_json: bool, solo_cache: bool):
     """
     Estadisticas del sistema.
 
-    Muestra: totales, promedios nutricionales (7d), top alimentos, ejercicio.
+    Muestra: totales, promedios nutricionales (7d), top alimentos, ejercicio
+    y métricas de caché agregadas de todos los workers.
     """
     console.print("CaloFit Stats")
+    stats: dict = {}
+    error = False
+    if not solo_cache:
+        db = _get_db()
+        try:
+            from scripts.stats import obtener_estadisticas, imprimir_estadisticas
+            stats = obtener_estadisticas(db)
+            if not (use_json or not _IS_TTY):
+                imprimir_estadisticas(stats)
+        except Exception as e:
+            console.print(f"Error obteniendo stats: {e}")
+            error = True
+        finally:
+            db.close()
+
+    cache = _metricas_cache()
+    if use_json or not _IS_TTY:
+        _print_json({**stats, "cache": cache} if not solo_cache else cache)
+    else:
+        _imprimir_metricas_cache(cache)
+    if error:
+        sys.exit(1)
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# rollups
+# ─────────────────────────────────────────────────────────────────────────────
+
+@cli.command("rollups")
+@click.option("--cliente", "client_id", type=int, default=None, help="Solo este client_id")
+@click.option("--desde", default=None, help="Solo periodos con días desde YYYY-MM-DD")
+@click.option("--json", "use_json", is_flag=True, default=False, help="Exportar en JSON")
+def cmd_rollups(client_id: int, desde: str, use_json: bool):
+    """
+    Backfill de resumen_semanal / resumen_mensual desde progreso_calorias.
+
+    Idempotente: recalcula cada semana ISO y mes con días registrados
+    (un commit por cliente). Correr tras aplicar la migración 010.
+    """
+    from datetime import date
+
+    console.print("CaloFit Rollups — recalculando resúmenes...")
     db = _get_db()
     try:
-        from scripts.stats import obtener_estadisticas, imprimir_estadisticas
-        stats = obtener_estadisticas(db)
-
+        from app.services.resumen_periodos import backfill_resumenes
+        resultado = backfill_resumenes(
+            db,
+            client_id=client_id,
+            desde=date.fromisoformat(desde) if desde else None,
+        )
         if use_json or not _IS_TTY:
-            _print_json(stats)
+            _print_json(resultado)
         else:
-            imprimir_estadisticas(stats)
-
+            console.print(
+                f"Clientes: {resultado['clientes']} | semanas: {resultado['semanas']} "
+                f"| meses: {resultado['meses']}"
+            )
     except Exception as e:
-        console.print(f"Error obteniendo stats: {e}")
+        db.rollback()
+        console.print(f"Error en rollups: {e}")
         sys.exit(1)
     finally:
         db.close()
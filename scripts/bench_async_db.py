@@ -0,0 +1,113 @@
+"""
+Benchmark de concurrencia: rutas de lectura con sesión síncrona vs engine async.
+
+Carga mixta dentro de un mismo event loop (como un worker de uvicorn):
+  - CHATS corutinas "de chat" que esperan al LLM en pasos de TICK segundos
+    (``asyncio.sleep``) y miden cuánto se retrasa cada paso;
+  - LECTURAS requests de lectura concurrentes, cada una con una query lenta
+    (``SELECT pg_sleep(LATENCIA_QUERY)``, como un /balance/historico pesado).
+
+Modos:
+  - "sync en async def": ``SessionLocal()`` dentro de la corutina, como las rutas
+                         ``async def`` con ``Depends(get_db)``: la query bloquea el loop
+  - "async (asyncpg)":   ``AsyncSessionLocal()``, como ``Depends(get_async_db)``
+
+Reporta lecturas/s, duración total y retraso de los ticks del chat (p50/p95/máx).
+Requiere Postgres (DATABASE_URL) y asyncpg.
+
+Ejecutar:
+  python scripts/bench_async_db.py
+  docker exec calofit_backend python scripts/bench_async_db.py
+"""
+from __future__ import annotations
+
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import text  # noqa: E402
+
+from app.core.database import AsyncSessionLocal, SessionLocal, dispose_async_engine  # noqa: E402
+
+CHATS = 20
+TICK = 0.02
+LECTURAS = 40
+CONCURRENCIA_LECTURAS = 10
+LATENCIA_QUERY = 0.05
+
+_QUERY = text("SELECT pg_sleep(:s)")
+
+
+async def _lectura_sync():
+    db = SessionLocal()
+    try:
+        db.execute(_QUERY, {"s": LATENCIA_QUERY})
+    finally:
+        db.close()
+
+
+async def _lectura_async():
+    async with AsyncSessionLocal() as db:
+        await db.execute(_QUERY, {"s": LATENCIA_QUERY})
+
+
+async def _chat(retrasos: list, fin: asyncio.Event):
+    while not fin.is_set():
+        t = time.perf_counter()
+        await asyncio.sleep(TICK)
+        retrasos.append((time.perf_counter() - t - TICK) * 1000.0)
+
+
+async def _correr(lectura) -> dict:
+    retrasos: list = []
+    fin = asyncio.Event()
+    chats = [asyncio.create_task(_chat(retrasos, fin)) for _ in range(CHATS)]
+    sem = asyncio.Semaphore(CONCURRENCIA_LECTURAS)
+
+    async def una():
+        async with sem:
+            await lectura()
+
+    await lectura()  # calentar el pool
+    t0 = time.perf_counter()
+    await asyncio.gather(*(una() for _ in range(LECTURAS)))
+    dur = time.perf_counter() - t0
+    fin.set()
+    await asyncio.gather(*chats)
+    retrasos.sort()
+    return {
+        "s": dur,
+        "rps": LECTURAS / dur,
+        "p50": statistics.median(retrasos),
+        "p95": retrasos[int(len(retrasos) * 0.95) - 1],
+        "max": retrasos[-1],
+    }
+
+
+async def main_async() -> list:
+    try:
+        return [
+            ("sync en async def", await _correr(_lectura_sync)),
+            ("async (asyncpg)", await _correr(_lectura_async)),
+        ]
+    finally:
+        await dispose_async_engine()
+
+
+def main() -> None:
+    filas = asyncio.run(main_async())
+    print(
+        f"{LECTURAS} lecturas (query de {LATENCIA_QUERY * 1000:.0f} ms, {CONCURRENCIA_LECTURAS} a la vez) "
+        f"+ {CHATS} chats con ticks de {TICK * 1000:.0f} ms\n"
+    )
+    print(f"{'modo':<20}{'total s':>9}{'lect/s':>9}{'tick p50':>10}{'p95':>9}{'máx ms':>9}")
+    for nombre, r in filas:
+        print(f"{nombre:<20}{r['s']:>9.2f}{r['rps']:>9.1f}{r['p50']:>10.1f}{r['p95']:>9.1f}{r['max']:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""
+Benchmark: datos de /balance/semanal con 2 queries por día vs 2 queries por semana.
+
+Compara el acceso anterior (por cada día: ProgresoCalorias + COUNT de
+workout_logs, 14 round trips) con ``_datos_semana`` (rango de progreso + conteo
+agrupado por fecha, 2 round trips) sobre SQLite con un año de datos de varios
+clientes. Cada sentencia paga además un RTT simulado (``RTTS_MS``, hook
+before_cursor_execute) como la latencia de red hacia Postgres.
+
+Reporta queries por request y ms por request (media de N requests).
+
+Ejecutar:
+  python scripts/bench_balance_semanal.py
+  docker exec calofit_backend python scripts/bench_balance_semanal.py
+"""
+from __future__ import annotations
+
+import os
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine, event, text  # noqa: E402
+from sqlalchemy.orm import Session  # noqa: E402
+
+from app.api.routes.balance import _datos_semana  # noqa: E402
+from app.core.query_counter import contar_queries  # noqa: E402
+from app.models.historial import ProgresoCalorias  # noqa: E402
+from app.models.workout_models import WorkoutLog  # noqa: E402
+
+CLIENTES = 50
+DIAS = 365
+EJERCICIOS_POR_DIA = 3
+N = 200
+RTTS_MS = (0.0, 0.5, 2.0)
+CLIENTE = 7
+
+
+def _por_dia(db: Session, client_id: int, lunes: date) -> tuple[dict, dict]:
+    """Acceso anterior: dos queries por cada día de la semana."""
+    progreso, ejercicios = {}, {}
+    for i in range(7):
+        fecha = lunes + timedelta(days=i)
+        progreso[fecha] = db.query(ProgresoCalorias).filter(
+            ProgresoCalorias.client_id == client_id,
+            ProgresoCalorias.fecha == fecha,
+        ).first()
+        ejercicios[fecha] = db.execute(text(
+            "SELECT COUNT(*) FROM workout_logs WHERE client_id = :cid AND date(created_at) = :fecha"
+        ), {"cid": client_id, "fecha": fecha.isoformat()}).scalar() or 0
+    return progreso, ejercicios
+
+
+def _sembrar(engine, hoy: date) -> None:
+    ProgresoCalorias.__table__.create(engine)
+    WorkoutLog.__table__.create(engine)
+    with Session(engine) as db:
+        for cid in range(1, CLIENTES + 1):
+            for d in range(DIAS):
+                fecha = hoy - timedelta(days=d)
+                db.add(ProgresoCalorias(client_id=cid, fecha=fecha, calorias_consumidas=1800 + d % 400, calorias_quemadas=250))
+                base = datetime.combine(fecha, datetime.min.time())
+                for k in range(EJERCICIOS_POR_DIA):
+                    db.add(WorkoutLog(client_id=cid, ejercicio="Sentadilla", series=3, reps=10,
+                                      created_at=base + timedelta(hours=8 + k * 3)))
+        db.commit()
+
+
+def _medir(engine, fn, lunes: date) -> tuple[int, float]:
+    with Session(engine) as db, contar_queries() as c:
+        fn(db, CLIENTE, lunes)
+    queries = c.total
+    t0 = time.perf_counter()
+    for _ in range(N):
+        with Session(engine) as db:
+            fn(db, CLIENTE, lunes)
+    return queries, (time.perf_counter() - t0) * 1000.0 / N
+
+
+def main() -> None:
+    hoy = date.today()
+    lunes = hoy - timedelta(days=hoy.isoweekday() - 1)
+    ruta = os.path.join(tempfile.mkdtemp(), "bench_semanal.sqlite3")
+    engine = create_engine(f"sqlite:///{ruta}")
+    _sembrar(engine, hoy)
+    with engine.begin() as conn:
+        conn.execute(text("CREATE INDEX ix_progreso_cliente_fecha ON progreso_calorias (client_id, fecha)"))
+
+    rtt = {"s": 0.0}
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _latencia_red(*_):
+        if rtt["s"]:
+            time.sleep(rtt["s"])
+
+    with Session(engine) as db:
+        antes = {f: n for f, n in _por_dia(db, CLIENTE, lunes)[1].items() if n}
+        assert antes == _datos_semana(db, CLIENTE, lunes)[1], "los conteos no coinciden"
+
+    print(f"{CLIENTES} clientes × {DIAS} días, {EJERCICIOS_POR_DIA} ejercicios/día; {N} requests por fila\n")
+    print(f"{'RTT ms':>7}  {'modo':<18}{'queries':>8}{'ms/req':>9}")
+    for rtt_ms in RTTS_MS:
+        rtt["s"] = rtt_ms / 1000.0
+        for nombre, fn in (("por día (antes)", _por_dia), ("rango (ahora)", _datos_semana)):
+            queries, ms = _medir(engine, fn, lunes)
+            print(f"{rtt_ms:>7.1f}  {nombre:<18}{queries:>8}{ms:>9.2f}")
+    engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""
+Microbenchmark: tier caliente de app.core.cache vs round-trip JSON histórico.
+
+Compara, para payloads reales del asistente (tarjeta de consulta y lista de
+comidas recientes):
+  - latencia media de un hit (µs)
+  - bytes asignados por hit (pico de tracemalloc)
+
+"json" reproduce el caché anterior (dict → json.dumps en set, json.loads en
+cada get); "hot" usa get_cached/set_cached actuales con backend memory.
+
+Ejecutar:
+  python scripts/bench_cache_hot_tier.py
+  docker exec calofit_backend python scripts/bench_cache_hot_tier.py
+"""
+from __future__ import annotations
+
+import json
+import os
+import sys
+import timeit
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.core import cache  # noqa: E402
+from app.core.cache_backends import MemoryBackend  # noqa: E402
+
+N = 20_000
+
+CONSULTA = {
+    "nombre": "Lomo saltado con arroz",
+    "calorias": 720.5,
+    "proteinas_g": 38.2,
+    "carbohidratos_g": 74.0,
+    "grasas_g": 27.9,
+    "origen": "platos",
+    "ingredientes": [
+        f"* {g}g de {n} ({k} kcal | P: {p}g | C: {c}g | G: {gr}g)"
+        for n, g, k, p, c, gr in [
+            ("lomo de res", 150, 250, 30, 0, 14),
+            ("arroz blanco", 200, 260, 5, 56, 0.5),
+            ("papa frita", 100, 150, 2, 18, 8),
+            ("cebolla", 60, 24, 0.7, 5, 0.1),
+            ("tomate", 60, 11, 0.5, 2.3, 0.1),
+        ]
+    ],
+    "secciones": {"preparacion": ["Saltear la carne", "Agregar verduras", "Servir con arroz"]},
+}
+RECIENTES = [dict(CONSULTA, nombre=f"Plato {i}") for i in range(10)]
+
+
+def _pico_bytes_por_hit(fn) -> int:
+    """Memoria asignada por un hit (pico, porque el resultado se libera enseguida)."""
+    fn()
+    tracemalloc.start()
+    tracemalloc.reset_peak()
+    base = tracemalloc.get_traced_memory()[0]
+    fn()
+    pico = tracemalloc.get_traced_memory()[1] - base
+    tracemalloc.stop()
+    return pico
+
+
+def main() -> None:
+    # Sin los print de depuración por hit (DEBUG=True por defecto).
+    cache.settings.DEBUG = False
+    cache.set_backend(MemoryBackend())
+    print(f"{'payload':<12} {'modo':<6} {'µs/hit':>9} {'pico bytes/hit':>15}")
+    for nombre, valor in (("consulta", CONSULTA), ("recientes", RECIENTES)):
+        raw = json.dumps(valor, ensure_ascii=False)
+        cache.set_cached(f"bench:{nombre}", valor, ttl_seconds=600)
+
+        def hit_json():
+            return json.loads(raw)
+
+        def hit_hot():
+            return cache.get_cached(f"bench:{nombre}")
+
+        for modo, fn in (("json", hit_json), ("hot", hit_hot)):
+            us = timeit.timeit(fn, number=N) / N * 1e6
+            pico = _pico_bytes_por_hit(fn)
+            print(f"{nombre:<12} {modo:<6} {us:>9.2f} {pico:>15}")
+    print(f"\n(N={N} hits por medición)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+"""
+Microbenchmark: resolución de ingredientes desde código async, API síncrona vs async.
+
+Simula R requests concurrentes dentro de un event loop (como un endpoint async),
+cada uno resolviendo I ingredientes desconocidos (todos van al LLM). El LLM es
+falso (``asyncio.sleep``) y la BD/caché van en memoria, así que lo que se mide
+es el costo de orquestación:
+  - "sync en loop":  ``resolver_ingrediente`` llamado directo desde la corutina
+                     (bloquea el loop; cada LLM abre un ThreadPoolExecutor + asyncio.run)
+  - "sync to_thread": ``resolver_ingrediente`` vía ``asyncio.to_thread``
+                     (cada LLM crea un event loop nuevo en el hilo del executor)
+  - "async":          ``resolver_ingrediente_async`` (el LLM se espera en el mismo loop)
+
+Reporta tiempo total, hilos arrancados y event loops creados.
+
+Ejecutar:
+  python scripts/bench_food_resolver_async.py
+  docker exec calofit_backend python scripts/bench_food_resolver_async.py
+"""
+from __future__ import annotations
+
+import asyncio
+import json
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.nutrition.food.resolver.cache_manager import CacheManager  # noqa: E402
+from app.services.nutrition.food.resolver.source_resolver import FoodSourceResolver  # noqa: E402
+
+REQUESTS = 20
+INGREDIENTES = 5
+LATENCIA_LLM = 0.05
+
+MACROS = {"calorias_100g": 120.0, "proteina_100g": 2.5, "carbohidratos_100g": 28.0, "grasas_100g": 0.3}
+
+
+class _LLMFalso:
+    async def completar(self, prompt, max_tokens=512, **kw):
+        await asyncio.sleep(LATENCIA_LLM)
+        return json.dumps(MACROS)
+
+
+class _CacheEnMemoria(CacheManager):
+    def __init__(self):
+        super().__init__(db=None)
+        self._datos = {}
+
+    def obtener_del_cache(self, food_normalized, user_id):
+        return self._datos.get((food_normalized, user_id))
+
+    def guardar_en_cache(self, food_normalized, user_id, macros, source, alimento_id=None):
+        self._datos[(food_normalized, user_id)] = {"macros": macros, "alimento_id": alimento_id}
+        return True
+
+
+class _ResolverBench(FoodSourceResolver):
+    def __init__(self):
+        super().__init__(db=None, cache_manager=_CacheEnMemoria(), llm_service=_LLMFalso())
+
+    def _buscar_bd_local(self, nombre_norm):
+        return None
+
+    def _persistir_en_bd(self, nombre, nombre_norm, macros, source):
+        return 1
+
+
+def _nombres(ronda: str, r: int):
+    return [f"fruta {ronda} {r} {i}" for i in range(INGREDIENTES)]
+
+
+async def _sync_en_loop(ronda: str, r: int):
+    resolver = _ResolverBench()
+    return [resolver.resolver_ingrediente(n, user_id=r) for n in _nombres(ronda, r)]
+
+
+async def _sync_to_thread(ronda: str, r: int):
+    resolver = _ResolverBench()
+    return [await asyncio.to_thread(resolver.resolver_ingrediente, n, r) for n in _nombres(ronda, r)]
+
+
+async def _async(ronda: str, r: int):
+    resolver = _ResolverBench()
+    return [await resolver.resolver_ingrediente_async(n, user_id=r) for n in _nombres(ronda, r)]
+
+
+def _medir(nombre: str, request_fn) -> dict:
+    contadores = {"hilos": 0, "loops": 0}
+    start_original = threading.Thread.start
+    loop_original = asyncio.events.new_event_loop
+
+    def start(self, *a, **kw):
+        contadores["hilos"] += 1
+        return start_original(self, *a, **kw)
+
+    def new_event_loop():
+        contadores["loops"] += 1
+        return loop_original()
+
+    async def main():
+        return await asyncio.gather(*(request_fn(nombre, r) for r in range(REQUESTS)))
+
+    threading.Thread.start = start
+    asyncio.events.new_event_loop = new_event_loop
+    try:
+        t0 = time.perf_counter()
+        resultados = asyncio.run(main())
+        dur = time.perf_counter() - t0
+    finally:
+        threading.Thread.start = start_original
+        asyncio.events.new_event_loop = loop_original
+
+    ok = sum(1 for req in resultados for res in req if res["source"] == "LLM_Estimado")
+    return {
+        "modo": nombre,
+        "ms": dur * 1000.0,
+        "hilos": contadores["hilos"],
+        "loops": contadores["loops"] - 1,  # sin contar el de asyncio.run(main())
+        "ok": ok,
+    }
+
+
+def main() -> None:
+    filas = [
+        _medir("sync en loop", _sync_en_loop),
+        _medir("sync to_thread", _sync_to_thread),
+        _medir("async", _async),
+    ]
+    total = REQUESTS * INGREDIENTES
+    print(
+        f"{REQUESTS} requests × {INGREDIENTES} ingredientes, LLM falso de {LATENCIA_LLM * 1000:.0f} ms\n"
+    )
+    print(f"{'modo':<16}{'total ms':>10}{'hilos':>8}{'loops':>8}{'ok':>8}")
+    for f in filas:
+        print(f"{f['modo']:<16}{f['ms']:>10.1f}{f['hilos']:>8}{f['loops']:>8}{f['ok']:>5}/{total}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+"""
+Microbenchmark: guardas de routing del asistente, ``any(k in msg ...)`` vs KeywordMatcher.
+
+Corpus: scripts/data/intenciones_corpus.jsonl (mensajes reales de usuario y
+frases curadas, ver entrenar_clasificador_intencion.py). Por mensaje se evalúan
+las mismas guardas que corren en cada ``consultar``:
+  - saludo / acción / respuesta          (AsistenteService.consultar)
+  - bloqueo absoluto + señales off-topic (tokens sin tildes)
+  - comida / ejercicio / registro / ...  (detectar_modo_funcion)
+  - modales / recetas / consumo claro    (resolver_modo_funcion, texto sin tildes)
+
+"legacy" reimplementa los escaneos tal como estaban (una tupla por guarda,
+``re.search`` por verbo con límites de palabra); "matcher" usa los
+``KeywordMatcher`` compilados de los módulos. Antes de medir se verifica que
+ambos den exactamente lo mismo para todo el corpus.
+
+Ejecutar:
+  python scripts/bench_keyword_matcher.py
+  docker exec calofit_backend python scripts/bench_keyword_matcher.py
+"""
+from __future__ import annotations
+
+import json
+import os
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.asistente import asistente_modos as am  # noqa: E402
+from app.services.asistente import asistente_service as asv  # noqa: E402
+from app.services.asistente.asistente_service import _deaccent  # noqa: E402
+
+CORPUS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "intenciones_corpus.jsonl")
+REPETICIONES = 50
+
+
+def _palabra(v: str, texto: str) -> bool:
+    return texto.startswith(v) or bool(re.search(rf"\b{re.escape(v.strip())}\b", texto))
+
+
+def _legacy(msg: str) -> tuple:
+    m = msg.lower().strip()
+    mn = _deaccent(m)
+    tokens = set(mn.split())
+    return (
+        any(r in m for r in asv._KW_RESPUESTA),
+        any(s in m for s in asv._KW_SALUDO),
+        any(k in m for k in asv._KW_ACCION),
+        next((t for t in mn.split() if t in asv._BLOQUEO_ABSOLUTO), None),
+        bool(tokens & asv._SEÑALES_NUTRICION),
+        any(m.startswith(v) for v in am._VERBOS_IMPERATIVOS_REGISTRO),
+        any(k in m for k in am._NO_SALUDO_PURO),
+        sum(1 for x in am._CTX_COMIDA if x in m),
+        sum(1 for x in am._CTX_EJERCICIO if x in m),
+        sum(1 for v in am._VERBOS_LOG if _palabra(v, m)),
+        any(x in m for x in am._REGISTRO),
+        any(x in m for x in am._REC_NUT),
+        any(x in m for x in am._EJERCICIO_REGISTRADO),
+        any(x in m for x in am._PERMISO_EJ_SYNC),
+        any(x in m for x in am._REC_EX),
+        any(mn.startswith(p) or f" {p}" in mn for p in am._MODALES),
+        any(k in mn for k in am._RECETA_O_TECNICA),
+        any(_palabra(v, mn) for v in am._CONSUMO_CLARO_NORM),
+    )
+
+
+def _matcher(msg: str) -> tuple:
+    m = msg.lower().strip()
+    mn = _deaccent(m)
+    s = asv._GUARDA_SALUDO.buscar(m)
+    t = asv._GUARDA_TOKENS.buscar(mn)
+    c = am._GUARDAS_MODO.buscar(m)
+    cn = am._GUARDAS_MODO_NORM.buscar(mn)
+    return (
+        s.tiene("respuesta"),
+        s.tiene("saludo"),
+        s.tiene("accion"),
+        t.primera("bloqueo_absoluto"),
+        t.tiene("senal_nutricion"),
+        c.tiene("imperativo_registro"),
+        c.tiene("no_saludo_puro"),
+        c.cuenta("comida"),
+        c.cuenta("ejercicio"),
+        c.cuenta("verbo_log"),
+        c.tiene("registro"),
+        c.tiene("rec_nut"),
+        c.tiene("ejercicio_registrado"),
+        c.tiene("permiso_ejercicio"),
+        c.tiene("rec_ex"),
+        cn.tiene("modal_inicio") or cn.tiene("modal"),
+        cn.tiene("receta_tecnica"),
+        cn.tiene("consumo_claro"),
+    )
+
+
+def _medir(fn, mensajes: list) -> float:
+    t0 = time.perf_counter()
+    for _ in range(REPETICIONES):
+        for msg in mensajes:
+            fn(msg)
+    return (time.perf_counter() - t0) / (REPETICIONES * len(mensajes)) * 1e6
+
+
+def main() -> None:
+    with open(CORPUS_PATH, encoding="utf-8") as f:
+        mensajes = [json.loads(linea)["texto"] for linea in f if linea.strip()]
+
+    distintos = [msg for msg in mensajes if _legacy(msg) != _matcher(msg)]
+    if distintos:
+        for msg in distintos[:10]:
+            print(f"  ≠ {msg!r}\n    legacy : {_legacy(msg)}\n    matcher: {_matcher(msg)}")
+        raise SystemExit(f"{len(distintos)} mensajes con resultado distinto")
+
+    tablas = (
+        am._VERBOS_IMPERATIVOS_REGISTRO, am._NO_SALUDO_PURO, am._CTX_COMIDA, am._CTX_EJERCICIO,
+        am._VERBOS_LOG, am._REGISTRO, am._REC_NUT, am._EJERCICIO_REGISTRADO, am._PERMISO_EJ_SYNC,
+        am._REC_EX, am._MODALES, am._RECETA_O_TECNICA, am._CONSUMO_CLARO_NORM,
+        asv._KW_SALUDO, asv._KW_ACCION, asv._KW_RESPUESTA,
+    )
+    print(
+        f"{len(mensajes)} mensajes × {REPETICIONES}, {sum(len(t) for t in tablas)} palabras clave, "
+        f"resultados idénticos\n"
+    )
+    filas = [("legacy any()", _medir(_legacy, mensajes)), ("matcher", _medir(_matcher, mensajes))]
+    base = filas[0][1]
+    print(f"{'modo':<16}{'µs/mensaje':>12}{'speedup':>10}")
+    for nombre, us in filas:
+        print(f"{nombre:<16}{us:>12.1f}{base / us:>9.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,163 @@
+"""
+Benchmark: /nutricionista/stats recorriendo historiales en Python vs agregado en SQL.
+
+Compara el cálculo anterior (carga cada paciente con ``progreso_calorias`` e
+``historial_peso`` por relaciones lazy, ``any(r.fecha == dia ...)`` por cada día
+y paciente, y ``alertas.all()`` para contar pacientes con alerta) con
+``_calcular_stats`` (un número fijo de queries agrupadas) sobre SQLite con una
+cartera sintética de ``PACIENTES`` pacientes y ``DIAS`` días de historial.
+Cada sentencia paga además un RTT simulado (``RTTS_MS``).
+
+Reporta queries por request y ms por request (media de N requests), y comprueba
+que ambos cálculos devuelven las mismas cifras.
+
+Ejecutar:
+  python scripts/bench_nutri_stats.py
+  docker exec calofit_backend python scripts/bench_nutri_stats.py
+"""
+from __future__ import annotations
+
+import os
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine, event, text  # noqa: E402
+from sqlalchemy.dialects.postgresql import ARRAY  # noqa: E402
+from sqlalchemy.ext.compiler import compiles  # noqa: E402
+from sqlalchemy.orm import Session  # noqa: E402
+
+from app.api.routes.nutricionista import _calcular_stats, calcular_progreso_paciente  # noqa: E402
+from app.core.query_counter import contar_queries  # noqa: E402
+from app.models.client import Client  # noqa: E402
+from app.models.historial import AlertaSalud, HistorialPeso, ProgresoCalorias  # noqa: E402
+from app.models.nutricion import PlanNutricional  # noqa: E402
+from app.services.ia_service import ia_service  # noqa: E402
+
+PACIENTES = 500
+DIAS = 180
+N = 5
+RTTS_MS = (0.0, 0.5, 2.0)
+NUTRI = SimpleNamespace(id=1, role_name="nutricionista")
+
+
+@compiles(ARRAY, "sqlite")
+def _array_sqlite(type_, compiler, **kw):
+    # clients.medical_conditions & co. son ARRAY (solo Postgres); aquí van vacíos.
+    return "TEXT"
+
+
+def _stats_antes(db: Session, nutri) -> dict:
+    """Cálculo anterior (mismas reglas, sin el formateo de alertas)."""
+    pacientes = db.query(Client).filter(Client.assigned_nutri_id == nutri.id).all()
+    total = len(pacientes)
+    ids = {c.id for c in pacientes}
+    validaciones = db.query(PlanNutricional).join(Client).filter(
+        Client.id.in_(ids), PlanNutricional.status == "provisional_ia",
+    ).count()
+    ahora = datetime.now()
+    alertas_q = db.query(AlertaSalud).filter(
+        AlertaSalud.estado == "pendiente",
+        AlertaSalud.fecha_deteccion >= ahora - timedelta(days=30),
+    ).join(Client).filter(Client.id.in_(ids))
+    alertas_db = alertas_q.count()
+    con_alerta = {a.cliente.id for a in alertas_q.all() if a.cliente}
+    alertas_ia = 0
+    for c in pacientes:
+        if c.id in con_alerta:
+            continue
+        recientes = [r for r in c.progreso_calorias if r.fecha >= (ahora - timedelta(days=7)).date()]
+        adh = round((len(recientes) / 7) * 100, 1)
+        if ia_service.generar_alerta_fuzzy(adh, calcular_progreso_paciente(c)).get("nivel") == "Alto":
+            alertas_ia += 1
+    tendencia = []
+    for i in range(6, -1, -1):
+        dia = (ahora - timedelta(days=i)).date()
+        activos = sum(1 for c in pacientes if any(r.fecha == dia for r in c.progreso_calorias))
+        tendencia.append(round((activos / total) * 100, 1))
+    return {
+        "total_pacientes": total,
+        "validaciones_pendientes": validaciones,
+        "alertas_criticas": alertas_db + alertas_ia,
+        "adherencia_media": round(sum(tendencia) / 7, 1),
+        "tendencia_adherencia": tendencia,
+    }
+
+
+def _sembrar(engine, hoy: date) -> None:
+    for modelo in (Client, ProgresoCalorias, HistorialPeso, AlertaSalud, PlanNutricional):
+        modelo.__table__.create(engine)
+    with Session(engine) as db:
+        # Insert de Core: el ORM reemplazaría los ARRAY en None por su default [].
+        db.execute(Client.__table__.insert(), [{
+            "id": n, "first_name": "Paciente", "last_name_paternal": str(n), "email": f"p{n}@bench.local",
+            "hashed_password": "x", "weight": 70.0 + n % 9, "goal": ("Perder peso", "Ganar masa", "Mantener peso")[n % 3],
+            "gender": "F", "assigned_nutri_id": NUTRI.id, "is_profile_complete": True, "created_at": datetime.now(),
+            "medical_conditions": None, "recommended_foods": None, "forbidden_foods": None,
+        } for n in range(1, PACIENTES + 1)])
+        for n in range(1, PACIENTES + 1):
+            for d in range(DIAS):
+                if (n + d) % 4:  # ~75% de días con registro
+                    db.add(ProgresoCalorias(client_id=n, fecha=hoy - timedelta(days=d),
+                                            calorias_consumidas=1800, calorias_quemadas=200))
+            for semana in range(0, DIAS, 14):
+                db.add(HistorialPeso(client_id=n, peso_kg=74.0 - semana / 30, fecha_registro=hoy - timedelta(days=DIAS - semana),
+                                     created_at=datetime.now()))
+            db.add(PlanNutricional(client_id=n, genero=2, edad=30, peso=70, talla=165, nivel_actividad=1.5,
+                                   objetivo="perder", status=("provisional_ia", "validado")[n % 2],
+                                   fecha_creacion=datetime.now()))
+            if n % 10 == 0:
+                db.add(AlertaSalud(client_id=n, tipo="progreso", descripcion="Estancamiento", severidad="alto",
+                                   estado="pendiente", fecha_deteccion=datetime.now() - timedelta(days=n % 20),
+                                   created_at=datetime.now()))
+        db.commit()
+
+
+def _medir(engine, fn) -> tuple[int, float]:
+    with Session(engine) as db, contar_queries() as c:
+        fn(db, NUTRI)
+    queries = c.total
+    t0 = time.perf_counter()
+    for _ in range(N):
+        with Session(engine) as db:
+            fn(db, NUTRI)
+    return queries, (time.perf_counter() - t0) * 1000.0 / N
+
+
+def main() -> None:
+    ruta = os.path.join(tempfile.mkdtemp(), "bench_nutri_stats.sqlite3")
+    engine = create_engine(f"sqlite:///{ruta}")
+    _sembrar(engine, datetime.now().date())
+    with engine.begin() as conn:
+        conn.execute(text("CREATE INDEX ix_progreso_cliente_fecha ON progreso_calorias (client_id, fecha)"))
+        conn.execute(text("CREATE INDEX ix_peso_cliente ON historial_peso (client_id, fecha_registro)"))
+        conn.execute(text("CREATE INDEX ix_clients_nutri ON clients (assigned_nutri_id)"))
+
+    rtt = {"s": 0.0}
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _latencia_red(*_):
+        if rtt["s"]:
+            time.sleep(rtt["s"])
+
+    with Session(engine) as db:
+        antes = _stats_antes(db, NUTRI)
+        ahora = {k: v for k, v in _calcular_stats(db, NUTRI).items() if k in antes}
+        assert antes == ahora, f"las cifras no coinciden:\n{antes}\n{ahora}"
+
+    print(f"{PACIENTES} pacientes × {DIAS} días de historial; {N} requests por fila\n")
+    print(f"{'RTT ms':>7}  {'modo':<22}{'queries':>8}{'ms/req':>10}")
+    for rtt_ms in RTTS_MS:
+        rtt["s"] = rtt_ms / 1000.0
+        for nombre, fn in (("historiales (antes)", _stats_antes), ("agregado SQL (ahora)", _calcular_stats)):
+            queries, ms = _medir(engine, fn)
+            print(f"{rtt_ms:>7.1f}  {nombre:<22}{queries:>8}{ms:>10.2f}")
+    engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+"""
+Entrena el clasificador local de intención del asistente (5 modos).
+
+Corpus: scripts/data/intenciones_corpus.jsonl ({"texto", "modo", "origen"}),
+armado con los ejemplos del prompt de ``IAService.clasificar_modo_asistente``,
+los mensajes de tests/integration y frases curadas. Con ``--desde-bd N`` se
+agregan los últimos N mensajes de usuario de ``chat_historial``, etiquetados
+con el flujo de producción sin el clasificador local (pre-checks + LLM).
+
+Modelo: TF-IDF de n-gramas de caracteres (2-5, char_wb) + regresión logística.
+Imprime exactitud por validación cruzada y, para el umbral configurado, qué
+fracción de mensajes saltaría el LLM y con qué exactitud.
+
+Output: app/models/ai_models/clasificador_intencion.pkl
+
+Ejecutar:
+  python scripts/entrenar_clasificador_intencion.py
+  python scripts/entrenar_clasificador_intencion.py --desde-bd 2000
+  docker exec calofit_backend python scripts/entrenar_clasificador_intencion.py
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+from collections import Counter
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import joblib  # noqa: E402
+import numpy as np  # noqa: E402
+from sklearn.feature_extraction.text import TfidfVectorizer  # noqa: E402
+from sklearn.linear_model import LogisticRegression  # noqa: E402
+from sklearn.model_selection import StratifiedKFold, cross_val_predict  # noqa: E402
+from sklearn.pipeline import Pipeline  # noqa: E402
+
+from app.core.config import settings  # noqa: E402
+from app.services.asistente.clasificador_intencion import MODELO_PATH, normalizar_texto  # noqa: E402
+
+CORPUS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "intenciones_corpus.jsonl")
+
+
+def cargar_corpus(ruta: str = CORPUS_PATH) -> list:
+    with open(ruta, encoding="utf-8") as f:
+        return [json.loads(linea) for linea in f if linea.strip()]
+
+
+def guardar_corpus(filas: list, ruta: str = CORPUS_PATH) -> None:
+    with open(ruta, "w", encoding="utf-8") as f:
+        for fila in filas:
+            f.write(json.dumps(fila, ensure_ascii=False) + "\n")
+
+
+def extraer_de_chat_historial(limite: int, vistos: set) -> list:
+    """Mensajes de usuario recientes, etiquetados con pre-checks + LLM (sin el modelo local)."""
+    from sqlalchemy import text
+
+    from app.core.database import SessionLocal
+    from app.services.ai.rate_governor import Prioridad, fijar_prioridad
+    from app.services.asistente.asistente_modos import resolver_modo_funcion
+    from app.services.ia_service import ia_engine
+
+    db = SessionLocal()
+    try:
+        filas = db.execute(text(
+            "SELECT contenido FROM chat_historial WHERE rol = 'user' "
+            "ORDER BY created_at DESC LIMIT :n"
+        ), {"n": limite}).fetchall()
+    finally:
+        db.close()
+
+    textos = []
+    for (contenido,) in filas:
+        clave = normalizar_texto(contenido)
+        if len(clave) >= 2 and clave not in vistos:
+            vistos.add(clave)
+            textos.append(contenido.strip())
+
+    async def etiquetar():
+        fijar_prioridad(Prioridad.BATCH)
+        return [await resolver_modo_funcion(ia_engine, t, es_saludo=False) for t in textos]
+
+    settings.CALOFIT_INTENT_LOCAL_ENABLED = False
+    modos = asyncio.run(etiquetar())
+    return [{"texto": t, "modo": m, "origen": "chat_historial"} for t, m in zip(textos, modos)]
+
+
+def construir_pipeline() -> Pipeline:
+    return Pipeline([
+        ("tfidf", TfidfVectorizer(analyzer="char_wb", ngram_range=(2, 5), sublinear_tf=True)),
+        ("clf", LogisticRegression(C=20.0, max_iter=2000, class_weight="balanced")),
+    ])
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--desde-bd", type=int, default=0, metavar="N",
+                        help="agregar al corpus los últimos N mensajes de usuario de chat_historial")
+    args = parser.parse_args()
+
+    corpus = cargar_corpus()
+    if args.desde_bd:
+        nuevos = extraer_de_chat_historial(args.desde_bd, {normalizar_texto(f["texto"]) for f in corpus})
+        corpus.extend(nuevos)
+        guardar_corpus(corpus)
+        print(f"  + {len(nuevos)} mensajes de chat_historial agregados al corpus")
+
+    X = [normalizar_texto(f["texto"]) for f in corpus]
+    y = np.array([f["modo"] for f in corpus])
+    print(f"  Corpus: {len(X)} mensajes — {dict(Counter(y))}")
+
+    folds = StratifiedKFold(n_splits=5, shuffle=True, random_state=42)
+    probas = cross_val_predict(construir_pipeline(), X, y, cv=folds, method="predict_proba")
+    clases = np.array(sorted(set(y)))
+    pred = clases[probas.argmax(axis=1)]
+    conf = probas.max(axis=1)
+    umbral = settings.CALOFIT_INTENT_LOCAL_THRESHOLD
+    seguros = conf >= umbral
+
+    print(f"\n  Exactitud (CV 5 folds)       : {(pred == y).mean():.3f}")
+    print(f"  Umbral                       : {umbral}")
+    print(f"  Mensajes sin LLM (cobertura) : {seguros.mean():.3f}")
+    if seguros.any():
+        print(f"  Exactitud sobre esos         : {(pred[seguros] == y[seguros]).mean():.3f}")
+    print(f"\n  {'modo':<22}{'n':>5}{'exact.':>9}{'sin LLM':>9}")
+    for c in clases:
+        m = y == c
+        print(f"  {c:<22}{m.sum():>5}{(pred[m] == c).mean():>9.2f}{seguros[m].mean():>9.2f}")
+
+    pipeline = construir_pipeline().fit(X, y)
+    paquete = {
+        "pipeline": pipeline,
+        "version": datetime.now().strftime("%Y%m%d") + f"_n{len(X)}",
+        "n_ejemplos": len(X),
+        "modos": list(pipeline.classes_),
+    }
+    os.makedirs(os.path.dirname(MODELO_PATH), exist_ok=True)
+    joblib.dump(paquete, MODELO_PATH, compress=3)
+    print(f"\n  💾 {MODELO_PATH} ({os.path.getsize(MODELO_PATH) / 1024:.0f} KB, versión {paquete['version']})")
+
+
+if __name__ == "__main__":
+    main()
@@ -11,6 +11,7 @@ sys.path.insert(0, "/app")
 
 from sqlalchemy import text
 from app.core.database import SessionLocal
+from app.services.ai.rate_governor import Prioridad, fijar_prioridad
 from app.services.ia_service import ia_engine
 
 PROMPT_TECNICA = """Eres un entrenador de gym profesional. Escribe la técnica correcta para el ejercicio "{nombre}".
@@ -41,6 +42,8 @@ async def generar_tecnica(nombre: str) -> str:
 
 
 async def main():
+    # Batch: espera cupo RPM/TPM en vez de saltar a modelos de fallback.
+    fijar_prioridad(Prioridad.BATCH)
     db = SessionLocal()
     rows = db.execute(text(
         "SELECT id, nombre FROM ejercicios "
@@ -27,6 +27,10 @@ from app.core.database import SessionLocal
 from app.models.client import Client
 from app.services.asistente.asistente_registro_comida import registro_comida_handler
 from app.services.ia_service import ia_engine
+from app.services.resumen_periodos import instalar_hooks_resumen
+
+# Los registros de comida de los casos actualizan también los resúmenes semanales / mensuales.
+instalar_hooks_resumen()
 
 
 # ══════════════════════════════════════════════════════════════════════════════
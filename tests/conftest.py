@@ -113,6 +113,77 @@ def _limpiar_macro_cache():
     _macro_cache.clear()
 
 
+@pytest.fixture(autouse=True)
+def _limpiar_cache_llm():
+    """Mismo motivo que _macro_cache: el caché de completions del LLM vive en
+    memoria de proceso y una respuesta mockeada de un test no debe servirse a otro."""
+    from app.services.ai.completion_cache import completion_cache
+    completion_cache.clear()
+    yield
+    completion_cache.clear()
+
+
+@pytest.fixture(autouse=True)
+def _reiniciar_breakers_llm():
+    """Un test que simula un modelo caído no debe dejar su circuito abierto para el siguiente."""
+    from app.services.ai.circuit_breaker import reset_breakers
+    reset_breakers()
+    yield
+    reset_breakers()
+
+
+@pytest.fixture(autouse=True)
+def _sin_clasificador_local(monkeypatch):
+    """Los tests simulan el LLM clasificador: el modelo local no debe adelantarse salvo que se pida."""
+    from app.core.config import settings
+    monkeypatch.setattr(settings, "CALOFIT_INTENT_LOCAL_ENABLED", False)
+
+
+@pytest.fixture
+def sin_bloqueos_loop():
+    """Corre una corutina con ``asyncio.run`` y falla (LoopBloqueado) si algo
+    dentro retiene el event loop más de ``umbral_ms``: urlopen, time.sleep,
+    una query síncrona en una ruta async... El error trae el sitio y el stack."""
+    import asyncio
+    from app.core.loop_monitor import vigilar_bloqueos
+
+    def correr(coro, umbral_ms: float = 100.0):
+        async def _vigilado():
+            async with vigilar_bloqueos(umbral_ms=umbral_ms):
+                return await coro
+        return asyncio.run(_vigilado())
+
+    return correr
+
+
+@pytest.fixture
+def presupuesto_queries():
+    """Máximo de queries SQL para un bloque (p. ej. un request con TestClient):
+
+        with presupuesto_queries(2):
+            client.get("/balance/semanal")
+
+    Cuenta en todos los hilos (TestClient corre la app en otro) y al fallar
+    lista las formas de query más repetidas. ``max_repeticion`` acota además
+    cuántas veces puede repetirse una misma forma (N+1)."""
+    from contextlib import contextmanager
+    from app.core.query_counter import contar_queries
+
+    @contextmanager
+    def presupuesto(maximo: int, max_repeticion: int = None):
+        with contar_queries(todo_el_proceso=True) as contador:
+            yield contador
+        assert contador.total <= maximo, (
+            f"presupuesto de queries excedido (máx. {maximo}):\n{contador.resumen()}"
+        )
+        if max_repeticion is not None:
+            assert contador.max_repeticion <= max_repeticion, (
+                f"query repetida más de {max_repeticion} veces (N+1):\n{contador.resumen()}"
+            )
+
+    return presupuesto
+
+
 # ─────────────────────────────────────────────────────────────────────────────
 # Fixtures de datos de prueba
 # ─────────────────────────────────────────────────────────────────────────────
@@ -0,0 +1,65 @@
+"""
+Servidor LLM falso (API chat/completions estilo OpenRouter) para tests de resiliencia.
+
+Cada modelo se configura con latencia y status HTTP; la respuesta trae como
+``content`` el nombre del modelo que respondió. Se usa con
+``OpenRouterClient(api_key=..., base_url=servidor.base_url)``.
+"""
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class FakeLLMServer:
+    """``comportamiento[modelo] = {"latencia": seg, "status": int}``; ``llamadas[modelo]`` cuenta requests."""
+
+    def __init__(self):
+        self.comportamiento: dict = {}
+        self.llamadas: dict = {}
+        self._lock = threading.Lock()
+        servidor = self
+
+        class _Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_POST(self):
+                largo = int(self.headers.get("Content-Length", 0))
+                body = json.loads(self.rfile.read(largo) or b"{}")
+                modelo = body.get("model", "")
+                with servidor._lock:
+                    servidor.llamadas[modelo] = servidor.llamadas.get(modelo, 0) + 1
+                conf = servidor.comportamiento.get(modelo, {})
+                time.sleep(conf.get("latencia", 0.0))
+                status = conf.get("status", 200)
+                if status == 200:
+                    out = {
+                        "choices": [{"message": {"content": modelo}}],
+                        "usage": {"total_tokens": 10},
+                    }
+                else:
+                    out = {"error": {"code": status, "message": "fake upstream error"}}
+                data = json.dumps(out).encode()
+                try:
+                    self.send_response(status)
+                    self.send_header("Content-Type", "application/json")
+                    self.send_header("Content-Length", str(len(data)))
+                    self.end_headers()
+                    self.wfile.write(data)
+                except (BrokenPipeError, ConnectionResetError):
+                    pass  # el cliente canceló (p. ej. perdedor de un hedge)
+
+            def log_message(self, *args):
+                pass
+
+        self._srv = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+        self._srv.daemon_threads = True
+        self.base_url = f"http://127.0.0.1:{self._srv.server_address[1]}/api/v1"
+
+    def __enter__(self) -> "FakeLLMServer":
+        threading.Thread(target=self._srv.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self._srv.shutdown()
+        self._srv.server_close()
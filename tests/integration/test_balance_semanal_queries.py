@@ -0,0 +1,59 @@
+"""
+Tests de integración: /balance/semanal lee la semana en dos queries
+(progreso por rango de fechas + conteo de workout_logs agrupado por fecha de Lima).
+"""
+import pytest
+from datetime import datetime, timedelta
+
+from app.core.utils import get_peru_date
+from app.models import ProgresoCalorias
+from app.models.workout_models import WorkoutLog
+
+
+def _lunes_actual():
+    hoy = get_peru_date()
+    return hoy - timedelta(days=hoy.isoweekday() - 1)
+
+
+@pytest.fixture
+def semana_con_datos(db, sample_client):
+    lunes = _lunes_actual()
+    for i, kcal in ((0, 1900), (2, 2100)):
+        db.add(ProgresoCalorias(
+            client_id=sample_client.id, fecha=lunes + timedelta(days=i),
+            calorias_consumidas=kcal, calorias_quemadas=300,
+        ))
+    inicio_utc = datetime.combine(lunes, datetime.min.time()) + timedelta(hours=5)
+    for created_at in (
+        inicio_utc + timedelta(hours=2),               # Lun en Lima
+        inicio_utc + timedelta(days=1, hours=20),      # Mar 20:00 Lima = Mié 01:00 UTC
+        inicio_utc - timedelta(hours=1),               # Dom anterior 23:00 en Lima: fuera de la semana
+    ):
+        db.add(WorkoutLog(client_id=sample_client.id, ejercicio="Sentadilla", series=3, reps=10, created_at=created_at))
+    db.commit()
+    return sample_client, lunes
+
+
+@pytest.mark.integration
+class TestBalanceSemanalQueries:
+
+    def test_semana_en_dos_queries(self, db, semana_con_datos, presupuesto_queries):
+        from app.api.routes.balance import _datos_semana
+        cliente, lunes = semana_con_datos
+        with presupuesto_queries(2):
+            progreso, ejercicios = _datos_semana(db, cliente.id, lunes)
+        assert sorted(progreso) == [lunes, lunes + timedelta(days=2)]
+        assert ejercicios == {lunes: 1, lunes + timedelta(days=1): 1}
+
+    def test_endpoint_sin_queries_por_dia(self, db, semana_con_datos, presupuesto_queries):
+        from app.api.routes.balance import _seguimiento_semanal
+        cliente, lunes = semana_con_datos
+        # plan (con sus días) + metas + las dos de la semana; el cliente llega resuelto
+        with presupuesto_queries(4, max_repeticion=1):
+            r = _seguimiento_semanal(db, cliente, 0)
+        dias = {d["fecha"]: d for d in r["dias"]}
+        assert dias[lunes.isoformat()]["kcal_consumidas"] == 1900.0
+        assert dias[lunes.isoformat()]["hay_ejercicio"] is True
+        assert dias[(lunes + timedelta(days=1)).isoformat()]["hay_ejercicio"] is True
+        assert dias[(lunes + timedelta(days=2)).isoformat()]["hay_ejercicio"] is False
+        assert r["resumen"]["dias_con_registro"] == 2 and r["resumen"]["dias_con_ejercicio"] == 2
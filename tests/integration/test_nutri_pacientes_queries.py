@@ -0,0 +1,89 @@
+"""
+Tests de integración: el listado /nutricionista/clientes agrega progreso, pesajes
+y estado del plan en SQL — el número de queries no crece con los pacientes.
+"""
+import pytest
+from datetime import datetime, timedelta
+
+from app.core.utils import get_peru_date
+from app.models import Client, ProgresoCalorias
+from app.models.historial import AlertaSalud, HistorialPeso
+from app.models.nutricion import PlanNutricional
+
+
+def _paciente(db, nutri, n, peso_inicial=None, registros=0, plan_status=None, hoy=None):
+    sello = f"{datetime.utcnow().timestamp()}_{n}"
+    c = Client(
+        first_name="Paciente", last_name_paternal=str(n), last_name_maternal="Demo",
+        email=f"paciente_{sello}@test.com", hashed_password="hashedpwd123",
+        weight=70.0, height=170, gender="F", medical_conditions=[],
+        goal="Perder peso", assigned_nutri_id=nutri.id, is_profile_complete=True,
+        created_at=datetime.utcnow() - timedelta(days=90),
+    )
+    db.add(c)
+    db.flush()
+    hoy = hoy or get_peru_date()
+    for i in range(registros):
+        db.add(ProgresoCalorias(client_id=c.id, fecha=hoy - timedelta(days=i), calorias_consumidas=1800))
+    if peso_inicial is not None:
+        db.add(HistorialPeso(client_id=c.id, peso_kg=peso_inicial, fecha_registro=hoy - timedelta(days=60)))
+        db.add(HistorialPeso(client_id=c.id, peso_kg=70.0, fecha_registro=hoy - timedelta(days=5)))
+    if plan_status:
+        db.add(PlanNutricional(
+            client_id=c.id, genero=2, edad=30, peso=70, talla=170, nivel_actividad=1.5,
+            objetivo="perder", status=plan_status, fecha_creacion=datetime.utcnow(),
+        ))
+    return c
+
+
+@pytest.mark.integration
+class TestPacientesNutriQueries:
+
+    def test_datos_agregados(self, db, sample_user):
+        from app.api.routes.nutricionista import get_assigned_patients
+        c = _paciente(db, sample_user, 0, peso_inicial=74.0, registros=3, plan_status="validado")
+        sin_datos = _paciente(db, sample_user, 1)
+        db.commit()
+
+        r = {p["id"]: p for p in get_assigned_patients(db=db, current_user=sample_user)}
+        assert r[c.id]["adherencia"] == round(3 / 7 * 100, 1)
+        assert r[c.id]["semana_status"] == "validado"
+        assert r[c.id]["hizo_checkin_peso"] is True
+        assert r[sin_datos.id]["adherencia"] == 0.0
+        assert r[sin_datos.id]["semana_status"] == "pendiente"
+        assert r[sin_datos.id]["hizo_checkin_peso"] is False
+
+    def test_queries_constantes(self, db, sample_user, presupuesto_queries):
+        from app.api.routes.nutricionista import get_assigned_patients
+        for n in range(25):
+            _paciente(db, sample_user, n, peso_inicial=72.0, registros=n % 7, plan_status="validado")
+        db.commit()
+        # clientes + progreso 7d + pesajes + último plan
+        with presupuesto_queries(4, max_repeticion=1):
+            r = get_assigned_patients(db=db, current_user=sample_user)
+        assert len(r) == 25
+
+
+@pytest.mark.integration
+class TestStatsNutriQueries:
+
+    def test_stats_agregadas(self, db, sample_user, presupuesto_queries):
+        from app.api.routes.nutricionista import _calcular_stats
+        pacientes = [
+            _paciente(db, sample_user, n, peso_inicial=72.0, registros=n % 3,
+                      plan_status=("provisional_ia", "validado")[n % 2], hoy=datetime.now().date())
+            for n in range(30)
+        ]
+        db.add(AlertaSalud(client_id=pacientes[0].id, tipo="progreso", descripcion="Estancamiento",
+                           severidad="alto", estado="pendiente", fecha_deteccion=datetime.now()))
+        db.commit()
+
+        # clientes + validaciones + alertas por paciente + recientes + progreso 7d + pesajes + tendencia
+        with presupuesto_queries(7, max_repeticion=1):
+            r = _calcular_stats(db, sample_user)
+        assert r["total_pacientes"] == 30
+        assert r["validaciones_pendientes"] == 15
+        assert r["alertas_recientes"][0]["problema"] == "Estancamiento"
+        # hoy registran los pacientes con n % 3 >= 1; ayer los de n % 3 == 2
+        assert r["tendencia_adherencia"][-1] == round(20 / 30 * 100, 1)
+        assert r["tendencia_adherencia"][-2] == round(10 / 30 * 100, 1)
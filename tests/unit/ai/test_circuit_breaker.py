@@ -0,0 +1,196 @@
+"""
+Tests del circuit breaker por modelo y del hedging (app.services.ai.circuit_breaker),
+contra un servidor LLM falso local.
+"""
+import asyncio
+import time
+
+import pytest
+
+from app.core.config import settings
+from app.services.ai import circuit_breaker
+from app.services.ai.circuit_breaker import (
+    ABIERTO,
+    CERRADO,
+    SEMI_ABIERTO,
+    CircuitBreaker,
+    CircuitoAbierto,
+)
+from app.services.ai.openrouter_client import MODEL_MAPPING, OpenRouterClient
+from app.services.ia_service import IAService
+from tests.fixtures.fake_llm_server import FakeLLMServer
+
+PRIMARIO = "llama-3.3-70b-versatile"
+SECUNDARIO = "llama-3.1-8b-instant"
+
+
+def _ia(base_url):
+    svc = IAService.__new__(IAService)
+    svc.groq_client = OpenRouterClient(api_key="k", base_url=base_url)
+    return svc
+
+
+@pytest.fixture
+def servidor():
+    with FakeLLMServer() as srv:
+        yield srv
+
+
+@pytest.mark.unit
+class TestCircuitBreaker:
+
+    def test_abre_tras_fallos_seguidos_y_rechaza(self):
+        b = CircuitBreaker("m", fallos_para_abrir=2, abierto_seg=60)
+        for _ in range(2):
+            b.antes_de_llamar()
+            b.registrar_fallo()
+        assert b.estado == ABIERTO
+        with pytest.raises(CircuitoAbierto, match="timeout"):
+            b.antes_de_llamar()
+        assert b.stats()["rejected"] == 1 and b.stats()["opened"] == 1
+
+    def test_half_open_deja_pasar_una_prueba(self):
+        b = CircuitBreaker("m", fallos_para_abrir=1, abierto_seg=0.05)
+        b.antes_de_llamar()
+        b.registrar_fallo()
+        time.sleep(0.06)
+        assert b.estado == SEMI_ABIERTO
+        b.antes_de_llamar()
+        with pytest.raises(CircuitoAbierto):
+            b.antes_de_llamar()  # solo una prueba a la vez
+        b.registrar_exito(0.1)
+        assert b.estado == CERRADO
+
+    def test_llamadas_lentas_cuentan_como_fallo(self):
+        b = CircuitBreaker("m", fallos_para_abrir=2, lento_seg=1.0)
+        b.registrar_exito(5.0)
+        b.registrar_exito(5.0)
+        assert b.estado == ABIERTO and b.stats()["slow"] == 2
+
+    def test_413_no_afecta_la_salud(self):
+        assert not circuit_breaker.es_fallo_de_salud(RuntimeError("Error (413): request too large"))
+        assert circuit_breaker.es_fallo_de_salud(RuntimeError("Error en OpenRouter API (503)"))
+
+    def test_p95(self):
+        b = CircuitBreaker("m")
+        assert b.p95() is None
+        for i in range(1, 21):
+            b.registrar_exito(i / 10)
+        assert b.p95() == pytest.approx(2.0)
+
+    def test_espera_de_cupo_no_cuenta_como_latencia(self, monkeypatch):
+        monkeypatch.setattr(settings, "LLM_BREAKER_SLOW_SEC", 0.05)
+        monkeypatch.setattr(settings, "LLM_BREAKER_FAILURES", 2)
+        circuit_breaker.reset_breakers()
+        reservas = []
+
+        async def reservar(modelo):
+            await asyncio.sleep(0.1)  # el governor retiene la llamada
+            reservas.append(modelo)
+            return f"reserva-{modelo}"
+
+        async def fn(modelo, reserva):
+            return reserva
+
+        async def main():
+            return [await circuit_breaker.llamar("modelo-x", fn, hedge=False, reservar=reservar) for _ in range(5)]
+
+        assert asyncio.run(main()) == ["reserva-modelo-x"] * 5
+        st = circuit_breaker.breaker_stats()["models"]["modelo-x"]
+        assert st["state"] == CERRADO and st["slow"] == 0
+        assert st["p95_ms"] < 50
+        circuit_breaker.reset_breakers()
+
+    def test_espera_de_cupo_no_dispara_el_hedge(self, monkeypatch):
+        monkeypatch.setattr(settings, "LLM_HEDGE_ENABLED", True)
+        monkeypatch.setattr(settings, "LLM_HEDGE_MIN_DELAY_SEC", 0.05)
+        monkeypatch.setattr(settings, "LLM_HEDGE_MAX_DELAY_SEC", 0.05)
+        circuit_breaker.reset_breakers()
+        llamados = []
+
+        async def reservar(modelo):
+            if modelo == PRIMARIO:
+                await asyncio.sleep(0.3)  # en cola del governor, bastante más que el delay del hedge
+            return None
+
+        async def fn(modelo, reserva):
+            llamados.append(modelo)
+            return modelo
+
+        assert asyncio.run(circuit_breaker.llamar(PRIMARIO, fn, reservar=reservar)) == PRIMARIO
+        assert llamados == [PRIMARIO]
+        assert circuit_breaker.breaker_stats()["routing"]["hedged"] == 0
+        circuit_breaker.reset_breakers()
+
+
+@pytest.mark.unit
+class TestContraServidorFalso:
+
+    def test_modelo_caido_se_salta_sin_llamarlo(self, servidor, monkeypatch):
+        monkeypatch.setattr(settings, "LLM_BREAKER_FAILURES", 2)
+        servidor.comportamiento[MODEL_MAPPING[PRIMARIO]] = {"status": 503}
+        ia = _ia(servidor.base_url)
+
+        async def main():
+            return [await ia._llamar_groq_sin_cache("hola", 50, 0.0, PRIMARIO) for _ in range(4)]
+
+        respuestas = asyncio.run(main())
+        # Las dos primeras fallan contra el primario; luego el circuito abierto manda directo al secundario.
+        assert respuestas[2:] == [MODEL_MAPPING[SECUNDARIO]] * 2
+        assert servidor.llamadas[MODEL_MAPPING[PRIMARIO]] == 2
+        st = circuit_breaker.breaker_stats()
+        assert st["models"][PRIMARIO]["state"] == ABIERTO
+        assert st["routing"]["rerouted"] == 2
+
+    def test_hedge_gana_el_secundario_si_el_primario_se_demora(self, servidor, monkeypatch):
+        monkeypatch.setattr(settings, "LLM_HEDGE_ENABLED", True)
+        monkeypatch.setattr(settings, "LLM_HEDGE_MIN_DELAY_SEC", 0.05)
+        monkeypatch.setattr(settings, "LLM_HEDGE_MAX_DELAY_SEC", 0.1)
+        servidor.comportamiento[MODEL_MAPPING[PRIMARIO]] = {"latencia": 1.5}
+        ia = _ia(servidor.base_url)
+
+        async def main():
+            t0 = time.perf_counter()
+            texto = await ia._llamar_groq_sin_cache("hola", 50, 0.0, PRIMARIO)
+            return texto, time.perf_counter() - t0
+
+        texto, dur = asyncio.run(main())
+        assert texto == MODEL_MAPPING[SECUNDARIO]
+        assert dur < 1.0
+        assert circuit_breaker.breaker_stats()["routing"] == {"rerouted": 0, "hedged": 1, "secondary_won": 1}
+
+    def test_el_perdedor_del_hedge_devuelve_su_cupo(self, servidor, monkeypatch):
+        from app.services import ia_service
+
+        monkeypatch.setattr(settings, "LLM_HEDGE_ENABLED", True)
+        monkeypatch.setattr(settings, "LLM_HEDGE_MIN_DELAY_SEC", 0.05)
+        monkeypatch.setattr(settings, "LLM_HEDGE_MAX_DELAY_SEC", 0.1)
+        servidor.comportamiento[MODEL_MAPPING[PRIMARIO]] = {"latencia": 1.5}
+        ajustes = {}
+
+        class Reserva:
+            def __init__(self, modelo):
+                self.modelo = modelo
+
+            def ajustar(self, tokens):
+                ajustes[self.modelo] = tokens
+
+        async def reservar_llamada(modelo, prompt, max_tokens):
+            return Reserva(modelo)
+
+        monkeypatch.setattr(ia_service, "reservar_llamada", reservar_llamada)
+        ia = _ia(servidor.base_url)
+
+        assert asyncio.run(ia._llamar_groq_sin_cache("hola", 50, 0.0, PRIMARIO)) == MODEL_MAPPING[SECUNDARIO]
+        # El primario se canceló con su cupo tomado: se ajusta a lo estimado del prompt.
+        assert ajustes[PRIMARIO] == ia_service.estimar_tokens("hola")
+        assert SECUNDARIO in ajustes
+
+    def test_sin_hedge_el_primario_rapido_responde(self, servidor, monkeypatch):
+        monkeypatch.setattr(settings, "LLM_HEDGE_ENABLED", True)
+        monkeypatch.setattr(settings, "LLM_HEDGE_MIN_DELAY_SEC", 0.5)
+        ia = _ia(servidor.base_url)
+
+        texto = asyncio.run(ia._llamar_groq_sin_cache("hola", 50, 0.0, PRIMARIO))
+        assert texto == MODEL_MAPPING[PRIMARIO]
+        assert MODEL_MAPPING[SECUNDARIO] not in servidor.llamadas
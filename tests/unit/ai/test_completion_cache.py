@@ -0,0 +1,137 @@
+"""
+Tests del caché de completions deterministas (app.services.ai.completion_cache).
+"""
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from app.core.cache_backends import SQLiteBackend
+from app.core.cache_metrics import registry
+from app.services.ai.completion_cache import cache_llm, clave, completion_cache
+from app.services.ai.llm_service import LLMService
+
+
+class _FakeClient:
+    """Imita ``client.chat.completions.create`` contando llamadas."""
+
+    def __init__(self, respuesta="ok"):
+        self.llamadas = 0
+        self.respuesta = respuesta
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create))
+
+    async def _create(self, model, messages, temperature=None, max_tokens=None):
+        self.llamadas += 1
+        await asyncio.sleep(0.01)
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=self.respuesta))])
+
+
+def _llm(fake):
+    svc = LLMService.__new__(LLMService)
+    svc._client = fake
+    return svc
+
+
+@pytest.fixture(autouse=True)
+def _limpio():
+    registry.reset()
+    completion_cache.clear()
+    completion_cache.set_shared_backend(None)
+    yield
+    completion_cache.clear()
+    completion_cache.set_shared_backend(None)
+
+
+@pytest.mark.unit
+class TestClave:
+
+    def test_normaliza_espacios(self):
+        assert clave("m", "hola   mundo\n", 0.0, 32) == clave("m", " hola mundo", 0.0, 32)
+
+    def test_distingue_parametros(self):
+        base = clave("m", "p", 0.0, 32)
+        assert base != clave("otro", "p", 0.0, 32)
+        assert base != clave("m", "p", 0.3, 32)
+        assert base != clave("m", "p", 0.0, 64)
+        assert base != clave("m", "p", 0.0, 32, system="s")
+
+
+@pytest.mark.unit
+class TestLLMService:
+
+    def test_sin_opt_in_no_cachea(self):
+        fake = _FakeClient()
+        llm = _llm(fake)
+
+        async def main():
+            await llm.completar("hola", temperature=0.0)
+            await llm.completar("hola", temperature=0.0)
+
+        asyncio.run(main())
+        assert fake.llamadas == 2
+
+    def test_opt_in_cachea_y_reporta_metricas(self):
+        fake = _FakeClient("SALUDO")
+        llm = _llm(fake)
+
+        async def main():
+            with cache_llm("test_site"):
+                a = await llm.completar("hola", temperature=0.0)
+                b = await llm.completar("hola", temperature=0.0)
+            return a, b
+
+        assert asyncio.run(main()) == ("SALUDO", "SALUDO")
+        assert fake.llamadas == 1
+        d = registry.snapshot()["caches"]["llm_completion"]["prefixes"]["test_site"]
+        assert (d["hits"], d["misses"], d["sets"]) == (1, 1, 1)
+
+    def test_analizar_intencion_usa_cache(self):
+        fake = _FakeClient("registro")
+        llm = _llm(fake)
+
+        async def main():
+            return [await llm.analizar_intencion("comí arroz", ["consulta", "registro"]) for _ in range(3)]
+
+        assert asyncio.run(main()) == ["registro"] * 3
+        assert fake.llamadas == 1
+
+    def test_respuesta_vacia_no_se_guarda(self):
+        fake = _FakeClient("")
+        llm = _llm(fake)
+
+        async def main():
+            with cache_llm("test_site"):
+                await llm.completar("x")
+                await llm.completar("x")
+
+        asyncio.run(main())
+        assert fake.llamadas == 2
+
+    def test_misses_concurrentes_una_llamada(self):
+        fake = _FakeClient("uno")
+        llm = _llm(fake)
+
+        async def main():
+            with cache_llm("test_site"):
+                return await asyncio.gather(*(llm.completar("igual") for _ in range(5)))
+
+        assert asyncio.run(main()) == ["uno"] * 5
+        assert fake.llamadas == 1
+
+
+@pytest.mark.unit
+class TestTierCompartido:
+
+    def test_hit_desde_tier_compartido_tras_reinicio(self, tmp_path):
+        # SQLiteBackend tiene la misma interfaz que el tier Postgres UNLOGGED.
+        completion_cache.set_shared_backend(SQLiteBackend(str(tmp_path / "llm.sqlite3")))
+        fake = _FakeClient("persistido")
+
+        async def main():
+            with cache_llm("test_site"):
+                return await _llm(fake).completar("p", temperature=0.0)
+
+        asyncio.run(main())
+        completion_cache.clear()  # simula worker nuevo: memoria vacía
+        assert asyncio.run(main()) == "persistido"
+        assert fake.llamadas == 1
@@ -0,0 +1,93 @@
+"""
+Tests del pool HTTP compartido para el LLM (app.services.ai.http_pool).
+"""
+import asyncio
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from app.services.ai import http_pool
+
+
+class _FakeLLM(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive
+
+    def do_POST(self):
+        largo = int(self.headers.get("Content-Length", 0))
+        body = json.loads(self.rfile.read(largo) or b"{}")
+        out = json.dumps({"choices": [{"message": {"content": body.get("model", "")}}]}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(out)))
+        self.end_headers()
+        self.wfile.write(out)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def servidor():
+    srv = ThreadingHTTPServer(("127.0.0.1", 0), _FakeLLM)
+    hilo = threading.Thread(target=srv.serve_forever, daemon=True)
+    hilo.start()
+    yield f"http://127.0.0.1:{srv.server_address[1]}/v1/chat/completions"
+    srv.shutdown()
+    srv.server_close()
+
+
+@pytest.fixture(autouse=True)
+def _stats_limpias():
+    http_pool.reset_http_stats()
+    yield
+    http_pool.reset_http_stats()
+
+
+@pytest.mark.unit
+class TestHttpPool:
+
+    def test_reutiliza_conexion_entre_requests(self, servidor):
+        async def main():
+            await http_pool.startup()
+            try:
+                for i in range(3):
+                    resp = await http_pool.post_json(servidor, headers={}, payload={"model": f"m{i}"})
+                    assert resp.json()["choices"][0]["message"]["content"] == f"m{i}"
+            finally:
+                await http_pool.shutdown()
+
+        asyncio.run(main())
+        st = http_pool.http_stats()
+        assert st["requests"] == 3 and st["pools"] == 0  # shutdown lo cerró
+        assert st["new_connections"] == 1 and st["reused_connections"] == 2
+        assert st["ttfb_ms_avg"] > 0 and st["total_ms_max"] >= st["ttfb_ms_avg"]
+
+    def test_pool_por_loop_y_se_cierra_con_su_loop(self, servidor):
+        clientes = {}
+
+        async def en_hilo():
+            # asyncio.run en otro hilo (como el resolvedor síncrono): su propio pool.
+            for _ in range(2):
+                resp = await http_pool.post_json(servidor, headers={}, payload={"model": "x"})
+                assert resp.status_code == 200
+            async with http_pool.cliente() as c:
+                clientes["hilo"] = c
+
+        async def main():
+            await http_pool.startup()
+            try:
+                async with http_pool.cliente() as c:
+                    clientes["app"] = c
+                await asyncio.to_thread(asyncio.run, en_hilo())
+                assert clientes["hilo"] is not clientes["app"]
+                assert clientes["hilo"].is_closed  # su loop terminó
+                assert not clientes["app"].is_closed and http_pool.http_stats()["pools"] == 1
+            finally:
+                await http_pool.shutdown()
+
+        asyncio.run(main())
+        st = http_pool.http_stats()
+        assert st["new_connections"] == 1 and st["reused_connections"] == 1
+        assert clientes["app"].is_closed and st["pools"] == 0
@@ -0,0 +1,119 @@
+"""
+Tests del gobernador de cuota RPM/TPM (app.services.ai.rate_governor).
+"""
+import asyncio
+
+import pytest
+
+from app.services.ai.rate_governor import (
+    PresupuestoAgotado,
+    Prioridad,
+    RateGovernor,
+    estimar_tokens,
+    prioridad_llm,
+)
+
+
+def _sin_cupo(gov, modelo="m"):
+    """Deja el bucket de ``modelo`` sin requests disponibles."""
+    b = gov._bucket(modelo)
+    b.req = 0.0
+    return b
+
+
+@pytest.mark.unit
+class TestBuckets:
+
+    def test_con_cupo_no_espera(self):
+        gov = RateGovernor({"m": (60, 10_000)})
+
+        async def main():
+            return [await gov.reservar("m", 100) for _ in range(3)]
+
+        reservas = asyncio.run(main())
+        assert all(r.espera_ms == 0.0 for r in reservas)
+        st = gov.stats()["m"]
+        assert st["requests"] == 3 and st["waited"] == 0
+        assert st["available"]["tokens"] == 10_000 - 300
+
+    def test_sin_requests_espera_el_relleno(self):
+        gov = RateGovernor({"m": (600, 100_000)})  # 10 req/s
+
+        async def main():
+            _sin_cupo(gov)
+            return await gov.reservar("m", 10)
+
+        r = asyncio.run(main())
+        assert 50 <= r.espera_ms <= 500
+        assert gov.stats()["m"]["waited"] == 1
+
+    def test_tpm_limita_aunque_sobren_requests(self):
+        gov = RateGovernor({"m": (600, 600)})  # 10 tokens/s
+
+        async def main():
+            await gov.reservar("m", 600)
+            with pytest.raises(PresupuestoAgotado, match="rate_limit"):
+                await gov.reservar("m", 100, max_espera=1.0)
+
+        asyncio.run(main())
+        assert gov.stats()["m"]["rejected"] == 1
+
+    def test_ajustar_devuelve_tokens_no_usados(self):
+        gov = RateGovernor({"m": (60, 1_000)})
+
+        async def main():
+            r = await gov.reservar("m", 800)
+            r.ajustar(200)
+
+        asyncio.run(main())
+        st = gov.stats()["m"]
+        assert st["available"]["tokens"] >= 800 and st["tokens_refunded"] == 600
+
+    def test_workers_reparten_el_presupuesto(self):
+        gov = RateGovernor({"m": (30, 6_000)}, workers=3)
+        b = gov._bucket("m")
+        assert (b.rpm, b.tpm) == (10, 2_000)
+
+    def test_estimar_tokens(self):
+        assert estimar_tokens("uno dos tres cuatro cinco") == 7
+
+
+@pytest.mark.unit
+class TestCola:
+
+    def test_interactivo_pasa_antes_que_batch(self):
+        gov = RateGovernor({"m": (600, 100_000)})
+        orden = []
+
+        async def llamar(nombre, prioridad):
+            with prioridad_llm(prioridad):
+                await gov.reservar("m", 10)
+            orden.append(nombre)
+
+        async def main():
+            _sin_cupo(gov)
+            batch = asyncio.create_task(llamar("batch", Prioridad.BATCH))
+            await asyncio.sleep(0.01)
+            chat = asyncio.create_task(llamar("chat", Prioridad.INTERACTIVO))
+            await asyncio.sleep(0.01)
+            assert gov.stats()["m"]["queue_by_priority"] == {"interactivo": 1, "batch": 1}
+            await asyncio.gather(batch, chat)
+
+        asyncio.run(main())
+        assert orden == ["chat", "batch"]
+        assert gov.stats()["m"]["queue_max"] == 2
+
+    def test_cancelar_saca_de_la_cola(self):
+        gov = RateGovernor({"m": (60, 100_000)})  # 1 req/s
+
+        async def main():
+            _sin_cupo(gov)
+            t = asyncio.create_task(gov.reservar("m", 10))
+            await asyncio.sleep(0.01)
+            assert gov.stats()["m"]["queue_depth"] == 1
+            t.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await t
+            return gov.stats()["m"]["queue_depth"]
+
+        assert asyncio.run(main()) == 0
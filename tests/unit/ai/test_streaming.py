@@ -0,0 +1,226 @@
+"""
+Tests del streaming de tokens (app.services.ai.streaming) y de ``stream=True``
+en los clientes del LLM.
+"""
+import asyncio
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+
+import pytest
+
+from app.services.ai import http_pool
+from app.services.ai.openrouter_client import OpenRouterClient
+from app.services.ai.streaming import (
+    TokenSink,
+    emitir_a,
+    evento_sse,
+    respuesta_visible,
+    sink_actual,
+)
+from app.services.ia_service import IAService
+
+
+def _chunk(texto):
+    return SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=texto))])
+
+
+class _FakeStreamClient:
+    """Imita ``AsyncGroq``: con ``stream=True`` devuelve un iterador async de chunks."""
+
+    def __init__(self, partes, usage=None, error=None):
+        self.partes = partes
+        self.usage = usage
+        self.error = error
+        self.streams = 0
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create))
+
+    async def _create(self, model, messages, max_tokens=None, temperature=None, stream=False):
+        if not stream:
+            texto = "".join(self.partes)
+            return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=texto))])
+        self.streams += 1
+
+        async def gen():
+            for p in self.partes:
+                await asyncio.sleep(0)
+                yield _chunk(p)
+            if self.error is not None:
+                raise self.error
+            # Chunk final con solo usage (Groq: ``x_groq.usage``).
+            yield SimpleNamespace(choices=[], x_groq=SimpleNamespace(usage=SimpleNamespace(total_tokens=self.usage)))
+
+        return gen()
+
+
+class _ReservaFalsa:
+    def __init__(self, tokens):
+        self.tokens = tokens
+        self.ajustes = []
+
+    def ajustar(self, tokens_reales):
+        self.ajustes.append(tokens_reales)
+
+
+def _ia(fake):
+    svc = IAService.__new__(IAService)
+    svc.groq_client = fake
+    return svc
+
+
+async def _recolectar(sink, coro):
+    with emitir_a(sink):
+        task = asyncio.create_task(coro)
+    eventos = [e async for e in sink.eventos(task)]
+    return eventos, task.result()
+
+
+@pytest.mark.unit
+class TestSink:
+
+    def test_sin_marca_visible_no_hay_sink(self):
+        with emitir_a(TokenSink()) as sink:
+            assert sink_actual() is None
+            with respuesta_visible():
+                assert sink_actual() is sink
+        with respuesta_visible():
+            assert sink_actual() is None
+
+    def test_eventos_hasta_que_termina_la_task(self):
+        async def consulta():
+            with respuesta_visible():
+                s = sink_actual()
+                s.token("Ho")
+                await asyncio.sleep(0.01)
+                s.token("la")
+                s.reiniciar()
+                s.token("Hola")
+            return {"respuesta": "Hola"}
+
+        async def main():
+            sink = TokenSink()
+            eventos, res = await _recolectar(sink, consulta())
+            return sink, eventos, res
+
+        sink, eventos, res = asyncio.run(main())
+        assert [n for n, _ in eventos] == ["token", "token", "reset", "token"]
+        assert res == {"respuesta": "Hola"}
+        assert sink.tokens == 3 and sink.ttft_ms is not None
+
+    def test_formato_sse(self):
+        assert evento_sse("token", {"t": "ñ"}) == 'event: token\ndata: {"t": "ñ"}\n\n'
+
+
+@pytest.mark.unit
+class TestIAServiceStream:
+
+    def test_llamada_visible_emite_tokens_y_retorna_texto(self):
+        fake = _FakeStreamClient(["Te ", "sugiero ", "avena. "])
+        ia = _ia(fake)
+
+        async def consulta():
+            with respuesta_visible():
+                return await ia._llamar_groq_sin_cache("p", 200, 0.7, "llama-3.1-8b-instant")
+
+        async def main():
+            return await _recolectar(TokenSink(), consulta())
+
+        eventos, texto = asyncio.run(main())
+        assert texto == "Te sugiero avena."
+        assert "".join(d["t"] for n, d in eventos if n == "token") == "Te sugiero avena. "
+        assert fake.streams == 1
+
+    def test_stream_ajusta_la_reserva(self, monkeypatch):
+        reservas = []
+
+        async def reservar(modelo, prompt, max_tokens):
+            reservas.append(_ReservaFalsa(max_tokens))
+            return reservas[-1]
+
+        monkeypatch.setattr("app.services.ia_service.reservar_llamada", reservar)
+
+        async def consulta(ia):
+            with respuesta_visible():
+                return await ia._llamar_groq_sin_cache("p", 200, 0.7, "llama-3.1-8b-instant")
+
+        async def main(fake):
+            return await _recolectar(TokenSink(), consulta(_ia(fake)))
+
+        asyncio.run(main(_FakeStreamClient(["Te ", "sugiero ", "avena. "], usage=42)))
+        assert reservas[-1].ajustes == [42]
+        # Corte a mitad del stream: se ajusta a lo recibido (estimado), no queda la reserva entera.
+        asyncio.run(main(_FakeStreamClient(["Te ", "sugiero "], error=RuntimeError("corte"))))
+        assert len(reservas[-1].ajustes) == 1 and reservas[-1].ajustes[0] < 200
+
+    def test_llamada_no_visible_no_usa_stream(self):
+        fake = _FakeStreamClient(["{", "}"])
+        ia = _ia(fake)
+
+        async def main():
+            return await _recolectar(
+                TokenSink(), ia._llamar_groq_sin_cache("p", 50, 0.0, "llama-3.1-8b-instant")
+            )
+
+        eventos, texto = asyncio.run(main())
+        assert texto == "{}" and eventos == [] and fake.streams == 0
+
+
+class _FakeOpenRouterSSE(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        largo = int(self.headers.get("Content-Length", 0))
+        body = json.loads(self.rfile.read(largo) or b"{}")
+        assert body["stream"] is True
+        lineas = [": OPENROUTER PROCESSING"]
+        for p in ("Hola", " mundo"):
+            lineas.append("data: " + json.dumps({"choices": [{"delta": {"content": p}}]}))
+        lineas.append("data: [DONE]")
+        out = ("\n\n".join(lineas) + "\n\n").encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Content-Length", str(len(out)))
+        self.end_headers()
+        self.wfile.write(out)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.mark.unit
+class TestOpenRouterStream:
+
+    def test_parsea_eventos_sse(self, monkeypatch):
+        srv = ThreadingHTTPServer(("127.0.0.1", 0), _FakeOpenRouterSSE)
+        threading.Thread(target=srv.serve_forever, daemon=True).start()
+        url = f"http://127.0.0.1:{srv.server_address[1]}/v1/chat/completions"
+        original = http_pool.stream_sse
+        monkeypatch.setattr(
+            http_pool, "stream_sse", lambda _url, **kw: original(url, **kw)
+        )
+
+        async def main():
+            client = OpenRouterClient(api_key="k")
+            textos = []
+            await http_pool.startup()
+            try:
+                for _ in range(2):
+                    chunks = await client.chat.completions.create(
+                        model="llama-3.1-8b-instant", messages=[], stream=True
+                    )
+                    textos.append([c.choices[0].delta.content async for c in chunks])
+            finally:
+                await http_pool.shutdown()
+            return textos
+
+        http_pool.reset_http_stats()
+        try:
+            assert asyncio.run(main()) == [["Hola", " mundo"]] * 2
+        finally:
+            srv.shutdown()
+            srv.server_close()
+        st = http_pool.http_stats()
+        # Ambos streams terminaron bien y el segundo reusó la conexión que liberó el primero.
+        assert st["requests"] == 2 and st["errors"] == 0
+        assert st["new_connections"] == 1 and st["reused_connections"] == 1
@@ -1,6 +1,8 @@
 """
 Tests para FoodSourceResolver.
 """
+import asyncio
+
 import pytest
 from app.services.nutrition.food.resolver.source_resolver import FoodSourceResolver
 from app.services.nutrition.food.resolver.cache_manager import CacheManager
@@ -18,3 +20,324 @@ class TestFoodSourceResolver:
         
     def test_resolver_init(self, resolver):
         assert resolver is not None
+
+
+@pytest.mark.unit
+class TestResolverSingleFlight:
+    """Misses concurrentes del mismo alimento → una sola estimación LLM + inserción."""
+
+    def test_misses_concurrentes_colapsan(self, monkeypatch):
+        import threading
+        import time
+        from concurrent.futures import ThreadPoolExecutor
+        from unittest.mock import MagicMock
+
+        llamadas_llm, inserciones = [], []
+
+        def estimar(self, nombre_norm, nombre_original):
+            llamadas_llm.append(nombre_norm)
+            time.sleep(0.1)
+            return {"calorias_100g": 130.0, "proteina_100g": 2.7,
+                    "carbohidratos_100g": 28.0, "grasas_100g": 0.3}
+
+        def persistir(self, nombre, nombre_norm, macros, source):
+            inserciones.append(nombre_norm)
+            return 77
+
+        monkeypatch.setattr(FoodSourceResolver, "_buscar_bd_local", lambda self, n: None)
+        monkeypatch.setattr(FoodSourceResolver, "_estimar_con_llm", estimar)
+        monkeypatch.setattr(FoodSourceResolver, "_persistir_en_bd", persistir)
+
+        caches = []
+        barrera = threading.Barrier(6)
+
+        def resolver(user_id):
+            cm = MagicMock()
+            cm.obtener_del_cache.return_value = None
+            caches.append(cm)
+            barrera.wait()
+            return FoodSourceResolver(db=None, cache_manager=cm).resolver_ingrediente(
+                "Quinua Roja", user_id=user_id, gramos=50
+            )
+
+        with ThreadPoolExecutor(6) as pool:
+            res = list(pool.map(resolver, range(6)))
+
+        assert llamadas_llm == ["quinua roja"]
+        assert inserciones == ["quinua roja"]
+        assert all(r["alimento_id"] == 77 and r["source"] == "LLM_Estimado" for r in res)
+        # Cada usuario conserva su propia entrada de caché.
+        assert all(cm.guardar_en_cache.call_count == 1 for cm in caches)
+        # Cada resultado tiene su propia copia de macros.
+        assert len({id(r["macros_100g"]) for r in res}) == 6
+
+
+    def test_lider_usa_su_propia_sesion(self, monkeypatch):
+        from unittest.mock import AsyncMock, MagicMock
+
+        from app.services.nutrition.food.resolver import source_resolver
+
+        sesiones = []
+
+        class Sesion:
+            def __init__(self, bind, **kw):
+                self.bind, self.cerrada = bind, False
+                sesiones.append(self)
+
+            def close(self):
+                self.cerrada = True
+
+        usadas = []
+
+        def fuentes(self, nombre_norm, nombre_original):
+            usadas.append(self.db)
+            return {"source": "BD", "macros": dict(_MACROS_OK), "alimento_id": 5}
+
+        async def fuentes_async(self, nombre_norm, nombre_original):
+            await asyncio.sleep(0)
+            return fuentes(self, nombre_norm, nombre_original)
+
+        monkeypatch.setattr(source_resolver, "Session", Sesion)
+        monkeypatch.setattr(FoodSourceResolver, "_resolver_fuentes", fuentes)
+        monkeypatch.setattr(FoodSourceResolver, "_resolver_fuentes_async", fuentes_async)
+        monkeypatch.setattr(FoodSourceResolver, "_resultado_desde_fuente", lambda self, *a: {"ok": True})
+        db = MagicMock()
+        cm = MagicMock()
+        cm.obtener_del_cache.return_value = None
+        cm.obtener_del_cache_async = AsyncMock(return_value=None)
+        resolver = FoodSourceResolver(db=db, cache_manager=cm)
+
+        resolver.resolver_ingrediente("Quinua", user_id=1)
+        asyncio.run(resolver.resolver_ingrediente_async("Quinua", user_id=1))
+
+        # Ni la ruta síncrona ni la task async tocan la sesión del request.
+        assert usadas == sesiones and len(sesiones) == 2
+        assert all(s.bind is db.get_bind.return_value and s.cerrada for s in sesiones)
+
+
+_MACROS_OK = {"calorias_100g": 130.0, "proteina_100g": 2.7,
+              "carbohidratos_100g": 28.0, "grasas_100g": 0.3}
+
+
+class _FakeLLM:
+    """``completar`` async: prompts de lote → array JSON; individuales → objeto JSON."""
+
+    def __init__(self, lote_falla=False, invalidos=()):
+        self.lote_falla = lote_falla
+        self.invalidos = set(invalidos)
+        self.lotes, self.individuales = [], []
+        self.activos = self.max_activos = 0
+
+    async def completar(self, prompt, max_tokens=512, **kw):
+        import asyncio
+        import json
+        import re
+
+        if "array JSON" in prompt:
+            nombres = re.findall(r"^\d+\. (.+)$", prompt, re.MULTILINE)
+            self.lotes.append(nombres)
+            if self.lote_falla:
+                raise ConnectionError("503")
+            entradas = []
+            for n in nombres:
+                m = dict(_MACROS_OK, nombre=n)
+                if n in self.invalidos:
+                    m["calorias_100g"] = 5000.0  # no pasa validación física
+                entradas.append(m)
+            return "Aquí tienes:\n" + json.dumps(entradas)
+
+        nombre = re.search(r"alimento: '(.+?)'", prompt).group(1)
+        self.individuales.append(nombre)
+        self.activos += 1
+        self.max_activos = max(self.max_activos, self.activos)
+        await asyncio.sleep(0.02)
+        self.activos -= 1
+        return json.dumps(_MACROS_OK)
+
+
+@pytest.mark.unit
+class TestResolverLote:
+    """Faltantes de un plato → un prompt LLM con array JSON + una transacción."""
+
+    def _resolver(self, monkeypatch, llm, en_bd=()):
+        from unittest.mock import MagicMock
+
+        persistidos = []
+
+        def bd(self, nombre_norm):
+            if nombre_norm in en_bd:
+                return {"id": 1, "nombre": nombre_norm, "macros": dict(_MACROS_OK)}
+            return None
+
+        def persistir_lote(self, estimados, source):
+            persistidos.append(sorted(estimados))
+            return {n: 100 + i for i, n in enumerate(sorted(estimados))}
+
+        monkeypatch.setattr(FoodSourceResolver, "_buscar_bd_local", bd)
+        monkeypatch.setattr(FoodSourceResolver, "_persistir_lote_en_bd", persistir_lote)
+        monkeypatch.setattr(FoodSourceResolver, "_registrar_sin_resolver", lambda self, nombre, user_id: True)
+        cm = MagicMock()
+        cm.obtener_del_cache.return_value = None
+        return FoodSourceResolver(db=None, cache_manager=cm, llm_service=llm), persistidos
+
+    def test_faltantes_en_una_llamada_y_una_transaccion(self, monkeypatch):
+        llm = _FakeLLM()
+        resolver, persistidos = self._resolver(monkeypatch, llm, en_bd={"arroz"})
+        res = resolver.resolver_ingredientes_lote(
+            [{"nombre": "Arroz", "gramos": 150}, {"nombre": "Sachatomate", "gramos": 50},
+             {"nombre": "Cocona"}, {"nombre": "sachatomate", "gramos": 20}],
+            user_id=1,
+        )
+        assert llm.lotes == [["Sachatomate", "Cocona"]] and llm.individuales == []
+        assert persistidos == [["cocona", "sachatomate"]]
+        assert [r["source"] for r in res] == ["BD", "LLM_Estimado", "LLM_Estimado", "LLM_Estimado"]
+        assert [r["gramos"] for r in res] == [150, 50, 100, 20]
+        assert res[1]["alimento_id"] == res[3]["alimento_id"] == 101
+
+    def test_entrada_invalida_se_reintenta_individual(self, monkeypatch):
+        llm = _FakeLLM(invalidos={"Cocona"})
+        resolver, _ = self._resolver(monkeypatch, llm)
+        res = resolver.resolver_ingredientes_lote(
+            [{"nombre": "Sachatomate"}, {"nombre": "Cocona"}], user_id=1
+        )
+        assert llm.individuales == ["Cocona"]
+        assert all(r["exito"] for r in res)
+
+    def test_lote_fallido_reintenta_con_concurrencia_acotada(self, monkeypatch):
+        from app.core.config import settings
+
+        monkeypatch.setattr(settings, "CALOFIT_FOOD_BATCH_FALLBACK_CONCURRENCY", 2)
+        llm = _FakeLLM(lote_falla=True)
+        resolver, persistidos = self._resolver(monkeypatch, llm)
+        nombres = ["Aguaymanto", "Camu camu", "Cocona", "Tumbo", "Pacay"]
+        res = resolver.resolver_ingredientes_lote([{"nombre": n} for n in nombres], user_id=1)
+        assert sorted(llm.individuales) == sorted(nombres)
+        assert llm.max_activos == 2
+        assert len(persistidos) == 1 and len(persistidos[0]) == 5
+        assert all(r["source"] == "LLM_Estimado" for r in res)
+
+    def test_platos_concurrentes_comparten_el_faltante(self, monkeypatch):
+        import threading
+        from concurrent.futures import ThreadPoolExecutor
+
+        llm = _FakeLLM()
+        original = llm.completar
+
+        async def lento(prompt, max_tokens=512, **kw):
+            await asyncio.sleep(0.1)
+            return await original(prompt, max_tokens, **kw)
+
+        llm.completar = lento
+        resolver, persistidos = self._resolver(monkeypatch, llm)
+        barrera = threading.Barrier(2)
+
+        def plato(nombres):
+            barrera.wait()
+            return resolver.resolver_ingredientes_lote([{"nombre": n} for n in nombres], user_id=1)
+
+        with ThreadPoolExecutor(2) as pool:
+            res = list(pool.map(plato, [["Cocona", "Tumbo"], ["Cocona", "Pacay"]]))
+        pedidos = sorted(n for lote in llm.lotes for n in lote) + sorted(llm.individuales)
+        assert pedidos.count("Cocona") == 1
+        assert sum(lote.count("cocona") for lote in persistidos) == 1
+        assert all(r["source"] == "LLM_Estimado" for rs in res for r in rs)
+        assert res[0][0]["alimento_id"] == res[1][0]["alimento_id"]
+
+    def test_persistir_lote_un_solo_commit(self):
+        from itertools import count
+        from unittest.mock import MagicMock
+
+        db = MagicMock()
+        db.query.return_value.filter.return_value.all.return_value = [(7, "arroz")]
+        ids = count(50)
+
+        def flush():
+            for a in db.add_all.call_args[0][0]:
+                a.id = next(ids)
+
+        db.flush.side_effect = flush
+        resolver = FoodSourceResolver(db=db, cache_manager=MagicMock())
+        res = resolver._persistir_lote_en_bd(
+            {"arroz": ("Arroz", _MACROS_OK), "cocona": ("Cocona", _MACROS_OK), "tumbo": ("Tumbo", _MACROS_OK)},
+            source="LLM_Estimado",
+        )
+        assert res == {"arroz": 7, "cocona": 50, "tumbo": 51}
+        assert db.commit.call_count == 1 and db.add_all.call_count == 1
+
+
+@pytest.mark.unit
+class TestResolverAsync:
+    """La API async espera al LLM en el loop del llamador y da lo mismo que la síncrona."""
+
+    def test_lote_async_igual_al_sincrono(self, monkeypatch):
+        ingredientes = [{"nombre": "Arroz", "gramos": 150}, {"nombre": "Cocona"}, {"nombre": "Tumbo", "gramos": 30}]
+        sync, _ = TestResolverLote()._resolver(monkeypatch, _FakeLLM(), en_bd={"arroz"})
+        esperado = sync.resolver_ingredientes_lote(ingredientes, user_id=1)
+
+        llm = _FakeLLM()
+        resolver, persistidos = TestResolverLote()._resolver(monkeypatch, llm, en_bd={"arroz"})
+        res = asyncio.run(resolver.resolver_ingredientes_lote_async(ingredientes, user_id=1))
+        assert res == esperado
+        assert llm.lotes == [["Cocona", "Tumbo"]] and persistidos == [["cocona", "tumbo"]]
+
+    def test_resolver_ingrediente_async_en_el_loop_del_llamador(self, monkeypatch):
+        from unittest.mock import AsyncMock
+
+        llm = _FakeLLM()
+        resolver, _ = TestResolverLote()._resolver(monkeypatch, llm)
+        resolver.cache_manager.obtener_del_cache_async = AsyncMock(return_value=None)
+        monkeypatch.setattr(FoodSourceResolver, "_persistir_en_bd", lambda self, **kw: 77)
+        loops = []
+        original = llm.completar
+
+        async def completar(prompt, max_tokens=512, **kw):
+            loops.append(asyncio.get_running_loop())
+            return await original(prompt, max_tokens, **kw)
+
+        llm.completar = completar
+
+        async def main():
+            r = await resolver.resolver_ingrediente_async("Sachatomate", user_id=1, gramos=50)
+            return r, asyncio.get_running_loop()
+
+        res, loop = asyncio.run(main())
+        assert loops == [loop]
+        assert res["source"] == "LLM_Estimado" and res["alimento_id"] == 77 and res["gramos"] == 50
+        resolver.cache_manager.guardar_en_cache.assert_called_once()
+
+
+@pytest.mark.unit
+class TestEjecutarAsync:
+    """``_ejecutar_async``: una sola ejecución, errores propagados y timeout real."""
+
+    def test_error_no_reintenta(self):
+        llamadas = []
+
+        async def falla():
+            llamadas.append(1)
+            raise ConnectionError("503")
+
+        with pytest.raises(ConnectionError):
+            FoodSourceResolver._ejecutar_async(falla, timeout=1)
+
+        async def desde_un_loop():
+            FoodSourceResolver._ejecutar_async(falla, timeout=1)
+
+        with pytest.raises(ConnectionError):
+            asyncio.run(desde_un_loop())
+        assert llamadas == [1, 1]
+
+    def test_timeout_acota_la_espera_con_loop_corriendo(self):
+        import time
+
+        async def lenta():
+            await asyncio.sleep(2)
+            return "tarde"
+
+        async def desde_un_loop():
+            t0 = time.perf_counter()
+            with pytest.raises(TimeoutError):
+                FoodSourceResolver._ejecutar_async(lenta, timeout=0.1)
+            return time.perf_counter() - t0
+
+        assert asyncio.run(desde_un_loop()) < 1
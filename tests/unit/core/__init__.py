@@ -0,0 +1,3 @@
+"""
+__init__.py para paquete de pruebas.
+"""
@@ -0,0 +1,78 @@
+"""
+Tests de los backends enchufables de app.core.cache.
+
+El backend SQLite se prueba con un segundo proceso real para comprobar que una
+entrada escrita por otro worker se sirve como hit y se cuenta como cross-worker.
+"""
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import pytest
+
+from app.core import cache
+from app.core.cache_backends import MemoryBackend, SQLiteBackend, build_backend
+
+_ROOT = Path(__file__).resolve().parents[3]
+
+
+@pytest.fixture
+def sqlite_backend(tmp_path):
+    backend = SQLiteBackend(str(tmp_path / "cache.sqlite3"))
+    cache.set_backend(backend)
+    yield backend
+    cache.set_backend(MemoryBackend())
+
+
+@pytest.mark.unit
+class TestCacheBackends:
+
+    def test_memory_roundtrip_y_expiracion(self):
+        backend = MemoryBackend()
+        backend.set("k", '{"a": 1}', ttl_seconds=60)
+        raw, pid = backend.get("k")
+        assert raw == '{"a": 1}'
+        backend.set("viejo", "1", ttl_seconds=-1)
+        assert backend.get("viejo") is None
+
+    def test_sqlite_roundtrip_delete(self, tmp_path):
+        backend = SQLiteBackend(str(tmp_path / "c.sqlite3"))
+        backend.set("k", "[1, 2]", ttl_seconds=60)
+        assert backend.get("k")[0] == "[1, 2]"
+        backend.delete("k")
+        assert backend.get("k") is None
+
+    def test_sqlite_respeta_ttl(self, tmp_path):
+        backend = SQLiteBackend(str(tmp_path / "c.sqlite3"))
+        backend.set("k", "1", ttl_seconds=0.05)
+        time.sleep(0.1)
+        assert backend.get("k") is None
+
+    def test_build_backend_desconocido(self):
+        with pytest.raises(ValueError):
+            build_backend("redis")
+
+    def test_api_publica_sobre_sqlite(self, sqlite_backend):
+        assert cache.set_consulta_cached("abc", {"kcal": 500})
+        assert cache.get_consulta_cached("abc") == {"kcal": 500}
+        assert cache.get_consulta_cached("no-existe") is None
+        stats = cache.get_cache_stats()
+        assert stats["backend"] == "sqlite"
+        assert stats["hits"] == 1 and stats["misses"] == 1
+        assert stats["hits_cross_worker"] == 0
+
+    def test_hit_entre_workers(self, sqlite_backend):
+        """Otro proceso escribe la tarjeta de consulta; este worker la lee como hit."""
+        script = (
+            "from app.core import cache\n"
+            "from app.core.cache_backends import SQLiteBackend\n"
+            f"cache.set_backend(SQLiteBackend({sqlite_backend.path!r}))\n"
+            "cache.set_consulta_cached('otro-worker', {'ok': True})\n"
+        )
+        subprocess.run([sys.executable, "-c", script], cwd=_ROOT, check=True, timeout=60)
+
+        assert cache.get_consulta_cached("otro-worker") == {"ok": True}
+        stats = cache.get_cache_stats()
+        assert stats["hits_cross_worker"] == 1
+        assert stats["cross_worker_hit_rate"] == 1.0
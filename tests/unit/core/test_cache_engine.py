@@ -0,0 +1,55 @@
+"""
+Tests de StripedTTLCache (app/core/cache_engine.py): expiración por heap,
+LRU acotado por entradas y bytes.
+"""
+import time
+
+import pytest
+
+from app.core.cache_engine import StripedTTLCache
+
+
+@pytest.mark.unit
+class TestStripedTTLCache:
+
+    def test_expira_sin_barrer_todo(self):
+        c = StripedTTLCache(stripes=1)
+        c.set("corto", 1, ttl_seconds=0.05)
+        c.set("largo", 2, ttl_seconds=60)
+        time.sleep(0.1)
+        assert c.get("corto") is None
+        assert c.get("largo") == 2
+        assert c.stats()["expirations"] == 1
+
+    def test_reescribir_key_no_expira_version_nueva(self):
+        c = StripedTTLCache(stripes=1)
+        c.set("k", "viejo", ttl_seconds=0.05)
+        c.set("k", "nuevo", ttl_seconds=60)
+        time.sleep(0.1)
+        # La entrada obsoleta del heap no debe borrar la versión vigente.
+        assert c.get("k") == "nuevo"
+
+    def test_lru_por_entradas(self):
+        c = StripedTTLCache(max_entries=3, stripes=1)
+        for k in ("a", "b", "c"):
+            c.set(k, k, ttl_seconds=60)
+        c.get("a")  # "a" pasa a ser la más reciente
+        c.set("d", "d", ttl_seconds=60)
+        assert c.get("b") is None
+        assert c.get("a") == "a"
+        assert len(c) == 3
+        assert c.stats()["evictions"] == 1
+
+    def test_lru_por_bytes(self):
+        c = StripedTTLCache(max_bytes=100, stripes=1)
+        c.set("a", "x", ttl_seconds=60, size=60)
+        c.set("b", "y", ttl_seconds=60, size=60)
+        assert c.get("a") is None
+        assert c.stats()["bytes"] == 60
+        assert c.set("enorme", "z", ttl_seconds=60, size=500) is False
+
+    def test_heap_se_compacta(self):
+        c = StripedTTLCache(stripes=1)
+        for _ in range(500):
+            c.set("misma", 1, ttl_seconds=60)
+        assert len(c._shards[0].heap) <= 2 * len(c) + 64
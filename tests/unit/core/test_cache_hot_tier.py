@@ -0,0 +1,73 @@
+"""
+Tests del tier caliente de app.core.cache: snapshots inmutables sin JSON.
+"""
+import json
+
+import pytest
+
+from app.core import cache
+from app.core.cache_backends import MemoryBackend, SQLiteBackend
+from app.core.frozen import FrozenDict, freeze
+
+
+@pytest.fixture(autouse=True)
+def _backend_memoria():
+    cache.set_backend(MemoryBackend())
+    yield
+    cache.set_backend(MemoryBackend())
+
+
+@pytest.mark.unit
+class TestFrozen:
+
+    def test_freeze_profundo(self):
+        v = freeze({"a": [1, {"b": 2}], "s": {1}})
+        assert isinstance(v, FrozenDict)
+        assert v["a"] == (1, {"b": 2})
+        with pytest.raises(TypeError):
+            v["a"] = 3
+        with pytest.raises(TypeError):
+            v["a"][1]["b"] = 3
+
+    def test_frozendict_serializa_como_dict(self):
+        v = freeze({"kcal": 500, "items": ["arroz"]})
+        assert json.loads(json.dumps(v)) == {"kcal": 500, "items": ["arroz"]}
+        assert isinstance(v, dict)
+
+
+@pytest.mark.unit
+class TestTierCaliente:
+
+    def test_hit_devuelve_mismo_objeto_sin_json(self, monkeypatch):
+        cache.set_consulta_cached("c1", {"kcal": 500})
+
+        def _prohibido(*a, **k):
+            raise AssertionError("el tier caliente no debe deserializar")
+
+        monkeypatch.setattr(cache.json, "loads", _prohibido)
+        a = cache.get_consulta_cached("c1")
+        b = cache.get_consulta_cached("c1")
+        assert a is b and a == {"kcal": 500}
+        assert cache.get_cache_stats()["hits_hot"] == 2
+
+    def test_set_copia_el_valor(self):
+        payload = {"kcal": 500}
+        cache.set_consulta_cached("c2", payload)
+        payload["kcal"] = 1
+        assert cache.get_consulta_cached("c2")["kcal"] == 500
+
+    def test_recent_meals_sigue_funcionando(self):
+        cache.add_user_recent_meal(7, {"nombre": "Ceviche"})
+        cache.add_user_recent_meal(7, {"nombre": "Lomo saltado"})
+        cache.add_user_recent_meal(7, {"nombre": "ceviche"})
+        nombres = [m["nombre"] for m in cache.get_user_recent_meals(7)]
+        assert nombres == ["ceviche", "Lomo saltado"]
+
+    def test_con_tier_compartido_serializa_solo_alli(self, tmp_path):
+        backend = SQLiteBackend(str(tmp_path / "c.sqlite3"))
+        cache.set_backend(backend)
+        cache.set_cached("k", {"x": [1, 2]})
+        raw, _ = backend.get("calofit:k")
+        assert json.loads(raw) == {"x": [1, 2]}
+        cache.delete_cached("k")
+        assert cache.get_cached("k") is None
@@ -0,0 +1,151 @@
+"""
+Tests del registro unificado de métricas de caché (app.core.cache_metrics).
+"""
+import json
+import os
+import threading
+import time
+
+import pytest
+
+from app.core import cache, cache_metrics
+from app.core.cache_backends import MemoryBackend
+from app.core.cache_engine import StripedTTLCache
+from app.core.cache_metrics import (
+    CacheMetricsRegistry,
+    key_prefix,
+    merge_snapshots,
+    read_published,
+    registry,
+)
+
+
+@pytest.fixture(autouse=True)
+def _registro_limpio():
+    cache.set_backend(MemoryBackend())
+    registry.reset()
+    yield
+    cache.set_backend(MemoryBackend())
+    registry.reset()
+
+
+def _serie(snap: dict, nombre: str, prefijo: str) -> dict:
+    return snap["caches"][nombre]["prefixes"][prefijo]
+
+
+@pytest.mark.unit
+class TestRegistro:
+
+    def test_key_prefix(self):
+        assert key_prefix("calofit:consulta:abc") == "consulta"
+        assert key_prefix("recent_meals:7") == "recent_meals"
+        assert key_prefix("sin_dos_puntos") == "sin_dos_puntos"
+
+    def test_lookup_e_incr(self):
+        r = CacheMetricsRegistry()
+        r.lookup("c", "p", True, 0.0002)
+        r.lookup("c", "p", False, 0.004)
+        r.incr("c", "p", "sets")
+        r.incr("c", "p", "evictions", 3)
+        d = _serie(r.snapshot(), "c", "p")
+        assert (d["hits"], d["misses"], d["sets"], d["evictions"]) == (1, 1, 1, 3)
+        assert d["hit_rate"] == 0.5
+        assert d["lookup_ms"]["count"] == 2
+        assert d["lookup_ms"]["max"] == pytest.approx(4.0)
+        assert sum(d["lookup_ms"]["buckets"].values()) == 2
+
+    def test_incr_contador_desconocido(self):
+        with pytest.raises(ValueError):
+            CacheMetricsRegistry().incr("c", "p", "latencia")
+
+    def test_gauge_aporta_entradas_y_bytes(self):
+        r = CacheMetricsRegistry()
+        r.register_gauge("c", lambda: {"p": {"entries": 2, "bytes": 100}})
+        snap = r.snapshot()
+        assert _serie(snap, "c", "p")["bytes"] == 100
+        assert snap["caches"]["c"]["total"]["entries"] == 2
+
+    def test_publicar_y_agregar_workers(self, tmp_path):
+        r = CacheMetricsRegistry(publish_dir=str(tmp_path))
+        r.lookup("c", "p", True, 0.001)
+        r.publish()
+        # Otro worker (pid distinto) con sus propios contadores.
+        otro = r.snapshot()
+        otro["pid"] = -1
+        otro["caches"]["c"]["prefixes"]["p"]["misses"] = 3
+        (tmp_path / "otro.json").write_text(json.dumps(otro))
+        viejo = dict(otro, ts=time.time() - 10 * 3600)
+        (tmp_path / "viejo.json").write_text(json.dumps(viejo))
+
+        merged = merge_snapshots(read_published(str(tmp_path)))
+        assert sorted(merged["workers"]) == sorted([os.getpid(), -1])
+        total = merged["caches"]["c"]["prefixes"]["p"]
+        assert total["hits"] == 2 and total["misses"] == 3
+
+    def test_lookup_no_publica_en_el_camino_del_request(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(cache_metrics, "_PUBLISH_EVERY_SEC", 0.02)
+        r = CacheMetricsRegistry(publish_dir=str(tmp_path))
+        hilos = []
+        monkeypatch.setattr(r, "snapshot", lambda: hilos.append(threading.current_thread()) or {"ts": time.time()})
+        try:
+            for _ in range(50):
+                r.lookup("c", "p", True, 0.001)
+            assert threading.current_thread() not in hilos
+            time.sleep(0.1)
+        finally:
+            r.detener_publicador()
+        assert hilos and all(h.name == "cache-metrics" for h in hilos)
+        assert (tmp_path / f"{os.getpid()}.json").exists()
+
+    def test_read_published_sin_directorio(self):
+        assert read_published("") == []
+
+
+@pytest.mark.unit
+class TestInstrumentacion:
+
+    def test_app_cache_por_prefijo(self):
+        cache.set_cached("consulta:x", {"a": 1}, ttl_seconds=60)
+        assert cache.get_cached("consulta:x") == {"a": 1}
+        assert cache.get_cached("consulta:y") is None
+        snap = registry.snapshot()
+        d = _serie(snap, "app_cache", "consulta")
+        assert (d["hits"], d["misses"], d["sets"]) == (1, 1, 1)
+        assert d["entries"] == 1 and d["bytes"] > 0
+
+    def test_engine_reporta_expulsiones_y_expiraciones(self):
+        eventos = []
+        c = StripedTTLCache(max_entries=1, stripes=1, on_remove=lambda k, m: eventos.append((k, m)))
+        c.set("a", 1, ttl_seconds=60)
+        c.set("b", 2, ttl_seconds=0.01)
+        time.sleep(0.02)
+        c.get("b")
+        assert eventos == [("a", "evicted"), ("b", "expired")]
+        assert c.usage_by(lambda k: "todo") == {}
+
+    def test_macro_cache_exact_y_fuzzy(self):
+        from app.services import llm_registro
+
+        llm_registro._macro_cache.clear()
+        llm_registro.cache_macros("Lomo saltado", {"kcal": 700})
+        assert llm_registro.get_cached_macros("Lomo saltado") == {"kcal": 700}
+        assert llm_registro.get_cached_macros("Ají de gallina") is None
+        llm_registro._buscar_en_cache("comí lomo saltado")
+        snap = registry.snapshot()
+        exact = _serie(snap, "macro_cache", "exact")
+        assert (exact["hits"], exact["misses"], exact["sets"], exact["entries"]) == (1, 1, 1, 1)
+        assert _serie(snap, "macro_cache", "fuzzy")["hits"] == 1
+        llm_registro._macro_cache.clear()
+
+    def test_macro_vencida_se_expulsa_y_cuenta_una_vez(self):
+        from app.services import llm_registro
+
+        llm_registro._macro_cache.clear()
+        llm_registro.cache_macros("Lomo saltado", {"kcal": 700})
+        key = llm_registro._cache_key("Lomo saltado")
+        llm_registro._macro_cache[key]["_ts"] -= llm_registro._CACHE_TTL + 1
+        assert llm_registro.get_cached_macros("Lomo saltado") is None
+        assert llm_registro.get_cached_macros("Lomo saltado") is None
+        assert key not in llm_registro._macro_cache
+        exact = _serie(registry.snapshot(), "macro_cache", "exact")
+        assert (exact["expirations"], exact["misses"], exact["entries"]) == (1, 2, 0)
@@ -0,0 +1,43 @@
+"""
+Tests del engine async de app.core.database (URL derivada de DATABASE_URL).
+"""
+import sys
+
+import pytest
+
+from app.core import database
+from app.core.database import _async_url
+
+
+@pytest.mark.unit
+class TestUrlAsync:
+
+    def test_postgres_pasa_a_asyncpg(self):
+        url, connect_args = _async_url("postgresql://u:p@db:5432/BD_Calofit")
+        assert url.drivername == "postgresql+asyncpg"
+        assert url.database == "BD_Calofit" and url.password == "p"
+        assert connect_args == {}
+
+    def test_sslmode_va_a_connect_args(self):
+        url, connect_args = _async_url("postgresql+psycopg2://u:p@h/bd?sslmode=require")
+        assert url.drivername == "postgresql+asyncpg"
+        assert "sslmode" not in url.query
+        assert connect_args == {"ssl": "require"}
+
+    def test_sqlite_pasa_a_aiosqlite(self):
+        url, _ = _async_url("sqlite+pysqlite:///:memory:")
+        assert url.drivername == "sqlite+aiosqlite"
+
+    def test_fallback_sqlite_comparte_archivo_con_el_engine_async(self, monkeypatch, tmp_path):
+        ruta = str(tmp_path / "fallback.db")
+        monkeypatch.setattr(database.settings, "DATABASE_URL", "postgresql://u:p@db:5432/BD_Calofit")
+        monkeypatch.setitem(sys.modules, "psycopg2", None)  # sin driver
+        monkeypatch.setenv("CALOFIT_DB_FALLBACK_SQLITE", "1")
+        monkeypatch.setenv("CALOFIT_DB_FALLBACK_SQLITE_PATH", ruta)
+        engine = database._build_engine()
+        try:
+            url, _ = _async_url(engine.url.render_as_string(hide_password=False))
+            assert engine.url.database == url.database == ruta
+            assert url.drivername == "sqlite+aiosqlite"
+        finally:
+            engine.dispose()
@@ -0,0 +1,91 @@
+"""
+Tests de la caché de identidad (app.core.identity_cache): hits sin queries,
+instancias propias por request e invalidación al modificar el usuario.
+"""
+import pytest
+from sqlalchemy import create_engine, inspect
+from sqlalchemy.orm import sessionmaker
+
+from app.core.config import settings
+from app.core.identity_cache import (
+    guardar_identidad,
+    identity_cache_stats,
+    instalar_invalidacion_identidad,
+    limpiar_identidades,
+    obtener_identidad,
+)
+from app.core.query_counter import contar_queries
+from app.models.user import User
+
+
+@pytest.fixture
+def db(monkeypatch):
+    monkeypatch.setattr(settings, "CALOFIT_AUTH_CACHE_TTL_SEC", 30.0)
+    instalar_invalidacion_identidad()
+    limpiar_identidades()
+    engine = create_engine("sqlite://")
+    User.__table__.create(engine)
+    sesion = sessionmaker(bind=engine, expire_on_commit=False)()
+    sesion.add(User(
+        id=5, first_name="Ana", last_name_paternal="Pérez", last_name_maternal="Soto",
+        email="ana@calofit.pe", hashed_password="x", role_id=1, role_name="Nutricionista",
+    ))
+    sesion.commit()
+    yield sesion
+    sesion.close()
+    engine.dispose()
+    limpiar_identidades()
+
+
+@pytest.mark.unit
+class TestIdentityCache:
+
+    def test_hit_sin_queries_e_instancia_propia(self, db):
+        assert obtener_identidad(User, 5) is None
+        guardar_identidad(db.get(User, 5))
+
+        with contar_queries() as c:
+            a = obtener_identidad(User, 5)
+            b = obtener_identidad(User, 5)
+        assert c.total == 0
+        assert a is not b
+        assert (a.id, a.email, a.role_name) == (5, "ana@calofit.pe", "Nutricionista")
+        assert inspect(a).detached
+
+        a.first_name = "Otra"
+        assert obtener_identidad(User, 5).first_name == "Ana"
+
+    def test_commit_invalida(self, db):
+        user = db.get(User, 5)
+        guardar_identidad(user)
+        user.role_name = "Admin"
+        db.commit()
+        assert obtener_identidad(User, 5) is None
+
+        guardar_identidad(db.get(User, 5))
+        assert obtener_identidad(User, 5).role_name == "Admin"
+
+    def test_flush_invalida_antes_del_commit(self, db):
+        user = db.get(User, 5)
+        guardar_identidad(user)
+        user.hashed_password = "nuevo"
+        db.flush()
+        assert obtener_identidad(User, 5) is None
+        db.rollback()
+
+    def test_fila_parcial_no_se_cachea(self, db):
+        user = db.get(User, 5)
+        db.expire(user, ["email"])
+        guardar_identidad(user)
+        assert obtener_identidad(User, 5) is None
+
+    def test_ttl_cero_desactiva(self, db, monkeypatch):
+        monkeypatch.setattr(settings, "CALOFIT_AUTH_CACHE_TTL_SEC", 0.0)
+        guardar_identidad(db.get(User, 5))
+        assert obtener_identidad(User, 5) is None
+
+    def test_stats(self, db):
+        guardar_identidad(db.get(User, 5))
+        obtener_identidad(User, 5)
+        stats = identity_cache_stats()
+        assert stats["hits"] >= 1 and stats["entradas"] == 1
@@ -0,0 +1,63 @@
+"""
+Tests del monitor del event loop (app.core.loop_monitor): lag, detección de
+callbacks que bloquean el loop y modo test (vigilar_bloqueos / sin_bloqueos_loop).
+"""
+import asyncio
+import time
+
+import pytest
+
+from app.core.loop_monitor import LoopBloqueado, LoopMonitor, vigilar_bloqueos
+
+
+def _consulta_sincrona():
+    time.sleep(0.2)
+
+
+async def _ruta_que_bloquea():
+    _consulta_sincrona()
+    await asyncio.sleep(0)
+    return "ok"
+
+
+async def _ruta_correcta():
+    await asyncio.to_thread(_consulta_sincrona)
+    await asyncio.sleep(0.05)
+    return "ok"
+
+
+@pytest.mark.unit
+class TestLoopMonitor:
+
+    def test_bloqueo_registra_sitio_y_stack(self):
+        async def escenario():
+            async with vigilar_bloqueos(umbral_ms=50, fallar=False) as monitor:
+                await _ruta_que_bloquea()
+            return monitor
+
+        monitor = asyncio.run(escenario())
+        assert len(monitor.bloqueos) == 1
+        bloqueo = monitor.bloqueos[0]
+        assert bloqueo["ms"] >= 50
+        assert "test_loop_monitor.py" in bloqueo["sitio"] and "_consulta_sincrona" in bloqueo["sitio"]
+        assert any("_ruta_que_bloquea" in linea for linea in bloqueo["stack"])
+
+    def test_lag_alimenta_el_histograma(self):
+        async def escenario():
+            monitor = LoopMonitor(umbral_ms=500, intervalo_ms=5)
+            monitor.iniciar()
+            await asyncio.sleep(0.1)
+            monitor.detener()
+            return monitor.stats()
+
+        st = asyncio.run(escenario())
+        assert st["lag_ms"]["count"] > 0
+        assert sum(st["lag_ms"]["buckets"].values()) == st["lag_ms"]["count"]
+        assert st["blocks"] == 0 and st["enabled"] is False
+
+    def test_fixture_falla_si_se_bloquea(self, sin_bloqueos_loop):
+        with pytest.raises(LoopBloqueado, match="_consulta_sincrona"):
+            sin_bloqueos_loop(_ruta_que_bloquea(), umbral_ms=50)
+
+    def test_fixture_pasa_sin_bloqueos(self, sin_bloqueos_loop):
+        assert sin_bloqueos_loop(_ruta_correcta(), umbral_ms=50) == "ok"
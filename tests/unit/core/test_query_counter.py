@@ -0,0 +1,111 @@
+"""
+Tests del conteo de queries por request (app.core.query_counter): formas de
+sentencia, middleware (headers X-DB-*, métricas por ruta, N+1) y el fixture
+presupuesto_queries.
+"""
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, text
+from sqlalchemy.pool import StaticPool
+
+from app.core.config import settings
+from app.core.query_counter import (
+    SIN_RUTA,
+    QueryCountMiddleware,
+    contar_queries,
+    forma_sql,
+    reset_sql_stats,
+    sql_stats,
+)
+
+
+@pytest.fixture
+def app_sqlite(monkeypatch):
+    monkeypatch.setattr(settings, "CALOFIT_SQL_METRICS_ENABLED", True)
+    monkeypatch.setattr(settings, "CALOFIT_SQL_HEADERS", True)
+    monkeypatch.setattr(settings, "CALOFIT_SQL_N1_THRESHOLD", 3)
+    engine = create_engine("sqlite://", poolclass=StaticPool, connect_args={"check_same_thread": False})
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE dias (id INTEGER PRIMARY KEY, kcal REAL)"))
+        conn.execute(text("INSERT INTO dias (id, kcal) VALUES (1, 1800), (2, 2100), (3, 1950), (4, 2000)"))
+
+    app = FastAPI()
+    app.add_middleware(QueryCountMiddleware)
+
+    @app.get("/semana/{n}")
+    def semana_por_dia(n: int):
+        with engine.connect() as conn:
+            return [conn.execute(text("SELECT kcal FROM dias WHERE id = :i"), {"i": i}).scalar() for i in range(1, n + 1)]
+
+    @app.get("/semana-agrupada")
+    async def semana_agrupada():
+        with engine.connect() as conn:
+            return list(conn.execute(text("SELECT kcal FROM dias ORDER BY id")).scalars())
+
+    reset_sql_stats()
+    yield TestClient(app)
+    reset_sql_stats()
+    engine.dispose()
+
+
+@pytest.mark.unit
+class TestQueryCounter:
+
+    def test_forma_sin_valores(self):
+        a = forma_sql("SELECT * FROM t WHERE id = 5 AND nombre = 'pan'")
+        b = forma_sql("SELECT *  FROM t\n WHERE id = 17 AND nombre = 'arroz'")
+        assert a == b == "SELECT * FROM t WHERE id = ? AND nombre = ?"
+        assert forma_sql("x IN (%(id_1_1)s, %(id_1_2)s)") == forma_sql("x IN (%(id_1_1)s, %(id_1_2)s, %(id_1_3)s)")
+
+    def test_headers_y_metricas_por_ruta(self, app_sqlite):
+        r = app_sqlite.get("/semana-agrupada")
+        assert r.json() == [1800, 2100, 1950, 2000]
+        assert r.headers["x-db-queries"] == "1" and r.headers["x-db-max-repeat"] == "1"
+        assert float(r.headers["x-db-time-ms"]) >= 0
+        assert sql_stats()["GET /semana-agrupada"]["queries_max"] == 1
+
+    def test_detecta_n_mas_1(self, app_sqlite):
+        r = app_sqlite.get("/semana/4")
+        assert r.headers["x-db-queries"] == "4" and r.headers["x-db-max-repeat"] == "4"
+        st = sql_stats()["GET /semana/{n}"]
+        assert st["n1"] == 1 and "WHERE id = ?" in st["n1_forma"]
+
+    def test_sin_headers_fuera_de_debug(self, app_sqlite, monkeypatch):
+        monkeypatch.setattr(settings, "CALOFIT_SQL_HEADERS", False)
+        r = app_sqlite.get("/semana/1")
+        assert "x-db-queries" not in r.headers
+        assert sql_stats()["GET /semana/{n}"]["requests"] == 1
+
+    def test_presupuesto_por_endpoint(self, app_sqlite, presupuesto_queries):
+        with presupuesto_queries(1):
+            app_sqlite.get("/semana-agrupada")
+        with pytest.raises(AssertionError, match="presupuesto de queries excedido"):
+            with presupuesto_queries(2):
+                app_sqlite.get("/semana/3")
+        with pytest.raises(AssertionError, match="N\\+1"):
+            with presupuesto_queries(10, max_repeticion=2):
+                app_sqlite.get("/semana/3")
+
+    def test_contar_queries_en_el_contexto(self):
+        engine = create_engine("sqlite://")
+        with contar_queries() as c, engine.connect() as conn:
+            conn.execute(text("SELECT 1"))
+            conn.execute(text("SELECT 2"))
+        assert c.total == 2 and c.repetidas() == [("SELECT ?", 2)]
+
+    def test_rutas_inexistentes_en_una_sola_entrada(self, app_sqlite):
+        for i in range(3):
+            assert app_sqlite.get(f"/nope/{i}").status_code == 404
+        st = sql_stats()
+        assert st[SIN_RUTA]["requests"] == 3
+        assert not [r for r in st if "nope" in r]
+
+    def test_sentencia_fallida_no_deja_t0(self):
+        engine = create_engine("sqlite://")
+        with contar_queries(), engine.connect() as conn:
+            for _ in range(3):
+                with pytest.raises(Exception):
+                    conn.execute(text("SELECT * FROM no_existe"))
+            assert not conn.connection.info.get("calofit_t0")
+            assert conn.execute(text("SELECT 1")).scalar() == 1
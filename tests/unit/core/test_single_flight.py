@@ -0,0 +1,228 @@
+"""
+Tests de app.core.single_flight: colapso de llamadas concurrentes por key.
+"""
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from app.core.single_flight import SingleFlight, single_flight_stats
+
+
+@pytest.mark.unit
+class TestSync:
+
+    def test_hilos_concurrentes_comparten_una_ejecucion(self):
+        sf = SingleFlight("test_sync")
+        llamadas = []
+        barrera = threading.Barrier(8)
+
+        def lenta():
+            llamadas.append(1)
+            time.sleep(0.1)
+            return {"kcal": 100}
+
+        def worker():
+            barrera.wait()
+            return sf.do("arroz", lenta)
+
+        with ThreadPoolExecutor(8) as pool:
+            res = list(pool.map(lambda _: worker(), range(8)))
+
+        assert len(llamadas) == 1
+        assert all(r is res[0] for r in res)
+        st = sf.stats()
+        assert st["calls"] == 8 and st["executions"] == 1 and st["coalesced"] == 7
+        assert st["inflight"] == 0
+
+    def test_excepcion_se_propaga_y_no_queda_en_vuelo(self):
+        sf = SingleFlight("test_sync_error")
+
+        def falla():
+            raise RuntimeError("llm caído")
+
+        with pytest.raises(RuntimeError):
+            sf.do("x", falla)
+        assert sf.do("x", lambda: 1) == 1
+        assert sf.stats()["errors"] == 1
+
+    def test_keys_distintas_no_se_colapsan(self):
+        sf = SingleFlight("test_sync_keys")
+        assert sf.do("a", lambda: 1) == 1
+        assert sf.do("b", lambda: 2) == 2
+        assert sf.stats()["executions"] == 2
+
+    def test_lote_espera_lo_que_ya_esta_en_vuelo(self):
+        sf = SingleFlight("test_sync_lote")
+        pedidos = []
+        en_vuelo = threading.Event()
+
+        def individual():
+            en_vuelo.set()
+            time.sleep(0.1)
+            return "cocona-individual"
+
+        def lote(keys):
+            pedidos.append(sorted(keys))
+            return {k: f"{k}-lote" for k in keys}
+
+        with ThreadPoolExecutor(2) as pool:
+            uno = pool.submit(sf.do, "cocona", individual)
+            en_vuelo.wait()
+            res = pool.submit(sf.do_many, ["tumbo", "cocona", "tumbo"], lote).result()
+        assert pedidos == [["tumbo"]]
+        assert res == {"tumbo": "tumbo-lote", "cocona": "cocona-individual"}
+        assert uno.result() == "cocona-individual"
+        st = sf.stats()
+        assert st["executions"] == 2 and st["coalesced"] == 1 and st["inflight"] == 0
+
+
+@pytest.mark.unit
+class TestSyncYAsync:
+    """Un solo espacio de keys: la ruta síncrona y la async se colapsan entre sí."""
+
+    def test_async_espera_al_lider_sincrono(self):
+        sf = SingleFlight("test_mixto_sync")
+        llamadas = []
+        en_vuelo = threading.Event()
+
+        def lenta():
+            llamadas.append("sync")
+            en_vuelo.set()
+            time.sleep(0.1)
+            return "quinua"
+
+        async def rapida():
+            llamadas.append("async")
+            return "otra"
+
+        async def main():
+            return await sf.do_async("quinua", rapida)
+
+        with ThreadPoolExecutor(1) as pool:
+            lider = pool.submit(sf.do, "quinua", lenta)
+            en_vuelo.wait()
+            assert asyncio.run(main()) == "quinua"
+        assert lider.result() == "quinua"
+        assert llamadas == ["sync"]
+        assert sf.stats()["coalesced"] == 1 and sf.stats()["inflight"] == 0
+
+    def test_sync_espera_al_lider_async(self):
+        sf = SingleFlight("test_mixto_async")
+        llamadas = []
+
+        async def lenta():
+            llamadas.append("async")
+            await asyncio.sleep(0.1)
+            return "quinua"
+
+        def rapida():
+            llamadas.append("sync")
+            return "otra"
+
+        async def main():
+            lider = asyncio.ensure_future(sf.do_async("quinua", lenta))
+            await asyncio.sleep(0.01)
+            waiter = await asyncio.to_thread(sf.do, "quinua", rapida)
+            return await lider, waiter
+
+        assert asyncio.run(main()) == ("quinua", "quinua")
+        assert llamadas == ["async"]
+
+    def test_sync_en_el_hilo_del_loop_no_se_bloquea(self):
+        sf = SingleFlight("test_mixto_loop")
+
+        async def lenta():
+            await asyncio.sleep(0.05)
+            return "async"
+
+        async def main():
+            lider = asyncio.ensure_future(sf.do_async("k", lenta))
+            await asyncio.sleep(0)
+            # Esperar aquí a la task del mismo loop sería un deadlock: ejecuta por su cuenta.
+            propio = sf.do("k", lambda: "sync")
+            return await lider, propio
+
+        assert asyncio.run(main()) == ("async", "sync")
+        assert sf.stats()["inflight"] == 0
+
+
+@pytest.mark.unit
+class TestAsync:
+
+    def test_coroutines_comparten_una_task(self):
+        sf = SingleFlight("test_async")
+        llamadas = []
+
+        async def lenta():
+            llamadas.append(1)
+            await asyncio.sleep(0.05)
+            return "json"
+
+        async def main():
+            return await asyncio.gather(*(sf.do_async("pollo", lenta) for _ in range(5)))
+
+        assert asyncio.run(main()) == ["json"] * 5
+        assert len(llamadas) == 1
+        assert sf.stats()["coalesced"] == 4
+
+    def test_cancelar_un_waiter_no_cancela_a_los_demas(self):
+        sf = SingleFlight("test_async_cancel")
+
+        async def lenta():
+            await asyncio.sleep(0.05)
+            return 42
+
+        async def main():
+            a = asyncio.ensure_future(sf.do_async("k", lenta))
+            b = asyncio.ensure_future(sf.do_async("k", lenta))
+            await asyncio.sleep(0)
+            a.cancel()
+            return await b
+
+        assert asyncio.run(main()) == 42
+
+    def test_excepcion_llega_a_todos(self):
+        sf = SingleFlight("test_async_error")
+
+        async def falla():
+            await asyncio.sleep(0.01)
+            raise ConnectionError("429")
+
+        async def main():
+            return await asyncio.gather(
+                sf.do_async("k", falla), sf.do_async("k", falla), return_exceptions=True
+            )
+
+        res = asyncio.run(main())
+        assert all(isinstance(r, ConnectionError) for r in res)
+        assert sf.stats()["errors"] == 1
+
+    def test_lotes_concurrentes_comparten_keys(self):
+        sf = SingleFlight("test_async_lote")
+        pedidos = []
+
+        async def lote(keys):
+            pedidos.append(sorted(keys))
+            await asyncio.sleep(0.05)
+            return {k: k.upper() for k in keys}
+
+        async def main():
+            return await asyncio.gather(
+                sf.do_many_async(["cocona", "tumbo"], lote),
+                sf.do_many_async(["tumbo", "pacay"], lote),
+                sf.do_async("cocona", lambda: lote(["cocona"])),
+            )
+
+        a, b, c = asyncio.run(main())
+        assert pedidos == [["cocona", "tumbo"], ["pacay"]]
+        assert a == {"cocona": "COCONA", "tumbo": "TUMBO"}
+        assert b == {"tumbo": "TUMBO", "pacay": "PACAY"}
+        assert c == "COCONA"
+        assert sf.stats()["inflight"] == 0
+
+    def test_stats_globales(self):
+        SingleFlight("test_global")
+        assert "test_global" in single_flight_stats()
@@ -0,0 +1,175 @@
+"""
+Corpus de regresión de la resolución nombre → alimento
+(app.services.alimentos_resolucion): la query rankeada y el catálogo en memoria
+eligen el mismo alimento que las cascadas secuenciales que reemplazan.
+"""
+import pytest
+from sqlalchemy import create_engine, func
+from sqlalchemy.orm import sessionmaker
+
+from app.core.query_counter import contar_queries
+from app.models.alimento import Alimento
+from app.models.alimento_alias import AlimentoAlias
+from app.models.alimento_unidad import AlimentoUnidad
+from app.services.alimentos_resolucion import (
+    buscar_alimento,
+    id_exacto_o_alias,
+    resolver_alimento_id,
+)
+from app.services.catalogo_alimentos import cargar_catalogo, descartar_catalogo
+from app.utils.alimento_nombre import norm_alimento_key
+
+# Nombres con la forma del catálogo INS/CENAN (más algunos cortos de usuario).
+CATALOGO = [
+    "Arroz blanco cocido", "Arroz", "Arroz con pollo", "Arroz integral cocido", "Arroz chaufa",
+    "Pan francés", "Pan", "Pan integral", "Pan de molde blanco", "Panetón",
+    "Papa amarilla sancochada", "Papa blanca sancochada", "Papaya", "Papa", "Papas fritas",
+    "Pollo, pechuga sin piel, cocida", "Pollo a la brasa", "Pollo, muslo con piel",
+    "Huevo de gallina entero, sancochado", "Huevo frito", "Huevo",
+    "Galleta de soda", "Galleta de avena", "Galleta de vainilla", "Galletas con chispas de chocolate",
+    "Avena en hojuelas", "Avena cocida con leche", "Leche evaporada entera", "Leche de vaca fresca",
+    "Ensalada de frutas", "Fruta seca mixta", "Mezcla de frutas", "Plátano de seda", "Plátano frito",
+    "Pescado atún, enlatado en agua", "Pescado atún, enlatado en aceite", "Queso fresco de vaca",
+    "Queso edam", "Yogurt natural", "Yogurt bebible de fresa", "Camote amarillo sancochado",
+    "Lomo saltado", "Ají de gallina", "Quinua cocida", "Manzana delicia", "Manzana verde",
+]
+ALIAS = {
+    "chaufa": "Arroz chaufa",
+    "pan frances": "Pan francés",
+    "atun": "Pescado atún, enlatado en agua",
+    "yogur": "Yogurt natural",
+    "palta": "Queso fresco de vaca",  # alias erróneo a propósito: gana al prefijo
+    "platano": "Plátano de seda",
+    "quinoa": "Quinua cocida",
+}
+# Entradas de usuario: exactos, alias, prefijos, multi-palabra, subcadenas y sin match.
+CORPUS = [
+    "arroz", "arroz blanco", "arroz con pollo", "chaufa", "pan", "pan frances", "pan integral",
+    "papa", "papas", "papa amarilla", "papaya", "pollo", "pechuga", "pollo brasa", "huevo",
+    "huevo sancochado", "galleta", "galleta de avena", "galletas", "galleta de chocolate",
+    "avena", "avena con leche", "leche", "leche evaporada", "fruta", "frutas", "platano",
+    "platano frito", "atun", "atun en aceite", "queso", "queso fresco", "yogur", "yogurt",
+    "yogurt fresa", "camote", "lomo", "gallina", "aji de gallina", "quinoa", "quinua", "manzana",
+    "manzana verde", "palta", "sandia", "ceviche de pescado", "soda", "vainilla", "integral",
+    "sancochado", "entero", "a", "de", "",
+]
+
+
+@pytest.fixture
+def db():
+    descartar_catalogo()
+    engine = create_engine("sqlite://")
+    Alimento.__table__.create(engine)
+    AlimentoAlias.__table__.create(engine)
+    AlimentoUnidad.__table__.create(engine)
+    sesion = sessionmaker(bind=engine)()
+    ids = {}
+    for nombre in CATALOGO:
+        a = Alimento(nombre=nombre, nombre_normalizado=norm_alimento_key(nombre), calorias_100g=100,
+                     proteina_100g=5, carbohidratos_100g=15, grasas_100g=2)
+        sesion.add(a)
+        sesion.flush()
+        ids[nombre] = a.id
+    for alias, nombre in ALIAS.items():
+        sesion.add(AlimentoAlias(alimento_id=ids[nombre], alias=alias, alias_normalizado=alias))
+    sesion.commit()
+    yield sesion
+    sesion.close()
+    engine.dispose()
+    descartar_catalogo()
+
+
+# ── Cascadas anteriores (referencia) ─────────────────────────────────────────
+
+def _cascada_nlp(db, n):
+    if not n:
+        return None
+    a = db.query(Alimento).filter(Alimento.nombre_normalizado == n).first()
+    if a:
+        return a
+    alias = db.query(AlimentoAlias).filter(AlimentoAlias.alias_normalizado == n).first()
+    if alias:
+        return db.query(Alimento).filter(Alimento.id == alias.alimento_id).first()
+    a3 = (db.query(Alimento).filter(Alimento.nombre_normalizado.like(f"{n} %"))
+          .order_by(func.length(Alimento.nombre_normalizado).asc()).first())
+    if a3:
+        return a3
+    palabras_n = [w for w in n.split() if len(w) >= 4 and w not in {"de", "con", "del", "las", "los"}]
+    if len(palabras_n) >= 2:
+        q = db.query(Alimento)
+        for pw in palabras_n:
+            q = q.filter(Alimento.nombre_normalizado.like(f"%{pw}%"))
+        a_multi = q.order_by(func.length(Alimento.nombre_normalizado).asc()).first()
+        if a_multi:
+            return a_multi
+    return (db.query(Alimento).filter(Alimento.nombre_normalizado.like(f"%{n}%"))
+            .order_by(Alimento.nombre_normalizado.like(f"{n}%").desc(),
+                      func.length(Alimento.nombre_normalizado).asc()).first())
+
+
+def _cascada_ids(db, n):
+    if not n:
+        return None
+    a = db.query(Alimento).filter(Alimento.nombre_normalizado == n).first()
+    if a:
+        return int(a.id)
+    al = db.query(AlimentoAlias).filter(AlimentoAlias.alias_normalizado == n).first()
+    if al:
+        return int(al.alimento_id)
+    a2 = (db.query(Alimento).filter(Alimento.nombre_normalizado.like(f"{n}%"))
+          .order_by(Alimento.id.asc()).first())
+    return int(a2.id) if a2 else None
+
+
+def _id(a):
+    return a.id if a else None
+
+
+@pytest.mark.unit
+class TestResolucionAlimentos:
+
+    @pytest.mark.parametrize("entrada", CORPUS)
+    def test_misma_eleccion_que_la_cascada_nlp(self, db, entrada):
+        n = norm_alimento_key(entrada)
+        assert _id(buscar_alimento(db, n)) == _id(_cascada_nlp(db, n))
+
+    @pytest.mark.parametrize("entrada", CORPUS)
+    def test_misma_eleccion_que_la_cascada_ids(self, db, entrada):
+        n = norm_alimento_key(entrada)
+        assert resolver_alimento_id(db, n) == _cascada_ids(db, n)
+
+    def test_precedencia(self, db):
+        def nombre(n):
+            return buscar_alimento(db, n).nombre
+        assert nombre("arroz") == "Arroz"                        # 1. exacto
+        assert nombre("palta") == "Queso fresco de vaca"         # 2. alias
+        assert nombre("papa") == "Papa"                          # 1. exacto antes que "papa %"
+        assert nombre("papa amarilla") == "Papa amarilla sancochada"  # 3. palabra inicial
+        assert nombre("galleta de chocolate") == "Galletas con chispas de chocolate"  # 4. todas las claves
+        assert nombre("fruta") == "Fruta seca mixta"             # 5. prefijo antes que subcadena
+        assert buscar_alimento(db, "sandia") is None
+
+    def test_una_query_por_resolucion(self, db):
+        with contar_queries() as c:
+            for entrada in CORPUS:
+                buscar_alimento(db, norm_alimento_key(entrada))
+        assert c.total == len([e for e in CORPUS if norm_alimento_key(e)])
+
+
+@pytest.mark.unit
+class TestCatalogoMismasReglas:
+
+    @pytest.mark.parametrize("entrada", CORPUS)
+    def test_catalogo_igual_a_las_cascadas(self, db, entrada):
+        n = norm_alimento_key(entrada)
+        cat = cargar_catalogo(db)
+        # El catálogo contesta solo nombre o alias exacto; lo demás es un miss.
+        if n and id_exacto_o_alias(cat, n) is not None:
+            assert id_exacto_o_alias(cat, n) == _id(_cascada_nlp(db, n)) == _cascada_ids(db, n)
+
+    def test_hits_sin_queries(self, db):
+        cargar_catalogo(db)
+        with contar_queries() as c:
+            assert buscar_alimento(db, "galleta de avena").nombre == "Galleta de avena"
+            assert resolver_alimento_id(db, "pan frances") is not None
+        assert c.total == 0
@@ -0,0 +1,196 @@
+"""
+Tests del catálogo de alimentos en memoria (app.services.catalogo_alimentos):
+swap atómico con versión, recarga tras commit y resolvers sin round trips en hits.
+"""
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.core.config import settings
+from app.core.query_counter import contar_queries
+from app.models.alimento import Alimento
+from app.models.alimento_alias import AlimentoAlias
+from app.models.alimento_unidad import AlimentoUnidad
+from app.services import catalogo_alimentos
+from app.services.alimentos_db_service import AlimentosDBService
+from app.services.catalogo_alimentos import (
+    cargar_catalogo,
+    catalogo_stats,
+    catalogo_vigente,
+    descartar_catalogo,
+    esperar_recarga,
+    instalar_recarga_catalogo,
+)
+
+ALIMENTOS = [
+    # id, nombre, nombre_normalizado
+    (1, "Arroz blanco cocido", "arroz blanco cocido"),
+    (2, "Ají amarillo fresco", "aji amarillo fresco"),
+    (3, "Ensalada de mariscos", "ensalada de mariscos"),
+    (4, "Sal de mesa", "sal de mesa"),
+    (5, "Pollo a la brasa", "pollo a la brasa"),
+    (6, "Pollo, pechuga sin piel, cocida", "pollo pechuga sin piel cocida"),
+]
+
+
+@pytest.fixture
+def fabrica(monkeypatch):
+    monkeypatch.setattr(settings, "CALOFIT_CATALOGO_TTL_SEC", 300.0)
+    monkeypatch.setattr(catalogo_alimentos, "_fabrica", None)  # el teardown la restaura
+    descartar_catalogo()
+    # StaticPool: las recargas en segundo plano ven la misma BD en memoria.
+    engine = create_engine("sqlite://", poolclass=StaticPool, connect_args={"check_same_thread": False})
+    for modelo in (Alimento, AlimentoAlias, AlimentoUnidad):
+        modelo.__table__.create(engine)
+    fabrica = sessionmaker(bind=engine, expire_on_commit=False)
+    with fabrica() as db:
+        for i, nombre, norm in ALIMENTOS:
+            db.add(Alimento(id=i, nombre=nombre, nombre_normalizado=norm, calorias_100g=100 + i,
+                            proteina_100g=5, carbohidratos_100g=20, grasas_100g=2))
+        db.add(AlimentoAlias(id=1, alimento_id=2, alias="aji", alias_normalizado="aji"))
+        db.add(AlimentoUnidad(id=1, alimento_id=1, nombre="Taza", gramos=186))
+        db.add(AlimentoUnidad(id=2, alimento_id=1, nombre="cucharada", gramos=12))
+        db.commit()
+    instalar_recarga_catalogo(fabrica)
+    yield fabrica
+    esperar_recarga()
+    descartar_catalogo()
+    engine.dispose()
+
+
+@pytest.mark.unit
+class TestCatalogoAlimentos:
+
+    def test_swap_atomico_con_version(self, fabrica):
+        with fabrica() as db:
+            v1 = cargar_catalogo(db)
+            v2 = cargar_catalogo(db)
+        assert v2.version == v1.version + 1
+        assert catalogo_vigente() is v2
+        assert len(v1) == len(v2) == len(ALIMENTOS)
+
+    def test_commit_recarga_el_catalogo(self, fabrica):
+        with fabrica() as db:
+            anterior = cargar_catalogo(db)
+            db.add(Alimento(id=7, nombre="Quinua cocida", nombre_normalizado="quinua cocida",
+                            calorias_100g=120, proteina_100g=4, carbohidratos_100g=21, grasas_100g=2))
+            db.commit()
+        esperar_recarga()
+        nuevo = catalogo_vigente()
+        assert nuevo.version > anterior.version
+        assert nuevo.id_por_nombre("quinua cocida") == 7
+        assert anterior.id_por_nombre("quinua cocida") is None  # el snapshot viejo no cambia
+
+    def test_rollback_no_recarga(self, fabrica):
+        with fabrica() as db:
+            version = cargar_catalogo(db).version
+            db.add(Alimento(id=8, nombre="Camote", nombre_normalizado="camote",
+                            calorias_100g=86, proteina_100g=2, carbohidratos_100g=20, grasas_100g=0))
+            db.flush()
+            db.rollback()
+            db.commit()
+        esperar_recarga()
+        assert catalogo_vigente().version == version
+
+    def test_porciones_sin_queries(self, fabrica):
+        with fabrica() as db:
+            cargar_catalogo(db)
+            srv = AlimentosDBService(db)
+            with contar_queries() as c:
+                por = srv.parsear_ingrediente_a_porcion("2 tazas de arroz blanco cocido")
+                cda = srv.gramos_por_unidad(1, "cucharadas")
+        assert c.total == 0
+        assert por.gramos == 372 and por.kcal == pytest.approx(101 * 3.72)
+        assert cda == 12
+
+    def test_bd_local_por_palabras_completas(self, fabrica):
+        from app.services.nutrition.food.resolver.source_resolver import FoodSourceResolver
+        with fabrica() as db:
+            cat = cargar_catalogo(db)
+        def buscar(nombre):
+            return FoodSourceResolver._id_en_catalogo(cat, nombre, nombre.split())
+        assert buscar("ají amarillo fresco") == 2  # sin tildes
+        assert buscar("sal de mesa") == 4
+        # Gana un nombre más largo: una fila nueva más corta cambiaría la respuesta → BD.
+        assert buscar("ají amarillo") is None
+        assert buscar("pollo") is None
+        assert buscar("rocoto") is None
+
+    def test_resolver_asistente_igual_que_bd(self, fabrica):
+        from app.services.asistente.asistente_nutricion import _resolver_alimento_en_bd
+        entradas = ["arroz blanco cocido", "aji", "arroz blanco", "pollos a la brasa", "ensalada mariscos", "lentejas"]
+        with fabrica() as db:
+            en_bd = [getattr(_resolver_alimento_en_bd(db, e), "id", None) for e in entradas]
+            cargar_catalogo(db)
+            with contar_queries() as c:
+                en_catalogo = [getattr(_resolver_alimento_en_bd(db, e), "id", None) for e in entradas]
+        assert en_catalogo == en_bd == [1, 2, 1, 5, 3, None]
+        # Solo nombre y alias exactos salen del catálogo; el resto hace la cascada en la BD.
+        with fabrica() as db, contar_queries() as c:
+            _resolver_alimento_en_bd(db, "arroz blanco cocido")
+            _resolver_alimento_en_bd(db, "aji")
+        assert c.total == 0
+
+    def test_porcion_estandar_no_usa_el_snapshot(self, fabrica):
+        from app.services.asistente.asistente_registro_comida import _get_porcion_estandar
+        with fabrica() as db:
+            cargar_catalogo(db)
+            assert _get_porcion_estandar("arroz", db) == (186.0, "1 Taza (~186g)")
+            # Renombrado por otro worker: el snapshot no lo ve, la regla "contiene" sí.
+            db.execute(text("UPDATE alimentos SET nombre_normalizado = 'quinua cocida' WHERE id = 1"))
+            db.commit()
+            assert catalogo_vigente().id_por_nombre("arroz blanco cocido") == 1
+            assert _get_porcion_estandar("quinua", db) == (186.0, "1 Taza (~186g)")
+            assert _get_porcion_estandar("arroz", db) != (186.0, "1 Taza (~186g)")
+
+    def test_sql_crudo_no_se_ve_hasta_recargar(self, fabrica):
+        with fabrica() as db:
+            cargar_catalogo(db)
+            db.execute(text("UPDATE alimentos SET calorias_100g = 999 WHERE id = 1"))
+            db.commit()
+            assert catalogo_vigente().fila(1)["calorias_100g"] == 101
+            cargar_catalogo(db)
+        assert catalogo_vigente().fila(1)["calorias_100g"] == 999
+
+    def test_fila_exacta_nueva_gana_al_snapshot(self, fabrica):
+        from app.services.alimentos_resolucion import resolver_alimento_id
+        with fabrica() as db:
+            cargar_catalogo(db)
+            assert resolver_alimento_id(db, "pollo") == 5  # prefijo, desde la BD
+            # Otro worker inserta la fila exacta: este snapshot no la tiene.
+            db.execute(text(
+                "INSERT INTO alimentos (id, nombre, nombre_normalizado, calorias_100g, proteina_100g, "
+                "carbohidratos_100g, grasas_100g) VALUES (9, 'Pollo', 'pollo', 200, 25, 0, 10)"
+            ))
+            db.commit()
+            assert catalogo_vigente().id_por_nombre("pollo") is None
+            assert resolver_alimento_id(db, "pollo") == 9
+
+    def test_escritura_local_salta_el_snapshot_hasta_recargar(self, fabrica, monkeypatch):
+        import threading
+        liberar = threading.Event()
+        recargar = catalogo_alimentos._recargar
+
+        def recarga_lenta():
+            liberar.wait(5)
+            recargar()
+
+        monkeypatch.setattr(catalogo_alimentos, "_recargar", recarga_lenta)
+        with fabrica() as db:
+            anterior = cargar_catalogo(db)
+            db.add(Alimento(id=10, nombre="Camote", nombre_normalizado="camote",
+                            calorias_100g=86, proteina_100g=2, carbohidratos_100g=20, grasas_100g=0))
+            db.commit()
+        assert catalogo_vigente() is None  # leído antes del commit
+        liberar.set()
+        esperar_recarga()
+        nuevo = catalogo_vigente()
+        assert nuevo.version > anterior.version and nuevo.id_por_nombre("camote") == 10
+
+    def test_ttl_cero_desactiva(self, fabrica, monkeypatch):
+        with fabrica() as db:
+            cargar_catalogo(db)
+        monkeypatch.setattr(settings, "CALOFIT_CATALOGO_TTL_SEC", 0.0)
+        assert catalogo_vigente() is None
+        assert catalogo_stats()["version"] > 0
@@ -0,0 +1,68 @@
+"""
+Tests del clasificador local de intención (app.services.asistente.clasificador_intencion)
+y de su uso en resolver_modo_funcion para saltar el LLM clasificador.
+"""
+import asyncio
+from unittest.mock import AsyncMock
+
+import pytest
+
+from app.core.config import settings
+from app.services.asistente import clasificador_intencion
+from app.services.asistente.asistente_modos import (
+    RECOMENDAR_EJERCICIO,
+    REGISTRAR_EJERCICIO,
+    resolver_modo_funcion,
+)
+from app.services.asistente.clasificador_intencion import clasificar_local, clasificador_stats
+
+
+@pytest.fixture(autouse=True)
+def _clasificador_activo(monkeypatch):
+    monkeypatch.setattr(settings, "CALOFIT_INTENT_LOCAL_ENABLED", True)
+    monkeypatch.setattr(settings, "CALOFIT_INTENT_LOCAL_THRESHOLD", 0.85)
+    clasificador_intencion.reset_stats()
+    yield
+    clasificador_intencion.reset_stats()
+
+
+def _ia(modo="otro"):
+    class _IA:
+        clasificar_modo_asistente = AsyncMock(return_value=modo)
+    return _IA()
+
+
+@pytest.mark.unit
+class TestClasificadorLocal:
+
+    def test_modelo_empaquetado_carga(self):
+        assert clasificador_intencion.clasificador.activo
+        modo, proba = clasificador_intencion.clasificador.predecir("dame una rutina de espalda")
+        assert modo == RECOMENDAR_EJERCICIO and proba >= 0.85
+
+    def test_mensaje_claro_se_resuelve_sin_llm(self):
+        ia = _ia()
+        modo = asyncio.run(resolver_modo_funcion(ia, "corrí 8 km", es_saludo=False))
+        assert modo == REGISTRAR_EJERCICIO
+        ia.clasificar_modo_asistente.assert_not_awaited()
+        st = clasificador_stats()
+        assert st["local"] == 1 and st["llm_skip_rate"] == 1.0
+
+    def test_baja_confianza_va_al_llm(self, monkeypatch):
+        monkeypatch.setattr(settings, "CALOFIT_INTENT_LOCAL_THRESHOLD", 1.01)
+        ia = _ia(RECOMENDAR_EJERCICIO)
+        modo = asyncio.run(resolver_modo_funcion(ia, "dame una rutina de espalda", es_saludo=False))
+        assert modo == RECOMENDAR_EJERCICIO
+        ia.clasificar_modo_asistente.assert_awaited_once()
+        assert clasificador_stats()["llm"]["baja_confianza"] == 1
+
+    def test_referencia_al_historial_va_al_llm(self):
+        historial = [{"role": "assistant", "content": "Te propongo tres platos..."}]
+        assert clasificar_local("¿cuál de esas tiene más proteína?", historial) is None
+        assert clasificar_local("agrégalo al registro", historial) is None
+        assert clasificador_stats()["llm"]["referencia_historial"] == 2
+
+    def test_desactivado_no_predice(self, monkeypatch):
+        monkeypatch.setattr(settings, "CALOFIT_INTENT_LOCAL_ENABLED", False)
+        assert clasificar_local("dame una rutina de espalda") is None
+        assert clasificador_stats()["local"] == 0
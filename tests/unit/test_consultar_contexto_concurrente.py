@@ -0,0 +1,98 @@
+"""
+Tests del arranque de AsistenteService.consultar: la clasificación del modo
+corre solapada con la lectura del contexto de BD (en un hilo) y los tiempos
+por etapa quedan registrados (app.services.asistente.tiempos_consulta).
+"""
+import asyncio
+import time
+from types import SimpleNamespace
+from unittest.mock import AsyncMock
+
+import pytest
+
+from app.services import llm_registro
+from app.services.asistente import asistente_service as asv
+from app.services.asistente.asistente_modos import OTRO
+from app.services.asistente.tiempos_consulta import reset_tiempos_consulta, tiempos_consulta_stats
+
+LATENCIA = 0.2
+PLAN = {"calorias_dia": 2000.0, "proteinas_g": 120, "carbohidratos_g": 220, "grasas_g": 60}
+
+
+class _Consulta:
+    def __init__(self, resultado):
+        self._resultado = resultado
+
+    def filter(self, *a, **kw):
+        return self
+
+    def first(self):
+        return self._resultado
+
+
+class _SesionFalsa:
+    bind = SimpleNamespace(dialect=SimpleNamespace(name="postgresql"))
+
+    def __init__(self, perfil):
+        self._perfil = perfil
+
+    def query(self, *a, **kw):
+        return _Consulta(self._perfil)
+
+
+# (etapa, "inicio" | "fin") en el orden en que ocurren.
+EVENTOS: list = []
+
+
+def _contexto_lento(perfil, edad, db):
+    EVENTOS.append(("contexto_bd", "inicio"))
+    time.sleep(LATENCIA)
+    EVENTOS.append(("contexto_bd", "fin"))
+    return PLAN, None, 150.0
+
+
+async def _modo_lento(ia, mensaje, es_saludo, historial=None):
+    EVENTOS.append(("modo", "inicio"))
+    await asyncio.sleep(LATENCIA)
+    EVENTOS.append(("modo", "fin"))
+    return OTRO
+
+
+@pytest.fixture
+def servicio(monkeypatch):
+    reset_tiempos_consulta()
+    EVENTOS.clear()
+    monkeypatch.setattr(asv, "_cargar_contexto_dia", _contexto_lento)
+    monkeypatch.setattr(asv, "resolver_modo_funcion", AsyncMock(side_effect=_modo_lento))
+    monkeypatch.setattr(llm_registro, "respuesta_chat_llm", AsyncMock(return_value="Claro, te cuento."))
+    monkeypatch.setattr("app.core.user_context.UserContext.build", lambda *a, **kw: SimpleNamespace())
+    servicio = asv.AsistenteService()
+    monkeypatch.setattr(servicio, "_analizar_salud_background", AsyncMock())
+    perfil = SimpleNamespace(id=1, first_name="Ana", birth_date=None)
+    yield servicio, _SesionFalsa(perfil), SimpleNamespace(email="ana@test.com")
+    reset_tiempos_consulta()
+
+
+@pytest.mark.unit
+class TestContextoConcurrente:
+
+    def test_modo_y_contexto_se_solapan(self, servicio, sin_bloqueos_loop):
+        srv, db, usuario = servicio
+        # La lectura de contexto (time.sleep) va en un hilo: el loop no debe quedar retenido.
+        resp = sin_bloqueos_loop(srv.consultar("¿qué opinas del té verde antes de dormir?", db, usuario, historial=[]))
+
+        assert resp["respuesta_ia"] == "Claro, te cuento."
+        assert resp["data_cientifica"]["progreso_diario"]["quemado"] == 150.0
+        # Solapadas: cada etapa empieza antes de que la otra termine.
+        assert EVENTOS.index(("modo", "inicio")) < EVENTOS.index(("contexto_bd", "fin"))
+        assert EVENTOS.index(("contexto_bd", "inicio")) < EVENTOS.index(("modo", "fin"))
+        st = tiempos_consulta_stats()
+        for etapa in ("perfil", "guardas", "contexto_bd", "modo", "espera_modo", "arranque"):
+            assert st[etapa]["count"] == 1
+
+    def test_guarda_responde_sin_clasificar(self, servicio):
+        srv, db, usuario = servicio
+        resp = asyncio.run(srv.consultar("pan con caca", db, usuario, historial=[]))
+        assert resp["_blocked"] is True
+        asv.resolver_modo_funcion.assert_not_called()
+        assert "modo" not in tiempos_consulta_stats()
@@ -0,0 +1,83 @@
+"""
+Tests del matcher compilado de palabras clave (app.services.parsing.keyword_matcher)
+y de su uso en las guardas de routing del asistente.
+"""
+import re
+
+import pytest
+
+from app.services.asistente.asistente_modos import (
+    OTRO,
+    REGISTRAR_EJERCICIO,
+    REGISTRAR_NUTRICION,
+    detectar_modo_funcion,
+)
+from app.services.parsing.contexto_respuesta import inferir_forzar_por_mensaje_usuario
+from app.services.parsing.keyword_matcher import PALABRA, PREFIJO, SUBCADENA, TOKEN, KeywordMatcher
+
+CLAVES = ("pan", "panque", "pa", "me comi", "comi", " cen", "tome ", "c++", "ya")
+TEXTOS = (
+    "", "pan", "panqueque", "me comi un pan", "comiste pan?", "ya cené",
+    "empanada", "tome agua", "tomé", "c++ y pan", "ayayay", "  comi  ",
+)
+
+
+def _referencia(modo, claves, texto):
+    if modo == SUBCADENA:
+        return [k for k in claves if k in texto]
+    if modo == PREFIJO:
+        return [k for k in claves if texto.startswith(k)]
+    if modo == PALABRA:
+        return [k for k in claves if texto.startswith(k) or re.search(rf"\b{re.escape(k.strip())}\b", texto)]
+    return [k for k in claves if k in set(texto.split())]
+
+
+@pytest.mark.unit
+class TestKeywordMatcher:
+
+    @pytest.mark.parametrize("modo", [SUBCADENA, PREFIJO, PALABRA, TOKEN])
+    def test_misma_semantica_que_el_escaneo_lineal(self, modo):
+        km = KeywordMatcher({"x": (modo, CLAVES)})
+        for texto in TEXTOS:
+            c = km.buscar(texto)
+            esperadas = _referencia(modo, CLAVES, texto)
+            assert sorted(c.claves("x")) == sorted(esperadas), texto
+            assert c.cuenta("x") == len(esperadas)
+            assert c.tiene("x") == bool(esperadas)
+
+    def test_varias_categorias_en_una_pasada(self):
+        km = KeywordMatcher({
+            "saludo": (SUBCADENA, ("hola", "buenas")),
+            "accion": (SUBCADENA, ("comi", "corri")),
+            "inicio": (PREFIJO, ("hola",)),
+        })
+        c = km.buscar("hola, hoy comi y corri")
+        assert c.categorias == {"saludo", "accion", "inicio"}
+        assert c.cuenta("accion") == 2
+        assert c.primera("accion") == "comi"
+        assert "saludo" in c and "otra" not in c
+
+    def test_modo_desconocido(self):
+        with pytest.raises(ValueError):
+            KeywordMatcher({"x": ("regex", ("a",))})
+
+
+@pytest.mark.unit
+class TestGuardasRouting:
+
+    @pytest.mark.parametrize("mensaje,modo", [
+        ("regístrame el ceviche de caballa", REGISTRAR_NUTRICION),
+        ("como se prepara un ceviche", OTRO),
+        ("hoy entrené pecho una hora", REGISTRAR_EJERCICIO),
+    ])
+    def test_detectar_modo_funcion(self, mensaje, modo):
+        assert detectar_modo_funcion(mensaje, es_saludo=False) == modo
+
+    def test_verbo_log_respeta_limite_de_palabra(self):
+        # "darme comidas" no contiene el verbo "me comi" como palabra
+        assert detectar_modo_funcion("podrías darme comidas altas en proteína", es_saludo=False) != REGISTRAR_NUTRICION
+
+    def test_dominio_por_conteo(self):
+        assert inferir_forzar_por_mensaje_usuario("comí arroz con pollo") == "comida"
+        assert inferir_forzar_por_mensaje_usuario("rutina de pierna en el gym") == "ejercicio"
+        assert inferir_forzar_por_mensaje_usuario("hola") is None
@@ -0,0 +1,58 @@
+"""
+Tests de RecomendadorPlatosConfiables.recomendar: los platos nuevos se
+construyen con la API async (LLM en el loop del llamador, sin hilo +
+asyncio.run por plato).
+"""
+import asyncio
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+
+from app.services import recomendador_platos as rp
+
+_PROPUESTAS = [
+    {"nombre_plato": "Pollo a la plancha con arroz", "ingredientes": [{"nombre": "pechuga de pollo", "gramos": 150}]},
+    {"nombre_plato": "Sudado de pescado", "ingredientes": [{"nombre": "bonito", "gramos": 150}]},
+]
+
+
+def _plato(nombre_plato, ingredientes, client_id, tipo_plato):
+    return SimpleNamespace(
+        exito=True, confianza_global=90, plato_id=1, nombre=nombre_plato, ingredientes=[],
+        macros_totales={"calorias": 600, "proteina": 40, "carbohidratos": 60, "grasas": 15},
+    )
+
+
+@pytest.mark.unit
+class TestRecomendadorAsync:
+
+    def test_platos_nuevos_con_construir_plato_async(self, monkeypatch):
+        loops = []
+
+        class _LLM:
+            async def generar_json(self, prompt, max_tokens=1500):
+                loops.append(asyncio.get_running_loop())
+                return _PROPUESTAS
+
+        monkeypatch.setattr("app.services.ai.llm_service.LLMService", _LLM)
+        monkeypatch.setattr(rp.RecomendadorPlatosConfiables, "_historial_reciente", lambda self, cid, dias=3: set())
+        monkeypatch.setattr(rp.RecomendadorPlatosConfiables, "_candidatos_desde_bd", lambda self, **kw: [])
+        guardados = []
+        monkeypatch.setattr(rp.RecomendadorPlatosConfiables, "_guardar_recomendacion",
+                            lambda self, cid, plato: guardados.append(plato["nombre"]))
+        builder = MagicMock()
+        builder.construir_plato.side_effect = AssertionError("ruta síncrona en el request")
+        builder.construir_plato_async = AsyncMock(side_effect=_plato)
+        reco = rp.RecomendadorPlatosConfiables(db=MagicMock(), plate_builder=builder)
+
+        async def main():
+            platos = await reco.recomendar(
+                client_id=1, deficit_kcal=600, deficit_proteina=40, deficit_carb=60, deficit_grasas=15, n=2,
+            )
+            return platos, asyncio.get_running_loop()
+
+        platos, loop = asyncio.run(main())
+        assert loops == [loop]
+        assert [p["nombre"] for p in platos] == [p["nombre_plato"] for p in _PROPUESTAS] == guardados
+        assert builder.construir_plato_async.await_count == 2
@@ -0,0 +1,142 @@
+"""
+Tests de los resúmenes semanales / mensuales (app.services.resumen_periodos):
+recálculo incremental al commit, escrituras en SQL crudo y backfill.
+"""
+from datetime import date, datetime
+
+import pytest
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.orm import sessionmaker
+
+from app.models.historial import ProgresoCalorias
+from app.models.nutricion import PlanDiario, PlanNutricional
+from app.models.resumen_periodo import ResumenMensual, ResumenSemanal
+from app.services.resumen_periodos import (
+    adherencia_dia,
+    backfill_resumenes,
+    instalar_hooks_resumen,
+    marcar_resumen,
+)
+
+CLIENTE = 7
+# Jue 29-ene a Mar 3-feb 2026: cruza la semana ISO 5 → 6 y el mes enero → febrero.
+DIAS = {
+    date(2026, 1, 29): (2000, 300),
+    date(2026, 1, 31): (2500, 0),
+    date(2026, 2, 2): (1800, 450),
+    date(2026, 2, 3): (0, 200),
+}
+
+
+@pytest.fixture
+def db():
+    instalar_hooks_resumen()
+    engine = create_engine("sqlite://")
+    for modelo in (ProgresoCalorias, PlanNutricional, PlanDiario, ResumenSemanal, ResumenMensual):
+        modelo.__table__.create(engine)
+    sesion = sessionmaker(bind=engine)()
+    sesion.add(PlanNutricional(
+        id=1, client_id=CLIENTE, genero=1, edad=30, peso=70, talla=170, nivel_actividad=1.5,
+        objetivo="mantener", calorias_ia_base=2000, fecha_creacion=datetime(2026, 1, 1),
+    ))
+    sesion.commit()
+    yield sesion
+    sesion.close()
+    engine.dispose()
+
+
+def _registrar(db):
+    for fecha, (kcal, quemadas) in DIAS.items():
+        db.add(ProgresoCalorias(
+            client_id=CLIENTE, fecha=fecha, calorias_consumidas=kcal, calorias_quemadas=quemadas,
+            proteinas_consumidas=kcal / 20, carbohidratos_consumidos=kcal / 8, grasas_consumidas=kcal / 30,
+        ))
+    db.commit()
+
+
+def _semana(db, semana):
+    return db.query(ResumenSemanal).filter_by(client_id=CLIENTE, anio=2026, semana=semana).one()
+
+
+def _mes(db, mes):
+    return db.query(ResumenMensual).filter_by(client_id=CLIENTE, anio=2026, mes=mes).one()
+
+
+@pytest.mark.unit
+class TestResumenPeriodos:
+
+    def test_adherencia_dia(self):
+        assert adherencia_dia(2000, 2000) == 100.0
+        assert adherencia_dia(1000, 2000) == 50.0
+        assert adherencia_dia(2200, 2000) == 100.0
+        assert adherencia_dia(3300, 2000) == 50.0
+        assert adherencia_dia(0, 2000) == 0.0
+
+    def test_commit_recalcula_semana_y_mes(self, db):
+        _registrar(db)
+        s5, s6 = _semana(db, 5), _semana(db, 6)
+        assert (s5.fecha_inicio, s5.fecha_fin) == (date(2026, 1, 26), date(2026, 2, 1))
+        assert s5.kcal_consumidas == 4500 and s5.kcal_quemadas == 300
+        assert s5.dias_registrados == 2 and s5.dias_con_ejercicio == 1
+        assert s5.adherencia_pct == pytest.approx((100.0 + adherencia_dia(2500, 2000)) / 2, abs=0.1)
+        assert s6.kcal_consumidas == 1800 and s6.dias_registrados == 1 and s6.dias_con_ejercicio == 2
+        assert _mes(db, 1).kcal_consumidas == 4500 and _mes(db, 2).kcal_consumidas == 1800
+        assert _mes(db, 2).kcal_objetivo_promedio == 2000.0
+
+    def test_actualizacion_incremental(self, db):
+        _registrar(db)
+        p = db.query(ProgresoCalorias).filter_by(client_id=CLIENTE, fecha=date(2026, 2, 2)).one()
+        p.calorias_consumidas = 2000
+        db.commit()
+        assert _semana(db, 6).kcal_consumidas == 2000 and _semana(db, 6).adherencia_pct == 100.0
+        assert _mes(db, 2).kcal_consumidas == 2000
+        assert _semana(db, 5).kcal_consumidas == 4500
+
+    def test_sql_crudo_con_marca(self, db):
+        _registrar(db)
+        db.execute(text("UPDATE progreso_calorias SET calorias_quemadas = 0 WHERE fecha = :f"), {"f": date(2026, 2, 3)})
+        marcar_resumen(db, CLIENTE, date(2026, 2, 3))
+        db.commit()
+        assert _semana(db, 6).kcal_quemadas == 450 and _semana(db, 6).dias_con_ejercicio == 1
+
+    def test_rollback_descarta_pendientes(self, db):
+        _registrar(db)
+        db.execute(text("UPDATE progreso_calorias SET calorias_quemadas = 0 WHERE fecha = :f"), {"f": date(2026, 3, 10)})
+        marcar_resumen(db, CLIENTE, date(2026, 3, 10))
+        db.rollback()
+        db.commit()
+        assert db.query(ResumenMensual).filter_by(mes=3).count() == 0
+
+    def test_backfill_igual_al_incremental(self, db):
+        _registrar(db)
+        incremental = {(r.semana, r.kcal_consumidas, r.adherencia_pct) for r in db.query(ResumenSemanal)}
+        db.query(ResumenSemanal).delete()
+        db.query(ResumenMensual).delete()
+        db.commit()
+        r = backfill_resumenes(db)
+        assert r == {"clientes": 1, "semanas": 2, "meses": 2}
+        assert {(x.semana, x.kcal_consumidas, x.adherencia_pct) for x in db.query(ResumenSemanal)} == incremental
+
+    def test_bloquea_el_periodo_antes_de_leer_progreso(self, db):
+        sentencias = []
+
+        def registrar(conn, cursor, statement, *args):
+            sentencias.append(" ".join(statement.split()))
+
+        event.listen(db.get_bind(), "before_cursor_execute", registrar)
+        _registrar(db)
+        upserts = [i for i, s in enumerate(sentencias) if "ON CONFLICT" in s and s.startswith("INSERT INTO resumen_")]
+        lectura = next(i for i, s in enumerate(sentencias) if s.startswith("SELECT") and "FROM progreso_calorias" in s)
+        # Una fila por semana y mes (5, 6, enero, febrero), todas antes de leer los días.
+        assert len(upserts) == 4 and max(upserts) < lectura
+        db.add(ProgresoCalorias(client_id=CLIENTE, fecha=date(2026, 2, 4), calorias_consumidas=1000))
+        db.commit()  # la fila ya existe: el upsert no choca con la unique
+        assert _semana(db, 6).kcal_consumidas == 2800
+
+    def test_instalar_hooks_es_idempotente(self):
+        from sqlalchemy.orm import Session
+
+        from app.services import resumen_periodos
+        instalar_hooks_resumen()
+        instalar_hooks_resumen()
+        assert event.contains(Session, "before_commit", resumen_periodos._antes_de_commit)